@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量草稿并行生成引擎
+将素材组合分发到线程池/进程池中并行执行 复制草稿 + 替换素材 + 保存,
+并保持组合→草稿名称的确定性映射(文本替换依赖该顺序)
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Any, Callable, Collection, Dict, List, Optional
+
+from pyJianYingDraft import instrumentation
+
+
+@dataclass
+class BatchTask:
+    """单个组合的处理任务"""
+
+    index: int
+    """组合序号, 从1开始"""
+    combination: Dict[str, Any]
+    """素材组合"""
+    combo_name: str
+    """组合的汉字名称"""
+    base_name: str
+    """未去重前的目标草稿名称"""
+    target_name: str
+    """去重后的目标草稿名称"""
+
+
+@dataclass
+class BatchTaskResult:
+    """单个组合的处理结果"""
+
+    index: int
+    target_name: str
+    success: bool = False
+    error: Optional[str] = None
+    attempts: int = 0
+    timings: Dict[str, float] = field(default_factory=dict)
+    """各阶段耗时(秒), 多次尝试时累加"""
+    completed_stages: List[str] = field(default_factory=list)
+    """已完成的阶段, 按执行顺序排列"""
+    resumed_stages: List[str] = field(default_factory=list)
+    """沿用之前运行结果、本次未执行的阶段"""
+    skipped: bool = False
+    """是否已在之前的运行中完成, 本次整个跳过"""
+    metrics: Optional[instrumentation.Recorder] = None
+    """处理过程中各阶段的耗时与读写字节数等计数, 跳过的任务为None"""
+
+
+def plan_batch_tasks(processor, combinations: List[Dict[str, Any]]) -> List[BatchTask]:
+    """按组合顺序预先计算目标草稿名称, 与串行处理的命名规则完全一致
+
+    名称在分发前一次性确定, 因此无论各任务以何种顺序完成, 组合→草稿名称的映射都保持不变
+    """
+    tasks: List[BatchTask] = []
+    used_names = set()
+    for i, combination in enumerate(combinations, 1):
+        combo_name = processor.generate_chinese_combo_name(combination)
+        base_name = f"{processor.selected_draft}_{combo_name}"
+
+        target_name = base_name
+        counter = 1
+        while target_name in used_names:
+            target_name = f"{base_name}_{counter}"
+            counter += 1
+        used_names.add(target_name)
+
+        tasks.append(BatchTask(i, combination, combo_name, base_name, target_name))
+    return tasks
+
+
+def run_batch_task(processor, task: BatchTask, max_retries: int = 3, retry_delay: float = 1.0,
+                   resume_stages: Collection[str] = (), clean: bool = False,
+                   profile_path: Optional[str] = None) -> BatchTaskResult:
+    """在当前线程/进程中处理单个组合: 复制草稿并替换素材, 失败时重试
+
+    重试前会删除上一次尝试遗留的半成品草稿, 保证每次尝试都从模板的干净副本开始.
+    处理过程中各阶段的耗时与计数记录在结果的`metrics`中
+
+    Args:
+        resume_stages (`Collection[str]`, optional): 之前的运行中已完成的阶段, 第一次尝试时跳过. 目前只支持跳过`copy`
+        clean (`bool`, optional): 是否先删除已存在的同名草稿(之前运行遗留的半成品), 默认为否
+        profile_path (`str`, optional): 提供时在剖析器下处理该组合并将结果保存到此路径, 见`instrumentation.profile_call`
+    """
+    with instrumentation.recording() as recorder:
+        with instrumentation.stage("variant.total"):
+            if profile_path:
+                result = instrumentation.profile_call(profile_path, _run_attempts, processor, task, max_retries,
+                                                      retry_delay, resume_stages, clean)
+            else:
+                result = _run_attempts(processor, task, max_retries, retry_delay, resume_stages, clean)
+    result.metrics = recorder
+    return result
+
+
+def _run_attempts(processor, task: BatchTask, max_retries: int, retry_delay: float,
+                  resume_stages: Collection[str], clean: bool) -> BatchTaskResult:
+    result = BatchTaskResult(task.index, task.target_name)
+    timings = result.timings
+
+    for attempt in range(max_retries):
+        result.attempts = attempt + 1
+        result.completed_stages = []
+        result.resumed_stages = []
+        try:
+            if attempt > 0 or clean:
+                if attempt > 0 and retry_delay > 0:
+                    time.sleep(retry_delay)
+                if processor.draft_folder.has_draft(task.target_name):
+                    processor.draft_folder.remove(task.target_name)
+
+            if attempt == 0 and "copy" in resume_stages and not clean:
+                result.resumed_stages.append("copy")
+            else:
+                start = time.perf_counter()
+                with instrumentation.stage("variant.copy"):
+                    copy_success = processor.copy_single_draft(task.target_name)
+                timings["copy"] = timings.get("copy", 0.0) + time.perf_counter() - start
+                if not copy_success:
+                    result.error = "草稿复制失败"
+                    continue
+            result.completed_stages.append("copy")
+
+            start = time.perf_counter()
+            with instrumentation.stage("variant.replace"):
+                replacement_success = processor.replace_materials_for_draft(task.target_name, task.combination)
+            timings["replace"] = timings.get("replace", 0.0) + time.perf_counter() - start
+            if not replacement_success:
+                result.error = "素材替换失败"
+                continue
+            result.completed_stages.append("replace")
+
+            result.success = True
+            result.error = None
+            break
+        except Exception as e:
+            result.error = str(e)
+
+    return result
+
+
+_worker_processor = None
+
+
+def _init_process_worker(processor) -> None:
+    """进程池初始化: 每个工作进程只反序列化一次处理器"""
+    global _worker_processor
+    _worker_processor = processor
+
+
+def _run_task_in_process(task: BatchTask, max_retries: int, retry_delay: float,
+                         resume_stages: Collection[str], clean: bool, profile_path: Optional[str]) -> BatchTaskResult:
+    return run_batch_task(_worker_processor, task, max_retries, retry_delay, resume_stages, clean, profile_path)
+
+
+class ParallelBatchEngine:
+    """非交互式的批量草稿并行生成引擎"""
+
+    processor: Any
+    """提供`copy_single_draft`与`replace_materials_for_draft`的批量处理器"""
+    workers: int
+    """并行任务数"""
+    executor: str
+    """执行器类型, "thread" 或 "process" """
+    max_retries: int
+    retry_delay: float
+    manifest: Any
+    """运行清单(`batch_manifest.BatchManifest`), 为None时不记录也不跳过"""
+    stage_resume: bool
+    """是否在已复制的草稿上只重做替换阶段. 仅当替换失败不会留下写了一半的草稿(即单次读写)时才应启用"""
+    profile_index: Optional[int]
+    """在剖析器下处理的组合序号, 为None时不剖析"""
+    profile_path: Optional[str]
+    """剖析结果的保存路径"""
+
+    def __init__(self, processor, workers: Optional[int] = None, executor: str = "thread",
+                 max_retries: int = 3, retry_delay: float = 1.0, manifest=None, stage_resume: bool = False,
+                 profile_index: Optional[int] = None, profile_path: Optional[str] = None):
+        """
+        Args:
+            processor: 已完成路径、模板与替换参数配置的批量处理器
+            workers (`int`, optional): 并行任务数, 默认为`min(8, CPU核数)`
+            executor (`str`, optional): "thread"使用线程池, "process"使用进程池, 默认为"thread"
+            max_retries (`int`, optional): 每个组合的最大尝试次数, 默认为3
+            retry_delay (`float`, optional): 重试前的等待秒数, 仅在失败后生效, 默认为1.0
+            manifest (`BatchManifest`, optional): 运行清单, 提供时跳过已完成的组合并记录各阶段状态
+            stage_resume (`bool`, optional): 是否在已复制的草稿上只重做替换阶段, 默认为否
+            profile_index (`int`, optional): 在剖析器下处理的组合序号(从1开始), 默认不剖析
+            profile_path (`str`, optional): 剖析结果的保存路径, 默认为`profile_<序号>.prof`
+
+        Raises:
+            `ValueError`: 执行器类型不合法
+        """
+        if executor not in ("thread", "process"):
+            raise ValueError(f"未知的执行器类型: {executor}")
+        self.processor = processor
+        self.workers = max(1, workers or min(8, os.cpu_count() or 1))
+        self.executor = executor
+        self.max_retries = max(1, max_retries)
+        self.retry_delay = retry_delay
+        self.manifest = manifest
+        self.stage_resume = stage_resume
+        self.profile_index = profile_index
+        self.profile_path = profile_path or (f"profile_{profile_index}.prof" if profile_index else None)
+
+    def _profile_path_for(self, task: BatchTask) -> Optional[str]:
+        return self.profile_path if task.index == self.profile_index else None
+
+    def plan_resume(self, tasks: List[BatchTask]) -> Dict[int, Dict[str, Any]]:
+        """根据运行清单确定各任务的处理方式, 返回 {组合序号: {"skip", "resume_stages", "clean"}}
+
+        只有草稿仍然存在时才沿用清单中已完成的阶段; 清单中有记录但未完成的同名草稿是之前遗留的半成品, 先删除再生成
+        """
+        plans: Dict[int, Dict[str, Any]] = {}
+        state = self.manifest.load_state() if self.manifest is not None else {}
+        for task in tasks:
+            done = self.manifest.completed_stages(task, state) if self.manifest is not None else set()
+            exists = bool(state.get(task.target_name)) and self.processor.draft_folder.has_draft(task.target_name)
+            if exists and {"copy", "replace"} <= done:
+                plans[task.index] = {"skip": True, "resume_stages": (), "clean": False}
+            elif exists and "copy" in done and self.stage_resume:
+                plans[task.index] = {"skip": False, "resume_stages": ("copy",), "clean": False}
+            else:
+                plans[task.index] = {"skip": False, "resume_stages": (), "clean": exists}
+        return plans
+
+    def run(self, tasks: List[BatchTask],
+            on_result: Optional[Callable[[BatchTask, BatchTaskResult], None]] = None) -> List[BatchTaskResult]:
+        """并行处理所有任务, 返回按组合序号排序的结果
+
+        Args:
+            tasks (`List[BatchTask]`): 由`plan_batch_tasks`生成的任务列表
+            on_result (`Callable`, optional): 每个任务完成时在主线程中调用的回调
+        """
+        results: Dict[int, BatchTaskResult] = {}
+        task_by_index = {task.index: task for task in tasks}
+        plans = self.plan_resume(tasks)
+
+        def finish(task: BatchTask, result: BatchTaskResult) -> None:
+            results[task.index] = result
+            if self.manifest is not None:
+                self.manifest.record_result(task, result)
+            if on_result:
+                on_result(task, result)
+
+        pending = []
+        for task in tasks:
+            if plans[task.index]["skip"]:
+                finish(task, BatchTaskResult(task.index, task.target_name, success=True,
+                                             completed_stages=["copy", "replace"], skipped=True))
+            else:
+                pending.append(task)
+
+        if self.workers == 1:
+            for task in pending:
+                plan = plans[task.index]
+                finish(task, run_batch_task(self.processor, task, self.max_retries, self.retry_delay,
+                                            plan["resume_stages"], plan["clean"], self._profile_path_for(task)))
+            return [results[task.index] for task in tasks]
+
+        if self.executor == "process":
+            pool = ProcessPoolExecutor(max_workers=self.workers,
+                                       initializer=_init_process_worker, initargs=(self.processor,))
+        else:
+            pool = ThreadPoolExecutor(max_workers=self.workers)
+
+        with pool:
+            if self.executor == "process":
+                futures = {pool.submit(_run_task_in_process, task, self.max_retries, self.retry_delay,
+                                       plans[task.index]["resume_stages"], plans[task.index]["clean"],
+                                       self._profile_path_for(task)): task.index
+                           for task in pending}
+            else:
+                futures = {pool.submit(run_batch_task, self.processor, task, self.max_retries, self.retry_delay,
+                                       plans[task.index]["resume_stages"], plans[task.index]["clean"],
+                                       self._profile_path_for(task)): task.index
+                           for task in pending}
+
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = BatchTaskResult(index, task_by_index[index].target_name, error=str(e))
+                finish(task_by_index[index], result)
+
+        return [results[task.index] for task in tasks]
+
+    @staticmethod
+    def build_combination_mapping(tasks: List[BatchTask], results: List[BatchTaskResult]) -> List[Dict[str, Any]]:
+        """生成文本替换所需的组合映射表, 严格按组合顺序排列"""
+        result_by_index = {result.index: result for result in results}
+        mapping = []
+        for task in tasks:
+            result = result_by_index.get(task.index)
+            success = bool(result and result.success)
+            mapping.append({
+                'combination_index': task.index,
+                'combination': task.combination,
+                'combo_name': task.combo_name,
+                'target_name': task.base_name,
+                'actual_draft_name': task.target_name if success else None,
+                'success': success
+            })
+        return mapping
+
+    @staticmethod
+    def summarize_timings(results: List[BatchTaskResult]) -> Dict[str, Dict[str, float]]:
+        """汇总各阶段耗时, 返回 {阶段: {"total", "mean", "max"}}"""
+        summary: Dict[str, Dict[str, float]] = {}
+        for result in results:
+            for stage, seconds in result.timings.items():
+                stats = summary.setdefault(stage, {"total": 0.0, "count": 0, "max": 0.0})
+                stats["total"] += seconds
+                stats["count"] += 1
+                stats["max"] = max(stats["max"], seconds)
+        for stats in summary.values():
+            stats["mean"] = stats["total"] / stats["count"] if stats["count"] else 0.0
+            del stats["count"]
+        return summary
+
+    @staticmethod
+    def summarize_metrics(results: List[BatchTaskResult]) -> instrumentation.Recorder:
+        """合并各组合的分阶段耗时与计数, 可由`Recorder.report()`输出p50/p95等统计"""
+        recorder = instrumentation.Recorder()
+        for result in results:
+            if result.metrics is not None:
+                recorder.merge(result.metrics)
+        return recorder
@@ -0,0 +1,486 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+无交互的批量草稿生成
+按JSON(或安装了PyYAML时的YAML)任务配置完成与`interactive_cli.py`相同的全部流程, 不读取标准输入,
+进度以JSON Lines的形式输出到标准输出(或`--events`指定的文件), 程序自身的日志输出到标准错误, 便于调度器同时运行多个任务
+
+用法:
+    python examples/batch_job.py job.json [--events events.jsonl]
+
+任务配置示例(除`template`与`materials_folder`外均可省略, 也可以用`settings_file`指定`utils/config/settings.json`
+这样的配置文件, 以其中的路径、模板名称及替换设置为默认值):
+    {
+        "draft_folder": "/path/to/com.lveditor.draft",
+        "template": "模板草稿",
+        "materials_folder": "/path/to/materials",
+        "replacement_mode": "video",
+        "timeline_mode": "speed_adjust",
+        "combination_mode": "sequential",
+        "audio": {"folder": "/path/to/materials/audios", "volume": 100, "subtitles": true},
+        "background_music": {"volume": 60, "fade_out": 2},
+        "text": {"content_track": 1, "watermark_track": "水印"},
+        "workers": 4,
+        "shard": "1/2",
+        "profile_variant": 3
+    }
+
+生成组合前会合并各part文件夹中画面(无法解码视频时为内容)重复的素材, 并输出`duplicates`事件, `"screen_duplicates": false`关闭.
+`profile_variant`指定时在cProfile下处理该序号的组合, 剖析结果保存到`profile_output`(默认为`profile_<序号>.prof`).
+`task`与`done`事件中的`metrics`为各阶段耗时的统计(次数、累计、p50、p95、最长, 单位秒),
+`done`事件中的`counters`为读写字节数、子进程数等计数的合计
+
+退出码: 0 全部成功, 1 存在失败的组合, 2 任务配置错误或流程中止
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import contextlib
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, TextIO
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import pyJianYingDraft as draft
+from examples.batch_engine import ParallelBatchEngine
+from examples.batch_manifest import parse_shard
+from examples.interactive_cli import BatchDraftProcessor
+from utils.config_manager import ConfigManager
+
+REPLACEMENT_MODES = ("video", "image", "all")
+TIMELINE_MODES = ("speed_adjust", "crop_end", "crop_start", "crop_random", "keep_original")
+SELECTION_MODES = ("sequential", "random")
+LONGER_HANDLINGS = ("none", "speed_up", "trim")
+SHORTER_HANDLINGS = ("none", "trim_video", "allow_silence", "slow_down")
+SUBTITLE_STYLES = ("white_bg_black_border", "default")
+
+AUDIO_DEFAULTS = {"folder": None, "volume": 100, "fade_in": 0, "fade_out": 0, "selection": "sequential",
+                  "longer": "none", "shorter": "none", "subtitles": True, "subtitle_style": "white_bg_black_border"}
+"""`audio`配置的默认值, 与交互界面中直接回车时的选择相同"""
+BACKGROUND_MUSIC_DEFAULTS = {"folder": None, "volume": 100, "fade_in": 0, "fade_out": 0, "selection": "sequential",
+                             "longer": "none", "shorter": "none"}
+"""`background_music`配置的默认值"""
+TEXT_DEFAULTS = {"folder": None, "content": None, "watermark": None,
+                 "content_track": 1, "watermark_track": None, "selection": "sequential"}
+"""`text`配置的默认值, 未指定`watermark_track`时只替换标题"""
+JOB_DEFAULTS = {"draft_folder": None, "replacement_mode": "video", "timeline_mode": "speed_adjust",
+                "combination_mode": "sequential", "audio": None, "background_music": None, "text": None,
+                "workers": 1, "executor": "thread", "backup_mode": None, "compact_json": False,
+                "copy_strategy": "auto", "material_pool": True, "shard": "1/1", "resume": True,
+                "screen_duplicates": True, "profile_variant": None, "profile_output": None}
+"""任务配置的默认值"""
+
+LENGTH_HANDLE_TIMELINE_MODES = {1: "speed_adjust", 2: "crop_end", 3: "crop_start", 4: "crop_random", 5: "keep_original"}
+"""`utils/config/settings.json`中`length_handle`选项对应的时间线处理模式"""
+MEDIA_TYPE_REPLACEMENT_MODES = {1: "image", 2: "video", 3: "all"}
+"""`utils/config/settings.json`中`media_type`选项对应的替换模式"""
+
+
+class JobSpecError(ValueError):
+    """任务配置不合法, 或流程需要配置中未给出的选项"""
+
+
+def _check_choice(section: str, key: str, value: Any, choices) -> None:
+    if value not in choices:
+        raise JobSpecError(f"{section}{key} 应为 {', '.join(map(str, choices))} 之一, 而不是 {value!r}")
+
+
+def _merge_section(name: str, value: Any, defaults: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """合并一个可选配置段: `false`/`null`表示不启用, `true`表示全部使用默认值"""
+    if value is None or value is False:
+        return None
+    if value is True:
+        value = {}
+    if not isinstance(value, dict):
+        raise JobSpecError(f"{name} 应为对象、true或false")
+    unknown = set(value) - set(defaults)
+    if unknown:
+        raise JobSpecError(f"{name} 中有未知的选项: {', '.join(sorted(unknown))}")
+    return {**defaults, **value}
+
+
+def settings_file_defaults(path: str) -> Dict[str, Any]:
+    """从`ConfigManager`的配置文件(如`utils/config/settings.json`)中读取路径、模板及替换设置, 作为任务配置的默认值
+
+    Raises:
+        `JobSpecError`: 配置文件不存在
+    """
+    if not os.path.isfile(path):
+        raise JobSpecError(f"配置文件不存在: {path}")
+    with contextlib.redirect_stdout(sys.stderr):
+        manager = ConfigManager(path)
+    paths = manager.get_paths()
+    settings = manager.get_replacement_settings()
+
+    defaults: Dict[str, Any] = {}
+    for key, value in (("draft_folder", paths.get("draft_folder")),
+                       ("materials_folder", paths.get("materials_folder")),
+                       ("template", manager.get_template_config().get("name")),
+                       ("timeline_mode", LENGTH_HANDLE_TIMELINE_MODES.get(settings.get("length_handle"))),
+                       ("replacement_mode", MEDIA_TYPE_REPLACEMENT_MODES.get(settings.get("media_type")))):
+        if value:
+            defaults[key] = value
+    if settings.get("selection_mode") in (1, 2):
+        defaults["combination_mode"] = "sequential" if settings["selection_mode"] == 1 else "random"
+    return defaults
+
+
+def normalize_job_spec(spec: Dict[str, Any]) -> Dict[str, Any]:
+    """检查任务配置并补全默认值
+
+    任务配置中的`settings_file`指向`ConfigManager`的配置文件时, 其中的设置作为默认值, 任务配置中的选项优先
+
+    Raises:
+        `JobSpecError`: 缺少必需项、有未知的选项或取值不合法
+    """
+    if not isinstance(spec, dict):
+        raise JobSpecError("任务配置应为对象")
+    if spec.get("settings_file"):
+        spec = {**settings_file_defaults(spec["settings_file"]),
+                **{key: value for key, value in spec.items() if key != "settings_file"}}
+    for key in ("template", "materials_folder"):
+        if not spec.get(key):
+            raise JobSpecError(f"任务配置缺少必需项 {key}")
+    unknown = set(spec) - set(JOB_DEFAULTS) - {"template", "materials_folder", "name"}
+    if unknown:
+        raise JobSpecError(f"任务配置中有未知的选项: {', '.join(sorted(unknown))}")
+
+    job = {**JOB_DEFAULTS, **spec}
+    _check_choice("", "replacement_mode", job["replacement_mode"], REPLACEMENT_MODES)
+    _check_choice("", "timeline_mode", job["timeline_mode"], TIMELINE_MODES)
+    _check_choice("", "combination_mode", job["combination_mode"], SELECTION_MODES)
+    _check_choice("", "executor", job["executor"], ("thread", "process"))
+    if job["backup_mode"] is not None:
+        _check_choice("", "backup_mode", job["backup_mode"], draft.BACKUP_MODES)
+    _check_choice("", "copy_strategy", job["copy_strategy"], draft.draft_copy.COPY_STRATEGIES)
+    if not isinstance(job["workers"], int) or job["workers"] < 1:
+        raise JobSpecError(f"workers 应为正整数, 而不是 {job['workers']!r}")
+    if job["profile_variant"] is not None and (not isinstance(job["profile_variant"], int) or job["profile_variant"] < 1):
+        raise JobSpecError(f"profile_variant 应为组合序号(从1开始), 而不是 {job['profile_variant']!r}")
+    try:
+        job["shard"] = parse_shard(str(job["shard"]))
+    except ValueError as e:
+        raise JobSpecError(str(e))
+
+    job["audio"] = _merge_section("audio", job["audio"], AUDIO_DEFAULTS)
+    job["background_music"] = _merge_section("background_music", job["background_music"], BACKGROUND_MUSIC_DEFAULTS)
+    job["text"] = _merge_section("text", job["text"], TEXT_DEFAULTS)
+    for name in ("audio", "background_music"):
+        section = job[name]
+        if section is None:
+            continue
+        _check_choice(name + ".", "selection", section["selection"], SELECTION_MODES)
+        _check_choice(name + ".", "longer", section["longer"], LONGER_HANDLINGS)
+        _check_choice(name + ".", "shorter", section["shorter"], SHORTER_HANDLINGS)
+        if not 0 <= section["volume"] <= 1000:
+            raise JobSpecError(f"{name}.volume 应在 0-1000 之间")
+    if job["audio"] is not None:
+        _check_choice("audio.", "subtitle_style", job["audio"]["subtitle_style"], SUBTITLE_STYLES)
+    if job["text"] is not None:
+        _check_choice("text.", "selection", job["text"]["selection"], SELECTION_MODES)
+        if job["text"]["content_track"] is None and job["text"]["watermark_track"] is None:
+            raise JobSpecError("text 中至少应指定 content_track 或 watermark_track")
+    return job
+
+
+def load_job_spec(path: str) -> Dict[str, Any]:
+    """读取任务配置文件, `.yaml`/`.yml`文件需要安装PyYAML
+
+    Raises:
+        `JobSpecError`: 文件无法解析或配置不合法
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    try:
+        if os.path.splitext(path)[1].lower() in (".yaml", ".yml"):
+            if yaml is None:
+                raise JobSpecError("读取YAML任务配置需要安装PyYAML: pip install pyyaml")
+            spec = yaml.safe_load(text)
+        else:
+            spec = json.loads(text)
+    except (ValueError, getattr(yaml, "YAMLError", ValueError)) as e:
+        if isinstance(e, JobSpecError):
+            raise
+        raise JobSpecError(f"无法解析任务配置 {path}: {e}")
+    if isinstance(spec, dict) and spec.get("settings_file"):
+        # 相对路径相对于任务配置文件所在的文件夹
+        spec["settings_file"] = os.path.join(os.path.dirname(os.path.abspath(path)), spec["settings_file"])
+    return normalize_job_spec(spec)
+
+
+def _ignore_event(event: str, **fields: Any) -> None:
+    pass
+
+
+class HeadlessBatchProcessor(BatchDraftProcessor):
+    """由任务配置代替交互输入的批量处理器
+
+    流程中的每个选择都取自任务配置; 若流程仍需询问(即配置不足以确定某个选项), 抛出`JobSpecError`而不是等待输入
+    """
+
+    job: Dict[str, Any]
+    """经过`normalize_job_spec`补全的任务配置"""
+
+    def __init__(self, job: Dict[str, Any], emit: Optional[Callable[..., None]] = None, debug: bool = False):
+        """
+        Args:
+            job (`Dict[str, Any]`): 经过`normalize_job_spec`补全的任务配置
+            emit (`Callable`, optional): 进度事件的回调, 以事件名称及其字段为关键字参数调用
+            debug (`bool`, optional): 是否输出调试信息
+        """
+        super().__init__(debug=debug)
+        self.job = job
+        self.emit = emit or _ignore_event
+
+        if job["draft_folder"]:
+            self.draft_folder_path = job["draft_folder"]
+        self.batch_workers = job["workers"]
+        self.batch_executor = job["executor"]
+        self.json_compact = job["compact_json"]
+        self.copy_strategy = job["copy_strategy"]
+        self.use_material_pool = job["material_pool"]
+        if job["backup_mode"]:
+            self.backup_mode = job["backup_mode"]
+        self.batch_shard = job["shard"]
+        self.resume_batches = job["resume"]
+        self.screen_duplicates = job["screen_duplicates"]
+        self.profile_variant = job["profile_variant"]
+        self.profile_output = job["profile_output"]
+
+    def __getstate__(self):
+        # 进程池中的工作进程不输出进度事件, 事件由主进程在收到结果时输出
+        state = self.__dict__.copy()
+        state["emit"] = _ignore_event
+        return state
+
+    def __setstate__(self, state):
+        # 以spawn方式启动的工作进程不继承主进程的输出重定向, 同样将日志输出到标准错误, 保持标准输出中只有进度事件
+        self.__dict__.update(state)
+        sys.stdout = sys.stderr
+
+    def get_user_input(self, prompt, allow_empty=False, default=None):
+        raise JobSpecError(f"流程需要交互输入, 请在任务配置中补充对应选项: {prompt}")
+
+    def get_user_choice(self, options, prompt="请选择", default_index=None):
+        raise JobSpecError(f"流程需要交互选择, 请在任务配置中补充对应选项: {prompt}")
+
+    def confirm(self, prompt):
+        return True
+
+    def setup_paths(self):
+        if not os.path.isdir(self.draft_folder_path):
+            raise JobSpecError(f"草稿文件夹不存在: {self.draft_folder_path}")
+        self.draft_folder = draft.DraftFolder(self.draft_folder_path)
+        return True
+
+    def select_source_draft(self):
+        template = self.job["template"]
+        if not self.draft_folder.has_draft(template):
+            raise JobSpecError(f"模板草稿不存在: {template}")
+        self.selected_draft = template
+        return True
+
+    def setup_materials_folder(self):
+        if not os.path.isdir(self.job["materials_folder"]):
+            raise JobSpecError(f"素材文件夹不存在: {self.job['materials_folder']}")
+        self.materials_folder_path = self.job["materials_folder"]
+        return True
+
+    def select_replacement_mode(self):
+        self.replacement_mode = self.job["replacement_mode"]
+        return True
+
+    def select_timeline_mode(self):
+        self.timeline_mode = "keep_original" if self.replacement_mode == "image" else self.job["timeline_mode"]
+        return True
+
+    def select_processing_mode(self):
+        self.processing_mode = self.job["combination_mode"]
+        return True
+
+    def _resolve_folder(self, section: Dict[str, Any], default_name: str) -> str:
+        folder = section["folder"] or os.path.join(self.materials_folder_path, default_name)
+        if not os.path.isdir(folder):
+            raise JobSpecError(f"文件夹不存在: {folder}")
+        return folder
+
+    def configure_background_music_options(self):
+        section = self.job["background_music"]
+        self.enable_background_music = section is not None
+        if section is None:
+            return True
+        self.background_music_folder_path = self._resolve_folder(section, "musics")
+        self.bg_music_volume = section["volume"]
+        self.bg_music_fade_in = float(section["fade_in"])
+        self.bg_music_fade_out = float(section["fade_out"])
+        self.bg_music_selection_mode = section["selection"]
+        self.bg_music_longer_handling = section["longer"]
+        self.bg_music_shorter_handling = section["shorter"]
+        return True
+
+    def configure_audio_options(self):
+        section = self.job["audio"]
+        self.enable_audio_subtitle = section is not None
+        if section is None:
+            self.enable_subtitles = False
+            return True
+        self.audios_folder_path = self._resolve_folder(section, "audios")
+        self.audio_volume = section["volume"]
+        self.audio_fade_in = float(section["fade_in"])
+        self.audio_fade_out = float(section["fade_out"])
+        self.audio_selection_mode = section["selection"]
+        self.audio_longer_handling = section["longer"]
+        self.audio_shorter_handling = section["shorter"]
+        self.enable_subtitles = bool(section["subtitles"])
+        self.subtitle_style = section["subtitle_style"]
+        return True
+
+    def _find_text_track(self, text_tracks, key):
+        """按序号(从1开始, 与交互界面中的"轨道N"一致)或轨道名称查找文本轨道"""
+        if isinstance(key, int):
+            if not 1 <= key <= len(text_tracks):
+                raise JobSpecError(f"模板草稿只有 {len(text_tracks)} 个文本轨道, 没有轨道{key}")
+            return key - 1
+        for i, track in enumerate(text_tracks):
+            if track['track_name'] == key:
+                return i
+        raise JobSpecError(f"模板草稿中没有名为 '{key}' 的文本轨道")
+
+    def configure_text_replacement_options(self):
+        section = self.job["text"]
+        self.enable_text_replacement = section is not None
+        if section is None:
+            return True
+
+        text_tracks = self.extract_text_tracks_from_draft(self.selected_draft)
+        if not text_tracks:
+            raise JobSpecError("模板草稿中没有文本轨道, 无法进行文本替换")
+        self.text_folder_path = section["folder"] or os.path.join(self.materials_folder_path, "text")
+        self.selected_text_tracks = []
+        self.text_files = {}
+        for text_type in ("content", "watermark"):
+            key = section[text_type + "_track"]
+            if key is None:
+                continue
+            track_idx = self._find_text_track(text_tracks, key)
+            self.selected_text_tracks.append({
+                'type': text_type,
+                'track_index': track_idx,
+                'original_track_index': text_tracks[track_idx]['track_index'],
+                'track_info': text_tracks[track_idx]
+            })
+            file_path = section[text_type] or os.path.join(self.text_folder_path, f"{text_type}.txt")
+            if not os.path.isfile(file_path):
+                raise JobSpecError(f"文本文件不存在: {file_path}")
+            self.text_files[text_type] = file_path
+        self.text_replacement_count = len(self.selected_text_tracks)
+        self.text_selection_mode = section["selection"]
+        if not self.load_text_contents():
+            raise JobSpecError("文本内容读取失败")
+        return True
+
+    def screen_duplicate_materials(self, part_files):
+        duplicates = super().screen_duplicate_materials(part_files)
+        for folder, groups in duplicates.items():
+            self.emit("duplicates", folder=folder, groups=groups)
+        return duplicates
+
+    def report_batch_result(self, task, result, completed, total):
+        super().report_batch_result(task, result, completed, total)
+        self.emit("task", index=task.index, target=task.target_name, completed=completed, total=total,
+                  success=result.success, skipped=result.skipped, attempts=result.attempts,
+                  error=result.error, timings=result.timings,
+                  metrics=result.metrics.summary() if result.metrics is not None else None)
+
+    def run_job(self) -> bool:
+        """运行完整流程, 返回是否全部组合都处理成功
+
+        Raises:
+            `JobSpecError`: 任务配置不足以完成流程
+        """
+        steps = [("paths", self.setup_paths), ("template", self.select_source_draft),
+                 ("materials", self.setup_materials_folder), ("replacement_mode", self.select_replacement_mode),
+                 ("timeline_mode", self.select_timeline_mode), ("scan", self.create_part_folders_and_scan)]
+        for name, step in steps:
+            self.emit("stage", stage=name)
+            if not step():
+                raise JobSpecError(f"步骤 {name} 未能完成, 详见日志")
+
+        self.emit("plan", combinations=len(self.material_combinations))
+        self.emit("stage", stage="batch")
+        if not self.batch_process_drafts() and not self.last_batch_results:
+            raise JobSpecError("批量处理未能开始, 详见日志")
+        if self.enable_text_replacement and not self.text_replaced_in_batch:
+            self.emit("stage", stage="text")
+            self.process_text_replacement()
+
+        return all(result.success for result in self.last_batch_results)
+
+
+class EventWriter:
+    """以JSON Lines写出进度事件, 每个事件写出后立即刷新"""
+
+    def __init__(self, stream: TextIO, job_name: str):
+        self.stream = stream
+        self.job_name = job_name
+
+    def __call__(self, event: str, **fields: Any) -> None:
+        record = {"time": round(time.time(), 3), "job": self.job_name, "event": event, **fields}
+        self.stream.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+        self.stream.flush()
+
+
+def run_job_file(spec_path: str, events: TextIO, log: TextIO = sys.stderr, debug: bool = False) -> int:
+    """运行一个任务配置文件, 返回退出码"""
+    emit = EventWriter(events, Path(spec_path).stem)
+    start = time.perf_counter()
+    try:
+        job = load_job_spec(spec_path)
+        emit.job_name = job.get("name") or emit.job_name
+        emit("start", template=job["template"], shard="%d/%d" % job["shard"])
+        processor = HeadlessBatchProcessor(job, emit, debug=debug)
+        with contextlib.redirect_stdout(log):
+            all_succeeded = processor.run_job()
+    except (JobSpecError, OSError) as e:
+        emit("error", message=str(e))
+        return 2
+    except Exception as e:
+        emit("error", message=f"{type(e).__name__}: {e}")
+        return 2
+
+    results = processor.last_batch_results
+    metrics = ParallelBatchEngine.summarize_metrics(results)
+    emit("done", elapsed=round(time.perf_counter() - start, 3),
+         succeeded=sum(1 for result in results if result.success),
+         failed=sum(1 for result in results if not result.success),
+         skipped=sum(1 for result in results if result.skipped),
+         drafts=[result.target_name for result in results if result.success],
+         metrics=metrics.summary(), counters=metrics.counters)
+    return 0 if all_succeeded else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description='按任务配置无交互地批量生成草稿')
+    parser.add_argument('job', help='任务配置文件 (.json，安装PyYAML后也支持 .yaml/.yml)')
+    parser.add_argument('--events', type=str, default=None, help='进度事件(JSON Lines)的输出文件，默认为标准输出')
+    parser.add_argument('--debug', action='store_true', help='启用调试模式')
+    args = parser.parse_args()
+
+    if args.events:
+        with open(args.events, "a", encoding="utf-8") as events:
+            sys.exit(run_job_file(args.job, events, debug=args.debug))
+    sys.exit(run_job_file(args.job, sys.stdout, debug=args.debug))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量草稿生成的运行清单
+记录每个组合的输入摘要、目标草稿名称及各阶段状态, 使中断后重新运行时跳过已完成的组合、只重做失败的阶段,
+并支持多台机器以`--shard i/n`分片处理同一草稿根目录下的同一批组合
+
+清单位于草稿根目录的`.batch_runs/<模板名称>/`中:
+
+- `plan.json`: 本批次的素材组合与生成参数, 随机组合时其它分片及重新运行都以它为准
+- `<主机名>.<分片>of<分片数>.jsonl`: 各分片追加写入的阶段记录, 每个分片只写自己的文件, 读取时合并全部文件
+"""
+
+import os
+import json
+import time
+import socket
+import hashlib
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from examples.batch_engine import BatchTask, BatchTaskResult
+
+RUN_DIR_NAME = ".batch_runs"
+"""运行清单在草稿根目录下的文件夹名称"""
+
+STAGES = ("copy", "replace")
+"""按顺序执行的处理阶段, 某阶段重做时其后的阶段也需重做"""
+
+
+def parse_shard(spec: str) -> Tuple[int, int]:
+    """解析形如`2/4`的分片参数, 返回 (分片序号, 分片数), 序号从1开始
+
+    Raises:
+        `ValueError`: 格式不正确或序号超出范围
+    """
+    try:
+        shard, count = (int(part) for part in spec.split("/"))
+    except ValueError:
+        raise ValueError(f"分片参数应形如 'i/n', 而不是 '{spec}'")
+    if count < 1 or not 1 <= shard <= count:
+        raise ValueError(f"分片序号应在 1-{count} 之间: '{spec}'")
+    return shard, count
+
+
+def shard_tasks(tasks: List[BatchTask], shard: int, shard_count: int) -> List[BatchTask]:
+    """按组合序号轮流分配, 取出属于第`shard`个分片的任务"""
+    return [task for task in tasks if (task.index - 1) % shard_count == shard - 1]
+
+
+def _dumps(data: Any) -> str:
+    return json.dumps(data, ensure_ascii=False, sort_keys=True, default=str)
+
+
+def file_signature(path: Optional[str]) -> Optional[List[int]]:
+    """文件的 [大小, 修改时间(纳秒)], 文件不存在时为None"""
+    if not path:
+        return None
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+class BatchManifest:
+    """一个模板草稿的批量生成清单"""
+
+    run_dir: str
+    """清单文件夹路径"""
+    template: str
+    """模板草稿名称"""
+    settings: Dict[str, Any]
+    """影响生成结果的参数, 参与输入摘要的计算"""
+    shard: int
+    """本机处理的分片序号, 从1开始"""
+    shard_count: int
+    """分片数"""
+    material_path: Optional[Callable[[str, Any], Optional[str]]]
+    """由组合中的文件夹与文件名得到素材文件路径, 素材文件的大小与修改时间参与输入摘要的计算"""
+
+    def __init__(self, draft_root: str, template: str, settings: Optional[Dict[str, Any]] = None,
+                 shard: int = 1, shard_count: int = 1, template_path: Optional[str] = None,
+                 material_path: Optional[Callable[[str, Any], Optional[str]]] = None):
+        """
+        Args:
+            draft_root (`str`): 草稿根目录, 清单保存在其中的`.batch_runs`文件夹下
+            template (`str`): 模板草稿名称
+            settings (`Dict[str, Any]`, optional): 影响生成结果的参数, 参数变化的组合会被重新生成
+            shard (`int`, optional): 本机处理的分片序号, 默认为1
+            shard_count (`int`, optional): 分片数, 默认为1
+            template_path (`str`, optional): 模板草稿的JSON文件路径, 模板被修改后所有组合都会被重新生成
+            material_path (`Callable[[str, Any], Optional[str]]`, optional): 由组合中的文件夹与文件名得到素材文件路径,
+                返回None表示不是素材文件; 素材被替换(如以同名重新导出)的组合会被重新生成
+        """
+        self.run_dir = os.path.join(draft_root, RUN_DIR_NAME, template)
+        self.template = template
+        self.settings = settings or {}
+        self.shard = shard
+        self.shard_count = shard_count
+        self.log_path = os.path.join(self.run_dir, f"{socket.gethostname()}.{shard}of{shard_count}.jsonl")
+        self._settings_hash = hashlib.sha1(_dumps(self.settings).encode("utf-8")).hexdigest()
+        self._template_signature = file_signature(template_path)
+        self.material_path = material_path
+        self._signatures: Dict[str, Optional[List[int]]] = {}  # 同一次运行中每个素材只查询一次
+        self._log = None
+
+    @property
+    def plan_path(self) -> str:
+        """批次计划文件路径"""
+        return os.path.join(self.run_dir, "plan.json")
+
+    def load_plan(self) -> Optional[Dict[str, Any]]:
+        """读取已有的批次计划, 不存在或损坏时返回None"""
+        try:
+            with open(self.plan_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save_plan(self, combinations: List[Dict[str, Any]], replace: bool = True) -> List[Dict[str, Any]]:
+        """保存批次计划
+
+        Args:
+            combinations (`List[Dict[str, Any]]`): 本批次的素材组合
+            replace (`bool`, optional): 已有计划时是否覆盖. 为否时以先写入者为准(多台机器同时开始分片时使用)
+
+        Returns:
+            `List[Dict[str, Any]]`: 实际生效的计划中的组合
+        """
+        os.makedirs(self.run_dir, exist_ok=True)
+        plan = {"template": self.template, "created": time.time(),
+                "combinations": combinations, "settings": self.settings}
+        tmp_path = f"{self.plan_path}.{socket.gethostname()}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(_dumps(plan))
+        try:
+            if replace:
+                os.replace(tmp_path, self.plan_path)
+                return combinations
+            try:
+                os.link(tmp_path, self.plan_path)  # 原子地创建, 已存在时失败
+            except FileExistsError:
+                existing = self.load_plan()
+                if existing is not None:
+                    return existing["combinations"]
+                os.replace(tmp_path, self.plan_path)
+            except OSError:
+                # 文件系统不支持硬链接
+                if os.path.exists(self.plan_path):
+                    existing = self.load_plan()
+                    if existing is not None:
+                        return existing["combinations"]
+                os.replace(tmp_path, self.plan_path)
+            return combinations
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _material_signatures(self, combination: Dict[str, Any]) -> Dict[str, Optional[List[int]]]:
+        """组合中各素材文件的大小与修改时间"""
+        signatures: Dict[str, Optional[List[int]]] = {}
+        if self.material_path is None:
+            return signatures
+        for folder, name in combination.items():
+            path = self.material_path(folder, name)
+            if path is None:
+                continue
+            if path not in self._signatures:
+                self._signatures[path] = file_signature(path)
+            signatures[folder] = self._signatures[path]
+        return signatures
+
+    def inputs_hash(self, task: BatchTask) -> str:
+        """组合的输入摘要: 模板(及其草稿文件的大小与修改时间)、目标名称、素材组合(及各素材文件的大小与修改时间)和生成参数"""
+        payload = {"template": self.template, "target": task.target_name,
+                   "combination": task.combination, "settings": self._settings_hash,
+                   "template_file": self._template_signature,
+                   "materials": self._material_signatures(task.combination)}
+        return hashlib.sha1(_dumps(payload).encode("utf-8")).hexdigest()
+
+    def _read_records(self) -> List[Dict[str, Any]]:
+        """读取所有分片的阶段记录, 按时间排序"""
+        records: List[Dict[str, Any]] = []
+        if not os.path.isdir(self.run_dir):
+            return records
+        for name in os.listdir(self.run_dir):
+            if not name.endswith(".jsonl"):
+                continue
+            with open(os.path.join(self.run_dir, name), "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        pass  # 中断时写了一半的行
+        records.sort(key=lambda record: record.get("time", 0))
+        return records
+
+    def load_state(self) -> Dict[str, Dict[str, Any]]:
+        """合并所有分片的记录, 返回 {目标草稿名称: {"inputs": 输入摘要, "stages": 已完成阶段的集合}}
+
+        同一草稿的输入摘要变化后, 之前完成的阶段作废; 某阶段失败或重做时, 其后的阶段也作废
+        """
+        state: Dict[str, Dict[str, Any]] = {}
+        for record in self._read_records():
+            entry = state.setdefault(record["target"], {"inputs": record["inputs"], "stages": set()})
+            if entry["inputs"] != record["inputs"]:
+                entry["inputs"] = record["inputs"]
+                entry["stages"] = set()
+            stage = record["stage"]
+            if stage not in STAGES:
+                continue
+            later = set(STAGES[STAGES.index(stage):])
+            entry["stages"] -= later
+            if record["status"] == "done":
+                entry["stages"].add(stage)
+        return state
+
+    def completed_stages(self, task: BatchTask, state: Dict[str, Dict[str, Any]]) -> Set[str]:
+        """在`load_state`的结果中查询任务已完成的阶段, 输入摘要不一致时为空"""
+        entry = state.get(task.target_name)
+        if entry is None or entry["inputs"] != self.inputs_hash(task):
+            return set()
+        return set(entry["stages"])
+
+    def record(self, task: BatchTask, stage: str, status: str, error: Optional[str] = None) -> None:
+        """追加一条阶段记录, 每条记录写入后立即刷新到磁盘"""
+        if self._log is None:
+            os.makedirs(self.run_dir, exist_ok=True)
+            self._log = open(self.log_path, "a+", encoding="utf-8")
+            if self._log.tell() > 0:
+                self._log.seek(self._log.tell() - 1)
+                if self._log.read(1) != "\n":
+                    self._log.write("\n")  # 断开中断时写了一半的行
+        line = {"time": time.time(), "index": task.index, "target": task.target_name,
+                "inputs": self.inputs_hash(task), "stage": stage, "status": status}
+        if error:
+            line["error"] = error
+        self._log.write(_dumps(line) + "\n")
+        self._log.flush()
+        os.fsync(self._log.fileno())
+
+    def record_result(self, task: BatchTask, result: BatchTaskResult) -> None:
+        """按任务结果记录各阶段的状态, 跳过的任务不再记录"""
+        if result.skipped:
+            return
+        for stage in STAGES:
+            if stage in result.completed_stages:
+                if stage not in result.resumed_stages:
+                    self.record(task, stage, "done")
+            else:
+                self.record(task, stage, "failed", result.error)
+                break
+
+    def close(self) -> None:
+        if self._log is not None:
+            self._log.close()
+            self._log = None
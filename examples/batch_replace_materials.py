@@ -10,8 +10,6 @@ import shutil
 from pathlib import Path
 from typing import Dict, List, Tuple
 import pyJianYingDraft as draft
-import subprocess
-import json
 
 class MaterialBatchReplacer:
     """批量素材替换器"""
@@ -448,16 +446,13 @@ class MaterialBatchReplacer:
             float: 视频时长（秒），如果获取失败返回0
         """
         try:
-            # 使用ffprobe获取视频信息
-            cmd = [
-                'ffprobe', '-v', 'quiet', '-print_format', 'json',
-                '-show_format', '-show_streams', video_path
-            ]
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+            # 使用ffprobe获取视频信息（结果经由探测缓存）
+            try:
+                data = draft.probe_cache.ffprobe(video_path)
+            except RuntimeError:
+                data = None
             
-            if result.returncode == 0:
-                data = json.loads(result.stdout)
-                
+            if data is not None:
                 # 尝试从format信息获取时长
                 if 'format' in data and 'duration' in data['format']:
                     return float(data['format']['duration'])
@@ -14,12 +14,16 @@ import random
 import shutil
 import re
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 
 # 添加项目根目录到Python路径
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
 import pyJianYingDraft as draft
+import video_duplicate_checker
+from examples.batch_engine import ParallelBatchEngine, plan_batch_tasks
+from examples.batch_manifest import BatchManifest, parse_shard, shard_tasks
 import platform
 import sys
 
@@ -95,6 +99,43 @@ class BatchDraftProcessor:
         self.last_replaced_videos = []  # 记录最近替换的视频文件
         self.jianying_app_path = None  # 剪映程序路径
         
+        # 素材探测结果 {绝对路径: probe_many摘要}，扫描素材时并发探测
+        self.media_probes = {}
+        
+        # 以紧凑格式（无缩进）写入草稿JSON，剪映可正常读取且写入更快
+        self.json_compact = False
+        
+        # 复制草稿时素材文件的共享方式: "auto"(reflink或硬链接，不支持时复制) 或 "copy"(完整复制)
+        self.copy_strategy = "auto"
+        
+        # 替换的新素材经由草稿根目录下的素材池共享，同一素材用于多个草稿时只保存一份
+        self.use_material_pool = True
+        
+        # 修改草稿JSON前的备份方式: "full"(完整备份)、"snapshot"(只保留原始快照)、"journal"(只记录改动)或 "off"(不备份，模板即是备份)
+        self.backup_mode = draft.draft_backup.default_backup_mode()
+        
+        # 单次读写：每个组合的素材、音频、背景音乐、字幕和文本替换在同一份内存中的草稿上完成，最后只保存一次
+        self.single_pass_edits = True
+        self.combination_indices = {}  # 目标草稿名称 → 组合序号，用于单次读写时确定文本
+        self.text_replaced_in_batch = False
+        
+        # 批量处理并行配置
+        self.batch_workers = 1  # 并行任务数，1为串行
+        self.batch_executor = "thread"  # "thread" 或 "process"
+        
+        # 断点续跑：在草稿根目录的 .batch_runs 中记录每个组合的处理状态，重新运行时跳过已完成的组合
+        self.resume_batches = True
+        self.batch_shard = (1, 1)  # (分片序号, 分片数)，多台机器分片处理同一批组合
+        self.last_batch_results = []  # 最近一次批量处理的结果（BatchTaskResult列表）
+        
+        # 重复素材预检：生成组合前按画面指纹（无法解码视频时按内容哈希）合并各part文件夹中的重复素材，只保留一个
+        self.screen_duplicates = True
+        self.duplicate_max_distance = 10  # 两帧视为相同画面的最大汉明距离（64位中）
+        
+        # 性能剖析：在cProfile/pyinstrument下处理指定序号的组合，None为不剖析
+        self.profile_variant = None
+        self.profile_output = None  # 剖析结果路径，以.html结尾且安装了pyinstrument时输出HTML报告
+        
     def safe_emoji_print(self, emoji, text):
         """安全的emoji打印，Windows兼容"""
         try:
@@ -148,6 +189,11 @@ class BatchDraftProcessor:
                 print("\n\n👋 用户取消操作，再见!")
                 sys.exit(0)
     
+    def confirm(self, prompt):
+        """询问是否继续，直接回车视为确认"""
+        answer = self.get_user_input(f"{prompt} (y/n)", allow_empty=True)
+        return answer.lower() in ['y', 'yes', '']
+    
     def get_user_choice(self, options, prompt="请选择", default_index=None):
         """获取用户选择"""
         while True:
@@ -317,60 +363,63 @@ class BatchDraftProcessor:
             return None
         
         try:
-            with open(draft_info_path, 'r', encoding='utf-8') as f:
-                draft_info = json.load(f)
+            draft_info = draft.json_util.load_file(draft_info_path)
                 
             if self.debug:
                 self.print_success(f"成功读取草稿文件: {os.path.basename(draft_info_path)}")
             
-            # 提取基本信息
-            canvas = draft_info.get('canvas_config', {})
-            duration = draft_info.get('duration', 0)
-            fps = draft_info.get('fps', 30.0)
-            
-            # 统计轨道信息
-            tracks_stats = {}
-            if 'tracks' in draft_info:
-                for track in draft_info['tracks']:
-                    track_type = track.get('type', 'unknown')
-                    tracks_stats[track_type] = tracks_stats.get(track_type, 0) + 1
-            
-            # 统计素材信息
-            materials_stats = {}
-            if 'materials' in draft_info:
-                for material_type, material_list in draft_info['materials'].items():
-                    if isinstance(material_list, list) and material_list:
-                        materials_stats[material_type] = len(material_list)
-            
-            # 提取视频素材信息
-            video_materials = []
-            if 'materials' in draft_info and 'videos' in draft_info['materials']:
-                for video in draft_info['materials']['videos']:
-                    if isinstance(video, dict):
-                        video_materials.append({
-                            'id': video.get('id', ''),
-                            'name': video.get('material_name', video.get('name', '')),
-                            'path': video.get('path', ''),
-                            'duration': video.get('duration', 0),
-                            'width': video.get('width', 0),
-                            'height': video.get('height', 0)
-                        })
-            
-            return {
-                'draft_name': draft_name,
-                'canvas_config': canvas,
-                'duration': duration,
-                'fps': fps,
-                'tracks': tracks_stats,
-                'materials': materials_stats,
-                'video_materials': video_materials,
-                'raw_data': draft_info
-            }
+            return self.summarize_draft_info(draft_name, draft_info)
             
         except Exception as e:
             print(f"读取 draft_info.json 失败: {e}")
             return None
     
+    def summarize_draft_info(self, draft_name, draft_info):
+        """从已解析的草稿内容中提取基本信息及视频素材列表"""
+        # 提取基本信息
+        canvas = draft_info.get('canvas_config', {})
+        duration = draft_info.get('duration', 0)
+        fps = draft_info.get('fps', 30.0)
+        
+        # 统计轨道信息
+        tracks_stats = {}
+        if 'tracks' in draft_info:
+            for track in draft_info['tracks']:
+                track_type = track.get('type', 'unknown')
+                tracks_stats[track_type] = tracks_stats.get(track_type, 0) + 1
+        
+        # 统计素材信息
+        materials_stats = {}
+        if 'materials' in draft_info:
+            for material_type, material_list in draft_info['materials'].items():
+                if isinstance(material_list, list) and material_list:
+                    materials_stats[material_type] = len(material_list)
+        
+        # 提取视频素材信息
+        video_materials = []
+        if 'materials' in draft_info and 'videos' in draft_info['materials']:
+            for video in draft_info['materials']['videos']:
+                if isinstance(video, dict):
+                    video_materials.append({
+                        'id': video.get('id', ''),
+                        'name': video.get('material_name', video.get('name', '')),
+                        'path': video.get('path', ''),
+                        'duration': video.get('duration', 0),
+                        'width': video.get('width', 0),
+                        'height': video.get('height', 0)
+                    })
+        
+        return {
+            'draft_name': draft_name,
+            'canvas_config': canvas,
+            'duration': duration,
+            'fps': fps,
+            'tracks': tracks_stats,
+            'materials': materials_stats,
+            'video_materials': video_materials,
+            'raw_data': draft_info
+        }
+
     def select_source_draft(self):
         """选择源草稿作为复制模版"""
         self.print_header("选择复制模版草稿")
@@ -1381,6 +1430,18 @@ class BatchDraftProcessor:
             
             print(f"  └── 找到 {len(part_files[folder])} 个{file_type_desc}: {part_files[folder][:3]}{'...' if len(part_files[folder]) > 3 else ''}")
         
+        # 并发探测所有素材，在复制任何草稿之前剔除无法使用的文件
+        expected_types = {}
+        for folder, files in part_files.items():
+            expected = 'photo' if folder == 'background' or folder.startswith('partbg') else 'video'
+            for file_name in files:
+                expected_types[os.path.join(self.materials_folder_path, folder, file_name)] = expected
+        invalid_paths = self.probe_media_files(expected_types)
+        if invalid_paths:
+            for folder in part_files:
+                part_files[folder] = [f for f in part_files[folder]
+                                      if os.path.join(self.materials_folder_path, folder, f) not in invalid_paths]
+        
         # 检查是否所有文件夹都有文件
         empty_folders = [folder for folder, files in part_files.items() if not files]
         if empty_folders:
@@ -1494,6 +1555,128 @@ class BatchDraftProcessor:
         # 生成素材组合
         return self.generate_material_combinations(part_files)
     
+    def probe_media_files(self, expected_types):
+        """并发探测素材文件（结果经由探测缓存），返回无法使用的文件路径集合
+        
+        Args:
+            expected_types: {文件路径: 期望的素材类型 "video" / "photo" / "audio"}
+        """
+        if not expected_types:
+            return set()
+        
+        results = draft.probe_many(list(expected_types))
+        self.media_probes.update(results)
+        
+        problems = {}
+        for path, expected in expected_types.items():
+            result = results.get(os.path.abspath(path))
+            if result is None or result['error'] is not None:
+                problems[path] = result['error'] if result else "探测失败"
+            elif result['media_type'] != expected:
+                problems[path] = f"素材类型为 {result['media_type']}，期望为 {expected}"
+            elif expected != 'photo' and not result['duration']:
+                problems[path] = "无法获取时长"
+        
+        # 全部失败通常意味着探测环境不可用（如缺少MediaInfo库），此时不剔除任何文件
+        if problems and len(problems) == len(expected_types):
+            self.print_warning(f"无法探测素材文件，跳过素材预检: {next(iter(problems.values()))}")
+            return set()
+        
+        for path, reason in problems.items():
+            self.print_warning(f"跳过无法使用的素材 {os.path.basename(path)}: {reason}")
+        return set(problems)
+    
+    def screen_duplicate_materials(self, part_files):
+        """预检各part文件夹中的重复素材：同一段画面以不同文件名出现时只保留文件名排序最前的一个，其余不参与组合
+        
+        安装了ffmpeg（或imageio-ffmpeg）及numpy、Pillow时比较抽帧的画面指纹，能发现重新编码或剪辑过的副本；
+        否则只比较大小相同的文件的内容哈希。指纹保存在探测缓存中，素材未变化时再次运行不必重新计算
+        
+        Args:
+            part_files: {文件夹: 文件名列表}，重复的文件会从列表中移除
+        
+        Returns:
+            {文件夹: [[保留的文件, 重复的文件, ...], ...]}
+        """
+        folders = [folder for folder, files in part_files.items()
+                   if folder.startswith('part') and not folder.startswith('partbg') and len(files) > 1]
+        if not folders:
+            return {}
+        
+        perceptual = video_duplicate_checker.perceptual_available()
+        if perceptual:
+            kind, key = video_duplicate_checker.FINGERPRINT_KIND, "fingerprint"
+            compute = video_duplicate_checker.video_fingerprint
+        else:
+            kind, key = f"content:{video_duplicate_checker.HASH_ALGORITHM}", "digest"
+            compute = video_duplicate_checker.full_file_hash
+        
+        # 只有大小相同的文件可能内容相同，按内容哈希比较时不必读取其余文件
+        candidates = {}
+        for folder in folders:
+            names = sorted(part_files[folder])
+            if not perceptual:
+                sizes = {name: os.path.getsize(os.path.join(self.materials_folder_path, folder, name)) for name in names}
+                size_counts = {}
+                for size in sizes.values():
+                    size_counts[size] = size_counts.get(size, 0) + 1
+                names = [name for name in names if size_counts[sizes[name]] > 1]
+            candidates[folder] = names
+        
+        cache = draft.get_probe_cache()
+        paths = [os.path.join(self.materials_folder_path, folder, name) for folder in folders for name in candidates[folder]]
+        fingerprints = {}
+        misses = []
+        for path in paths:
+            record = cache.get(path, kind) if cache is not None else None
+            if record is not None:
+                fingerprints[path] = record[key]
+            else:
+                misses.append(path)
+        
+        if misses:
+            print(f"🔍 计算 {len(misses)} 个素材的{'画面指纹' if perceptual else '内容哈希'}（{len(paths) - len(misses)} 个已缓存）...")
+        
+        def fingerprint(path):
+            try:
+                return path, compute(path), None
+            except Exception as e:
+                return path, None, str(e) or type(e).__name__
+        
+        with ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1)) as pool:
+            for path, value, error in pool.map(fingerprint, misses):
+                if value is None:
+                    self.print_warning(f"无法计算 {os.path.basename(path)} 的指纹，不参与重复预检: {error}")
+                    continue
+                fingerprints[path] = value
+                if cache is not None:
+                    cache.put(path, {key: value}, kind)
+        
+        duplicates = {}
+        for folder in folders:
+            names = [name for name in candidates[folder]
+                     if os.path.join(self.materials_folder_path, folder, name) in fingerprints]
+            values = [fingerprints[os.path.join(self.materials_folder_path, folder, name)] for name in names]
+            if perceptual:
+                groups = video_duplicate_checker.group_similar_fingerprints(values, self.duplicate_max_distance)
+            else:
+                by_digest = {}
+                for i, value in enumerate(values):
+                    by_digest.setdefault(value, []).append(i)
+                groups = [group for group in by_digest.values() if len(group) > 1]
+            if groups:
+                duplicates[folder] = [[names[i] for i in group] for group in groups]
+        
+        for folder, groups in duplicates.items():
+            removed = {name for group in groups for name in group[1:]}
+            part_files[folder] = [name for name in part_files[folder] if name not in removed]
+            for group in groups:
+                self.print_warning(f"{folder} 中的 {', '.join(group[1:])} 与 {group[0]} "
+                                   f"{'画面相同' if perceptual else '内容相同'}，只保留 {group[0]}")
+        if not duplicates:
+            print(f"✅ 重复素材预检: 未发现{'画面' if perceptual else '内容'}重复的素材")
+        return duplicates
+    
     def scan_audio_files(self):
         """扫描音频文件"""
         if not self.audios_folder_path or not os.path.exists(self.audios_folder_path):
@@ -1506,6 +1689,10 @@ class BatchDraftProcessor:
             files = glob.glob(os.path.join(self.audios_folder_path, ext))
             audio_files.extend([os.path.basename(f) for f in files])
         
+        invalid_paths = self.probe_media_files(
+            {os.path.join(self.audios_folder_path, f): 'audio' for f in audio_files})
+        audio_files = [f for f in audio_files if os.path.join(self.audios_folder_path, f) not in invalid_paths]
+        
         # 根据音频选择模式排序
         if self.audio_selection_mode == "sequential":
             audio_files.sort()
@@ -1526,6 +1713,11 @@ class BatchDraftProcessor:
             files = glob.glob(os.path.join(self.background_music_folder_path, ext))
             bg_music_files.extend([os.path.basename(f) for f in files])
         
+        invalid_paths = self.probe_media_files(
+            {os.path.join(self.background_music_folder_path, f): 'audio' for f in bg_music_files})
+        bg_music_files = [f for f in bg_music_files
+                          if os.path.join(self.background_music_folder_path, f) not in invalid_paths]
+        
         # 根据背景音乐选择模式排序
         if self.bg_music_selection_mode == "sequential":
             bg_music_files.sort()
@@ -1538,6 +1730,10 @@ class BatchDraftProcessor:
         """生成素材组合"""
         self.print_section("生成素材组合")
         
+        # 在复制任何草稿之前合并重复素材，避免生成画面雷同、会被平台判为重复的组合
+        if self.screen_duplicates:
+            self.screen_duplicate_materials(part_files)
+        
         # 找到文件数量最少的文件夹（决定组合数量），排除音频和背景音乐文件夹，也排除空文件夹
         non_audio_files = {k: v for k, v in part_files.items() if k not in ['audios', 'bg_musics']}
         # 只考虑有文件的文件夹来决定组合数量，空文件夹代表不需要新素材只需要替换
@@ -1562,15 +1758,8 @@ class BatchDraftProcessor:
         print(f"🔢 最少文件数量: {min_count} (决定最大组合数)")
         
         # 让用户选择处理模式
-        mode_options = [
-            "顺序模式 (不重复，按文件名排序组合)",
-            "随机裂变模式 (打乱排序，随机组合)"
-        ]
-        
-        mode_idx, mode_str = self.get_user_choice(mode_options, "选择素材组合模式")
-        self.processing_mode = "sequential" if mode_idx == 0 else "random"
-        
-        print(f"✅ 选择模式: {mode_str}")
+        if not self.select_processing_mode():
+            return False
         
         # 配置背景音乐选项
         if not self.configure_background_music_options():
@@ -1691,6 +1880,19 @@ class BatchDraftProcessor:
         
         return True
     
+    def select_processing_mode(self):
+        """选择素材组合模式"""
+        mode_options = [
+            "顺序模式 (不重复，按文件名排序组合)",
+            "随机裂变模式 (打乱排序，随机组合)"
+        ]
+        
+        mode_idx, mode_str = self.get_user_choice(mode_options, "选择素材组合模式")
+        self.processing_mode = "sequential" if mode_idx == 0 else "random"
+        
+        print(f"✅ 选择模式: {mode_str}")
+        return True
+    
     def format_combination_display(self, combination):
         """格式化组合显示，包含详细的音频和字幕文件信息"""
         parts = []
@@ -1801,12 +2003,13 @@ class BatchDraftProcessor:
         
         self.print_header("批量复制草稿并替换素材")
         
+        manifest = self.open_batch_manifest() if self.resume_batches else None
+        
         total_combinations = len(self.material_combinations)
         print(f"📊 将创建 {total_combinations} 个草稿副本")
         
         # 确认开始处理
-        confirm = self.get_user_input(f"确认开始批量处理 {total_combinations} 个草稿? (y/n)", allow_empty=True)
-        if confirm.lower() not in ['y', 'yes', '']:
+        if not self.confirm(f"确认开始批量处理 {total_combinations} 个草稿?"):
             print("❌ 用户取消操作")
             return False
         
@@ -1816,85 +2019,44 @@ class BatchDraftProcessor:
             self.print_error("无法读取源草稿信息")
             return False
         
-        successful_drafts = []
-        failed_drafts = []
-        used_names = set()  # 跟踪已使用的名称
-        
-        # 批量处理，添加重试机制
-        for i, combination in enumerate(self.material_combinations, 1):
-            print(f"\n🔄 处理组合 {i}/{total_combinations}")
-            
-            # 显示详细的组合信息
-            combo_display = self.format_combination_display(combination)
-            combo_name = self.generate_chinese_combo_name(combination)
-            print(f"   📋 组合内容: {combo_display}")
-            print(f"   🎯 目标名称: {combo_name}")
-            
-            # 生成新草稿名称（使用汉字组合）
-            base_target_name = f"{self.selected_draft}_{combo_name}"
-            
-            # 检查名称是否重复，如果重复则添加序号
-            target_name = base_target_name
-            counter = 1
-            while target_name in used_names:
-                target_name = f"{base_target_name}_{counter}"
-                counter += 1
-            used_names.add(target_name)
-            
-            # 重试机制：最多尝试3次
-            max_retries = 3
-            success = False
-            last_error = None
-            
-            for attempt in range(max_retries):
-                try:
-                    if attempt > 0:
-                        print(f"  🔄 重试第 {attempt} 次...")
-                    
-                    # 复制草稿
-                    print(f"  📋 复制草稿: {target_name}")
-                    copy_success = self.copy_single_draft(target_name)
-                    
-                    if copy_success:
-                        # 替换素材
-                        print(f"  🔄 替换素材...")
-                        replacement_success = self.replace_materials_for_draft(target_name, combination)
-                        
-                        if replacement_success:
-                            successful_drafts.append(target_name)
-                            print(f"  ✅ 组合 {i} 处理成功" + (f" (第{attempt+1}次尝试)" if attempt > 0 else ""))
-                            success = True
-                            break
-                        else:
-                            last_error = "素材替换失败"
-                            print(f"  ⚠️ 组合 {i} 素材替换失败" + (f" (第{attempt+1}次尝试)" if attempt > 0 else ""))
-                    else:
-                        last_error = "草稿复制失败"
-                        print(f"  ⚠️ 组合 {i} 草稿复制失败" + (f" (第{attempt+1}次尝试)" if attempt > 0 else ""))
-                    
-                    # 如果不是最后一次尝试，等待一会儿再重试
-                    if attempt < max_retries - 1:
-                        import time
-                        time.sleep(1)
-                
-                except Exception as e:
-                    last_error = str(e)
-                    print(f"  ⚠️ 组合 {i} 处理出错: {e}" + (f" (第{attempt+1}次尝试)" if attempt > 0 else ""))
-                    
-                    # 如果不是最后一次尝试，等待一会儿再重试
-                    if attempt < max_retries - 1:
-                        import time
-                        time.sleep(1)
-            
-            # 如果所有重试都失败了
-            if not success:
-                failed_drafts.append((target_name, last_error or "未知错误"))
-                print(f"  ❌ 组合 {i} 最终失败，已尝试 {max_retries} 次")
-                print(f"       继续处理下一个组合，保持文字替换顺序不变")
+        # 预先确定每个组合的目标名称，保证组合→草稿名称的映射与处理顺序无关
+        tasks = plan_batch_tasks(self, self.material_combinations)
+        self.combination_indices = {task.target_name: task.index for task in tasks} if self.single_pass_edits else {}
+        self.text_replaced_in_batch = bool(self.single_pass_edits and self.enable_text_replacement and self.selected_text_tracks)
+        shard, shard_count = self.batch_shard
+        if shard_count > 1:
+            tasks = shard_tasks(tasks, shard, shard_count)
+            print(f"🧩 分片 {shard}/{shard_count}: 本机处理其中 {len(tasks)} 个组合")
+        engine = ParallelBatchEngine(self, workers=self.batch_workers, executor=self.batch_executor,
+                                     manifest=manifest, stage_resume=self.single_pass_edits,
+                                     profile_index=self.profile_variant, profile_path=self.profile_output)
+        if engine.workers > 1:
+            print(f"⚡ 并行处理: {engine.workers} 个{'进程' if engine.executor == 'process' else '线程'}")
+        
+        completed = [0]
+        
+        def report_result(task, result):
+            completed[0] += 1
+            self.report_batch_result(task, result, completed[0], total_combinations)
+        
+        batch_start = time.perf_counter()
+        try:
+            results = engine.run(tasks, on_result=report_result)
+        finally:
+            if manifest is not None:
+                manifest.close()
+        batch_elapsed = time.perf_counter() - batch_start
+        
+        self.last_batch_results = results
+        successful_drafts = [result.target_name for result in results if result.success]
+        failed_drafts = [(result.target_name, result.error or "未知错误") for result in results if not result.success]
         
         # 显示处理结果
         self.print_header("批量处理结果")
         print(f"✅ 成功处理: {len(successful_drafts)} 个草稿")
+        skipped_count = sum(1 for result in results if result.skipped)
+        if skipped_count:
+            print(f"⏭️ 其中 {skipped_count} 个在之前的运行中已完成")
         print(f"❌ 失败: {len(failed_drafts)} 个草稿")
         
         if successful_drafts:
@@ -1907,32 +2069,23 @@ class BatchDraftProcessor:
             for draft_name, error in failed_drafts:
                 print(f"  • {draft_name}: {error}")
         
+        # 显示各阶段耗时
+        print(f"\n⏱️ 总耗时: {batch_elapsed:.2f}s")
+        for stage, stats in ParallelBatchEngine.summarize_timings(results).items():
+            print(f"  • {stage}: 累计 {stats['total']:.2f}s, 平均 {stats['mean']:.2f}s, 最长 {stats['max']:.2f}s")
+        metrics = ParallelBatchEngine.summarize_metrics(results)
+        if metrics.stages:
+            print(f"\n📈 分阶段统计（{sum(1 for result in results if result.metrics is not None)} 个组合）:")
+            print(metrics.report())
+        if engine.profile_path and any(result.index == engine.profile_index and result.metrics is not None
+                                       for result in results):
+            print(f"\n🔬 组合 {engine.profile_index} 的剖析结果已保存到: {engine.profile_path}")
+        
         # 保存成功创建的草稿列表，供文本替换功能使用，按组合顺序保存
         self.successful_drafts = successful_drafts
         
         # 保存组合顺序映射，确保文字替换时按原始顺序进行
-        self.draft_combination_mapping = []
-        for i, combination in enumerate(self.material_combinations, 1):
-            combo_name = self.generate_chinese_combo_name(combination)
-            base_target_name = f"{self.selected_draft}_{combo_name}"
-            
-            # 查找实际创建的草稿名称（可能有序号后缀）
-            actual_draft_name = None
-            for draft_name in successful_drafts:
-                if draft_name.startswith(base_target_name):
-                    actual_draft_name = draft_name
-                    break
-            
-            # 记录组合信息，包括成功和失败的
-            mapping_info = {
-                'combination_index': i,
-                'combination': combination,
-                'combo_name': combo_name,
-                'target_name': base_target_name,
-                'actual_draft_name': actual_draft_name,
-                'success': actual_draft_name is not None
-            }
-            self.draft_combination_mapping.append(mapping_info)
+        self.draft_combination_mapping = ParallelBatchEngine.build_combination_mapping(tasks, results)
         
         print(f"\n📊 文字替换映射表已建立，共 {len(self.draft_combination_mapping)} 个组合")
         
@@ -1949,29 +2102,104 @@ class BatchDraftProcessor:
         
         return len(successful_drafts) > 0
     
+    def report_batch_result(self, task, result, completed, total):
+        """显示单个组合的处理结果，在主线程中按完成顺序调用"""
+        combo_display = self.format_combination_display(task.combination)
+        print(f"\n🔄 组合 {task.index}/{total} 完成 ({completed}/{total})")
+        print(f"   📋 组合内容: {combo_display}")
+        print(f"   🎯 目标名称: {task.target_name}")
+        if result.skipped:
+            print(f"  ⏭️ 组合 {task.index} 已在之前的运行中完成，跳过")
+        elif result.success:
+            print(f"  ✅ 组合 {task.index} 处理成功" + (f" (第{result.attempts}次尝试)" if result.attempts > 1 else ""))
+        else:
+            print(f"  ❌ 组合 {task.index} 最终失败，已尝试 {result.attempts} 次: {result.error or '未知错误'}")
+            print(f"       继续处理下一个组合，保持文字替换顺序不变")
+    
+    def batch_settings(self):
+        """影响生成结果的参数，参数变化后已生成的草稿在续跑时会被重新生成"""
+        names = ["replacement_mode", "timeline_mode", "processing_mode",
+                 "enable_audio_subtitle", "audio_volume", "audio_fade_in", "audio_fade_out",
+                 "audio_longer_handling", "audio_shorter_handling", "enable_subtitles", "subtitle_style",
+                 "enable_background_music", "bg_music_volume", "bg_music_fade_in", "bg_music_fade_out",
+                 "bg_music_longer_handling", "bg_music_shorter_handling",
+                 "enable_text_replacement", "text_selection_mode", "text_contents", "selected_text_tracks"]
+        settings = {name: getattr(self, name, None) for name in names}
+        settings["materials_folder_path"] = self.materials_folder_path
+        return settings
+    
+    def open_batch_manifest(self):
+        """打开当前模板的运行清单，并确定本批次的素材组合
+        
+        清单中有未完成的批次且组合不同（如随机组合）时：分片运行直接沿用清单中的组合，保证各台机器处理同一批组合；
+        否则询问是否继续上次的批次。
+        """
+        shard, shard_count = self.batch_shard
+        manifest = BatchManifest(self.draft_folder_path, self.selected_draft, self.batch_settings(), shard, shard_count,
+                                 template_path=self.get_compatible_draft_file_path(self.selected_draft),
+                                 material_path=self.combination_file_path)
+        
+        plan = manifest.load_plan()
+        if plan and plan["combinations"] != self.material_combinations:
+            state = manifest.load_state()
+            planned = plan_batch_tasks(self, plan["combinations"])
+            done = sum(1 for task in planned
+                       if {"copy", "replace"} <= manifest.completed_stages(task, state)
+                       and self.draft_folder.has_draft(task.target_name))
+            if done < len(planned):
+                print(f"📒 检测到未完成的批量任务: 已完成 {done}/{len(planned)} 个组合")
+                if shard_count > 1 or self.confirm("是否继续上次的组合?"):
+                    self.material_combinations = plan["combinations"]
+                    print(f"🔁 沿用上次的 {len(self.material_combinations)} 个组合")
+                    return manifest
+        
+        self.material_combinations = manifest.save_plan(self.material_combinations, replace=shard_count == 1)
+        return manifest
+    
+    def combination_file_path(self, folder, file_name):
+        """组合中某文件夹对应的素材文件路径，空文件夹的占位（不替换）返回None"""
+        if not isinstance(file_name, str) or file_name == "__REMOVE__":
+            return None
+        if folder == 'audios':
+            return os.path.join(self.audios_folder_path, file_name) if self.audios_folder_path else None
+        if folder == 'bg_musics':
+            return os.path.join(self.background_music_folder_path, file_name) if self.background_music_folder_path else None
+        return os.path.join(self.materials_folder_path, folder, file_name)
+    
     def copy_single_draft(self, target_name):
         """复制单个草稿"""
         try:
-            # 执行复制
-            copied_script = self.draft_folder.duplicate_as_template(self.selected_draft, target_name)
+            # 执行复制，素材文件与源草稿共享，只实际复制JSON等会被编辑的文件
+            report = self.draft_folder.duplicate_draft(self.selected_draft, target_name, copy_strategy=self.copy_strategy)
+            if report.bytes_saved:
+                print(f"    💾 {report}")
         except Exception as e:
             # 新版剪映加密，使用原始复制方式
             pass
         
-        # 检查是否实际创建成功
-        time.sleep(0.5)  # 等待文件系统同步
-        updated_drafts = self.draft_folder.list_drafts()
-        
-        if target_name in updated_drafts:
-            return True
-        else:
-            return False
+        # 检查是否实际创建成功（copytree为同步操作，无需等待文件系统）
+        return self.draft_folder.has_draft(target_name)
+    
+    def open_draft_session(self, draft_name, backup_suffix=".backup"):
+        """打开草稿的编辑会话，草稿文件只读取一次，文件不存在时返回None"""
+        draft_file_path = self.get_compatible_draft_file_path(draft_name)
+        if not draft_file_path:
+            return None
+        return draft.DraftEditSession(draft_file_path, self.backup_mode, backup_suffix)
     
     def replace_materials_for_draft(self, draft_name, combination):
-        """为指定草稿替换素材"""
+        """为指定草稿替换素材
+        
+        启用单次读写时，素材、音频、背景音乐、字幕和文本替换都作用于同一个编辑会话，最后只保存一次
+        """
+        session = None
         try:
             # 获取草稿信息
-            draft_info = self.load_draft_info_from_file(draft_name)
+            if self.single_pass_edits:
+                session = self.open_draft_session(draft_name)
+                draft_info = self.summarize_draft_info(draft_name, session.content) if session else None
+            else:
+                draft_info = self.load_draft_info_from_file(draft_name)
             if not draft_info:
                 print(f"    ❌ 无法读取草稿信息: {draft_name}")
                 return False
@@ -1999,21 +2227,41 @@ class BatchDraftProcessor:
                 if not (has_audio_work or has_bg_music_work):
                     return False
             
-            # 先处理常规素材替换（视频、图片）
+            # 先处理常规素材替换（视频、图片），会话中的轨道须在创建ScriptFile之前修改
             success = True
             if replacements:
-                success = self.attempt_direct_json_replacement(draft_name, replacements)
+                success = self.attempt_direct_json_replacement(draft_name, replacements, session=session)
             
             # 处理音频和字幕（使用库API）
+            audio_added = False
             if self.enable_audio_subtitle and 'audios' in combination:
-                audio_success = self.add_audio_and_subtitle_with_api(draft_name, combination)
+                audio_success = self.add_audio_and_subtitle_with_api(draft_name, combination, session=session)
+                audio_added = audio_success
                 success = success and audio_success
             
             # 处理单独的背景音乐（当没有音频时）
             elif self.enable_background_music and 'bg_musics' in combination:
-                bg_music_success = self.add_background_music_only_with_api(draft_name, combination)
+                bg_music_success = self.add_background_music_only_with_api(draft_name, combination, session=session)
                 success = success and bg_music_success
             
+            if session is None:
+                return success
+            
+            # 文本替换也在同一会话中完成，按组合序号选择文本
+            if self.enable_text_replacement and self.selected_text_tracks and draft_name in self.combination_indices:
+                text_tracks = self.extract_text_tracks_from_draft(draft_name, draft_data=session.content)
+                if text_tracks:
+                    self.replace_text_in_draft(draft_name, text_tracks, session=session,
+                                               text_index=self.combination_indices[draft_name] - 1)
+            
+            # 一次性保存全部修改（失败的组合会被重试或丢弃，不必保存）
+            if success and session.modified:
+                if audio_added:
+                    self.save_script_file(session.script, draft_name, session=session)
+                elif session.has_script:
+                    session.save(compact=self.json_compact)
+                else:
+                    session.save(indent=2, compact=self.json_compact)
             return success
             
         except Exception as e:
@@ -2262,31 +2510,29 @@ class BatchDraftProcessor:
         
         return replacements
     
-    def attempt_direct_json_replacement(self, draft_name, replacements):
-        """直接操作草稿文件进行素材替换 (兼容多版本格式)"""
+    def attempt_direct_json_replacement(self, draft_name, replacements, session=None):
+        """直接操作草稿文件进行素材替换 (兼容多版本格式)
+        
+        给定编辑会话`session`时只修改会话中的草稿，由调用方统一保存
+        """
         try:
-            # 使用兼容性方法获取草稿文件路径
-            draft_file_path = self.get_compatible_draft_file_path(draft_name)
-            
-            if not draft_file_path:
-                self.print_error(f"草稿文件不存在，已检查 draft_info.json 和 draft_content.json")
-                return False
-            
-            # 读取当前的草稿文件
-            with open(draft_file_path, 'r', encoding='utf-8') as f:
-                draft_info = json.load(f)
-            
-            # 备份原文件
-            backup_path = draft_file_path + ".backup"
-            with open(backup_path, 'w', encoding='utf-8') as f:
-                json.dump(draft_info, f, ensure_ascii=False, indent=2)
+            own_session = session is None
+            if own_session:
+                # 读取当前的草稿文件，备份在保存时按备份方式写入
+                session = self.open_draft_session(draft_name)
+                if session is None:
+                    self.print_error(f"草稿文件不存在，已检查 draft_info.json 和 draft_content.json")
+                    return False
+            draft_info = session.content
             
             success_count = 0
+            # 素材与片段索引只建立一次, 供所有替换项共用
+            index = session.index
             
             # 分别处理视频、图片和音频素材
             for replacement in replacements:
                 if replacement['type'] == 'video':
-                    if self.replace_video_material(draft_info, replacement, draft_name):
+                    if self.replace_video_material(draft_info, replacement, draft_name, index=index):
                         success_count += 1
                 elif replacement['type'] == 'image':
                     if self.replace_image_material(draft_info, replacement, draft_name):
@@ -2297,8 +2543,9 @@ class BatchDraftProcessor:
             
             if success_count > 0:
                 # 保存更新后的草稿文件
-                with open(draft_file_path, 'w', encoding='utf-8') as f:
-                    json.dump(draft_info, f, ensure_ascii=False, indent=2)
+                session.mark_modified()
+                if own_session:
+                    session.save(indent=2, compact=self.json_compact)
                 
                 print(f"    ✅ 素材替换完成! 成功替换 {success_count}/{len(replacements)} 个素材")
                 return True
@@ -2310,9 +2557,11 @@ class BatchDraftProcessor:
             print(f"    ❌ 直接JSON替换失败: {e}")
             return False
     
-    def replace_video_material(self, draft_info, replacement, draft_name):
-        """替换视频素材"""
+    def replace_video_material(self, draft_info, replacement, draft_name, index=None):
+        """替换视频素材, `index`为草稿的`DraftIndex`, 未提供时临时建立"""
         try:
+            if index is None:
+                index = draft.DraftIndex.from_content(draft_info)
             # 创建video materials目录
             materials_dir = os.path.join(self.draft_folder_path, draft_name, "materials", "video")
             if not os.path.exists(materials_dir):
@@ -2322,10 +2571,11 @@ class BatchDraftProcessor:
             if 'materials' in draft_info and 'videos' in draft_info['materials']:
                 videos = draft_info['materials']['videos']
                 
-                for video in videos:
+                for _, position in index.find_materials(replacement['original_name'], 'videos'):
+                    video = videos[position]
                     if video.get('material_name') == replacement['original_name']:
                         # 获取原始片段在时间线上的实际使用时长
-                        original_duration = self.get_actual_segment_duration(draft_info, video.get('id'))
+                        original_duration = self.get_actual_segment_duration(draft_info, video.get('id'), index=index)
                         
                         # 如果获取不到实际片段时长，使用素材时长作为备选
                         if not original_duration:
@@ -2334,11 +2584,11 @@ class BatchDraftProcessor:
                         else:
                             print(f"    🎯 获取实际片段时长: {original_duration/1000000:.1f}s")
                         
-                        # 复制新文件到草稿materials目录
+                        # 将新文件放入草稿materials目录
                         new_filename = replacement['new_name']
                         target_path = os.path.join(materials_dir, new_filename)
                         
-                        shutil.copy2(replacement['new_file'], target_path)
+                        material_path = self.place_material(replacement['new_file'], target_path, draft_name, "video")
                         
                         # 记录最近替换的视频文件（用于封面图生成）
                         if not hasattr(self, 'last_replaced_videos'):
@@ -2371,8 +2621,8 @@ class BatchDraftProcessor:
                                 print(f"    📊 时长调整: 原始{original_duration/1000000:.1f}s → 新素材{new_duration/1000000:.1f}s → {action}{speed_ratio:.2f}x")
                         
                         # 更新素材信息
-                        video['material_name'] = new_filename
-                        video['path'] = f"##_draftpath_placeholder_0E685133-18CE-45ED-8CB8-2904A212EC80_##/materials/video/{new_filename}"
+                        index.rename_material(('videos', position), new_filename)
+                        video['path'] = material_path
                         
                         # 更新素材时长为新素材的实际时长
                         video['duration'] = new_duration
@@ -2385,7 +2635,7 @@ class BatchDraftProcessor:
                         
                         # 查找并更新使用此素材的片段，设置速度
                         if speed_ratio != 1.0:
-                            self.update_segments_speed(draft_info, video.get('id'), speed_ratio, new_duration)
+                            self.update_segments_speed(draft_info, video.get('id'), speed_ratio, new_duration, index=index)
                         
                         print(f"    ✅ 更新视频素材: {replacement['original_name']} → {new_filename}")
                         return True
@@ -2396,8 +2646,8 @@ class BatchDraftProcessor:
             print(f"    ❌ 替换视频素材失败 {replacement['original_name']}: {e}")
             return False
     
-    def update_segments_speed(self, draft_info, material_id, speed_ratio, new_material_duration=None):
-        """更新使用指定素材的片段速度"""
+    def update_segments_speed(self, draft_info, material_id, speed_ratio, new_material_duration=None, index=None):
+        """更新使用指定素材的片段速度, `index`为草稿的`DraftIndex`, 未提供时临时建立"""
         try:
             if 'tracks' not in draft_info:
                 return
@@ -2422,46 +2672,43 @@ class BatchDraftProcessor:
             # 添加speed对象到speeds数组
             draft_info['speeds'].append(speed_obj)
             
-            for track in draft_info['tracks']:
-                if track.get('type') == 'video' and 'segments' in track:
-                    segments = track['segments']
+            # 经由反向索引查找使用此素材的片段
+            if index is None:
+                index = draft.DraftIndex.from_content(draft_info)
+            for segment in index.segments_of(material_id, 'video'):
+                if self.debug:
+                    print(f"    🔍 DEBUG segment结构: {list(segment.keys())}")
+                    if 'target_timerange' in segment:
+                        print(f"    🔍 DEBUG target_timerange: {segment['target_timerange']}")
+                    if 'source_timerange' in segment:
+                        print(f"    🔍 DEBUG source_timerange: {segment['source_timerange']}")
+                
+                # 更新source_timerange以适应新素材时长
+                if new_material_duration and 'source_timerange' in segment:
+                    # 保持source_timerange的start不变，只更新duration
+                    source_start = segment['source_timerange'].get('start', 0)
+                    segment['source_timerange']['duration'] = new_material_duration
                     
-                    for segment in segments:
-                        # 检查片段是否使用了指定的素材
-                        if segment.get('material_id') == material_id:
-                            if self.debug:
-                                print(f"    🔍 DEBUG segment结构: {list(segment.keys())}")
-                                if 'target_timerange' in segment:
-                                    print(f"    🔍 DEBUG target_timerange: {segment['target_timerange']}")
-                                if 'source_timerange' in segment:
-                                    print(f"    🔍 DEBUG source_timerange: {segment['source_timerange']}")
-                            
-                            # 更新source_timerange以适应新素材时长
-                            if new_material_duration and 'source_timerange' in segment:
-                                # 保持source_timerange的start不变，只更新duration
-                                source_start = segment['source_timerange'].get('start', 0)
-                                segment['source_timerange']['duration'] = new_material_duration
-                                
-                                if self.debug:
-                                    print(f"    🔍 DEBUG 更新source_timerange: start={source_start}, duration={new_material_duration}")
-                            
-                            # 更新片段速度引用
-                            segment['speed'] = speed_ratio
-                            
-                            # 更新extra_material_refs，添加speed_id引用
-                            if 'extra_material_refs' not in segment:
-                                segment['extra_material_refs'] = []
-                            
-                            # 移除旧的speed引用（如果存在）
-                            segment['extra_material_refs'] = [ref for ref in segment['extra_material_refs'] 
-                                                            if not any(speed.get('id') == ref for speed in draft_info.get('speeds', []))]
-                            
-                            # 添加新的speed引用
-                            segment['extra_material_refs'].append(speed_id)
-                            
-                            updated_segments += 1
-                            print(f"    🎬 更新片段速度: {speed_ratio:.2f}x (ID: {speed_id})")
-            
+                    if self.debug:
+                        print(f"    🔍 DEBUG 更新source_timerange: start={source_start}, duration={new_material_duration}")
+                
+                # 更新片段速度引用
+                segment['speed'] = speed_ratio
+                
+                # 更新extra_material_refs，添加speed_id引用
+                if 'extra_material_refs' not in segment:
+                    segment['extra_material_refs'] = []
+                
+                # 移除旧的speed引用（如果存在）
+                segment['extra_material_refs'] = [ref for ref in segment['extra_material_refs'] 
+                                                if not any(speed.get('id') == ref for speed in draft_info.get('speeds', []))]
+                
+                # 添加新的speed引用
+                segment['extra_material_refs'].append(speed_id)
+                
+                updated_segments += 1
+                print(f"    🎬 更新片段速度: {speed_ratio:.2f}x (ID: {speed_id})")
+
             if updated_segments == 0:
                 print(f"    ⚠️ 未找到使用素材 {material_id} 的片段")
                 # 如果没有使用到，移除刚创建的speed对象
@@ -2540,21 +2787,36 @@ class BatchDraftProcessor:
                 traceback.print_exc()
             return False
     
+    def place_material(self, new_file, target_path, draft_name, material_type):
+        """将新素材放入草稿的materials目录，返回写入草稿JSON的素材路径
+        
+        启用素材池时，目标文件为素材池中同一内容的硬链接（不支持硬链接时直接引用素材池中的绝对路径），
+        否则先删除再复制，不写穿与模板共享的素材文件
+        """
+        if self.use_material_pool and self.draft_folder is not None:
+            placed_path = self.draft_folder.material_pool.link_material(new_file, target_path, draft_name)
+            if placed_path != target_path:
+                return placed_path
+        else:
+            draft.replace_file(new_file, target_path)
+        return f"##_draftpath_placeholder_0E685133-18CE-45ED-8CB8-2904A212EC80_##/materials/{material_type}/{os.path.basename(target_path)}"
+    
     def _perform_image_replacement(self, image_material, replacement, materials_dir):
         """执行实际的图片替换操作"""
-        # 复制新文件到草稿materials目录
+        # 将新文件放入草稿materials目录
         new_filename = replacement['new_name']
         target_path = os.path.join(materials_dir, new_filename)
+        draft_name = os.path.basename(os.path.dirname(os.path.dirname(materials_dir)))
         
-        shutil.copy2(replacement['new_file'], target_path)
+        material_path = self.place_material(replacement['new_file'], target_path, draft_name, "image")
         
         # 获取新文件的信息
         new_file_info = self.get_image_file_info(replacement['new_file'])
         
         # 更新素材信息
         image_material['material_name'] = new_filename
-        # 使用占位符路径，与视频素材保持一致
-        image_material['path'] = f"##_draftpath_placeholder_0E685133-18CE-45ED-8CB8-2904A212EC80_##/materials/image/{new_filename}"
+        # 与视频素材一致：草稿内的素材使用占位符路径，素材池中的素材使用绝对路径
+        image_material['path'] = material_path
         
         # 确保类型设置为 photo
         if 'type' in image_material:
@@ -2600,7 +2862,7 @@ class BatchDraftProcessor:
             # 复制新文件到草稿materials目录
             new_filename = replacement['new_name']
             target_path = os.path.join(materials_dir, new_filename)
-            shutil.copy2(replacement['new_file'], target_path)
+            draft.replace_file(replacement['new_file'], target_path)
             
             # 获取新文件的信息
             new_audio_info = self.get_audio_file_info(replacement['new_file'])
@@ -2699,19 +2961,13 @@ class BatchDraftProcessor:
         except Exception as e:
             print(f"    ⚠️ 使用AudioMaterial获取音频信息失败: {e}")
             
-            # 备用方法：使用ffprobe
+            # 备用方法：使用ffprobe（结果经由探测缓存）
             try:
-                import subprocess
-                cmd = [
-                    'ffprobe', '-v', 'quiet', '-print_format', 'json', '-show_format',
-                    audio_path
-                ]
-                
-                result = subprocess.run(cmd, capture_output=True, text=True)
-                if result.returncode == 0:
-                    import json
-                    info = json.loads(result.stdout)
-                    
+                try:
+                    info = draft.probe_cache.ffprobe(audio_path)
+                except RuntimeError:
+                    info = None
+                if info is not None:
                     if 'format' in info and 'duration' in info['format']:
                         duration_sec = float(info['format']['duration'])
                         return {'duration': int(duration_sec * 1000000)}  # 转换为微秒
@@ -3202,11 +3458,9 @@ class BatchDraftProcessor:
     def convert_draft_info_to_script_file(self, draft_info_path, draft_path):
         """将 draft_info.json 转换为 ScriptFile 对象"""
         import tempfile
-        import json
         
         # 读取 draft_info.json
-        with open(draft_info_path, 'r', encoding='utf-8') as f:
-            draft_info = json.load(f)
+        draft_info = draft.json_util.load_file(draft_info_path)
         
         # 创建临时的 draft_content.json 文件
         # 基本上 draft_info.json 的结构就是 draft_content.json 的结构
@@ -3215,8 +3469,7 @@ class BatchDraftProcessor:
         temp_draft_content = os.path.join(temp_dir, "draft_content.json")
         
         # 直接复制内容，因为格式基本相同
-        with open(temp_draft_content, 'w', encoding='utf-8') as f:
-            json.dump(draft_info, f, ensure_ascii=False, indent=2)
+        draft.json_util.dump_file(draft_info, temp_draft_content, indent=2, compact=self.json_compact)
         
         # 使用临时文件创建 ScriptFile
         script = draft.ScriptFile.load_template(temp_draft_content)
@@ -3277,8 +3530,7 @@ class BatchDraftProcessor:
                 return
             
             # 读取现有的元信息
-            with open(meta_info_path, 'r', encoding='utf-8') as f:
-                meta_info = json.load(f)
+            meta_info = draft.json_util.load_file(meta_info_path)
             
             # 更新时间戳（使用微秒时间戳，与剪映格式一致）
             current_time = int(time.time() * 1000000)  # 微秒时间戳
@@ -3290,8 +3542,7 @@ class BatchDraftProcessor:
                 meta_info['tm_draft_cloud_modified'] = current_time
             
             # 写回文件
-            with open(meta_info_path, 'w', encoding='utf-8') as f:
-                json.dump(meta_info, f, ensure_ascii=False, indent=None, separators=(',', ':'))
+            draft.json_util.dump_file(meta_info, meta_info_path, compact=True)
             
             print(f"✅ 已更新草稿元信息时间戳: {current_time}")
                 
@@ -3312,21 +3563,19 @@ class BatchDraftProcessor:
                 return
             
             # 读取现有的根元信息
-            with open(root_meta_path, 'r', encoding='utf-8') as f:
-                root_meta = json.load(f)
+            root_meta = draft.json_util.load_file(root_meta_path)
             
             # 检查是否已存在此草稿
             existing_draft = None
-            for draft in root_meta.get("all_draft_store", []):
-                if draft.get("draft_name") == draft_name:
-                    existing_draft = draft
+            for entry in root_meta.get("all_draft_store", []):
+                if entry.get("draft_name") == draft_name:
+                    existing_draft = entry
                     break
             
             # 读取草稿元信息
             draft_meta_path = os.path.join(draft_path, "draft_meta_info.json")
             if os.path.exists(draft_meta_path):
-                with open(draft_meta_path, 'r', encoding='utf-8') as f:
-                    draft_meta = json.load(f)
+                draft_meta = draft.json_util.load_file(draft_meta_path)
             else:
                 print(f"⚠️ 草稿元信息文件不存在: {draft_meta_path}")
                 return
@@ -3371,8 +3620,7 @@ class BatchDraftProcessor:
                 print(f"✅ 添加新草稿到索引: {draft_name}")
             
             # 写回文件
-            with open(root_meta_path, 'w', encoding='utf-8') as f:
-                json.dump(root_meta, f, ensure_ascii=False, separators=(',', ':'))
+            draft.json_util.dump_file(root_meta, root_meta_path, compact=True)
             
             print(f"🎯 剪映根索引已更新，草稿现在应该可以立即被扫描到")
                 
@@ -3382,6 +3630,18 @@ class BatchDraftProcessor:
                 import traceback
                 traceback.print_exc()
     
+    def undo_draft_edit(self, draft_name):
+        """撤销草稿JSON最近一次的素材或文本替换（按编辑日志、原始快照、完整备份的顺序查找）"""
+        draft_file_path = self.get_compatible_draft_file_path(draft_name)
+        if not draft_file_path:
+            print(f"❌ 草稿文件不存在，已检查 draft_info.json 和 draft_content.json")
+            return False
+        
+        # 完整备份模式下素材替换与文本替换的备份文件不同，取较新的一个
+        suffixes = [s for s in (".backup", ".text_backup") if os.path.exists(draft_file_path + s)]
+        suffix = max(suffixes, key=lambda s: os.path.getmtime(draft_file_path + s)) if suffixes else ".backup"
+        return draft.DraftBackup(draft_file_path, suffix=suffix).undo(indent=2, compact=self.json_compact)
+    
     def fix_existing_draft_placeholders(self, draft_name):
         """修复已存在草稿中的路径占位符问题"""
         try:
@@ -3519,8 +3779,8 @@ class BatchDraftProcessor:
                 import traceback
                 traceback.print_exc()
     
-    def save_script_file(self, script, draft_name):
-        """保存ScriptFile到正确的文件位置"""
+    def save_script_file(self, script, draft_name, session=None):
+        """保存ScriptFile到正确的文件位置，`script`来自编辑会话`session`时经由会话保存（按备份方式备份）"""
         print(f"    🔧 [DEBUG] save_script_file开始执行...")
         draft_path = os.path.join(self.draft_folder_path, draft_name)
         print(f"           草稿路径: {draft_path}")
@@ -3561,15 +3821,19 @@ class BatchDraftProcessor:
             os.rename(draft_content_path, draft_info_path)
         
         # 始终保存到draft_info.json
-        script.save_path = draft_info_path
+        if session is not None:
+            session.save(draft_info_path, compact=self.json_compact)
+        else:
+            script.save_path = draft_info_path
+            script.save(compact=self.json_compact)
         print(f"           设置save_path: {script.save_path}")
-        script.save()
         print(f"    🔧 [DEBUG] script.save()调用完成")
         print(f"    💾 保存到 draft_info.json (强制兼容格式)")
         
         # 生成封面图（如果启用）
         if self.enable_cover_image:
-            self.generate_cover_image(script, draft_path, draft_name)
+            with draft.instrumentation.stage("cover"):
+                self.generate_cover_image(script, draft_path, draft_name)
     
     def generate_cover_image(self, script, draft_path, draft_name):
         """根据选择的样式生成草稿封面图"""
@@ -3733,8 +3997,7 @@ class BatchDraftProcessor:
                 else:
                     return None
             
-            with open(draft_info_path, 'r', encoding='utf-8') as f:
-                draft_data = json.load(f)
+            draft_data = draft.json_util.load_file(draft_info_path)
             
             analysis = {
                 'draft_duration': draft_data.get('duration', 40000000),
@@ -3943,10 +4206,8 @@ class BatchDraftProcessor:
                 'total_sticker_segments': len(draft_analysis.get('sticker_segments', []))
             }
             
-            import json
             info_path = cover_image_path.replace('.jpg', '_composition_info.json')
-            with open(info_path, 'w', encoding='utf-8') as f:
-                json.dump(composition_info, f, indent=2, ensure_ascii=False)
+            draft.json_util.dump_file(composition_info, info_path, indent=2, compact=self.json_compact)
             print(f"    📄 合成信息已保存: {os.path.basename(info_path)}")
             
         except Exception as e:
@@ -4001,8 +4262,7 @@ class BatchDraftProcessor:
                 return False
             
             # 读取草稿配置
-            with open(draft_info_path, 'r', encoding='utf-8') as f:
-                draft_data = json.load(f)
+            draft_data = draft.json_util.load_file(draft_info_path)
             
             # 备份原始文件
             backup_path = draft_info_path + ".cover_backup"
@@ -4019,8 +4279,7 @@ class BatchDraftProcessor:
             })
             
             # 保存更新后的配置
-            with open(draft_info_path, 'w', encoding='utf-8') as f:
-                json.dump(draft_data, f, ensure_ascii=False, separators=(',', ':'))
+            draft.json_util.dump_file(draft_data, draft_info_path, compact=True)
             
             print(f"    🔧 草稿封面配置已更新")
             return True
@@ -4173,7 +4432,9 @@ class BatchDraftProcessor:
                 ]
                 print(f"    🎯 使用ffmpeg提取时间点 {time_seconds:.2f}s 的帧")
             
-            result = subprocess.run(cmd, capture_output=True, text=True)
+            draft.instrumentation.count("subprocesses")
+            with draft.instrumentation.stage("cover.ffmpeg"):
+                result = subprocess.run(cmd, capture_output=True, text=True)
             
             if result.returncode == 0 and os.path.exists(output_path):
                 return True
@@ -4192,14 +4453,14 @@ class BatchDraftProcessor:
         """使用ffmpeg提取视频最后一帧（向后兼容）"""
         return self.extract_frame_at_time_with_ffmpeg(video_path, output_path, None)
     
-    def add_audio_and_subtitle_with_api(self, draft_name, combination):
-        """使用pyJianYingDraft库API添加音频和字幕"""
+    def add_audio_and_subtitle_with_api(self, draft_name, combination, session=None):
+        """使用pyJianYingDraft库API添加音频和字幕，给定编辑会话`session`时不单独保存"""
         try:
             print(f"    🎵 使用库API添加音频和字幕...")
             
             # 加载草稿为ScriptFile对象
             try:
-                script = self.load_draft_as_script_file(draft_name)
+                script = session.script if session is not None else self.load_draft_as_script_file(draft_name)
                 print(f"    ✅ 成功加载草稿为ScriptFile对象")
             except Exception as e:
                 print(f"    ❌ 无法加载草稿为ScriptFile对象: {e}")
@@ -4407,6 +4668,7 @@ class BatchDraftProcessor:
                                         # 完全超出，移除片段
                                         print(f"    🔧 [DEBUG] 移除超出时长的视频片段 {segment.segment_id}")
                                         track.segments.remove(segment)
+                            track.reindex()  # 片段的时间范围已被直接修改
                 
             except Exception as e:
                 print(f"    ❌ 创建音频片段失败: {e}")
@@ -4424,6 +4686,10 @@ class BatchDraftProcessor:
                 if not success:
                     print(f"    ⚠️ 字幕添加失败，但音频添加成功")
             
+            # 编辑会话由调用方统一保存
+            if session is not None:
+                return True
+            
             # 保存草稿
             try:
                 print(f"    🔧 [DEBUG] 开始保存草稿...")
@@ -4676,6 +4942,7 @@ class BatchDraftProcessor:
                                         # 完全超出，移除片段
                                         print(f"    🔧 [DEBUG] 移除超出背景音乐时长的视频片段 {segment.segment_id}")
                                         track.segments.remove(segment)
+                            track.reindex()  # 片段的时间范围已被直接修改
                 elif self.bg_music_longer_handling == "trim" and bg_music_duration > video_duration:
                     print(f"    🔧 [DEBUG] 背景音乐比视频长，已在计算中裁剪背景音乐到视频长度")
                     print(f"    ✂️ 背景音乐裁剪: {bg_music_duration/1000000:.2f}s -> {target_duration/1000000:.2f}s")
@@ -4690,14 +4957,14 @@ class BatchDraftProcessor:
             print(f"    ❌ 添加背景音乐失败: {e}")
             return False
     
-    def add_background_music_only_with_api(self, draft_name, combination):
-        """单独使用库API添加背景音乐（无音频时）"""
+    def add_background_music_only_with_api(self, draft_name, combination, session=None):
+        """单独使用库API添加背景音乐（无音频时），给定编辑会话`session`时不单独保存"""
         try:
             print(f"    🎶 使用库API单独添加背景音乐...")
             
             # 加载草稿为ScriptFile对象
             try:
-                script = self.load_draft_as_script_file(draft_name)
+                script = session.script if session is not None else self.load_draft_as_script_file(draft_name)
                 print(f"    ✅ 成功加载草稿为ScriptFile对象")
             except Exception as e:
                 print(f"    ❌ 无法加载草稿为ScriptFile对象: {e}")
@@ -4708,10 +4975,12 @@ class BatchDraftProcessor:
             if not bg_music_success:
                 print(f"    ❌ 背景音乐添加失败")
                 return False
+            if session is not None:
+                return True
             
             # 保存草稿
             try:
-                script.save()
+                script.save(compact=self.json_compact)
                 print(f"    ✅ 草稿保存成功")
                 return True
                 
@@ -4972,25 +5241,21 @@ class BatchDraftProcessor:
             return None
     
     
-    def get_actual_segment_duration(self, draft_info, material_id):
-        """获取素材在时间线上的实际使用时长"""
+    def get_actual_segment_duration(self, draft_info, material_id, index=None):
+        """获取素材在时间线上的实际使用时长, `index`为草稿的`DraftIndex`, 未提供时临时建立"""
         total_duration = 0
         
         try:
-            if 'tracks' in draft_info:
-                for track in draft_info['tracks']:
-                    if track.get('type') == 'video' and 'segments' in track:
-                        segments = track['segments']
-                        
-                        for segment in segments:
-                            if segment.get('material_id') == material_id:
-                                # 计算片段实际时长：target_timerange.duration
-                                target_timerange = segment.get('target_timerange', {})
-                                if 'duration' in target_timerange:
-                                    total_duration += target_timerange['duration']
-                                elif 'start' in target_timerange and 'end' in target_timerange:
-                                    # 如果没有duration，用end-start计算
-                                    total_duration += target_timerange['end'] - target_timerange['start']
+            if index is None:
+                index = draft.DraftIndex.from_content(draft_info)
+            for segment in index.segments_of(material_id, 'video'):
+                # 计算片段实际时长：target_timerange.duration
+                target_timerange = segment.get('target_timerange', {})
+                if 'duration' in target_timerange:
+                    total_duration += target_timerange['duration']
+                elif 'start' in target_timerange and 'end' in target_timerange:
+                    # 如果没有duration，用end-start计算
+                    total_duration += target_timerange['end'] - target_timerange['start']
             
             return total_duration if total_duration > 0 else None
             
@@ -5008,8 +5273,7 @@ class BatchDraftProcessor:
                 print(f"    ❌ 草稿文件不存在: {draft_info_path}")
                 return None
             
-            with open(draft_info_path, 'r', encoding='utf-8') as f:
-                draft_data = json.load(f)
+            draft_data = draft.json_util.load_file(draft_info_path)
             
             # 从视频文件名找到对应的material_id
             video_filename = os.path.basename(video_file_path)
@@ -5078,8 +5342,7 @@ class BatchDraftProcessor:
                 print(f"    ❌ 草稿文件不存在: {draft_info_path}")
                 return None
             
-            with open(draft_info_path, 'r', encoding='utf-8') as f:
-                draft_data = json.load(f)
+            draft_data = draft.json_util.load_file(draft_info_path)
             
             # 获取草稿总时长
             draft_duration = draft_data.get('duration', 0)
@@ -5183,6 +5446,16 @@ class BatchDraftProcessor:
 
     def get_video_file_info(self, video_path):
         """获取视频文件信息，使用pyJianYingDraft的VideoMaterial获取准确信息"""
+        # 优先使用扫描素材时的并发探测结果
+        probe = self.media_probes.get(os.path.abspath(video_path))
+        if probe and probe['error'] is None and probe['media_type'] == 'video' and probe['duration']:
+            return {
+                'duration': probe['duration'],
+                'width': probe['width'],
+                'height': probe['height'],
+                'material_type': 'video'
+            }
+        
         try:
             # 导入pyJianYingDraft
             import sys
@@ -5207,20 +5480,13 @@ class BatchDraftProcessor:
         except Exception as e:
             print(f"    ⚠️ 使用VideoMaterial获取文件信息失败: {e}")
             
-        # 无论VideoMaterial是否成功，都用ffprobe验证时长
+        # 无论VideoMaterial是否成功，都用ffprobe验证时长（结果经由探测缓存）
         try:
-            import subprocess
-            
-            cmd = [
-                'ffprobe', '-v', 'quiet', '-print_format', 'json', '-show_format', '-show_streams',
-                video_path
-            ]
-            
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            if result.returncode == 0:
-                import json
-                info = json.loads(result.stdout)
-                
+            try:
+                info = draft.probe_cache.ffprobe(video_path)
+            except RuntimeError:
+                info = None
+            if info is not None:
                 video_info = {}
                 
                 # 获取时长（微秒）
@@ -5258,11 +5524,13 @@ class BatchDraftProcessor:
             
             # 添加测试选项
             print(f"\n🧪 开发者选项")
-            test_options = ["继续正常流程", "测试封面图生成功能"]
+            test_options = ["继续正常流程", "测试封面图生成功能", "搜索特效/滤镜/字体名称"]
             test_idx, test_str = self.get_user_choice(test_options, "选择模式", default_index=0)
             
             if test_idx == 1:  # 测试封面图生成
                 return self.test_jianying_cover_generation()
+            if test_idx == 2:  # 搜索元数据名称
+                return self.search_effect_names()
             
             # 1. 设置路径
             if not self.setup_paths():
@@ -5292,8 +5560,8 @@ class BatchDraftProcessor:
             if not self.batch_process_drafts():
                 return
             
-            # 8. 文本替换（如果已启用）
-            if self.enable_text_replacement:
+            # 8. 文本替换（如果已启用，且未在批量处理时一并完成）
+            if self.enable_text_replacement and not self.text_replaced_in_batch:
                 if not self.process_text_replacement():
                     print("⚠️ 文本替换过程中出现问题，但草稿创建已完成")
             
@@ -5307,6 +5575,22 @@ class BatchDraftProcessor:
             import traceback
             traceback.print_exc()
     
+    def search_effect_names(self):
+        """按名称、拼音模糊搜索特效/滤镜/字体等元数据, 查看其准确名称"""
+        from pyJianYingDraft.metadata.search import search_effects
+
+        self.print_section("搜索特效/滤镜/字体名称")
+        while True:
+            query = self.get_user_input("输入关键词 (回车结束)", allow_empty=True)
+            if not query:
+                return True
+            results = search_effects(query, limit=15)
+            if not results:
+                self.print_warning("没有找到匹配的项")
+                continue
+            for i, result in enumerate(results, 1):
+                print(f"   {i:2d}. {result.display_name}  [{result.enum_name}.{result.member_name}]  匹配度 {result.score:.2f}")
+
     def setup_text_replacement(self):
         """设置文本替换功能"""
         self.print_section("文本替换配置")
@@ -5716,21 +6000,21 @@ class BatchDraftProcessor:
                 traceback.print_exc()
             return False
     
-    def extract_text_tracks_from_draft(self, draft_name):
-        """从草稿中提取文本轨道信息 (兼容多版本格式)"""
+    def extract_text_tracks_from_draft(self, draft_name, draft_data=None):
+        """从草稿中提取文本轨道信息 (兼容多版本格式)，给定已解析的`draft_data`时不读取文件"""
         try:
-            # 使用兼容性方法获取草稿文件路径
-            draft_file_path = self.get_compatible_draft_file_path(draft_name)
-            
-            if not draft_file_path:
-                self.print_error(f"草稿文件不存在，已检查 draft_info.json 和 draft_content.json")
-                return []
-            
-            if self.debug:
-                self.print_success(f"找到草稿文件: {os.path.basename(draft_file_path)}")
-            
-            with open(draft_file_path, 'r', encoding='utf-8') as f:
-                draft_data = json.load(f)
+            if draft_data is None:
+                # 使用兼容性方法获取草稿文件路径
+                draft_file_path = self.get_compatible_draft_file_path(draft_name)
+                
+                if not draft_file_path:
+                    self.print_error(f"草稿文件不存在，已检查 draft_info.json 和 draft_content.json")
+                    return []
+                
+                if self.debug:
+                    self.print_success(f"找到草稿文件: {os.path.basename(draft_file_path)}")
+                
+                draft_data = draft.json_util.load_file(draft_file_path)
             
             # 获取素材信息
             materials = draft_data.get('materials', {})
@@ -5874,24 +6158,20 @@ class BatchDraftProcessor:
         self.selected_text_tracks = selected_tracks
         return True
     
-    def replace_text_in_draft(self, draft_name, text_tracks):
-        """在草稿中执行文本替换 (兼容多版本格式)"""
+    def replace_text_in_draft(self, draft_name, text_tracks, session=None, text_index=None):
+        """在草稿中执行文本替换 (兼容多版本格式)
+        
+        给定编辑会话`session`时只修改会话中的草稿，由调用方统一保存；`text_index`为按顺序选择文本时使用的序号
+        """
         try:
-            # 使用兼容性方法获取草稿文件路径
-            draft_file_path = self.get_compatible_draft_file_path(draft_name)
-            
-            if not draft_file_path:
-                self.print_error(f"草稿文件不存在，已检查 draft_info.json 和 draft_content.json")
-                return False
-            
-            # 读取草稿文件
-            with open(draft_file_path, 'r', encoding='utf-8') as f:
-                draft_data = json.load(f)
-            
-            # 备份原文件
-            backup_path = draft_file_path + ".text_backup"
-            with open(backup_path, 'w', encoding='utf-8') as f:
-                json.dump(draft_data, f, ensure_ascii=False, indent=2)
+            own_session = session is None
+            if own_session:
+                # 读取草稿文件，备份在保存时按备份方式写入
+                session = self.open_draft_session(draft_name, ".text_backup")
+                if session is None:
+                    self.print_error(f"草稿文件不存在，已检查 draft_info.json 和 draft_content.json")
+                    return False
+            draft_data = session.content
             
             replacement_success = False
             
@@ -5906,7 +6186,7 @@ class BatchDraftProcessor:
                     continue
                 
                 # 获取要替换的新文本
-                new_text = self.get_next_text_content(text_type, draft_name)
+                new_text = self.get_next_text_content(text_type, draft_name, text_index)
                 if not new_text:
                     print(f"⚠️ 无法获取{text_type}的新文本内容")
                     continue
@@ -5952,8 +6232,9 @@ class BatchDraftProcessor:
             
             if replacement_success:
                 # 保存修改后的草稿文件
-                with open(draft_file_path, 'w', encoding='utf-8') as f:
-                    json.dump(draft_data, f, ensure_ascii=False, indent=2)
+                session.mark_modified()
+                if own_session:
+                    session.save(indent=2, compact=self.json_compact)
                 
                 return True
             else:
@@ -5967,8 +6248,8 @@ class BatchDraftProcessor:
                 traceback.print_exc()
             return False
     
-    def get_next_text_content(self, text_type, draft_name):
-        """获取下一个要使用的文本内容"""
+    def get_next_text_content(self, text_type, draft_name, index=None):
+        """获取下一个要使用的文本内容，按顺序选择时若给定`index`则直接使用第`index`个（循环）"""
         if text_type not in self.text_contents:
             return None
         
@@ -5978,6 +6259,9 @@ class BatchDraftProcessor:
         
         # 根据选择模式决定使用哪个文本
         if self.text_selection_mode == "sequential":
+            if index is not None:
+                return texts[index % len(texts)]
+            
             # 按顺序循环：使用草稿索引来确定使用哪个文本
             if not hasattr(self, 'draft_text_indices'):
                 self.draft_text_indices = {}
@@ -6047,9 +6331,41 @@ def main():
     parser.add_argument('--debug', action='store_true', help='启用调试模式')
     parser.add_argument('--fix-draft', type=str, help='修复指定草稿名称的路径占位符问题')
     parser.add_argument('--test-cover', action='store_true', help='测试封面图生成功能')
+    parser.add_argument('--warm-probe-cache', type=str, metavar='FOLDER', help='预先探测素材文件夹中的所有媒体文件并写入探测缓存')
+    parser.add_argument('--compact-json', action='store_true', help='以紧凑格式（无缩进）写入草稿JSON')
+    parser.add_argument('--workers', type=int, default=1, help='批量处理的并行任务数，默认为1（串行）')
+    parser.add_argument('--executor', choices=['thread', 'process'], default='thread', help='并行执行器类型')
+    parser.add_argument('--backup-mode', choices=list(draft.BACKUP_MODES), default=None,
+                        help='修改草稿前的备份方式: full(完整备份)、snapshot(只保留原始快照)、journal(只记录改动)、off(不备份)')
+    parser.add_argument('--undo-draft', type=str, metavar='DRAFT', help='撤销指定草稿最近一次的素材或文本替换')
+    parser.add_argument('--shard', type=str, metavar='I/N', default=None,
+                        help='只处理第I个分片（共N个），多台机器可指向同一草稿根目录分片处理同一批组合')
+    parser.add_argument('--no-resume', action='store_true', help='不记录运行清单，也不跳过之前已完成的组合')
+    parser.add_argument('--no-duplicate-screening', action='store_true',
+                        help='生成组合前不预检part文件夹中画面重复的素材')
+    parser.add_argument('--profile-variant', type=int, metavar='N', default=None,
+                        help='在cProfile下处理第N个组合并保存剖析结果，用于定位单个草稿的耗时')
+    parser.add_argument('--profile-output', type=str, metavar='PATH', default=None,
+                        help='剖析结果路径，默认为 profile_<N>.prof；以.html结尾且安装了pyinstrument时输出HTML报告')
     args = parser.parse_args()
     
     processor = BatchDraftProcessor(debug=args.debug)
+    processor.json_compact = args.compact_json
+    if args.backup_mode:
+        processor.backup_mode = args.backup_mode
+    processor.batch_workers = args.workers
+    processor.batch_executor = args.executor
+    processor.resume_batches = not args.no_resume
+    processor.screen_duplicates = not args.no_duplicate_screening
+    processor.profile_variant = args.profile_variant
+    processor.profile_output = args.profile_output
+    if args.shard:
+        try:
+            processor.batch_shard = parse_shard(args.shard)
+        except ValueError as e:
+            parser.error(str(e))
+        if args.no_resume:
+            parser.error("--shard 需要运行清单，不能与 --no-resume 同时使用")
     
     # 如果指定了测试封面图
     if args.test_cover:
@@ -6061,6 +6377,25 @@ def main():
             print("❌ 测试失败！")
         return
     
+    # 如果指定了预热探测缓存
+    if args.warm_probe_cache:
+        cache = draft.get_probe_cache()
+        if cache is None:
+            print("❌ 探测缓存已被禁用")
+            return
+        print(f"🔥 预热探测缓存: {args.warm_probe_cache}")
+        stats = cache.warm(args.warm_probe_cache)
+        print(f"✅ 新探测 {stats['probed']} 个，已缓存 {stats['cached']} 个，失败 {stats['failed']} 个")
+        return
+    
+    # 如果指定了撤销草稿修改
+    if args.undo_draft:
+        if processor.undo_draft_edit(args.undo_draft):
+            print(f"✅ 已撤销草稿 '{args.undo_draft}' 最近一次的修改")
+        else:
+            print(f"❌ 草稿 '{args.undo_draft}' 没有可用的备份")
+        return
+    
     # 如果指定了修复草稿
     if args.fix_draft:
         print(f"🔧 修复模式：修复草稿 '{args.fix_draft}'")
@@ -1,7 +1,10 @@
 import warnings
 import sys
 
-from .local_materials import CropSettings, VideoMaterial, AudioMaterial
+from .local_materials import CropSettings, VideoMaterial, AudioMaterial, probe_media, probe_many
+from .probe_cache import ProbeCache, get_probe_cache, set_probe_cache
+from . import json_util
+from . import instrumentation
 from .keyframe import KeyframeProperty
 
 from .time_util import Timerange
@@ -10,18 +13,20 @@ from .video_segment import VideoSegment, StickerSegment, ClipSettings
 from .effect_segment import EffectSegment, FilterSegment
 from .text_segment import TextSegment, TextStyle, TextBorder, TextBackground, TextShadow
 
-from .metadata import FontType
+from . import metadata
 from .metadata import MaskType
-from .metadata import TransitionType, FilterType
-from .metadata import IntroType, OutroType, GroupAnimationType
-from .metadata import TextIntro, TextOutro, TextLoopAnim
-from .metadata import AudioSceneEffectType
-from .metadata import VideoSceneEffectType, VideoCharacterEffectType
+from .metadata.search import EffectSearchIndex, EffectSearchResult, search_effects
+# 其余元数据枚举(FontType、FilterType等)在首次访问时才加载, 见模块末尾的`__getattr__`
 
 from .track import TrackType
 from .template_mode import ShrinkMode, ExtendMode
-from .script_file import ScriptFile
+from .script_file import ScriptFile, CompiledTemplate
 from .draft_folder import DraftFolder
+from .draft_copy import CopyReport, copy_draft_tree, replace_file
+from .material_pool import MaterialPool
+from .draft_backup import DraftBackup, BACKUP_MODES
+from .edit_session import DraftEditSession
+from .draft_index import DraftIndex
 
 # 仅在Windows系统下导入jianying_controller
 ISWIN = (sys.platform == 'win32')
@@ -144,13 +149,21 @@ class Crop_settings:
 
 # 枚举类的向后兼容 - 使用代理类
 class _DeprecatedEnum:
-    """带deprecation警告的枚举代理类"""
+    """带deprecation警告的枚举代理类, `original_enum`也可以是元数据枚举的名称, 此时在首次使用时才加载"""
     def __init__(self, original_enum, old_name, new_name):
-        self._enum = original_enum
+        self._original = original_enum
         self._old_name = old_name
         self._new_name = new_name
 
+    @property
+    def _enum(self):
+        if isinstance(self._original, str):
+            self._original = getattr(metadata, self._original)
+        return self._original
+
     def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
         # 当访问枚举成员时显示警告
         _deprecated_class_warning(self._old_name, self._new_name)
         return getattr(self._enum, name)
@@ -164,19 +177,19 @@ class _DeprecatedEnum:
         return f"<Deprecated {self._old_name} (use {self._new_name} instead)>"
 
 Track_type = _DeprecatedEnum(TrackType, "Track_type", "TrackType")
-Font_type = _DeprecatedEnum(FontType, "Font_type", "FontType")
+Font_type = _DeprecatedEnum("FontType", "Font_type", "FontType")
 Mask_type = _DeprecatedEnum(MaskType, "Mask_type", "MaskType")
-Filter_type = _DeprecatedEnum(FilterType, "Filter_type", "FilterType")
-Transition_type = _DeprecatedEnum(TransitionType, "Transition_type", "TransitionType")
-Intro_type = _DeprecatedEnum(IntroType, "Intro_type", "IntroType")
-Outro_type = _DeprecatedEnum(OutroType, "Outro_type", "OutroType")
-Group_animation_type = _DeprecatedEnum(GroupAnimationType, "Group_animation_type", "GroupAnimationType")
-Text_intro = _DeprecatedEnum(TextIntro, "Text_intro", "TextIntro")
-Text_outro = _DeprecatedEnum(TextOutro, "Text_outro", "TextOutro")
-Text_loop_anim = _DeprecatedEnum(TextLoopAnim, "Text_loop_anim", "TextLoopAnim")
-Audio_scene_effect_type = _DeprecatedEnum(AudioSceneEffectType, "Audio_scene_effect_type", "AudioSceneEffectType")
-Video_scene_effect_type = _DeprecatedEnum(VideoSceneEffectType, "Video_scene_effect_type", "VideoSceneEffectType")
-Video_character_effect_type = _DeprecatedEnum(VideoCharacterEffectType, "Video_character_effect_type", "VideoCharacterEffectType")
+Filter_type = _DeprecatedEnum("FilterType", "Filter_type", "FilterType")
+Transition_type = _DeprecatedEnum("TransitionType", "Transition_type", "TransitionType")
+Intro_type = _DeprecatedEnum("IntroType", "Intro_type", "IntroType")
+Outro_type = _DeprecatedEnum("OutroType", "Outro_type", "OutroType")
+Group_animation_type = _DeprecatedEnum("GroupAnimationType", "Group_animation_type", "GroupAnimationType")
+Text_intro = _DeprecatedEnum("TextIntro", "Text_intro", "TextIntro")
+Text_outro = _DeprecatedEnum("TextOutro", "Text_outro", "TextOutro")
+Text_loop_anim = _DeprecatedEnum("TextLoopAnim", "Text_loop_anim", "TextLoopAnim")
+Audio_scene_effect_type = _DeprecatedEnum("AudioSceneEffectType", "Audio_scene_effect_type", "AudioSceneEffectType")
+Video_scene_effect_type = _DeprecatedEnum("VideoSceneEffectType", "Video_scene_effect_type", "VideoSceneEffectType")
+Video_character_effect_type = _DeprecatedEnum("VideoCharacterEffectType", "Video_character_effect_type", "VideoCharacterEffectType")
 Keyframe_property = _DeprecatedEnum(KeyframeProperty, "Keyframe_property", "KeyframeProperty")
 
 # 仅在Windows系统下定义jianying_controller相关的向后兼容类
@@ -205,9 +218,17 @@ __all__ = [
     "AudioSceneEffectType",
     "VideoSceneEffectType",
     "VideoCharacterEffectType",
+    "EffectSearchIndex",
+    "EffectSearchResult",
+    "search_effects",
     "CropSettings",
     "VideoMaterial",
     "AudioMaterial",
+    "probe_media",
+    "probe_many",
+    "ProbeCache",
+    "get_probe_cache",
+    "set_probe_cache",
     "KeyframeProperty",
     "Timerange",
     "AudioSegment",
@@ -225,7 +246,16 @@ __all__ = [
     "ShrinkMode",
     "ExtendMode",
     "ScriptFile",
+    "CompiledTemplate",
     "DraftFolder",
+    "CopyReport",
+    "copy_draft_tree",
+    "replace_file",
+    "MaterialPool",
+    "DraftBackup",
+    "BACKUP_MODES",
+    "DraftEditSession",
+    "DraftIndex",
     "SEC",
     "tim",
     "trange",
@@ -275,3 +305,15 @@ if ISWIN:
         "Export_resolution",
         "Export_framerate",
     ])
+
+_LAZY_METADATA = {"FontType", "FilterType", "TransitionType", "IntroType", "OutroType", "GroupAnimationType",
+                  "TextIntro", "TextOutro", "TextLoopAnim", "AudioSceneEffectType",
+                  "VideoSceneEffectType", "VideoCharacterEffectType"}
+
+def __getattr__(name: str):
+    # 元数据枚举延迟到首次访问时加载
+    if name in _LAZY_METADATA:
+        value = getattr(metadata, name)
+        globals()[name] = value
+        return value
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
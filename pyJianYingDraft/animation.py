@@ -2,14 +2,17 @@
 
 import uuid
 
-from typing import Union, Optional
+from typing import Union, Optional, TYPE_CHECKING
 from typing import Literal, Dict, List, Any
 
 from .time_util import Timerange
 
+from . import metadata
 from .metadata import AnimationMeta
-from .metadata import IntroType, OutroType, GroupAnimationType
-from .metadata import TextIntro, TextOutro, TextLoopAnim
+
+if TYPE_CHECKING:
+    from .metadata import IntroType, OutroType, GroupAnimationType
+    from .metadata import TextIntro, TextOutro, TextLoopAnim
 
 class Animation:
     """一个视频/文本动画效果"""
@@ -61,15 +64,15 @@ class VideoAnimation(Animation):
 
     animation_type: Literal["in", "out", "group"]
 
-    def __init__(self, animation_type: Union[IntroType, OutroType, GroupAnimationType],
+    def __init__(self, animation_type: Union["IntroType", "OutroType", "GroupAnimationType"],
                  start: int, duration: int):
         super().__init__(animation_type.value, start, duration)
 
-        if isinstance(animation_type, IntroType):
+        if isinstance(animation_type, metadata.IntroType):
             self.animation_type = "in"
-        elif isinstance(animation_type, OutroType):
+        elif isinstance(animation_type, metadata.OutroType):
             self.animation_type = "out"
-        elif isinstance(animation_type, GroupAnimationType):
+        elif isinstance(animation_type, metadata.GroupAnimationType):
             self.animation_type = "group"
 
         self.is_video_animation = True
@@ -79,15 +82,15 @@ class Text_animation(Animation):
 
     animation_type: Literal["in", "out", "loop"]
 
-    def __init__(self, animation_type: Union[TextIntro, TextOutro, TextLoopAnim],
+    def __init__(self, animation_type: Union["TextIntro", "TextOutro", "TextLoopAnim"],
                  start: int, duration: int):
         super().__init__(animation_type.value, start, duration)
 
-        if isinstance(animation_type, TextIntro):
+        if isinstance(animation_type, metadata.TextIntro):
             self.animation_type = "in"
-        elif isinstance(animation_type, TextOutro):
+        elif isinstance(animation_type, metadata.TextOutro):
             self.animation_type = "out"
-        elif isinstance(animation_type, TextLoopAnim):
+        elif isinstance(animation_type, metadata.TextLoopAnim):
             self.animation_type = "loop"
 
         self.is_video_animation = False
@@ -6,7 +6,7 @@
 import uuid
 from copy import deepcopy
 
-from typing import Optional, Literal, Union
+from typing import Optional, Literal, Union, TYPE_CHECKING
 from typing import Dict, List, Any
 
 from .time_util import tim, Timerange
@@ -14,8 +14,11 @@ from .segment import MediaSegment
 from .local_materials import AudioMaterial
 from .keyframe import KeyframeProperty, KeyframeList
 
+from . import metadata
 from .metadata import EffectParamInstance
-from .metadata import AudioSceneEffectType, ToneEffectType, SpeechToSongType
+
+if TYPE_CHECKING:
+    from .metadata import AudioSceneEffectType, ToneEffectType, SpeechToSongType
 
 class AudioFade:
     """音频淡入淡出效果"""
@@ -60,7 +63,7 @@ class AudioEffect:
 
     audio_adjust_params: List[EffectParamInstance]
 
-    def __init__(self, effect_meta: Union[AudioSceneEffectType, ToneEffectType, SpeechToSongType],
+    def __init__(self, effect_meta: Union["AudioSceneEffectType", "ToneEffectType", "SpeechToSongType"],
                  params: Optional[List[Optional[float]]] = None):
         """根据给定的音效元数据及参数列表构造一个音频特效对象, params的范围是0~100"""
 
@@ -69,15 +72,15 @@ class AudioEffect:
         self.resource_id = effect_meta.value.resource_id
         self.audio_adjust_params = []
 
-        if isinstance(effect_meta, AudioSceneEffectType):
+        if isinstance(effect_meta, metadata.AudioSceneEffectType):
             self.category_id = "sound_effect"
             self.category_name = "场景音"
             self.category_index = 1
-        elif isinstance(effect_meta, ToneEffectType):
+        elif isinstance(effect_meta, metadata.ToneEffectType):
             self.category_id = "tone"
             self.category_name = "音色"
             self.category_index = 2
-        elif isinstance(effect_meta, SpeechToSongType):
+        elif isinstance(effect_meta, metadata.SpeechToSongType):
             self.category_id = "speech_to_song"
             self.category_name = "声音成曲"
             self.category_index = 3
@@ -157,7 +160,7 @@ class AudioSegment(MediaSegment):
         self.fade = None
         self.effects = []
 
-    def add_effect(self, effect_type: Union[AudioSceneEffectType, ToneEffectType, SpeechToSongType],
+    def add_effect(self, effect_type: Union["AudioSceneEffectType", "ToneEffectType", "SpeechToSongType"],
                    params: Optional[List[Optional[float]]] = None) -> "AudioSegment":
         """为音频片段添加一个作用于整个片段的音频效果, 目前"声音成曲"效果不能自动被剪映所识别
 
@@ -0,0 +1,222 @@
+"""草稿编辑前的备份与撤销
+
+批量修改草稿时, 每次编辑前完整地重新写一份备份会使写入量翻倍. 本模块提供几种备份方式:
+
+- `full`: 每次保存前将修改前的文件原样写入备份文件(如`draft_content.json.backup`), 与以往的行为相同
+- `snapshot`: 只在首次保存前保留一份原始快照(`.pristine`), 之后的编辑不再写备份
+- `journal`: 只向日志(`.journal`)追加每次编辑的反向JSON补丁, 可以逐次撤销
+- `off`: 不备份, 适合由模板批量生成草稿的场合, 此时模板本身即是备份
+
+默认方式可通过环境变量`PYJIANYINGDRAFT_BACKUP_MODE`指定, 未指定时为`full`.
+"""
+
+import os
+import time
+
+from typing import Optional, Union, Callable
+from typing import Dict, List, Any
+
+from . import json_util
+from . import instrumentation
+
+BACKUP_MODE_ENV = "PYJIANYINGDRAFT_BACKUP_MODE"
+"""指定默认备份方式的环境变量"""
+
+BACKUP_MODES = ("full", "snapshot", "journal", "off")
+"""可选的备份方式"""
+
+SNAPSHOT_SUFFIX = ".pristine"
+"""原始快照文件的后缀"""
+JOURNAL_SUFFIX = ".journal"
+"""编辑日志文件的后缀"""
+
+def default_backup_mode() -> str:
+    """按环境变量确定的默认备份方式"""
+    mode = os.environ.get(BACKUP_MODE_ENV, "").strip().lower()
+    return mode if mode in BACKUP_MODES else "full"
+
+def _escape(key: Union[str, int]) -> str:
+    return str(key).replace("~", "~0").replace("/", "~1")
+
+def _unescape(token: str) -> str:
+    return token.replace("~1", "/").replace("~0", "~")
+
+def make_patch(src: Any, dst: Any, path: str = "") -> List[Dict[str, Any]]:
+    """计算将`src`变为`dst`的JSON补丁(RFC 6902中的`add`、`remove`、`replace`操作)
+
+    列表只比较去掉公共前后缀之后的部分, 在列表中间增删元素不会使整个列表被替换.
+    """
+    if src == dst:
+        return []
+    if isinstance(src, dict) and isinstance(dst, dict):
+        ops: List[Dict[str, Any]] = []
+        for key in src:
+            if key not in dst:
+                ops.append({"op": "remove", "path": path + "/" + _escape(key)})
+        for key, value in dst.items():
+            if key not in src:
+                ops.append({"op": "add", "path": path + "/" + _escape(key), "value": value})
+            else:
+                ops.extend(make_patch(src[key], value, path + "/" + _escape(key)))
+        return ops
+    if isinstance(src, list) and isinstance(dst, list):
+        prefix = 0
+        limit = min(len(src), len(dst))
+        while prefix < limit and src[prefix] == dst[prefix]:
+            prefix += 1
+        suffix = 0
+        while suffix < limit - prefix and src[-1 - suffix] == dst[-1 - suffix]:
+            suffix += 1
+        src_mid, dst_mid = len(src) - prefix - suffix, len(dst) - prefix - suffix
+        ops = []
+        for i in range(min(src_mid, dst_mid)):
+            ops.extend(make_patch(src[prefix + i], dst[prefix + i], "%s/%d" % (path, prefix + i)))
+        # 从后往前删除, 使前面的下标保持有效
+        for i in reversed(range(dst_mid, src_mid)):
+            ops.append({"op": "remove", "path": "%s/%d" % (path, prefix + i)})
+        for i in range(src_mid, dst_mid):
+            ops.append({"op": "add", "path": "%s/%d" % (path, prefix + i), "value": dst[prefix + i]})
+        return ops
+    return [{"op": "replace", "path": path, "value": dst}]
+
+def apply_patch(doc: Any, patch: List[Dict[str, Any]]) -> Any:
+    """将JSON补丁原地应用到`doc`上, 返回结果(整体替换时为新对象)"""
+    for op in patch:
+        if op["path"] == "":
+            doc = op["value"]
+            continue
+        tokens = [_unescape(token) for token in op["path"].split("/")[1:]]
+        parent = doc
+        for token in tokens[:-1]:
+            parent = parent[int(token)] if isinstance(parent, list) else parent[token]
+        last = tokens[-1]
+        if isinstance(parent, list):
+            index = int(last)
+            if op["op"] == "add":
+                parent.insert(index, op["value"])
+            elif op["op"] == "remove":
+                del parent[index]
+            else:
+                parent[index] = op["value"]
+        elif op["op"] == "remove":
+            del parent[last]
+        else:
+            parent[last] = op["value"]
+    return doc
+
+class DraftBackup:
+    """按选定的备份方式读取、保存一个草稿JSON文件
+
+    用法为`data = backup.load()`, 修改`data`后调用`backup.save(data)`, 备份在保存时才写入.
+    """
+
+    path: str
+    """草稿JSON文件路径"""
+    mode: str
+    """备份方式, 见`BACKUP_MODES`"""
+    suffix: str
+    """`full`方式下备份文件的后缀"""
+
+    def __init__(self, path: str, mode: Optional[str] = None, suffix: str = ".backup"):
+        """
+        Args:
+            path (`str`): 草稿JSON文件路径
+            mode (`str`, optional): 备份方式, 默认由`default_backup_mode()`确定
+            suffix (`str`, optional): `full`方式下备份文件的后缀, 默认为`.backup`
+
+        Raises:
+            `ValueError`: 未知的备份方式
+        """
+        mode = default_backup_mode() if mode is None else mode
+        if mode not in BACKUP_MODES:
+            raise ValueError(f"未知的备份方式 '{mode}', 可选 {', '.join(BACKUP_MODES)}")
+        self.path = path
+        self.mode = mode
+        self.suffix = suffix
+        self._original: Optional[bytes] = None
+
+    def load(self) -> Any:
+        """读取并解析草稿文件, 同时记住修改前的原始内容"""
+        with instrumentation.stage("json.load"):
+            with open(self.path, "rb") as f:
+                self._original = f.read()
+            instrumentation.count("bytes_read", len(self._original))
+            return json_util.loads(self._original)
+
+    def _write_backup(self) -> None:
+        """按`full`或`snapshot`方式备份修改前的内容"""
+        if self._original is None:
+            return
+        if self.mode == "full":
+            with open(self.path + self.suffix, "wb") as f:
+                f.write(self._original)
+        elif self.mode == "snapshot":
+            if not os.path.exists(self.path + SNAPSHOT_SUFFIX):
+                with open(self.path + SNAPSHOT_SUFFIX, "wb") as f:
+                    f.write(self._original)
+
+    def save(self, data: Any, *, indent: Optional[int] = 4, compact: bool = False) -> None:
+        """按备份方式备份修改前的内容, 然后写入草稿文件, 参数含义同`json_util.dump_file`
+
+        `journal`方式的编辑日志在草稿文件写入成功后才追加, 写入失败时不会留下未发生的编辑
+        """
+        entry = None
+        if self._original is not None and self.mode == "journal":
+            reverse = make_patch(data, json_util.loads(self._original))
+            if reverse:
+                entry = json_util.dumps({"time": time.time(), "patch": reverse}, compact=True)
+        self._write_backup()
+
+        json_util.dump_file(data, self.path, indent=indent, compact=compact)
+        if entry is not None:
+            with open(self.path + JOURNAL_SUFFIX, "ab") as f:
+                f.write(entry.encode("utf-8") + b"\n")
+        self._original = None
+
+    def save_with(self, writer: Callable[[str], None]) -> None:
+        """按备份方式备份修改前的内容, 然后调用`writer(path)`写入草稿文件, 如以`ScriptFile.dump`流式写入
+
+        Raises:
+            `ValueError`: `journal`方式需要完整的草稿内容计算反向补丁, 应使用`save`
+        """
+        if self.mode == "journal":
+            raise ValueError("journal 备份方式需要完整的草稿内容, 请使用 save")
+        self._write_backup()
+        writer(self.path)
+        self._original = None
+
+    def undo(self, *, indent: Optional[int] = 4, compact: bool = False) -> bool:
+        """撤销草稿文件最近的修改, 与备份方式无关地依次尝试:
+        撤销编辑日志中的最后一次编辑, 恢复原始快照, 恢复`full`方式的备份
+
+        Returns:
+            `bool`: 是否找到可用的备份并完成撤销
+        """
+        journal_path = self.path + JOURNAL_SUFFIX
+        lines = self._read_journal()
+        if lines:
+            doc = apply_patch(json_util.load_file(self.path), json_util.loads(lines[-1])["patch"])
+            json_util.dump_file(doc, self.path, indent=indent, compact=compact)
+            remaining = lines[:-1]
+            if remaining:
+                json_util.atomic_write(journal_path, lambda f: f.write(b"\n".join(remaining) + b"\n"))
+            else:
+                os.remove(journal_path)
+            return True
+
+        for backup_path in (self.path + SNAPSHOT_SUFFIX, self.path + self.suffix):
+            if os.path.exists(backup_path):
+                with open(backup_path, "rb") as f:
+                    original = f.read()
+                json_util.atomic_write(self.path, lambda f: f.write(original))
+                if backup_path.endswith(SNAPSHOT_SUFFIX):
+                    os.remove(backup_path)
+                return True
+        return False
+
+    def _read_journal(self) -> List[bytes]:
+        try:
+            with open(self.path + JOURNAL_SUFFIX, "rb") as f:
+                return [line for line in f.read().splitlines() if line.strip()]
+        except FileNotFoundError:
+            return []
@@ -0,0 +1,198 @@
+"""草稿文件夹的复制
+
+批量生成草稿时, 每份草稿都完整复制模板中的视频、音频等素材会占用大量磁盘空间和IO.
+本模块在复制草稿时对不会被修改的素材文件使用reflink(写时复制的克隆)或硬链接, 只有JSON等会被编辑的文件才实际复制,
+文件系统不支持时自动回退为普通复制.
+
+注意: 以硬链接复制的文件与模板共享同一份数据, 不能原地写入, 替换其内容时应使用`replace_file`.
+"""
+
+import os
+import sys
+import errno
+import shutil
+
+from typing import Set
+
+from . import instrumentation
+
+COPY_STRATEGIES = ("auto", "reflink", "hardlink", "copy")
+"""可选的复制策略:
+
+- `auto`: 依次尝试reflink、硬链接, 都不支持时复制
+- `reflink`: 尝试reflink, 不支持时复制
+- `hardlink`: 尝试硬链接, 不支持时复制
+- `copy`: 总是复制, 与`shutil.copytree`相同
+"""
+
+EDITABLE_EXTENSIONS = frozenset([".json", ".bak", ".backup", ".tmp", ".txt", ".srt", ".ini", ".xml"])
+"""总是实际复制的文件扩展名, 即草稿的配置文件及可能被编辑的文本文件"""
+
+MIN_LINK_SIZE = 64 * 1024
+"""小于该大小(字节)的文件总是实际复制, 共享它们节省的空间有限"""
+
+_FICLONE = 0x40049409
+"""Linux下克隆文件的ioctl请求码"""
+
+class CopyReport:
+    """一次草稿复制的统计信息"""
+
+    files_copied: int
+    """实际复制的文件数"""
+    bytes_copied: int
+    """实际复制的字节数"""
+    files_reflinked: int
+    """以reflink复制的文件数"""
+    bytes_reflinked: int
+    """以reflink复制的字节数"""
+    files_linked: int
+    """以硬链接复制的文件数"""
+    bytes_linked: int
+    """以硬链接复制的字节数"""
+    fallbacks: int
+    """因文件系统不支持而回退为复制的文件数"""
+
+    def __init__(self):
+        self.files_copied = self.bytes_copied = 0
+        self.files_reflinked = self.bytes_reflinked = 0
+        self.files_linked = self.bytes_linked = 0
+        self.fallbacks = 0
+
+    @property
+    def bytes_saved(self) -> int:
+        """与完整复制相比节省的磁盘写入字节数"""
+        return self.bytes_reflinked + self.bytes_linked
+
+    def merge(self, other: "CopyReport") -> None:
+        """将另一次复制的统计累加到本对象上"""
+        for attr in ("files_copied", "bytes_copied", "files_reflinked", "bytes_reflinked",
+                     "files_linked", "bytes_linked", "fallbacks"):
+            setattr(self, attr, getattr(self, attr) + getattr(other, attr))
+
+    def __str__(self) -> str:
+        return ("复制 %d 个文件 (%.1f MB), reflink %d 个 (%.1f MB), 硬链接 %d 个 (%.1f MB), 节省 %.1f MB" %
+                (self.files_copied, self.bytes_copied / 2**20, self.files_reflinked, self.bytes_reflinked / 2**20,
+                 self.files_linked, self.bytes_linked / 2**20, self.bytes_saved / 2**20))
+
+_UNSUPPORTED_ERRNOS = {errno.EXDEV, errno.EPERM, errno.EACCES, errno.EINVAL, errno.EMLINK,
+                       getattr(errno, "EOPNOTSUPP", errno.EINVAL), getattr(errno, "ENOTSUP", errno.EINVAL),
+                       getattr(errno, "ENOTTY", errno.EINVAL), getattr(errno, "ENOSYS", errno.EINVAL)}
+"""表示文件系统不支持reflink或硬链接的错误码"""
+
+def _clonefile_darwin(src: str, dst: str) -> None:
+    import ctypes
+
+    libc = ctypes.CDLL(None, use_errno=True)
+    if libc.clonefile(os.fsencode(src), os.fsencode(dst), 0) != 0:
+        err = ctypes.get_errno()
+        raise OSError(err, os.strerror(err), dst)
+
+def reflink(src: str, dst: str) -> None:
+    """以写时复制的方式克隆文件(Linux下的FICLONE, macOS下的clonefile), 新旧文件之后的修改互不影响
+
+    Raises:
+        `OSError`: 平台或文件系统不支持
+    """
+    if sys.platform == "darwin":
+        _clonefile_darwin(src, dst)
+    elif sys.platform.startswith("linux"):
+        import fcntl
+
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            try:
+                fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+            except OSError:
+                fdst.close()
+                os.remove(dst)
+                raise
+    else:
+        raise OSError(errno.EOPNOTSUPP, "当前平台不支持reflink", dst)
+    shutil.copystat(src, dst)
+
+class _TreeCopier:
+    """在一次复制中记住文件系统不支持的方式, 避免对每个文件重复尝试"""
+
+    def __init__(self, strategy: str, min_link_size: int):
+        if strategy not in COPY_STRATEGIES:
+            raise ValueError(f"未知的复制策略 '{strategy}', 可选 {', '.join(COPY_STRATEGIES)}")
+        self.methods = {"auto": ["reflink", "hardlink"], "reflink": ["reflink"],
+                        "hardlink": ["hardlink"], "copy": []}[strategy]
+        self.min_link_size = min_link_size
+        self.unsupported: Set[str] = set()
+        self.report = CopyReport()
+
+    def shareable(self, rel_path: str, size: int) -> bool:
+        """文件是否可与模板共享: 位于子文件夹中(草稿根目录下均为配置及封面)、非可编辑类型且不太小"""
+        if os.path.dirname(rel_path) == "" or size < self.min_link_size:
+            return False
+        return os.path.splitext(rel_path)[1].lower() not in EDITABLE_EXTENSIONS
+
+    def copy_file(self, src: str, dst: str, rel_path: str) -> None:
+        size = os.path.getsize(src)
+        if os.path.lexists(dst):
+            os.remove(dst)  # 不能写入已有文件, 它可能是与其它草稿共享的硬链接
+
+        if self.shareable(rel_path, size):
+            for method in self.methods:
+                if method in self.unsupported:
+                    continue
+                try:
+                    if method == "reflink":
+                        reflink(src, dst)
+                        self.report.files_reflinked += 1
+                        self.report.bytes_reflinked += size
+                    else:
+                        os.link(src, dst)
+                        self.report.files_linked += 1
+                        self.report.bytes_linked += size
+                    return
+                except OSError as e:
+                    if e.errno not in _UNSUPPORTED_ERRNOS:
+                        raise
+                    self.unsupported.add(method)
+            if self.methods:
+                self.report.fallbacks += 1
+
+        shutil.copy2(src, dst)
+        self.report.files_copied += 1
+        self.report.bytes_copied += size
+
+def copy_draft_tree(src: str, dst: str, strategy: str = "auto", *,
+                    dirs_exist_ok: bool = False, min_link_size: int = MIN_LINK_SIZE) -> CopyReport:
+    """复制草稿文件夹, 素材文件按给定策略共享, 其余文件实际复制
+
+    Args:
+        src (`str`): 原草稿文件夹
+        dst (`str`): 目标文件夹
+        strategy (`str`, optional): 复制策略, 见`COPY_STRATEGIES`, 默认为`auto`
+        dirs_exist_ok (`bool`, optional): 目标文件夹已存在时是否合并复制(同名文件被替换), 默认为否
+        min_link_size (`int`, optional): 可共享文件的最小字节数, 默认为`MIN_LINK_SIZE`
+
+    Returns:
+        `CopyReport`: 复制统计, 其中`bytes_saved`为节省的字节数
+
+    Raises:
+        `ValueError`: 未知的复制策略
+        `FileExistsError`: 目标文件夹已存在, 但`dirs_exist_ok`为否
+    """
+    copier = _TreeCopier(strategy, min_link_size)
+    with instrumentation.stage("draft.copy"):
+        os.makedirs(dst, exist_ok=dirs_exist_ok)
+        for root, dirs, files in os.walk(src, followlinks=True):
+            rel_root = os.path.relpath(root, src)
+            dst_root = dst if rel_root == os.curdir else os.path.join(dst, rel_root)
+            for name in dirs:
+                os.makedirs(os.path.join(dst_root, name), exist_ok=True)
+            for name in files:
+                rel_path = name if rel_root == os.curdir else os.path.join(rel_root, name)
+                copier.copy_file(os.path.join(root, name), os.path.join(dst_root, name), rel_path)
+    report = copier.report
+    instrumentation.count("bytes_copied", report.bytes_copied)
+    instrumentation.count("bytes_shared", report.bytes_reflinked + report.bytes_linked)
+    return report
+
+def replace_file(src: str, dst: str) -> None:
+    """用`src`的内容替换`dst`: 先删除`dst`再复制, 从而不会写穿与模板共享的硬链接"""
+    if os.path.lexists(dst):
+        os.remove(dst)
+    shutil.copy2(src, dst)
@@ -3,16 +3,22 @@
 import os
 import shutil
 
-from typing import List
+from typing import List, Optional
 
 from . import assets
-from .script_file import ScriptFile
+from .draft_copy import CopyReport, copy_draft_tree
+from .material_pool import MaterialPool, POOL_DIR_NAME
+from .script_file import ScriptFile, CompiledTemplate
 
 class DraftFolder:
     """管理一个文件夹及其内的一系列草稿"""
 
     folder_path: str
     """根路径"""
+    last_copy_report: Optional[CopyReport]
+    """最近一次复制草稿的统计信息"""
+    material_pool: MaterialPool
+    """草稿之间共享的素材池, 位于根路径下的`.material_pool`文件夹"""
 
     def __init__(self, folder_path: str):
         """初始化草稿文件夹管理器
@@ -24,16 +30,19 @@ class DraftFolder:
             `FileNotFoundError`: 路径不存在
         """
         self.folder_path = folder_path
+        self.last_copy_report = None
 
         if not os.path.exists(self.folder_path):
             raise FileNotFoundError(f"根文件夹 {self.folder_path} 不存在")
+        self.material_pool = MaterialPool(os.path.join(self.folder_path, POOL_DIR_NAME))
 
     def list_drafts(self) -> List[str]:
         """列出文件夹中所有草稿的名称
 
-        注意: 本函数只是如实地列出子文件夹的名称, 并不检查它们是否符合草稿的格式
+        注意: 本函数只是如实地列出子文件夹的名称(素材池、批量生成清单等以`.`开头的隐藏文件夹除外), 并不检查它们是否符合草稿的格式
         """
-        return [f for f in os.listdir(self.folder_path) if os.path.isdir(os.path.join(self.folder_path, f))]
+        return [f for f in os.listdir(self.folder_path)
+                if not f.startswith(".") and os.path.isdir(os.path.join(self.folder_path, f))]
 
     def has_draft(self, draft_name: str) -> bool:
         """检查文件夹中是否存在指定名称的草稿
@@ -46,7 +55,7 @@ class DraftFolder:
         return draft_name in self.list_drafts()
 
     def remove(self, draft_name: str) -> None:
-        """删除指定名称的草稿
+        """删除指定名称的草稿, 并释放它对素材池的引用
 
         Args:
             draft_name (`str`): 草稿名称, 即相应文件夹名称
@@ -59,6 +68,7 @@ class DraftFolder:
             raise FileNotFoundError(f"草稿文件夹 {draft_name} 不存在")
 
         shutil.rmtree(draft_path)
+        self.material_pool.release(draft_name)
 
     def create_draft(self, draft_name: str, width: int, height: int, fps: int = 30, *,
                      allow_replace: bool = False) -> ScriptFile:
@@ -79,6 +89,7 @@ class DraftFolder:
             if not allow_replace:
                 raise FileExistsError(f"草稿文件夹 {draft_name} 已存在且不允许覆盖")
             shutil.rmtree(draft_path)
+            self.material_pool.release(draft_name)
 
         # 创建草稿文件夹
         os.makedirs(draft_path)
@@ -124,20 +135,40 @@ class DraftFolder:
 
         return ScriptFile.load_template(os.path.join(draft_path, "draft_content.json"))
 
-    def duplicate_as_template(self, template_name: str, new_draft_name: str, allow_replace: bool = False) -> ScriptFile:
-        """复制一份给定的草稿, 并在复制出的新草稿上进行编辑
+    def compile_template(self, draft_name: str) -> CompiledTemplate:
+        """将文件夹中的一个草稿编译为可反复实例化的模板, 适合基于同一模板批量生成大量草稿
+
+        Args:
+            draft_name (`str`): 草稿名称, 即相应文件夹名称
+
+        Raises:
+            `FileNotFoundError`: 对应的草稿不存在
+        """
+        draft_path = os.path.join(self.folder_path, draft_name)
+        if not os.path.exists(draft_path):
+            raise FileNotFoundError(f"草稿文件夹 {draft_name} 不存在")
+
+        return CompiledTemplate.load(os.path.join(draft_path, "draft_content.json"))
+
+    def duplicate_draft(self, template_name: str, new_draft_name: str, allow_replace: bool = False,
+                        copy_strategy: str = "auto") -> CopyReport:
+        """复制一份给定的草稿, 但不打开它
+
+        视频、音频等素材文件按`copy_strategy`与原草稿共享(reflink或硬链接), JSON等会被编辑的文件总是实际复制.
 
         Args:
             template_name (`str`): 原草稿名称
             new_draft_name (`str`): 新草稿名称
             allow_replace (`bool`, optional): 是否允许覆盖与`new_draft_name`重名的草稿. 默认为否.
+            copy_strategy (`str`, optional): 复制策略, 可选`auto`、`reflink`、`hardlink`、`copy`, 详见`draft_copy.COPY_STRATEGIES`. 默认为`auto`.
 
         Returns:
-            `ScriptFile`: 以模板模式打开的**复制后的**草稿对象
+            `CopyReport`: 复制统计, 同时记录在`last_copy_report`中
 
         Raises:
             `FileNotFoundError`: 原始草稿不存在
             `FileExistsError`: 已存在与`new_draft_name`重名的草稿, 但不允许覆盖.
+            `ValueError`: 未知的复制策略
         """
         template_path = os.path.join(self.folder_path, template_name)
         new_draft_path = os.path.join(self.folder_path, new_draft_name)
@@ -146,8 +177,31 @@ class DraftFolder:
         if os.path.exists(new_draft_path) and not allow_replace:
             raise FileExistsError(f"新草稿 {new_draft_name} 已存在且不允许覆盖")
 
+        self.last_copy_report = copy_draft_tree(template_path, new_draft_path, copy_strategy, dirs_exist_ok=allow_replace)
+        self.material_pool.copy_references(template_name, new_draft_name)
+        return self.last_copy_report
+
+    def duplicate_as_template(self, template_name: str, new_draft_name: str, allow_replace: bool = False,
+                              copy_strategy: str = "copy") -> ScriptFile:
+        """复制一份给定的草稿, 并在复制出的新草稿上进行编辑
+
+        Args:
+            template_name (`str`): 原草稿名称
+            new_draft_name (`str`): 新草稿名称
+            allow_replace (`bool`, optional): 是否允许覆盖与`new_draft_name`重名的草稿. 默认为否.
+            copy_strategy (`str`, optional): 复制策略, 同`duplicate_draft`. 默认为`copy`, 即完整复制;
+                使用硬链接时, 替换素材文件须先删除再写入(见`draft_copy.replace_file`), 否则会一并修改原草稿.
+
+        Returns:
+            `ScriptFile`: 以模板模式打开的**复制后的**草稿对象
+
+        Raises:
+            `FileNotFoundError`: 原始草稿不存在
+            `FileExistsError`: 已存在与`new_draft_name`重名的草稿, 但不允许覆盖.
+            `ValueError`: 未知的复制策略
+        """
         # 复制草稿文件夹
-        shutil.copytree(template_path, new_draft_path, dirs_exist_ok=allow_replace)
+        self.duplicate_draft(template_name, new_draft_name, allow_replace, copy_strategy)
 
         # 打开草稿
         return self.load_template(new_draft_name)
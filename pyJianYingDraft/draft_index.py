@@ -0,0 +1,173 @@
+"""草稿json数据中素材与片段的索引
+
+用于在已解析的草稿内容(或模板模式下的`imported_materials`)中按id、名称查找素材, 以及查找引用某一素材的片段,
+避免每次查找都遍历全部素材与轨道.
+"""
+
+from typing import Optional, Iterable
+from typing import Dict, List, Tuple, Any
+
+MaterialLocation = Tuple[str, int]
+"""素材的位置, 即(素材类型, 在该类型素材列表中的下标)"""
+
+NAME_KEYS = ("material_name", "name")
+"""素材名称所在的字段, 视频素材使用`material_name`, 音频素材及特效等使用`name`"""
+
+def material_names(material: Dict[str, Any]) -> List[str]:
+    """返回素材字典在各名称字段中的非空名称"""
+    names: List[str] = []
+    for key in NAME_KEYS:
+        name = material.get(key)
+        if name and isinstance(name, str) and name not in names:
+            names.append(name)
+    return names
+
+class DraftIndex:
+    """草稿素材的id、名称索引, 以及素材id到片段的反向索引
+
+    索引记录的是素材的位置而非素材字典本身, 因此素材在原位置被替换为副本(写时复制)后索引依然有效.
+    通过本类的`add_material`、`rename_material`、`add_segment`修改时索引同步更新;
+    若素材列表在外部被删减或重排, 按id查找时会自动重建索引.
+    """
+
+    materials: Dict[str, Any]
+    """被索引的素材字典, 即草稿内容的`materials`字段"""
+
+    def __init__(self, materials: Dict[str, Any], tracks: Iterable[Dict[str, Any]] = ()):
+        """为给定的素材及轨道建立索引
+
+        Args:
+            materials (`Dict[str, Any]`): 草稿内容的`materials`字段
+            tracks (`Iterable[Dict[str, Any]]`, optional): 草稿内容的`tracks`字段, 默认不建立片段索引
+        """
+        self.materials = materials
+        self._by_id: Dict[str, MaterialLocation] = {}
+        self._by_name: Dict[str, List[MaterialLocation]] = {}
+        self._segments: Dict[str, List[Tuple[Dict[str, Any], Dict[str, Any]]]] = {}
+
+        self._index_materials()
+        for track in tracks:
+            for segment in track.get("segments", []):
+                self.add_segment(track, segment)
+
+    @classmethod
+    def from_content(cls, content: Dict[str, Any]) -> "DraftIndex":
+        """为完整的草稿内容(`draft_content.json`或`draft_info.json`)建立索引"""
+        return cls(content.setdefault("materials", {}), content.get("tracks", []))
+
+    def _material_count(self) -> int:
+        return sum(len(material_list) for material_list in self.materials.values() if isinstance(material_list, list))
+
+    def _index_materials(self) -> None:
+        self._by_id.clear()
+        self._by_name.clear()
+        self._indexed_count = self._material_count()
+        for material_type, material_list in self.materials.items():
+            if not isinstance(material_list, list):
+                continue
+            for index, material in enumerate(material_list):
+                self._register(material_type, index, material)
+
+    def _register(self, material_type: str, index: int, material: Any) -> None:
+        if not isinstance(material, dict):
+            return
+        material_id = material.get("id")
+        if material_id:
+            self._by_id.setdefault(material_id, (material_type, index))
+        for name in material_names(material):
+            self._by_name.setdefault(name, []).append((material_type, index))
+
+    def _at(self, location: MaterialLocation) -> Optional[Dict[str, Any]]:
+        material_type, index = location
+        material_list = self.materials.get(material_type)
+        if not isinstance(material_list, list) or index >= len(material_list):
+            return None
+        return material_list[index]
+
+    def locate_material(self, material_id: str) -> Optional[MaterialLocation]:
+        """返回指定id的素材的位置, 不存在时返回None"""
+        location = self._by_id.get(material_id)
+        if location is not None:
+            material = self._at(location)
+            if isinstance(material, dict) and material.get("id") == material_id:
+                return location
+        elif self._material_count() == self._indexed_count:
+            return None
+        # 索引失效(素材列表在外部被修改)时重建一次
+        self._index_materials()
+        return self._by_id.get(material_id)
+
+    def get_material(self, material_id: str) -> Optional[Dict[str, Any]]:
+        """返回指定id的素材, 不存在时返回None"""
+        location = self.locate_material(material_id)
+        return None if location is None else self._at(location)
+
+    def find_materials(self, name: str, material_type: Optional[str] = None) -> List[MaterialLocation]:
+        """按名称查找素材, 返回所有匹配素材的位置
+
+        Args:
+            name (`str`): 素材名称, 匹配`material_name`或`name`字段
+            material_type (`str`, optional): 素材类型(如`videos`), 默认不限
+        """
+        ret: List[MaterialLocation] = []
+        for location in self._by_name.get(name, []):
+            if material_type is not None and location[0] != material_type:
+                continue
+            material = self._at(location)
+            if isinstance(material, dict) and name in material_names(material):
+                ret.append(location)
+        return ret
+
+    def add_material(self, material_type: str, material: Dict[str, Any]) -> MaterialLocation:
+        """向指定类型的素材列表末尾添加素材并建立索引, 返回其位置"""
+        material_list = self.materials.setdefault(material_type, [])
+        material_list.append(material)
+        location = (material_type, len(material_list) - 1)
+        self._register(material_type, location[1], material)
+        self._indexed_count += 1
+        return location
+
+    def rename_material(self, location: MaterialLocation, new_name: str, name_key: str = "material_name") -> None:
+        """修改指定位置素材的名称并更新名称索引
+
+        Args:
+            location (`MaterialLocation`): 素材位置
+            new_name (`str`): 新名称
+            name_key (`str`, optional): 名称字段, 默认为`material_name`
+        """
+        material = self._at(location)
+        if material is None:
+            raise IndexError("素材位置 %s 不存在" % (location,))
+        for old_name in material_names(material):
+            if location in self._by_name.get(old_name, []):
+                self._by_name[old_name].remove(location)
+        material[name_key] = new_name
+        for name in material_names(material):
+            self._by_name.setdefault(name, []).append(location)
+
+    def copy_for(self, materials: Dict[str, Any]) -> "DraftIndex":
+        """为与被索引素材结构相同(各列表顺序一致)的另一份素材字典复制索引, 不含片段索引"""
+        ret = DraftIndex.__new__(DraftIndex)
+        ret.materials = materials
+        ret._by_id = dict(self._by_id)
+        ret._by_name = {name: list(locations) for name, locations in self._by_name.items()}
+        ret._indexed_count = self._indexed_count
+        ret._segments = {}
+        return ret
+
+    def add_segment(self, track: Dict[str, Any], segment: Dict[str, Any]) -> None:
+        """将片段加入素材id到片段的反向索引"""
+        material_id = segment.get("material_id")
+        if material_id:
+            self._segments.setdefault(material_id, []).append((track, segment))
+
+    def segments_of(self, material_id: str, track_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        """返回引用指定素材的所有片段
+
+        Args:
+            material_id (`str`): 素材id
+            track_type (`str`, optional): 只返回该类型轨道(如`video`)上的片段, 默认不限
+        """
+        return [segment for track, segment in self._segments.get(material_id, [])
+                if (track_type is None or track.get("type") == track_type)
+                and segment.get("material_id") == material_id]
@@ -0,0 +1,99 @@
+"""草稿的一次性编辑会话
+
+批量生成草稿时, 素材替换、变速、音频、背景音乐、字幕和文本替换若各自读写一次草稿文件, 每份草稿要反复解析、序列化多次.
+编辑会话只读取一次草稿文件: 直接修改JSON的操作(`content`、`index`)与经由库API的操作(`script`)作用于同一份内存中的数据,
+全部完成后由`save`一次写回, 备份按`draft_backup`中的备份方式在保存时写入.
+"""
+
+from typing import Optional
+from typing import Dict, Any
+
+from .draft_backup import DraftBackup
+from .draft_index import DraftIndex
+from .script_file import ScriptFile
+
+class DraftEditSession:
+    """对一个草稿文件的编辑会话
+
+    注意: 首次访问`script`后, 轨道由`script`解析并在保存时导出, 此后对`content["tracks"]`的直接修改不再生效,
+    因此修改轨道的JSON操作应在访问`script`之前完成; 素材列表与`script`共享, 可以继续直接修改.
+    """
+
+    content: Dict[str, Any]
+    """草稿文件内容"""
+    modified: bool
+    """是否有待保存的修改, 由调用方通过`mark_modified`标记, 访问`script`时视为已修改"""
+
+    def __init__(self, path: str, backup_mode: Optional[str] = None, backup_suffix: str = ".backup"):
+        """读取草稿文件并开始编辑
+
+        Args:
+            path (`str`): 草稿JSON文件路径(`draft_content.json`或`draft_info.json`)
+            backup_mode (`str`, optional): 保存时的备份方式, 见`draft_backup.BACKUP_MODES`, 默认由环境变量确定
+            backup_suffix (`str`, optional): `full`方式下备份文件的后缀, 默认为`.backup`
+
+        Raises:
+            `FileNotFoundError`: 草稿文件不存在
+            `ValueError`: 未知的备份方式
+        """
+        self._backup = DraftBackup(path, backup_mode, backup_suffix)
+        self.content = self._backup.load()
+        self.modified = False
+        self._index: Optional[DraftIndex] = None
+        self._script: Optional[ScriptFile] = None
+
+    @property
+    def path(self) -> str:
+        """草稿JSON文件路径, 修改后保存到新路径"""
+        return self._backup.path
+
+    @path.setter
+    def path(self, value: str) -> None:
+        self._backup.path = value
+        if self._script is not None:
+            self._script.save_path = value
+
+    @property
+    def index(self) -> DraftIndex:
+        """草稿素材与片段的索引, 首次访问时建立"""
+        if self._index is None:
+            self._index = DraftIndex.from_content(self.content)
+        return self._index
+
+    @property
+    def has_script(self) -> bool:
+        """是否已创建`script`"""
+        return self._script is not None
+
+    @property
+    def script(self) -> ScriptFile:
+        """以模板模式打开的草稿对象, 首次访问时由`content`创建, 不读取磁盘"""
+        if self._script is None:
+            self._script = ScriptFile.from_content(self.content, self.path)
+            self.modified = True
+        return self._script
+
+    def mark_modified(self) -> None:
+        """标记`content`已被直接修改"""
+        self.modified = True
+
+    def save(self, path: Optional[str] = None, *, indent: Optional[int] = 4, compact: bool = False) -> None:
+        """按备份方式备份修改前的内容, 并一次性写回全部修改
+
+        已创建`script`时由`ScriptFile.dump`流式写入, 不在内存中构造完整的JSON;
+        `journal`方式需要完整的草稿内容计算反向补丁, 仍先导出全部内容再写入
+
+        Args:
+            path (`str`, optional): 保存路径, 默认为打开时的路径
+            indent (`int`, optional): 缩进空格数, 默认为4
+            compact (`bool`, optional): 是否使用紧凑格式, 默认为否
+        """
+        if path is not None:
+            self.path = path
+        if self._script is not None and self._backup.mode != "journal":
+            script = self._script
+            self._backup.save_with(lambda target: script.dump(target, indent=indent or 0, compact=compact))
+        else:
+            data = self._script.export_content() if self._script is not None else self.content
+            self._backup.save(data, indent=indent, compact=compact)
+        self.modified = False
@@ -0,0 +1,214 @@
+"""草稿文件的JSON读写, 支持可插拔的JSON后端
+
+默认按orjson、ujson、标准库json的顺序选用已安装的后端, 也可通过环境变量`PYJIANYINGDRAFT_JSON_BACKEND`
+或`set_backend`指定. 第三方后端无法处理的数据(如超出64位的整数、NaN)会自动回退到标准库.
+"""
+
+import os
+import json
+import math
+import shutil
+import tempfile
+
+from typing import Optional, Union, Callable, Iterable, Tuple, BinaryIO, Any
+
+from . import instrumentation
+
+JSON_BACKEND_ENV = "PYJIANYINGDRAFT_JSON_BACKEND"
+"""指定JSON后端的环境变量, 取值为`orjson`、`ujson`或`json`"""
+
+try:
+    import orjson  # type: ignore
+except ImportError:
+    orjson = None
+
+try:
+    import ujson  # type: ignore
+except ImportError:
+    ujson = None
+
+_AVAILABLE = {"orjson": orjson is not None, "ujson": ujson is not None, "json": True}
+
+def _default_backend() -> str:
+    requested = os.environ.get(JSON_BACKEND_ENV, "").strip().lower()
+    if requested and _AVAILABLE.get(requested, False):
+        return requested
+    for name in ("orjson", "ujson"):
+        if _AVAILABLE[name]:
+            return name
+    return "json"
+
+_backend = _default_backend()
+
+def get_backend() -> str:
+    """返回当前使用的JSON后端名称"""
+    return _backend
+
+def set_backend(name: str) -> None:
+    """指定使用的JSON后端
+
+    Args:
+        name (`str`): 后端名称, 可选`orjson`、`ujson`或`json`
+
+    Raises:
+        `ValueError`: 后端未知或未安装
+    """
+    global _backend
+    if not _AVAILABLE.get(name, False):
+        raise ValueError(f"JSON后端 '{name}' 不可用")
+    _backend = name
+
+def loads(data: Union[str, bytes]) -> Any:
+    """解析JSON字符串或UTF-8字节串"""
+    if _backend == "orjson":
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass  # 交由标准库处理(或报告)非标准的输入
+    elif _backend == "ujson":
+        try:
+            return ujson.loads(data)
+        except ValueError:
+            pass
+    return json.loads(data)
+
+def dumps(obj: Any, *, indent: Optional[int] = 4, compact: bool = False) -> str:
+    """将对象序列化为JSON字符串, 非ASCII字符原样保留
+
+    Args:
+        obj (`Any`): 要序列化的对象
+        indent (`int`, optional): 缩进空格数, 默认为4. orjson后端只支持2空格缩进, 缩进宽度不影响剪映读取.
+        compact (`bool`, optional): 是否使用无缩进、无多余空白的紧凑格式, 剪映可正常读取, 默认为否.
+    """
+    return _dumps_bytes(obj, indent=indent, compact=compact).decode("utf-8")
+
+def _contains_non_finite(obj: Any) -> bool:
+    """对象中是否含有NaN或正负无穷的浮点数"""
+    stack = [obj]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, float):
+            if not math.isfinite(value):
+                return True
+        elif isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+    return False
+
+def _dumps_bytes(obj: Any, *, indent: Optional[int], compact: bool) -> bytes:
+    if compact:
+        indent = None
+    if _backend == "orjson":
+        try:
+            data = orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+            # orjson将NaN与无穷静默写为null; 输出中没有null时不可能含有这些值, 不必遍历对象
+            if b"null" not in data or not _contains_non_finite(obj):
+                return data
+        except TypeError:
+            pass  # orjson.JSONEncodeError是TypeError的子类
+    elif _backend == "ujson":
+        try:
+            return ujson.dumps(obj, ensure_ascii=False, escape_forward_slashes=False, indent=indent or 0).encode("utf-8")
+        except (TypeError, OverflowError):
+            pass
+    separators = (",", ":") if compact else None
+    return json.dumps(obj, ensure_ascii=False, indent=indent, separators=separators).encode("utf-8")
+
+class StreamedList:
+    """流式写入时逐个序列化的列表, 元素可以由生成器按需产生"""
+
+    items: Iterable[Any]
+
+    def __init__(self, items: Iterable[Any]):
+        self.items = items
+
+class StreamedDict:
+    """流式写入时逐项序列化的字典, 值可以是`StreamedList`或`StreamedDict`"""
+
+    items: Iterable[Tuple[str, Any]]
+
+    def __init__(self, items: Iterable[Tuple[str, Any]]):
+        self.items = items
+
+def _effective_indent(indent: Optional[int], compact: bool) -> Optional[int]:
+    if compact or not indent:
+        return None
+    return 2 if _backend == "orjson" else indent
+
+def _write_stream(fp: BinaryIO, value: Any, level: int, indent: Optional[int], compact: bool) -> None:
+    if isinstance(value, (StreamedDict, StreamedList)):
+        is_dict = isinstance(value, StreamedDict)
+        fp.write(b"{" if is_dict else b"[")
+        inner = b"\n" + b" " * (indent * (level + 1)) if indent else b""
+        first = True
+        for item in value.items:
+            fp.write(inner if first else b"," + inner)
+            first = False
+            if is_dict:
+                key, item = item
+                fp.write(json.dumps(key, ensure_ascii=False).encode("utf-8"))
+                fp.write(b":" if compact else b": ")
+            _write_stream(fp, item, level + 1, indent, compact)
+        if not first and indent:
+            fp.write(b"\n" + b" " * (indent * level))
+        fp.write(b"}" if is_dict else b"]")
+        return
+
+    data = _dumps_bytes(value, indent=indent, compact=compact)
+    if indent and level:
+        # 字符串中的换行均已转义, 故可直接按行增加缩进
+        data = data.replace(b"\n", b"\n" + b" " * (indent * level))
+    fp.write(data)
+
+def dump_stream(obj: Any, fp: BinaryIO, *, indent: Optional[int] = 4, compact: bool = False) -> None:
+    """将对象逐块序列化并写入二进制文件对象, 不在内存中构造完整的JSON字符串
+
+    `StreamedDict`和`StreamedList`中的每一项被单独序列化后立即写出, 其余对象整体序列化.
+    参数含义同`dumps`.
+    """
+    _write_stream(fp, obj, 0, _effective_indent(indent, compact), compact)
+
+def atomic_write(path: str, writer: Callable[[BinaryIO], None]) -> None:
+    """原子地写入文件: 先写入同目录下的临时文件, 完成后再替换目标文件, 中途出错不会破坏原文件
+
+    Args:
+        path (`str`): 目标文件路径
+        writer (`Callable[[BinaryIO], None]`): 向二进制文件对象写入内容的函数
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=directory)
+    try:
+        with instrumentation.stage("json.write"), os.fdopen(fd, "wb") as f:
+            writer(f)
+            f.flush()
+            os.fsync(f.fileno())
+            instrumentation.count("bytes_written", f.tell())
+        if os.path.exists(path):
+            shutil.copymode(path, tmp_path)
+        else:
+            os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+def load_file(path: str) -> Any:
+    """读取并解析JSON文件
+
+    Raises:
+        `FileNotFoundError`: 文件不存在
+    """
+    with instrumentation.stage("json.load"):
+        with open(path, "rb") as f:
+            data = f.read()
+        instrumentation.count("bytes_read", len(data))
+        return loads(data)
+
+def dump_file(obj: Any, path: str, *, indent: Optional[int] = 4, compact: bool = False) -> None:
+    """将对象以UTF-8编码原子地写入JSON文件, 参数含义同`dumps`"""
+    data = _dumps_bytes(obj, indent=indent, compact=compact)
+    atomic_write(path, lambda f: f.write(data))
@@ -1,9 +1,218 @@
 import os
 import uuid
+import shutil
 import pymediainfo
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
-from typing import Optional, Literal
-from typing import Dict, Any
+from typing import Optional, Literal, Iterable, Tuple
+from typing import Dict, List, Any
+
+from . import probe_cache
+from . import instrumentation
+
+def _probe_media_uncached(path: str) -> Dict[str, Any]:
+    if not pymediainfo.MediaInfo.can_parse():
+        raise ValueError(f"不支持的素材类型 '{os.path.splitext(path)[1]}'")
+
+    with instrumentation.stage("probe.mediainfo"):
+        info: pymediainfo.MediaInfo = \
+            pymediainfo.MediaInfo.parse(path, mediainfo_options={"File_TestContinuousFileNames": "0"})  # type: ignore
+    record: Dict[str, Any] = {"video": None, "image": None, "audio": None, "gif_duration": None}
+    if len(info.video_tracks):
+        track = info.video_tracks[0]
+        record["video"] = {"duration": track.duration, "width": track.width, "height": track.height,  # type: ignore
+                           "frame_rate": track.frame_rate, "codec": track.format}  # type: ignore
+    if len(info.image_tracks):
+        track = info.image_tracks[0]
+        record["image"] = {"width": track.width, "height": track.height}  # type: ignore
+    if len(info.audio_tracks):
+        record["audio"] = {"duration": info.audio_tracks[0].duration, "codec": info.audio_tracks[0].format}  # type: ignore
+
+    # gif文件使用imageio库获取长度
+    if record["video"] is None and os.path.splitext(path)[1].lower() == ".gif":
+        import imageio
+        gif = imageio.get_reader(path)
+        record["gif_duration"] = int(round(gif.get_meta_data()['duration'] * gif.get_length() * 1e3))
+        gif.close()
+    return record
+
+def probe_media(path: str, *, use_cache: bool = True) -> Dict[str, Any]:
+    """探测媒体文件的轨道信息, 结果默认经由持久化缓存(见`probe_cache`)
+
+    返回的字典包含`video`(时长毫秒、宽高、帧率、编码)、`image`(宽高)、`audio`(时长毫秒、编码)三部分, 不存在的轨道为None,
+    gif文件另有`gif_duration`(微秒)
+
+    Args:
+        path (`str`): 媒体文件路径
+        use_cache (`bool`, optional): 是否使用持久化缓存, 默认为是
+
+    Raises:
+        `FileNotFoundError`: 文件不存在
+        `ValueError`: 无法解析媒体文件
+    """
+    path = os.path.abspath(path)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"找不到 {path}")
+    cache = probe_cache.get_probe_cache() if use_cache else None
+    if cache is None:
+        return _probe_media_uncached(path)
+    return cache.get_or_probe(path, _probe_media_uncached, kind=probe_cache.MEDIAINFO_KIND)
+
+def _summarize_mediainfo(record: Dict[str, Any]) -> Dict[str, Any]:
+    video, image, audio = record["video"], record["image"], record["audio"]
+    summary: Dict[str, Any] = {
+        "video_codec": video["codec"] if video else None,
+        "audio_codec": audio["codec"] if audio else None,
+    }
+    if video is not None:
+        summary.update(media_type="video", width=video["width"], height=video["height"],
+                       duration=int(video["duration"] * 1e3) if video["duration"] is not None else None)
+    elif record["gif_duration"] is not None:
+        summary.update(media_type="video", width=image["width"], height=image["height"], duration=record["gif_duration"])
+    elif image is not None:
+        summary.update(media_type="photo", width=image["width"], height=image["height"], duration=None)
+    elif audio is not None:
+        summary.update(media_type="audio", width=None, height=None,
+                       duration=int(audio["duration"] * 1e3) if audio["duration"] is not None else None)
+    else:
+        raise ValueError("没有视频、图片或音频轨道")
+    return summary
+
+def _summarize_ffprobe(info: Dict[str, Any]) -> Dict[str, Any]:
+    streams: List[Dict[str, Any]] = info.get("streams", [])
+    video = next((s for s in streams if s.get("codec_type") == "video"), None)
+    audio = next((s for s in streams if s.get("codec_type") == "audio"), None)
+    duration = info.get("format", {}).get("duration")
+    if video is None and audio is None:
+        raise ValueError("没有视频或音频流")
+    return {
+        "media_type": "video" if video is not None else "audio",
+        "duration": int(float(duration) * 1e6) if duration is not None else None,
+        "width": video.get("width") if video else None,
+        "height": video.get("height") if video else None,
+        "video_codec": video.get("codec_name") if video else None,
+        "audio_codec": audio.get("codec_name") if audio else None,
+    }
+
+def _probe_media_in_worker(path: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """在工作进程中探测单个文件, 异常转为错误信息以便跨进程返回"""
+    try:
+        return _probe_media_uncached(path), None
+    except Exception as e:
+        return None, str(e) or type(e).__name__
+
+def probe_many(paths: Iterable[str], *, max_workers: Optional[int] = None,
+               use_cache: bool = True, cache: Optional[probe_cache.ProbeCache] = None,
+               ffprobe_fallback: bool = True) -> Dict[str, Dict[str, Any]]:
+    """并发探测一批媒体文件(或文件夹中的所有媒体文件), 探测结果经由持久化缓存
+
+    libmediainfo不支持在同一进程内并发调用, 因此未命中缓存的文件在进程池中探测, ffprobe回退则在线程池中执行.
+
+    每个文件返回一条摘要记录, 包含:
+    `path`, `size`(字节), `media_type`("video"/"photo"/"audio"), `duration`(微秒, 图片为None),
+    `width`, `height`, `video_codec`, `audio_codec`, `cached`(是否命中缓存),
+    以及`error`(探测失败时的原因, 成功时为None)
+
+    Args:
+        paths (`Iterable[str]`): 媒体文件路径, 若为文件夹则递归探测其中的常见媒体文件
+        max_workers (`int`, optional): 并发探测的进程/线程数, 默认为CPU核数
+        use_cache (`bool`, optional): 是否使用持久化缓存, 默认为是
+        cache (`ProbeCache`, optional): 使用的缓存, 默认为`probe_cache.get_probe_cache()`
+        ffprobe_fallback (`bool`, optional): pymediainfo探测失败时是否尝试ffprobe, 默认为是
+
+    Returns:
+        `Dict[str, Dict[str, Any]]`: 以绝对路径为键的摘要记录, 顺序与输入一致
+    """
+    files: List[str] = []
+    for path in paths:
+        path = os.path.abspath(path)
+        if os.path.isdir(path):
+            files.extend(probe_cache.iter_media_files(path))
+        else:
+            files.append(path)
+    if use_cache and cache is None:
+        cache = probe_cache.get_probe_cache()
+    elif not use_cache:
+        cache = None
+
+    results: Dict[str, Dict[str, Any]] = {}
+    records: Dict[str, Dict[str, Any]] = {}
+    misses: List[str] = []
+    for path in dict.fromkeys(files):
+        result = results[path] = {"path": path, "size": None, "media_type": None, "duration": None,
+                                  "width": None, "height": None, "video_codec": None, "audio_codec": None,
+                                  "cached": False, "error": None}
+        try:
+            result["size"] = os.path.getsize(path)
+            record = cache.get(path, probe_cache.MEDIAINFO_KIND) if cache is not None else None
+        except OSError as e:
+            result["error"] = str(e)
+            continue
+        if record is None:
+            misses.append(path)
+        else:
+            result["cached"] = True
+            records[path] = record
+
+    instrumentation.count("probe_cache_hits", len(records))
+    instrumentation.count("probe_cache_misses", len(misses))
+
+    # 未命中缓存的文件在进程池中探测
+    failures: Dict[str, str] = {}
+
+    def collect(path: str, record: Optional[Dict[str, Any]], error: Optional[str]) -> None:
+        if record is None:
+            failures[path] = error or "探测失败"
+            return
+        if cache is not None:
+            try:
+                cache.put(path, record, probe_cache.MEDIAINFO_KIND)
+            except OSError as e:  # 如探测期间文件被删除
+                failures[path] = str(e)
+                return
+        records[path] = record
+
+    in_process = len(misses) < 4 or max_workers == 1  # 文件很少时不值得启动进程池
+    if misses:
+        with instrumentation.stage("probe.batch"):
+            done = 0
+            if not in_process:
+                try:
+                    with ProcessPoolExecutor(max_workers=min(len(misses), max_workers or os.cpu_count() or 1)) as pool:
+                        for path, (record, error) in zip(misses, pool.map(_probe_media_in_worker, misses,
+                                                                          chunksize=max(1, len(misses) // 64))):
+                            collect(path, record, error)
+                            done += 1
+                except BrokenProcessPool:
+                    pass  # 工作进程异常退出(如libmediainfo崩溃), 其余文件改为在本进程中逐个探测
+            for path in misses[done:]:
+                collect(path, *_probe_media_in_worker(path))
+
+    for path, record in records.items():
+        try:
+            results[path].update(_summarize_mediainfo(record))
+        except Exception as e:
+            failures[path] = str(e)
+
+    # pymediainfo无法处理的文件尝试ffprobe, 子进程调用可直接在线程池中并发
+    if failures and ffprobe_fallback and shutil.which("ffprobe") is not None:
+        def fallback(path: str) -> Optional[Dict[str, Any]]:
+            try:
+                info = probe_cache.ffprobe(path) if cache is not None else probe_cache._run_ffprobe(path)
+                return _summarize_ffprobe(info)
+            except Exception:
+                return None
+
+        with ThreadPoolExecutor(max_workers=max_workers) as thread_pool:
+            for path, summary in zip(list(failures), thread_pool.map(fallback, list(failures))):
+                if summary is not None:
+                    results[path].update(summary)
+                    del failures[path]
+
+    for path, error in failures.items():
+        results[path]["error"] = error
+    return results
 
 class CropSettings:
     """素材的裁剪设置, 各属性均在0-1之间, 注意素材的坐标原点在左上角"""
@@ -91,26 +300,21 @@ class VideoMaterial:
         if not pymediainfo.MediaInfo.can_parse():
             raise ValueError(f"不支持的视频素材类型 '{postfix}'")
 
-        info: pymediainfo.MediaInfo = \
-            pymediainfo.MediaInfo.parse(path, mediainfo_options={"File_TestContinuousFileNames": "0"})  # type: ignore
+        info = probe_media(path)
         # 有视频轨道的视为视频素材
-        if len(info.video_tracks):
+        if info["video"] is not None:
             self.material_type = "video"
-            self.duration = int(info.video_tracks[0].duration * 1e3)  # type: ignore
-            self.width, self.height = info.video_tracks[0].width, info.video_tracks[0].height  # type: ignore
+            self.duration = int(info["video"]["duration"] * 1e3)
+            self.width, self.height = info["video"]["width"], info["video"]["height"]
         # gif文件使用imageio库获取长度
-        elif postfix.lower() == ".gif":
-            import imageio
-            gif = imageio.get_reader(path)
-
+        elif info["gif_duration"] is not None:
             self.material_type = "video"
-            self.duration = int(round(gif.get_meta_data()['duration'] * gif.get_length() * 1e3))
-            self.width, self.height = info.image_tracks[0].width, info.image_tracks[0].height  # type: ignore
-            gif.close()
-        elif len(info.image_tracks):
+            self.duration = info["gif_duration"]
+            self.width, self.height = info["image"]["width"], info["image"]["height"]
+        elif info["image"] is not None:
             self.material_type = "photo"
             self.duration = 10800000000  # 相当于3h
-            self.width, self.height = info.image_tracks[0].width, info.image_tracks[0].height  # type: ignore
+            self.width, self.height = info["image"]["width"], info["image"]["height"]
         else:
             raise ValueError(f"输入的素材文件 {path} 没有视频轨道或图片轨道")
 
@@ -170,12 +374,12 @@ class AudioMaterial:
 
         if not pymediainfo.MediaInfo.can_parse():
             raise ValueError("不支持的音频素材类型 %s" % os.path.splitext(path)[1])
-        info: pymediainfo.MediaInfo = pymediainfo.MediaInfo.parse(path)  # type: ignore
-        if len(info.video_tracks):
+        info = probe_media(path)
+        if info["video"] is not None:
             raise ValueError("音频素材不应包含视频轨道")
-        if not len(info.audio_tracks):
+        if info["audio"] is None:
             raise ValueError(f"给定的素材文件 {path} 没有音频轨道")
-        self.duration = int(info.audio_tracks[0].duration * 1e3)  # type: ignore
+        self.duration = int(info["audio"]["duration"] * 1e3)
 
     def export_json(self) -> Dict[str, Any]:
         return {
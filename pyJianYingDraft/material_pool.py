@@ -0,0 +1,218 @@
+"""草稿之间共享的素材池
+
+批量生成草稿时, 同一个新素材往往被替换进几十份草稿. 素材池以内容哈希为键在草稿根文件夹下只保存一份素材,
+各草稿通过硬链接(文件系统不支持时改为绝对路径)引用它, 并在SQLite数据库中记录每份素材被哪些草稿引用.
+删除草稿时释放其引用, 只有最后一个引用者被删除后才真正删除素材文件. 引用记录可在多线程、多进程间共享.
+"""
+
+import os
+import shutil
+import sqlite3
+import hashlib
+import threading
+
+from typing import Optional
+from typing import Dict, List, Tuple
+
+from . import instrumentation
+
+POOL_DIR_NAME = ".material_pool"
+"""素材池在草稿根文件夹下的文件夹名称"""
+
+_CHUNK_SIZE = 1024 * 1024
+
+def hash_file(path: str) -> str:
+    """计算文件内容的SHA-256摘要(十六进制)"""
+    digest = hashlib.sha256()
+    with instrumentation.stage("pool.hash"), open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+            digest.update(chunk)
+        instrumentation.count("bytes_read", f.tell())
+    return digest.hexdigest()
+
+class MaterialPool:
+    """以内容哈希寻址、带引用计数的素材池"""
+
+    pool_path: str
+    """素材池文件夹路径"""
+
+    def __init__(self, pool_path: str):
+        """打开素材池, 文件夹及数据库在首次加入素材时创建
+
+        Args:
+            pool_path (`str`): 素材池文件夹路径, 一般为草稿根文件夹下的`.material_pool`
+        """
+        self.pool_path = os.path.abspath(pool_path)
+        self._local = threading.local()
+        self._digests: Dict[Tuple[str, int, int], str] = {}
+
+    def __getstate__(self) -> Dict[str, object]:
+        # 各线程的数据库连接不能跨进程传递, 在新进程中首次使用时重新连接
+        state = self.__dict__.copy()
+        del state["_local"]
+        return state
+
+    def __setstate__(self, state: Dict[str, object]) -> None:
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+    @property
+    def db_path(self) -> str:
+        """引用记录数据库的路径"""
+        return os.path.join(self.pool_path, "refs.sqlite3")
+
+    def _connect(self, create: bool = False) -> Optional[sqlite3.Connection]:
+        """获取当前线程的数据库连接, 素材池尚未创建且`create`为否时返回None"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        if not create and not os.path.exists(self.db_path):
+            return None
+        os.makedirs(self.pool_path, exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=60, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS objects (digest TEXT PRIMARY KEY, file TEXT NOT NULL, size INTEGER NOT NULL)")
+        conn.execute("CREATE TABLE IF NOT EXISTS refs (digest TEXT NOT NULL, draft TEXT NOT NULL, PRIMARY KEY (digest, draft))")
+        conn.execute("CREATE INDEX IF NOT EXISTS refs_draft ON refs (draft)")
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def _digest(self, path: str) -> str:
+        """文件的内容摘要, 同一进程内按(路径, 大小, 修改时间)缓存, 同一素材只计算一次"""
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        digest = self._digests.get(key)
+        if digest is None:
+            digest = self._digests[key] = hash_file(path)
+        return digest
+
+    def object_path(self, digest: str) -> Optional[str]:
+        """素材池中给定摘要的素材文件路径, 不存在时返回None"""
+        conn = self._connect()
+        row = None if conn is None else conn.execute("SELECT file FROM objects WHERE digest=?", (digest,)).fetchone()
+        return None if row is None else os.path.join(self.pool_path, row[0])
+
+    def add(self, src: str, draft_name: str) -> str:
+        """将文件加入素材池(内容相同的文件只保存一份), 并记录`draft_name`对它的引用
+
+        Args:
+            src (`str`): 素材文件路径
+            draft_name (`str`): 引用该素材的草稿名称
+
+        Returns:
+            `str`: 素材在池中的绝对路径
+        """
+        digest = self._digest(src)
+        rel_path = os.path.join("objects", digest[:2], digest + os.path.splitext(src)[1].lower())
+        conn = self._connect(create=True)
+        assert conn is not None
+
+        row = conn.execute("SELECT file FROM objects WHERE digest=?", (digest,)).fetchone()
+        tmp_path = None
+        if row is None or not os.path.exists(os.path.join(self.pool_path, row[0])):
+            # 在事务外复制, 避免大文件长时间占用写锁
+            object_path = os.path.join(self.pool_path, rel_path)
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            tmp_path = "%s.%d.%d.tmp" % (object_path, os.getpid(), threading.get_ident())
+            with instrumentation.stage("pool.copy"):
+                shutil.copy2(src, tmp_path)
+            instrumentation.count("bytes_copied", os.path.getsize(tmp_path))
+
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT file FROM objects WHERE digest=?", (digest,)).fetchone()
+                if row is not None and os.path.exists(os.path.join(self.pool_path, row[0])):
+                    rel_path = row[0]
+                elif tmp_path is not None:
+                    os.replace(tmp_path, os.path.join(self.pool_path, rel_path))
+                    tmp_path = None
+                    conn.execute("INSERT OR REPLACE INTO objects (digest, file, size) VALUES (?, ?, ?)",
+                                 (digest, rel_path, os.path.getsize(os.path.join(self.pool_path, rel_path))))
+                else:
+                    # 其它进程在本次检查之后删除了该素材, 重新加入
+                    conn.execute("ROLLBACK")
+                    return self.add(src, draft_name)
+                conn.execute("INSERT OR IGNORE INTO refs (digest, draft) VALUES (?, ?)", (digest, draft_name))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return os.path.join(self.pool_path, rel_path)
+
+    def link_material(self, src: str, dst: str, draft_name: str) -> str:
+        """将素材经由素材池放入草稿: `dst`成为池中素材的硬链接
+
+        Args:
+            src (`str`): 新素材文件路径
+            dst (`str`): 素材在草稿中的路径, 已存在的文件会被替换
+            draft_name (`str`): 草稿名称
+
+        Returns:
+            `str`: 草稿中应引用的素材路径. 成功链接时为`dst`; 文件系统不支持硬链接时为池中素材的绝对路径, 此时不创建`dst`
+        """
+        object_path = self.add(src, draft_name)
+        if os.path.lexists(dst):
+            os.remove(dst)
+        try:
+            os.link(object_path, dst)
+            return dst
+        except OSError:
+            return object_path
+
+    def references(self, digest: str) -> List[str]:
+        """引用给定素材的草稿名称列表"""
+        conn = self._connect()
+        if conn is None:
+            return []
+        return [row[0] for row in conn.execute("SELECT draft FROM refs WHERE digest=? ORDER BY draft", (digest,))]
+
+    def copy_references(self, src_draft: str, dst_draft: str) -> None:
+        """令`dst_draft`引用`src_draft`所引用的全部素材, 用于复制草稿之后"""
+        conn = self._connect()
+        if conn is not None:
+            conn.execute("INSERT OR IGNORE INTO refs (digest, draft) SELECT digest, ? FROM refs WHERE draft=?",
+                         (dst_draft, src_draft))
+
+    def release(self, draft_name: str) -> int:
+        """释放草稿对池中素材的全部引用, 删除不再被任何草稿引用的素材
+
+        Returns:
+            `int`: 释放的字节数
+        """
+        conn = self._connect()
+        if conn is None:
+            return 0
+
+        freed = 0
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            digests = [row[0] for row in conn.execute("SELECT digest FROM refs WHERE draft=?", (draft_name,))]
+            conn.execute("DELETE FROM refs WHERE draft=?", (draft_name,))
+            for digest in digests:
+                if conn.execute("SELECT 1 FROM refs WHERE digest=? LIMIT 1", (digest,)).fetchone() is not None:
+                    continue
+                row = conn.execute("SELECT file, size FROM objects WHERE digest=?", (digest,)).fetchone()
+                conn.execute("DELETE FROM objects WHERE digest=?", (digest,))
+                if row is not None:
+                    try:
+                        os.remove(os.path.join(self.pool_path, row[0]))
+                        freed += row[1]
+                    except FileNotFoundError:
+                        pass
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return freed
+
+    def total_size(self) -> int:
+        """池中素材的总字节数"""
+        conn = self._connect()
+        if conn is None:
+            return 0
+        return conn.execute("SELECT COALESCE(SUM(size), 0) FROM objects").fetchone()[0]
@@ -2,35 +2,75 @@
 
 音频相关元数据更新时间：2024
 其余元数据更新时间：2025-08
+
+各元数据枚举在首次访问时才导入相应模块, 以免每次导入本库都构造数千个元数据对象.
+若已构建二进制目录(见`catalog`模块), 这些模块直接从目录加载, 元数据在访问时才解码
 """
 
+import importlib
+
+from typing import TYPE_CHECKING, Dict, List, Any
+
 from .effect_meta import EffectMeta, EffectParamInstance
 from .effect_meta import AnimationMeta
+from .mask_meta import MaskType, MaskMeta
 
-# 视频特效
-from .video_scene_effect import VideoSceneEffectType
-from .video_character_effect import VideoCharacterEffectType
+from . import catalog as _catalog
+_catalog.install()
 
-# 视频动画
-from .video_intro import IntroType
-from .video_outro import OutroType
-from .video_group_animation import GroupAnimationType
+_LAZY_MODULES: Dict[str, str] = {
+    # 视频特效
+    "VideoSceneEffectType": "video_scene_effect",
+    "VideoCharacterEffectType": "video_character_effect",
 
-# 音频特效
-from .audio_scene_effect import AudioSceneEffectType
-from .tone_effect import ToneEffectType
-from .speech_to_song import SpeechToSongType
+    # 视频动画
+    "IntroType": "video_intro",
+    "OutroType": "video_outro",
+    "GroupAnimationType": "video_group_animation",
 
-# 文本动画
-from .text_intro import TextIntro
-from .text_outro import TextOutro
-from .text_loop import TextLoopAnim
+    # 音频特效
+    "AudioSceneEffectType": "audio_scene_effect",
+    "ToneEffectType": "tone_effect",
+    "SpeechToSongType": "speech_to_song",
 
-# 其它
-from .font_meta import FontType
-from .mask_meta import MaskType, MaskMeta
-from .filter_meta import FilterType
-from .transition_meta import TransitionType
+    # 文本动画
+    "TextIntro": "text_intro",
+    "TextOutro": "text_outro",
+    "TextLoopAnim": "text_loop",
+
+    # 其它
+    "FontType": "font_meta",
+    "FilterType": "filter_meta",
+    "TransitionType": "transition_meta",
+}
+"""延迟加载的元数据枚举及其所在的模块"""
+
+if TYPE_CHECKING:
+    from .video_scene_effect import VideoSceneEffectType
+    from .video_character_effect import VideoCharacterEffectType
+    from .video_intro import IntroType
+    from .video_outro import OutroType
+    from .video_group_animation import GroupAnimationType
+    from .audio_scene_effect import AudioSceneEffectType
+    from .tone_effect import ToneEffectType
+    from .speech_to_song import SpeechToSongType
+    from .text_intro import TextIntro
+    from .text_outro import TextOutro
+    from .text_loop import TextLoopAnim
+    from .font_meta import FontType
+    from .filter_meta import FilterType
+    from .transition_meta import TransitionType
+
+def __getattr__(name: str) -> Any:
+    module_name = _LAZY_MODULES.get(name)
+    if module_name is None:
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+    value = getattr(importlib.import_module("." + module_name, __name__), name)
+    globals()[name] = value  # 之后的访问不再经过__getattr__
+    return value
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(_LAZY_MODULES))
 
 __all__ = [
     "AnimationMeta",
@@ -0,0 +1,13 @@
+"""构建元数据目录文件: python -m pyJianYingDraft.metadata [目录文件路径]"""
+
+import os
+import argparse
+
+from .catalog import DEFAULT_CATALOG_PATH, build_catalog
+
+parser = argparse.ArgumentParser(description="将pyJianYingDraft的元数据枚举编译为二进制目录文件")
+parser.add_argument("output", nargs="?", default=None, help="目录文件路径, 默认为 %s" % DEFAULT_CATALOG_PATH)
+args = parser.parse_args()
+
+output = build_catalog(args.output)
+print("已写入 %s (%d 字节)" % (output, os.path.getsize(output)))
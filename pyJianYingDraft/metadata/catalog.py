@@ -0,0 +1,474 @@
+"""元数据枚举的预编译二进制目录
+
+各元数据枚举的Python源文件(如`video_scene_effect.py`)中有数千个元数据字面量, 导入时需全部构造.
+本模块提供的构建步骤将其编译为紧凑的二进制目录文件(定长记录 + 字符串表), 运行时以内存映射方式读取:
+枚举成员的值只是占位对象, 首次访问其属性时才从目录中解码出实际的元数据.
+
+构建目录文件:
+
+    python -m pyJianYingDraft.metadata
+
+目录中记录了每个源文件的哈希值, 源文件修改后对应的枚举自动回退为从源文件导入, 因此目录过期只影响性能.
+目录位置可通过环境变量`PYJIANYINGDRAFT_METADATA_CATALOG`指定, 设为`off`则禁用目录.
+"""
+
+import os
+import sys
+import mmap
+import struct
+import threading
+import importlib.abc
+import importlib.util
+
+from types import ModuleType, MappingProxyType
+from typing import Optional, Sequence
+from typing import Dict, List, Tuple, Any
+
+from .effect_meta import EffectEnum, EffectParam
+from .effect_meta import EffectMeta, AnimationMeta, TransitionMeta
+
+CATALOG_ENV = "PYJIANYINGDRAFT_METADATA_CATALOG"
+"""指定目录文件路径的环境变量, 取值为`off`时禁用目录"""
+
+DEFAULT_CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "catalog.bin")
+"""默认的目录文件路径, 即本包目录下的`catalog.bin`"""
+
+CATALOG_MODULES: Dict[str, str] = {
+    "video_scene_effect": "VideoSceneEffectType",
+    "video_character_effect": "VideoCharacterEffectType",
+    "video_intro": "IntroType",
+    "video_outro": "OutroType",
+    "video_group_animation": "GroupAnimationType",
+    "audio_scene_effect": "AudioSceneEffectType",
+    "tone_effect": "ToneEffectType",
+    "speech_to_song": "SpeechToSongType",
+    "text_intro": "TextIntro",
+    "text_outro": "TextOutro",
+    "text_loop": "TextLoopAnim",
+    "font_meta": "FontType",
+    "filter_meta": "FilterType",
+    "transition_meta": "TransitionType",
+}
+"""编入目录的模块及其中的枚举类"""
+
+_PACKAGE = __package__ or "pyJianYingDraft.metadata"
+_SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 文件格式(小端序): 文件头, 各枚举的表头, 记录区, 参数区, 字符串表
+# 字符串均以(偏移量, 字节长度)的形式引用字符串表中的UTF-8数据
+_MAGIC = b"PJYMETA\x01"
+_HEADER = struct.Struct("<8sII")
+"""魔数, 枚举数, 字符串表偏移量"""
+_TABLE = struct.Struct("<IIIIIIB3x20sIII")
+"""模块名, 枚举类名, 枚举文档, 元数据种类, 源文件哈希, 记录数, 记录区偏移量, 参数区偏移量"""
+_RECORD = struct.Struct("<IIIIIIIIIIB3xqII")
+"""成员名, 名称/标题, resource_id, effect_id, md5, 标志位, 时长(微秒), 首个参数的下标, 参数数"""
+_PARAM = struct.Struct("<IIddd")
+"""参数名, 默认值, 最小值, 最大值"""
+
+_KINDS: List[type] = [EffectMeta, TransitionMeta, AnimationMeta]
+"""元数据种类编号与元数据类的对应关系"""
+
+_FLAG_VIP = 1
+_FLAG_OVERLAP = 2
+
+def _source_path(module_name: str) -> str:
+    return os.path.join(_SOURCE_DIR, module_name + ".py")
+
+def _source_digest(module_name: str) -> Optional[bytes]:
+    import hashlib
+
+    try:
+        with open(_source_path(module_name), "rb") as f:
+            return hashlib.sha1(f.read()).digest()
+    except OSError:
+        return None
+
+class _StringTable:
+    """构建目录时使用的字符串表, 相同的字符串只存储一次"""
+
+    def __init__(self):
+        self.data = bytearray()
+        self._offsets: Dict[str, Tuple[int, int]] = {}
+
+    def add(self, text: str) -> Tuple[int, int]:
+        ref = self._offsets.get(text)
+        if ref is None:
+            encoded = text.encode("utf-8")
+            ref = (len(self.data), len(encoded))
+            self.data += encoded
+            self._offsets[text] = ref
+        return ref
+
+def _load_source_module(module_name: str) -> ModuleType:
+    """绕过目录, 直接执行元数据模块的源文件"""
+    spec = importlib.util.spec_from_file_location("%s.%s" % (_PACKAGE, module_name), _source_path(module_name))
+    assert spec is not None and spec.loader is not None
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def build_catalog(path: Optional[str] = None, modules: Optional[Sequence[str]] = None) -> str:
+    """从元数据模块的源文件编译目录文件, 返回写入的路径
+
+    Args:
+        path (`str`, optional): 目录文件路径, 默认为`DEFAULT_CATALOG_PATH`
+        modules (`Sequence[str]`, optional): 要编入的模块名, 默认为`CATALOG_MODULES`中的全部模块
+
+    Raises:
+        `ValueError`: 枚举成员的值不是可编入目录的元数据类型
+    """
+    from .. import json_util
+
+    path = path or DEFAULT_CATALOG_PATH
+    module_names = list(CATALOG_MODULES) if modules is None else list(modules)
+    strings = _StringTable()
+    records = bytearray()
+    params = bytearray()
+    tables: List[Tuple[Any, ...]] = []
+
+    for module_name in module_names:
+        enum_name = CATALOG_MODULES[module_name]
+        enum_class = getattr(_load_source_module(module_name), enum_name)
+        members = list(enum_class)
+        kind = _KINDS.index(type(members[0].value)) if members and type(members[0].value) in _KINDS else -1
+        if kind < 0:
+            raise ValueError("%s 的成员不是可编入目录的元数据类型" % enum_name)
+        digest = _source_digest(module_name)
+        assert digest is not None
+
+        tables.append((*strings.add(module_name), *strings.add(enum_name), *strings.add(enum_class.__doc__ or ""),
+                       kind, digest, len(members), len(records), len(params)))
+        param_count = 0
+        for member in members:
+            meta = member.value
+            if type(meta) is not _KINDS[kind]:
+                raise ValueError("%s.%s 的元数据类型与其它成员不一致" % (enum_name, member.name))
+            flags = _FLAG_VIP if meta.is_vip else 0
+            duration = 0
+            member_params: List[EffectParam] = []
+            if kind == 1:
+                flags |= _FLAG_OVERLAP if meta.is_overlap else 0
+                duration = meta.default_duration
+            elif kind == 2:
+                duration = meta.duration
+            else:
+                member_params = meta.params
+            records += _RECORD.pack(*strings.add(member.name),
+                                    *strings.add(meta.title if kind == 2 else meta.name),
+                                    *strings.add(meta.resource_id), *strings.add(meta.effect_id), *strings.add(meta.md5),
+                                    flags, duration, param_count, len(member_params))
+            for param in member_params:
+                params += _PARAM.pack(*strings.add(param.name), param.default_value, param.min_value, param.max_value)
+            param_count += len(member_params)
+
+    # 记录区与参数区紧跟在表头之后, 表头中的偏移量在此换算为文件内的绝对偏移量
+    records_base = _HEADER.size + _TABLE.size * len(tables)
+    params_base = records_base + len(records)
+    strings_base = params_base + len(params)
+    header = _HEADER.pack(_MAGIC, len(tables), strings_base)
+    table_bytes = b"".join(_TABLE.pack(*table[:-2], records_base + table[-2], params_base + table[-1])
+                           for table in tables)
+
+    def write(f) -> None:
+        f.write(header)
+        f.write(table_bytes)
+        f.write(records)
+        f.write(params)
+        f.write(strings.data)
+
+    json_util.atomic_write(path, write)
+    return path
+
+class CatalogTable:
+    """目录文件中一个枚举的全部记录"""
+
+    module_name: str
+    """对应的模块名"""
+    enum_name: str
+    """对应的枚举类名"""
+    enum_doc: str
+    """枚举类的文档字符串"""
+    meta_class: type
+    """元数据类型"""
+    digest: bytes
+    """编译时源文件的SHA-1哈希值"""
+    count: int
+    """记录数"""
+
+    def __init__(self, catalog: "Catalog", fields: Tuple[Any, ...]):
+        self._catalog = catalog
+        self.module_name = catalog.string(fields[0], fields[1])
+        self.enum_name = catalog.string(fields[2], fields[3])
+        self.enum_doc = catalog.string(fields[4], fields[5])
+        self.meta_class = _KINDS[fields[6]]
+        self.digest = fields[7]
+        self.count = fields[8]
+        self._records_offset = fields[9]
+        self._params_offset = fields[10]
+
+    def _record(self, index: int) -> Tuple[Any, ...]:
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+        return _RECORD.unpack_from(self._catalog.buffer, self._records_offset + index * _RECORD.size)
+
+    def member_names(self) -> List[str]:
+        """按定义顺序返回全部枚举成员名"""
+        string = self._catalog.string
+        names: List[str] = []
+        offset = self._records_offset
+        for _ in range(self.count):
+            name_offset, name_length = struct.unpack_from("<II", self._catalog.buffer, offset)
+            names.append(string(name_offset, name_length))
+            offset += _RECORD.size
+        return names
+
+    def fill(self, meta: Any, index: int) -> None:
+        """从第`index`条记录解码元数据, 写入给定的元数据对象"""
+        record = self._record(index)
+        string = self._catalog.string
+        fields: Dict[str, Any] = {
+            "title" if self.meta_class is AnimationMeta else "name": string(record[2], record[3]),
+            "is_vip": bool(record[10] & _FLAG_VIP),
+            "resource_id": string(record[4], record[5]),
+            "effect_id": string(record[6], record[7]),
+            "md5": string(record[8], record[9]),
+        }
+        if self.meta_class is TransitionMeta:
+            fields["default_duration"] = record[11]
+            fields["is_overlap"] = bool(record[10] & _FLAG_OVERLAP)
+        elif self.meta_class is AnimationMeta:
+            fields["duration"] = record[11]
+        else:
+            fields["params"] = [self._param(record[12] + i) for i in range(record[13])]
+        meta.__dict__.update(fields)
+
+    def _param(self, index: int) -> EffectParam:
+        name_offset, name_length, default_value, min_value, max_value = \
+            _PARAM.unpack_from(self._catalog.buffer, self._params_offset + index * _PARAM.size)
+        return EffectParam(self._catalog.string(name_offset, name_length), default_value, min_value, max_value)
+
+    def is_fresh(self) -> bool:
+        """源文件是否与编译时一致"""
+        return _source_digest(self.module_name) == self.digest
+
+    def lazy_meta(self, index: int) -> Any:
+        """返回第`index`条记录对应的元数据对象, 其属性在首次访问时才解码"""
+        lazy_class = _lazy_meta_class(self.meta_class)
+        meta = lazy_class.__new__(lazy_class)
+        meta.__dict__["_catalog_source"] = (self, index)
+        return meta
+
+    def build_enum(self) -> "type[EffectEnum]":
+        """构造对应的枚举类, 成员名及顺序与源文件中的定义一致, 成员在首次访问时才创建"""
+        classdict = CatalogEnumType.__prepare__(self.enum_name, (EffectEnum,))
+        classdict["__module__"] = "%s.%s" % (_PACKAGE, self.module_name)
+        classdict["__qualname__"] = self.enum_name
+        classdict["__doc__"] = self.enum_doc
+        classdict["__reduce_ex__"] = _reduce_member
+        enum_class = CatalogEnumType(self.enum_name, (EffectEnum,), classdict)
+
+        names = self.member_names()
+        type.__setattr__(enum_class, "_catalog_table", self)
+        type.__setattr__(enum_class, "_catalog_names", names)
+        type.__setattr__(enum_class, "_catalog_indices", {name: i for i, name in enumerate(names)})
+        return enum_class
+
+def _reduce_member(self: EffectEnum, protocol: int) -> Tuple[Any, ...]:
+    # 按成员名序列化, 与元数据对象无关
+    return getattr, (self.__class__, self._name_)
+
+class CatalogEnumType(type(EffectEnum)):  # type: ignore
+    """由目录构造的枚举类的元类
+
+    枚举类本身不含成员, 成员在首次按名称访问时才创建并登记到枚举的内部映射中;
+    遍历、`len`、`__members__`等操作与普通枚举的行为一致.
+    """
+
+    def _catalog_member(cls, name: str) -> Optional[EffectEnum]:
+        index = cls.__dict__.get("_catalog_indices", {}).get(name)
+        if index is None:
+            return None
+        member = cls._member_map_.get(name)
+        if member is None:
+            member = object.__new__(cls)
+            member._name_ = name
+            member._value_ = cls._catalog_table.lazy_meta(index)
+            member = cls._member_map_.setdefault(name, member)
+            cls._value2member_map_.setdefault(member._value_, member)
+            type.__setattr__(cls, name, member)  # 之后的访问不再经过__getattr__
+        return member
+
+    def _catalog_load_all(cls) -> None:
+        if len(cls._member_map_) < len(cls._catalog_names) or list(cls._member_map_) != cls._catalog_names:
+            for name in cls._catalog_names:
+                cls._catalog_member(name)
+            # 按定义顺序重排, 使依赖这些内部属性的枚举方法行为正常
+            type.__setattr__(cls, "_member_map_", {name: cls._member_map_[name] for name in cls._catalog_names})
+            type.__setattr__(cls, "_member_names_", list(cls._catalog_names))
+
+    def __getattr__(cls, name: str) -> Any:
+        member = None if name.startswith("__") else cls._catalog_member(name)
+        if member is None:
+            raise AttributeError(name)
+        return member
+
+    def __getitem__(cls, name: str) -> Any:
+        member = cls._catalog_member(name)
+        if member is None:
+            raise KeyError(name)
+        return member
+
+    def __call__(cls, value: Any, *args: Any, **kwargs: Any) -> Any:
+        if not args and not kwargs:
+            cls._catalog_load_all()
+        return super().__call__(value, *args, **kwargs)
+
+    def __contains__(cls, member: Any) -> bool:
+        if isinstance(member, cls):
+            return True
+        cls._catalog_load_all()
+        return super().__contains__(member)
+
+    def __iter__(cls):
+        return (cls._catalog_member(name) for name in cls._catalog_names)
+
+    def __reversed__(cls):
+        return (cls._catalog_member(name) for name in reversed(cls._catalog_names))
+
+    def __len__(cls) -> int:
+        return len(cls._catalog_names)
+
+    @property
+    def __members__(cls):
+        cls._catalog_load_all()
+        return MappingProxyType(cls._member_map_)
+
+class Catalog:
+    """以内存映射方式打开的目录文件"""
+
+    path: str
+    """目录文件路径"""
+    tables: Dict[str, CatalogTable]
+    """模块名到其记录的映射"""
+
+    def __init__(self, path: str):
+        """打开目录文件
+
+        Raises:
+            `OSError`: 文件无法读取
+            `ValueError`: 文件不是有效的目录文件
+        """
+        self.path = path
+        with open(path, "rb") as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, table_count, self._strings_offset = _HEADER.unpack_from(self.buffer, 0)
+            if magic != _MAGIC:
+                raise ValueError("%s 不是有效的元数据目录文件" % path)
+            self.tables = {}
+            for i in range(table_count):
+                table = CatalogTable(self, _TABLE.unpack_from(self.buffer, _HEADER.size + i * _TABLE.size))
+                self.tables[table.module_name] = table
+        except (struct.error, IndexError, UnicodeDecodeError) as e:
+            self.buffer.close()
+            raise ValueError("%s 不是有效的元数据目录文件" % path) from e
+        except ValueError:
+            self.buffer.close()
+            raise
+
+    def string(self, offset: int, length: int) -> str:
+        """读取字符串表中的字符串"""
+        start = self._strings_offset + offset
+        return self.buffer[start:start + length].decode("utf-8")
+
+def _lazy_meta_class(meta_class: type) -> type:
+    """返回给定元数据类的延迟解码子类"""
+    lazy_class = _lazy_classes.get(meta_class)
+    if lazy_class is None:
+        def __getattr__(self, name: str) -> Any:
+            # 特殊方法的查询(如构造枚举时检查是否为描述符)不触发解码
+            source = None if name.startswith("__") else self.__dict__.get("_catalog_source")
+            if source is None:
+                raise AttributeError("%r object has no attribute %r" % (meta_class.__name__, name))
+            table, index = source
+            table.fill(self, index)  # 解码是幂等的, 多线程同时访问也无妨
+            self.__dict__.pop("_catalog_source", None)
+            return object.__getattribute__(self, name)
+
+        def __reduce__(self):
+            # 序列化为普通的元数据对象
+            getattr(self, "md5")
+            return (_restore_meta, (meta_class, dict(self.__dict__)))
+
+        lazy_class = type(meta_class.__name__, (meta_class,), {
+            "__getattr__": __getattr__, "__reduce__": __reduce__,
+            "__module__": meta_class.__module__, "__qualname__": meta_class.__qualname__,
+        })
+        _lazy_classes[meta_class] = lazy_class
+    return lazy_class
+
+_lazy_classes: Dict[type, type] = {}
+
+def _restore_meta(meta_class: type, state: Dict[str, Any]) -> Any:
+    meta = meta_class.__new__(meta_class)
+    meta.__dict__.update(state)
+    return meta
+
+class _CatalogLoader(importlib.abc.Loader):
+    """以目录中的记录代替执行源文件的模块加载器"""
+
+    def __init__(self, table: CatalogTable):
+        self.table = table
+
+    def create_module(self, spec):
+        return None
+
+    def exec_module(self, module: ModuleType) -> None:
+        module.__dict__.update({
+            "EffectEnum": EffectEnum, "EffectMeta": EffectMeta, "EffectParam": EffectParam,
+            "AnimationMeta": AnimationMeta, "TransitionMeta": TransitionMeta,
+            self.table.enum_name: self.table.build_enum(),
+        })
+
+class CatalogFinder(importlib.abc.MetaPathFinder):
+    """元数据模块的查找器: 目录文件存在且未过期时由目录加载模块, 否则交由常规的导入机制"""
+
+    def __init__(self, path: Optional[str] = None):
+        self._path = path
+        self._catalog: Optional[Catalog] = None
+        self._opened = False
+        self._lock = threading.Lock()
+
+    def _get_catalog(self) -> Optional[Catalog]:
+        with self._lock:
+            if not self._opened:
+                self._opened = True
+                path = self._path or os.environ.get(CATALOG_ENV, "") or DEFAULT_CATALOG_PATH
+                if path.lower() not in ("off", "0", "false", "none"):
+                    try:
+                        self._catalog = Catalog(path)
+                    except (OSError, ValueError):
+                        self._catalog = None  # 目录缺失或损坏时回退为导入源文件
+            return self._catalog
+
+    def find_spec(self, fullname: str, path: Any = None, target: Any = None):
+        package, _, module_name = fullname.rpartition(".")
+        if package != _PACKAGE or module_name not in CATALOG_MODULES:
+            return None
+        catalog = self._get_catalog()
+        if catalog is None:
+            return None
+        table = catalog.tables.get(module_name)
+        if table is None or not table.is_fresh():
+            return None
+        return importlib.util.spec_from_loader(fullname, _CatalogLoader(table), origin=catalog.path)
+
+_finder: Optional[CatalogFinder] = None
+
+def install() -> None:
+    """在导入机制中注册目录查找器, 由`pyJianYingDraft.metadata`在导入时调用"""
+    global _finder
+    if _finder is None:
+        _finder = CatalogFinder()
+        sys.meta_path.insert(0, _finder)
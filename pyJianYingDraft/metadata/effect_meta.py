@@ -93,7 +93,27 @@ class EffectMeta:
 EffectEnumSubclass = TypeVar("EffectEnumSubclass", bound="EffectEnum")
 
 class EffectEnum(Enum):
-    """特效枚举基类, 提供一个`from_name`方法用于根据名称获取特效元数据"""
+    """特效枚举基类, 提供`from_name`等方法用于根据名称或ID获取特效元数据
+
+    各查找方法所用的索引在首次调用时为每个枚举类建立一次, 之后的查找均为O(1).
+    """
+
+    @staticmethod
+    def _normalize_name(name: str) -> str:
+        return name.lower().replace(" ", "").replace("_", "")
+
+    @classmethod
+    def _lookup_index(cls, key: str) -> Dict[str, Any]:
+        """返回从`key`(`name`、`resource_id`或`effect_id`)到枚举成员的索引, 同一键对应多个成员时取定义在前者"""
+        attr = "_index_" + key
+        index = cls.__dict__.get(attr)
+        if index is None:
+            index = {}
+            for effect in cls:
+                value = cls._normalize_name(effect.name) if key == "name" else getattr(effect.value, key)
+                index.setdefault(value, effect)
+            type.__setattr__(cls, attr, index)  # 绕过Enum对类属性赋值的检查, 缓存在各枚举类自身上
+        return index
 
     @classmethod
     def from_name(cls: "type[EffectEnumSubclass]", name: str) -> EffectEnumSubclass:
@@ -105,11 +125,41 @@ class EffectEnum(Enum):
         Raises:
             `ValueError`: 特效名称不存在
         """
-        name = name.lower().replace(" ", "").replace("_", "")
-        for effect in cls:
-            if effect.name.lower().replace(" ", "").replace("_", "") == name:
-                return effect
-        raise ValueError(f"Effect named '{name}' not found")
+        name = cls._normalize_name(name)
+        effect = cls._lookup_index("name").get(name)
+        if effect is None:
+            raise ValueError(f"Effect named '{name}' not found")
+        return effect
+
+    @classmethod
+    def from_resource_id(cls: "type[EffectEnumSubclass]", resource_id: str) -> EffectEnumSubclass:
+        """根据资源ID获取特效元数据, 可用于将模板中的素材映射回枚举成员
+
+        Args:
+            resource_id (str): 资源ID
+
+        Raises:
+            `ValueError`: 资源ID不存在
+        """
+        effect = cls._lookup_index("resource_id").get(resource_id)
+        if effect is None:
+            raise ValueError(f"Effect with resource_id '{resource_id}' not found")
+        return effect
+
+    @classmethod
+    def from_effect_id(cls: "type[EffectEnumSubclass]", effect_id: str) -> EffectEnumSubclass:
+        """根据效果ID获取特效元数据
+
+        Args:
+            effect_id (str): 效果ID
+
+        Raises:
+            `ValueError`: 效果ID不存在
+        """
+        effect = cls._lookup_index("effect_id").get(effect_id)
+        if effect is None:
+            raise ValueError(f"Effect with effect_id '{effect_id}' not found")
+        return effect
 
 # 动画元数据
 class AnimationMeta:
@@ -0,0 +1,265 @@
+"""元数据枚举的模糊搜索
+
+在所有特效、滤镜、字体、转场、动画等枚举上建立n-gram倒排索引, 按名称(及安装了`pypinyin`时的全拼、首字母)
+对查询进行打分排序. 索引只需建立一次, 之后缓存在磁盘上, 元数据源文件变化时自动重建.
+缓存位置可通过环境变量`PYJIANYINGDRAFT_SEARCH_CACHE`指定, 设为`off`则不使用磁盘缓存.
+"""
+
+import os
+import threading
+
+from typing import Optional, Iterable, Union
+from typing import Dict, List, Set, Tuple, Any
+
+from .. import json_util
+
+try:
+    import pypinyin  # type: ignore
+except ImportError:
+    pypinyin = None
+
+SEARCH_CACHE_ENV = "PYJIANYINGDRAFT_SEARCH_CACHE"
+"""指定索引缓存文件路径的环境变量, 取值为`off`时不使用磁盘缓存"""
+
+SEARCHABLE_ENUMS: Dict[str, str] = {
+    "VideoSceneEffectType": "video_scene_effect",
+    "VideoCharacterEffectType": "video_character_effect",
+    "FilterType": "filter_meta",
+    "FontType": "font_meta",
+    "TransitionType": "transition_meta",
+    "IntroType": "video_intro",
+    "OutroType": "video_outro",
+    "GroupAnimationType": "video_group_animation",
+    "TextIntro": "text_intro",
+    "TextOutro": "text_outro",
+    "TextLoopAnim": "text_loop",
+    "AudioSceneEffectType": "audio_scene_effect",
+    "ToneEffectType": "tone_effect",
+    "SpeechToSongType": "speech_to_song",
+    "MaskType": "mask_meta",
+}
+"""参与搜索的枚举及其所在的模块"""
+
+_INDEX_VERSION = 1
+"""索引格式的版本号, 分词或打分方式变化时更新以使旧缓存失效"""
+
+_SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def normalize(text: str) -> str:
+    """与`EffectEnum.from_name`一致的名称规范化: 忽略大小写、空格和下划线"""
+    return text.lower().replace(" ", "").replace("_", "")
+
+def _grams(text: str) -> Set[str]:
+    """文本的单字及相邻双字"""
+    grams = set(text)
+    grams.update(text[i:i + 2] for i in range(len(text) - 1))
+    return grams
+
+def _search_keys(*names: str) -> List[str]:
+    """名称的各种可搜索形式: 规范化名称, 以及含中文时的全拼与拼音首字母"""
+    keys: List[str] = []
+    for name in names:
+        key = normalize(name)
+        if key and key not in keys:
+            keys.append(key)
+        if pypinyin is not None and not key.isascii():
+            full = "".join(pypinyin.lazy_pinyin(key))
+            initials = "".join(pypinyin.lazy_pinyin(key, style=pypinyin.Style.FIRST_LETTER))
+            for key in (full, initials):
+                key = normalize(key)
+                if key and key not in keys:
+                    keys.append(key)
+    return keys
+
+def _score(query: str, query_grams: Set[str], key: str) -> float:
+    """查询与某一可搜索形式的匹配程度, 取值0~1"""
+    if key == query:
+        return 1.0
+    if key.startswith(query):
+        return 0.85 + 0.1 * len(query) / len(key)
+    if query in key:
+        return 0.7 + 0.1 * len(query) / len(key)
+    key_grams = _grams(key)
+    return 0.7 * 2 * len(query_grams & key_grams) / (len(query_grams) + len(key_grams))
+
+class EffectSearchResult:
+    """一条搜索结果"""
+
+    enum_name: str
+    """所属枚举类名, 如`FilterType`"""
+    member_name: str
+    """枚举成员名"""
+    display_name: str
+    """元数据中的名称(动画为标题)"""
+    score: float
+    """匹配程度, 取值0~1, 越大越匹配"""
+
+    def __init__(self, enum_name: str, member_name: str, display_name: str, score: float):
+        self.enum_name = enum_name
+        self.member_name = member_name
+        self.display_name = display_name
+        self.score = score
+
+    @property
+    def member(self) -> Any:
+        """对应的枚举成员, 访问时才加载所属枚举"""
+        from .. import metadata
+        return getattr(getattr(metadata, self.enum_name), self.member_name)
+
+    def __repr__(self) -> str:
+        return "<EffectSearchResult %s.%s %r score=%.2f>" % (self.enum_name, self.member_name, self.display_name, self.score)
+
+def _fingerprint() -> List[Any]:
+    """索引所依赖的元数据源文件及分词方式, 任一变化都使缓存失效"""
+    sources: List[Any] = []
+    for module_name in sorted(set(SEARCHABLE_ENUMS.values())):
+        try:
+            stat = os.stat(os.path.join(_SOURCE_DIR, module_name + ".py"))
+            sources.append([module_name, stat.st_size, stat.st_mtime_ns])
+        except OSError:
+            sources.append([module_name, None, None])
+    return [_INDEX_VERSION, pypinyin is not None, sources]
+
+def default_cache_path() -> str:
+    """返回默认的索引缓存路径, 与媒体探测缓存位于同一目录"""
+    from ..probe_cache import default_cache_path as probe_cache_path
+    return os.path.join(os.path.dirname(probe_cache_path()), "effect_search_index.json")
+
+class EffectSearchIndex:
+    """元数据枚举的n-gram倒排索引"""
+
+    entries: List[Tuple[str, str, str, List[str]]]
+    """各条目的(枚举类名, 成员名, 显示名称, 可搜索形式列表)"""
+
+    def __init__(self, entries: List[Tuple[str, str, str, List[str]]],
+                 postings: Optional[Dict[str, List[int]]] = None, fingerprint: Optional[List[Any]] = None):
+        self.entries = entries
+        self.fingerprint = fingerprint if fingerprint is not None else _fingerprint()
+        if postings is None:
+            postings = {}
+            for i, (_, _, _, keys) in enumerate(entries):
+                grams: Set[str] = set()
+                for key in keys:
+                    grams |= _grams(key)
+                for gram in grams:
+                    postings.setdefault(gram, []).append(i)
+        self._postings = postings
+
+    @classmethod
+    def build(cls, enum_names: Optional[Iterable[str]] = None) -> "EffectSearchIndex":
+        """遍历枚举建立索引
+
+        Args:
+            enum_names (`Iterable[str]`, optional): 参与搜索的枚举类名, 默认为`SEARCHABLE_ENUMS`中的全部枚举
+        """
+        from .. import metadata
+
+        entries: List[Tuple[str, str, str, List[str]]] = []
+        for enum_name in (SEARCHABLE_ENUMS if enum_names is None else enum_names):
+            for member in getattr(metadata, enum_name):
+                meta = member.value
+                display_name = meta.title if isinstance(meta, metadata.AnimationMeta) else meta.name
+                entries.append((enum_name, member.name, display_name, _search_keys(display_name, member.name)))
+        return cls(entries)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["EffectSearchIndex"]:
+        """读取缓存的索引, 缓存不存在、已损坏或已过期时返回None"""
+        try:
+            data = json_util.load_file(path)
+            if data["fingerprint"] != _fingerprint():
+                return None
+            return cls([tuple(entry) for entry in data["entries"]], data["postings"], data["fingerprint"])  # type: ignore
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def save(self, path: str) -> None:
+        """将索引写入缓存文件"""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        json_util.dump_file({"fingerprint": self.fingerprint, "entries": self.entries, "postings": self._postings}, path, compact=True)
+
+    @classmethod
+    def load_or_build(cls, cache_path: Optional[str] = None) -> "EffectSearchIndex":
+        """读取缓存的索引, 无可用缓存时建立索引并写入缓存
+
+        Args:
+            cache_path (`str`, optional): 缓存文件路径, 默认按环境变量`PYJIANYINGDRAFT_SEARCH_CACHE`或`default_cache_path()`确定,
+                环境变量为`off`时不使用磁盘缓存
+        """
+        if cache_path is None:
+            setting = os.environ.get(SEARCH_CACHE_ENV, "")
+            if setting.lower() in ("off", "0", "false", "none"):
+                return cls.build()
+            cache_path = setting or default_cache_path()
+
+        index = cls.load(cache_path)
+        if index is None:
+            index = cls.build()
+            try:
+                index.save(cache_path)
+            except OSError:
+                pass  # 缓存只是加速手段, 无法写入时不影响搜索
+        return index
+
+    def search(self, query: str, enum_types: Optional[Iterable[Union[str, type]]] = None,
+               limit: int = 10, min_score: float = 0.3) -> List[EffectSearchResult]:
+        """搜索与查询匹配的枚举成员, 按匹配程度从高到低排列
+
+        Args:
+            query (`str`): 查询文本, 可以是中文名称的一部分、成员名, 或安装`pypinyin`时的全拼、拼音首字母
+            enum_types (`Iterable[str | type]`, optional): 只在这些枚举(类名或枚举类)中搜索, 默认不限
+            limit (`int`, optional): 最多返回的结果数, 默认为10
+            min_score (`float`, optional): 最低匹配程度, 默认为0.3
+        """
+        query = normalize(query)
+        if not query:
+            return []
+        allowed = None if enum_types is None else {t if isinstance(t, str) else t.__name__ for t in enum_types}
+        query_grams = _grams(query)
+
+        # 按查询中的双字(单字查询则按单字)召回, 只为命中其中至少一半的条目打分,
+        # 完全包含查询的条目必然命中全部双字, 其余条目的得分本就较低
+        recall_grams = [gram for gram in query_grams if len(gram) == min(len(query), 2)]
+        hits: Dict[int, int] = {}
+        for gram in recall_grams:
+            for i in self._postings.get(gram, ()):
+                hits[i] = hits.get(i, 0) + 1
+        min_hits = (len(recall_grams) + 1) // 2
+
+        scored: List[Tuple[float, int, int]] = []
+        for i, hit_count in hits.items():
+            if hit_count < min_hits:
+                continue
+            enum_name, _, display_name, keys = self.entries[i]
+            if allowed is not None and enum_name not in allowed:
+                continue
+            score = max(_score(query, query_grams, key) for key in keys)
+            if score >= min_score:
+                scored.append((-score, len(display_name), i))
+        scored.sort()
+
+        results: List[EffectSearchResult] = []
+        for neg_score, _, i in scored[:limit]:
+            enum_name, member_name, display_name, _ = self.entries[i]
+            results.append(EffectSearchResult(enum_name, member_name, display_name, -neg_score))
+        return results
+
+_default_index: Optional[EffectSearchIndex] = None
+_default_index_lock = threading.Lock()
+
+def get_search_index() -> EffectSearchIndex:
+    """获取进程内共享的搜索索引, 首次调用时从磁盘缓存读取或建立"""
+    global _default_index
+    if _default_index is None:
+        with _default_index_lock:
+            if _default_index is None:
+                _default_index = EffectSearchIndex.load_or_build()
+    return _default_index
+
+def search_effects(query: str, enum_types: Optional[Iterable[Union[str, type]]] = None,
+                   limit: int = 10, min_score: float = 0.3) -> List[EffectSearchResult]:
+    """在全部元数据枚举中搜索, 参数含义同`EffectSearchIndex.search`
+
+    例如`search_effects("全息", enum_types=["VideoSceneEffectType"])`.
+    """
+    return get_search_index().search(query, enum_types, limit, min_score)
@@ -0,0 +1,284 @@
+"""媒体探测结果的持久化缓存
+
+以(绝对路径, 文件大小, 修改时间)为键, 将pymediainfo/ffprobe的探测结果保存在SQLite数据库中,
+文件内容变化后对应记录自动失效. 缓存位置可通过环境变量`PYJIANYINGDRAFT_PROBE_CACHE`指定,
+设为`off`则禁用缓存.
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import threading
+import subprocess
+
+from typing import Optional, Callable, Iterable
+from typing import Dict, List, Any
+
+from . import json_util
+from . import instrumentation
+
+PROBE_CACHE_ENV = "PYJIANYINGDRAFT_PROBE_CACHE"
+"""指定缓存数据库路径的环境变量, 取值为`off`时禁用缓存"""
+
+MEDIA_EXTENSIONS = frozenset([
+    ".mp4", ".mov", ".avi", ".mkv", ".m4v", ".flv", ".webm", ".gif",
+    ".jpg", ".jpeg", ".png", ".bmp", ".webp",
+    ".mp3", ".wav", ".m4a", ".aac", ".flac", ".ogg",
+])
+"""预热缓存时默认扫描的文件扩展名"""
+
+MEDIAINFO_KIND = "mediainfo-v2"
+"""`local_materials.probe_media`结果的记录类型, 探测结果格式变化时更新版本号以使旧记录失效"""
+
+_TOUCH_INTERVAL = 24 * 3600
+"""命中缓存时更新最近使用时间的最小间隔(秒), 避免每次命中都写库"""
+
+def default_cache_path() -> str:
+    """返回默认的缓存数据库路径"""
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA", os.path.expanduser("~"))
+    else:
+        base = os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache"))
+    return os.path.join(base, "pyJianYingDraft", "probe_cache.sqlite3")
+
+class ProbeCache:
+    """媒体探测结果的持久化缓存, 可在多线程、多进程间共享"""
+
+    db_path: str
+    """缓存数据库路径"""
+    max_entries: int
+    """最多保留的记录数, 超出时淘汰最久未使用的记录"""
+
+    def __init__(self, db_path: Optional[str] = None, max_entries: int = 200000):
+        """打开(或创建)缓存数据库
+
+        Args:
+            db_path (`str`, optional): 数据库路径, 默认为用户缓存目录下的`pyJianYingDraft/probe_cache.sqlite3`
+            max_entries (`int`, optional): 最多保留的记录数, 默认为200000
+        """
+        self.db_path = db_path or default_cache_path()
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._puts = 0
+        self._disabled = False
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        """获取当前线程的数据库连接, 数据库不可用时返回None"""
+        if self._disabled:
+            return None
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS probes ("
+                         "path TEXT NOT NULL, kind TEXT NOT NULL, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL,"
+                         "data TEXT NOT NULL, last_used REAL NOT NULL, PRIMARY KEY (path, kind))")
+            conn.execute("CREATE INDEX IF NOT EXISTS probes_last_used ON probes (last_used)")
+        except (sqlite3.Error, OSError):
+            # 缓存只是加速手段, 数据库不可用(如只读目录)时退化为不缓存
+            self._disabled = True
+            return None
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def _file_key(path: str):
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        return path, stat.st_size, stat.st_mtime_ns
+
+    def get(self, path: str, kind: str = MEDIAINFO_KIND) -> Optional[Dict[str, Any]]:
+        """查询指定文件的缓存记录, 文件已变化或无记录时返回None
+
+        Args:
+            path (`str`): 媒体文件路径
+            kind (`str`, optional): 探测方式, 用于区分不同探测器的结果, 默认为`MEDIAINFO_KIND`
+
+        Raises:
+            `FileNotFoundError`: 文件不存在
+        """
+        abs_path, size, mtime_ns = self._file_key(path)
+        conn = self._connect()
+        if conn is None:
+            return None
+        try:
+            row = conn.execute("SELECT size, mtime_ns, data, last_used FROM probes WHERE path=? AND kind=?",
+                               (abs_path, kind)).fetchone()
+            if row is None or row[0] != size or row[1] != mtime_ns:
+                return None
+            now = time.time()
+            if now - row[3] > _TOUCH_INTERVAL:
+                conn.execute("UPDATE probes SET last_used=? WHERE path=? AND kind=?", (now, abs_path, kind))
+            return json_util.loads(row[2])
+        except sqlite3.Error:
+            return None
+
+    def put(self, path: str, record: Dict[str, Any], kind: str = MEDIAINFO_KIND) -> None:
+        """写入指定文件的探测结果
+
+        Args:
+            path (`str`): 媒体文件路径
+            record (`Dict[str, Any]`): 可JSON序列化的探测结果
+            kind (`str`, optional): 探测方式, 默认为`MEDIAINFO_KIND`
+        """
+        abs_path, size, mtime_ns = self._file_key(path)
+        conn = self._connect()
+        if conn is None:
+            return
+        try:
+            conn.execute("INSERT OR REPLACE INTO probes (path, kind, size, mtime_ns, data, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+                         (abs_path, kind, size, mtime_ns, json_util.dumps(record, compact=True), time.time()))
+            self._puts += 1
+            if self._puts % 1000 == 0:
+                self.evict()
+        except sqlite3.Error:
+            pass
+
+    def get_or_probe(self, path: str, prober: Callable[[str], Dict[str, Any]], kind: str = MEDIAINFO_KIND) -> Dict[str, Any]:
+        """查询缓存, 未命中时调用`prober`探测并写入缓存
+
+        Args:
+            path (`str`): 媒体文件路径
+            prober (`Callable[[str], Dict[str, Any]]`): 探测函数, 接受文件路径并返回可JSON序列化的结果
+            kind (`str`, optional): 探测方式, 默认为`MEDIAINFO_KIND`
+
+        Raises:
+            `FileNotFoundError`: 文件不存在
+        """
+        record = self.get(path, kind)
+        if record is None:
+            instrumentation.count("probe_cache_misses")
+            record = prober(path)
+            self.put(path, record, kind)
+        else:
+            instrumentation.count("probe_cache_hits")
+        return record
+
+    def evict(self, max_entries: Optional[int] = None) -> int:
+        """淘汰最久未使用的记录, 使记录数不超过上限, 返回淘汰的记录数
+
+        Args:
+            max_entries (`int`, optional): 记录数上限, 默认为`self.max_entries`
+        """
+        limit = self.max_entries if max_entries is None else max_entries
+        conn = self._connect()
+        if conn is None:
+            return 0
+        try:
+            count = conn.execute("SELECT COUNT(*) FROM probes").fetchone()[0]
+            if count <= limit:
+                return 0
+            conn.execute("DELETE FROM probes WHERE rowid IN (SELECT rowid FROM probes ORDER BY last_used LIMIT ?)",
+                         (count - limit,))
+            return count - limit
+        except sqlite3.Error:
+            return 0
+
+    def clear(self) -> None:
+        """清空所有缓存记录"""
+        conn = self._connect()
+        if conn is not None:
+            conn.execute("DELETE FROM probes")
+
+    def __len__(self) -> int:
+        conn = self._connect()
+        if conn is None:
+            return 0
+        return conn.execute("SELECT COUNT(*) FROM probes").fetchone()[0]
+
+    def warm(self, folder: str, max_workers: Optional[int] = None) -> Dict[str, int]:
+        """预热缓存: 递归并发探测文件夹中的所有媒体文件并写入缓存
+
+        Args:
+            folder (`str`): 素材文件夹
+            max_workers (`int`, optional): 并发探测的进程数, 默认为CPU核数
+
+        Returns:
+            `Dict[str, int]`: 统计信息, 包括`cached`(已有缓存)、`probed`(新探测)、`failed`(探测失败)
+        """
+        from .local_materials import probe_many
+
+        stats = {"cached": 0, "probed": 0, "failed": 0}
+        for result in probe_many([folder], max_workers=max_workers, cache=self, ffprobe_fallback=False).values():
+            if result["error"] is not None:
+                stats["failed"] += 1
+            elif result["cached"]:
+                stats["cached"] += 1
+            else:
+                stats["probed"] += 1
+        return stats
+
+def iter_media_files(folder: str, extensions: Iterable[str] = MEDIA_EXTENSIONS) -> List[str]:
+    """递归列出文件夹中指定扩展名的文件, 按路径排序"""
+    extensions = {ext.lower() for ext in extensions}
+    result: List[str] = []
+    for root, _, files in os.walk(folder):
+        for file in files:
+            if os.path.splitext(file)[1].lower() in extensions:
+                result.append(os.path.join(root, file))
+    result.sort()
+    return result
+
+_default_cache: Optional[ProbeCache] = None
+_default_cache_lock = threading.Lock()
+
+def get_probe_cache() -> Optional[ProbeCache]:
+    """获取进程内共享的默认缓存, 被环境变量禁用时返回None"""
+    global _default_cache
+    setting = os.environ.get(PROBE_CACHE_ENV, "")
+    if setting.lower() in ("off", "0", "false", "none"):
+        return None
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                _default_cache = ProbeCache(setting or None)
+    return _default_cache
+
+def set_probe_cache(cache: Optional[ProbeCache]) -> None:
+    """替换进程内共享的默认缓存, 传入None则在下次使用时按环境变量重新创建"""
+    global _default_cache
+    _default_cache = cache
+
+def _run_ffprobe(path: str) -> Dict[str, Any]:
+    instrumentation.count("subprocesses")
+    with instrumentation.stage("probe.ffprobe"):
+        result = subprocess.run(["ffprobe", "-v", "quiet", "-print_format", "json", "-show_format", "-show_streams", path],
+                                capture_output=True, text=True, encoding="utf-8", timeout=60)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffprobe 探测 {path} 失败")
+    return json_util.loads(result.stdout)
+
+def ffprobe(path: str) -> Dict[str, Any]:
+    """调用ffprobe获取媒体信息(`-show_format -show_streams`的JSON输出), 结果经由默认缓存
+
+    Raises:
+        `FileNotFoundError`: 文件不存在, 或未安装ffprobe
+        `RuntimeError`: ffprobe探测失败
+    """
+    cache = get_probe_cache()
+    if cache is None:
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"找不到 {path}")
+        return _run_ffprobe(path)
+    return cache.get_or_probe(path, _run_ffprobe, kind="ffprobe")
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="预热pyJianYingDraft的媒体探测缓存")
+    parser.add_argument("folders", nargs="+", help="要预热的素材文件夹")
+    args = parser.parse_args()
+
+    cache = get_probe_cache()
+    if cache is None:
+        print(f"缓存已被环境变量 {PROBE_CACHE_ENV} 禁用")
+        sys.exit(1)
+    for folder in args.folders:
+        stats = cache.warm(folder)
+        print(f"{folder}: 新探测 {stats['probed']}, 已缓存 {stats['cached']}, 失败 {stats['failed']}")
@@ -3,13 +3,16 @@ import json
 import math
 from copy import deepcopy
 
-from typing import Optional, Literal, Union, overload
-from typing import Type, Dict, List, Any
+from typing import Optional, Literal, Union, overload, TYPE_CHECKING
+from typing import Type, Dict, List, Tuple, Set, Any, FrozenSet
 
 from . import util
 from . import assets
+from . import json_util
 from . import exceptions
-from .template_mode import ImportedTrack, EditableTrack, ImportedMediaTrack, ImportedTextTrack, ShrinkMode, ExtendMode, import_track
+from .draft_index import DraftIndex
+from .template_mode import (ImportedTrack, ImportedSegment, EditableTrack, ImportedMediaTrack, ImportedTextTrack,
+                            ShrinkMode, ExtendMode, import_track)
 from .time_util import Timerange, tim, srt_tstamp
 from .local_materials import VideoMaterial, AudioMaterial
 from .segment import BaseSegment, Speed, ClipSettings
@@ -19,7 +22,8 @@ from .effect_segment import EffectSegment, FilterSegment
 from .text_segment import TextSegment, TextStyle, TextBubble
 from .track import TrackType, BaseTrack, Track
 
-from .metadata import VideoSceneEffectType, VideoCharacterEffectType, FilterType
+if TYPE_CHECKING:
+    from .metadata import VideoSceneEffectType, VideoCharacterEffectType, FilterType
 
 class ScriptMaterial:
     """草稿文件中的素材信息部分"""
@@ -70,6 +74,22 @@ class ScriptMaterial:
         self.filters = []
         self.canvases = []
 
+        self._id_index: Dict[str, Tuple[int, Set[str]]] = {}
+
+    def _ids(self, list_name: str, id_attr: str) -> Set[str]:
+        """返回指定素材列表中所有素材的id集合
+
+        素材列表只会在末尾追加元素, 因此仅需为上次查询后新增的元素建立索引
+        """
+        items: List[Any] = getattr(self, list_name)
+        indexed, ids = self._id_index.get(list_name, (0, set()))
+        if indexed > len(items):  # 列表被整体替换或删减, 重建索引
+            indexed, ids = 0, set()
+        for item in items[indexed:]:
+            ids.add(getattr(item, id_attr))
+        self._id_index[list_name] = (len(items), ids)
+        return ids
+
     @overload
     def __contains__(self, item: Union[VideoMaterial, AudioMaterial]) -> bool: ...
     @overload
@@ -79,21 +99,21 @@ class ScriptMaterial:
 
     def __contains__(self, item) -> bool:
         if isinstance(item, VideoMaterial):
-            return item.material_id in [video.material_id for video in self.videos]
+            return item.material_id in self._ids("videos", "material_id")
         elif isinstance(item, AudioMaterial):
-            return item.material_id in [audio.material_id for audio in self.audios]
+            return item.material_id in self._ids("audios", "material_id")
         elif isinstance(item, AudioFade):
-            return item.fade_id in [fade.fade_id for fade in self.audio_fades]
+            return item.fade_id in self._ids("audio_fades", "fade_id")
         elif isinstance(item, AudioEffect):
-            return item.effect_id in [effect.effect_id for effect in self.audio_effects]
+            return item.effect_id in self._ids("audio_effects", "effect_id")
         elif isinstance(item, SegmentAnimations):
-            return item.animation_id in [ani.animation_id for ani in self.animations]
+            return item.animation_id in self._ids("animations", "animation_id")
         elif isinstance(item, VideoEffect):
-            return item.global_id in [effect.global_id for effect in self.video_effects]
+            return item.global_id in self._ids("video_effects", "global_id")
         elif isinstance(item, Transition):
-            return item.global_id in [transition.global_id for transition in self.transitions]
+            return item.global_id in self._ids("transitions", "global_id")
         elif isinstance(item, Filter):
-            return item.global_id in [filter_.global_id for filter_ in self.filters]
+            return item.global_id in self._ids("filters", "global_id")
         else:
             raise TypeError("Invalid argument type '%s'" % type(item))
 
@@ -173,6 +193,13 @@ class ScriptFile:
     imported_tracks: List[ImportedTrack]
     """导入的轨道信息"""
 
+    _shared_materials: FrozenSet[int]
+    """与编译模板共享的导入素材(以`id()`标识), 修改前需先复制"""
+    _material_index: Optional[DraftIndex]
+    """导入素材的索引, 首次使用时建立"""
+    _segment_index: Optional[Dict[str, List[Tuple[EditableTrack, ImportedSegment]]]]
+    """导入轨道中素材id到片段的反向索引, 首次使用时建立, 片段的素材变化时失效"""
+
     def __init__(self, width: int, height: int, fps: int = 30):
         """**创建剪映草稿推荐使用`DraftFolder.create_draft()`而非此方法**
 
@@ -193,9 +220,11 @@ class ScriptFile:
 
         self.imported_materials = {}
         self.imported_tracks = []
+        self._shared_materials = frozenset()
+        self._material_index = None
+        self._segment_index = None
 
-        with open(assets.get_asset_path('DRAFT_CONTENT_TEMPLATE'), "r", encoding="utf-8") as f:
-            self.content = json.load(f)
+        self.content = json_util.load_file(assets.get_asset_path('DRAFT_CONTENT_TEMPLATE'))
 
     @staticmethod
     def load_template(json_path: str) -> "ScriptFile":
@@ -207,17 +236,30 @@ class ScriptFile:
         Raises:
             `FileNotFoundError`: JSON文件不存在
         """
-        obj = ScriptFile(**util.provide_ctor_defaults(ScriptFile))
-        obj.save_path = json_path
         if not os.path.exists(json_path):
             raise FileNotFoundError("JSON文件 '%s' 不存在" % json_path)
-        with open(json_path, "r", encoding="utf-8") as f:
-            obj.content = json.load(f)
+        return ScriptFile.from_content(json_util.load_file(json_path), json_path)
+
+    @staticmethod
+    def from_content(content: Dict[str, Any], save_path: Optional[str] = None) -> "ScriptFile":
+        """从已解析的草稿内容创建模板模式的草稿对象, 不读取磁盘
+
+        草稿对象直接沿用`content`中的素材列表, 因此之后对素材字典的原地修改仍会被导出;
+        轨道则被解析为轨道对象, 此后应通过草稿对象修改.
+
+        Args:
+            content (`Dict[str, Any]`): 草稿文件内容
+            save_path (`str`, optional): 保存路径, 供`save`使用
+        """
+        obj = ScriptFile(**util.provide_ctor_defaults(ScriptFile))
+        obj.save_path = save_path
+        obj.content = content
 
         util.assign_attr_with_json(obj, ["fps", "duration"], obj.content)
         util.assign_attr_with_json(obj, ["width", "height"], obj.content["canvas_config"])
 
-        obj.imported_materials = deepcopy(obj.content["materials"])
+        # 导出时会整体替换`content["materials"]`, 因此直接沿用已解析的素材, 无需深复制
+        obj.imported_materials = dict(obj.content["materials"])
         obj.imported_tracks = [import_track(track_data) for track_data in obj.content["tracks"]]
 
         return obj
@@ -301,7 +343,35 @@ class ScriptFile:
         target.add_segment(segment)
         self.duration = max(self.duration, segment.end)
 
-        # 自动添加相关素材
+        self._add_segment_materials(segment)
+        return self
+
+    def add_segments(self, segments: List[Union[VideoSegment, StickerSegment, AudioSegment, TextSegment]],
+                     track_name: Optional[str] = None) -> "ScriptFile":
+        """向指定轨道中批量添加同类型的片段, 比逐个调用`add_segment`更快, 尤其适合按时间顺序排列的大量片段
+
+        Args:
+            segments (`List[VideoSegment | StickerSegment | AudioSegment | TextSegment]`): 要添加的片段, 类型须相同
+            track_name (`str`, optional): 添加到的轨道名称. 当此类型的轨道仅有一条时可省略.
+
+        Raises:
+            `NameError`: 未找到指定名称的轨道, 或必须提供`track_name`参数时未提供
+            `TypeError`: 片段类型不匹配轨道类型
+            `SegmentOverlap`: 片段之间或与已有片段重叠
+        """
+        if len(segments) == 0:
+            return self
+        target = self._get_track(type(segments[0]), track_name)
+
+        target.add_segments(segments)
+        self.duration = max(self.duration, max(segment.end for segment in segments))
+
+        for segment in segments:
+            self._add_segment_materials(segment)
+        return self
+
+    def _add_segment_materials(self, segment: Union[VideoSegment, StickerSegment, AudioSegment, TextSegment]) -> None:
+        """自动添加片段相关的素材"""
         if isinstance(segment, VideoSegment):
             # 出入场等动画
             if (segment.animations_instance is not None) and (segment.animations_instance not in self.materials):
@@ -353,9 +423,7 @@ class ScriptFile:
         if isinstance(segment, (VideoSegment, AudioSegment)):
             self.add_material(segment.material_instance)
 
-        return self
-
-    def add_effect(self, effect: Union[VideoSceneEffectType, VideoCharacterEffectType],
+    def add_effect(self, effect: Union["VideoSceneEffectType", "VideoCharacterEffectType"],
                    t_range: Timerange, track_name: Optional[str] = None, *,
                    params: Optional[List[Optional[float]]] = None) -> "ScriptFile":
         """向指定的特效轨道中添加一个特效片段
@@ -384,7 +452,7 @@ class ScriptFile:
             self.materials.video_effects.append(segment.effect_inst)
         return self
 
-    def add_filter(self, filter_meta: FilterType, t_range: Timerange,
+    def add_filter(self, filter_meta: "FilterType", t_range: Timerange,
                    track_name: Optional[str] = None, intensity: float = 100.0) -> "ScriptFile":
         """向指定的滤镜轨道中添加一个滤镜片段
 
@@ -441,6 +509,7 @@ class ScriptFile:
         with open(srt_path, "r", encoding="utf-8-sig") as srt_file:
             lines = srt_file.readlines()
 
+        segments: List[TextSegment] = []
         def __add_text_segment(text: str, t_range: Timerange) -> None:
             if style_reference:
                 seg = TextSegment.create_from_template(text, t_range, style_reference)
@@ -448,7 +517,7 @@ class ScriptFile:
                     seg.clip_settings = deepcopy(clip_settings)
             else:
                 seg = TextSegment(text, t_range, style=text_style, clip_settings=clip_settings)
-            self.add_segment(seg, track_name)
+            segments.append(seg)
 
         index = 0
         text: str = ""
@@ -487,6 +556,7 @@ class ScriptFile:
         if len(text) > 0:
             __add_text_segment(text.strip(), text_trange)
 
+        self.add_segments(segments, track_name)
         return self
 
     def get_imported_track(self, track_type: Literal[TrackType.video, TrackType.audio, TrackType.text],
@@ -539,8 +609,9 @@ class ScriptFile:
             new_name (`str`, optional): 新轨道名称, 默认使用源轨道名称.
             relative_index (`int`, optional): 相对索引，用于调整导入轨道的渲染层级. 默认保持原有层级.
         """
-        # 直接拷贝原始轨道结构, 按需修改渲染层级
-        imported_track = deepcopy(track)
+        # 复制轨道的可修改部分(原始数据只读共享), 按需修改渲染层级
+        imported_track = track.fork()
+        self._segment_index = None
         if relative_index is not None:
             imported_track.render_index = track.track_type.value.render_index + relative_index
         if new_name is not None:
@@ -566,14 +637,13 @@ class ScriptFile:
             extra_refs: List[str] = segment.get("extra_material_refs", [])
             material_ids.update(extra_refs)
 
-        # 复制素材
-        for material_type, material_list in source_file.imported_materials.items():
-            for material in material_list:
-                if material.get("id") in material_ids:
-                    if material_type not in self.imported_materials:
-                        self.imported_materials[material_type] = []
-                    self.imported_materials[material_type].append(deepcopy(material))
-                    material_ids.remove(material.get("id"))
+        # 按素材在源文件中的顺序复制素材
+        locations = {material_id: source_file.material_index.locate_material(material_id) for material_id in material_ids}
+        for material_id, (material_type, index) in sorted(((mid, loc) for mid, loc in locations.items() if loc is not None),
+                                                          key=lambda item: item[1]):
+            # 素材只在顶层字段上修改, 浅复制即可
+            self.material_index.add_material(material_type, dict(source_file.imported_materials[material_type][index]))
+            material_ids.remove(material_id)
 
         assert len(material_ids) == 0, "未找到以下素材: %s" % material_ids
 
@@ -599,20 +669,21 @@ class ScriptFile:
         """
         video_mode = isinstance(material, VideoMaterial)
         # 查找素材
-        target_json_obj: Optional[Dict[str, Any]] = None
-        target_material_list = self.imported_materials["videos" if video_mode else "audios"]
+        material_type = "videos" if video_mode else "audios"
         name_key = "material_name" if video_mode else "name"
-        for mat in target_material_list:
-            if mat[name_key] == material_name:
-                if target_json_obj is not None:
-                    raise exceptions.AmbiguousMaterial(
-                        "找到多个名为 '%s', 类型为 '%s' 的素材" % (material_name, type(material)))
-                target_json_obj = mat
-        if target_json_obj is None:
+        locations = [location for location in self.material_index.find_materials(material_name, material_type)
+                     if self.imported_materials[material_type][location[1]].get(name_key) == material_name]
+        if len(locations) > 1:
+            raise exceptions.AmbiguousMaterial(
+                "找到多个名为 '%s', 类型为 '%s' 的素材" % (material_name, type(material)))
+        if len(locations) == 0:
             raise exceptions.MaterialNotFound("没有找到名为 '%s', 类型为 '%s' 的素材" % (material_name, type(material)))
+        target_index = locations[0][1]
 
         # 更新素材信息
-        target_json_obj.update({name_key: material.material_name, "path": material.path, "duration": material.duration})
+        target_json_obj = self._writable_material(material_type, target_index)
+        self.material_index.rename_material(locations[0], material.material_name, name_key)
+        target_json_obj.update({"path": material.path, "duration": material.duration})
         if video_mode:
             target_json_obj.update({"width": material.width, "height": material.height, "material_type": material.material_type})
             if replace_crop:
@@ -661,6 +732,7 @@ class ScriptFile:
 
         # 最后替换素材链接
         track.segments[segment_index].material_id = material.material_id
+        self._segment_index = None
         self.add_material(material)
 
         # TODO: 更新总长
@@ -697,12 +769,11 @@ class ScriptFile:
                     new_styles.append(style)
             return new_styles
 
-        replaced: bool = False
         material_id: str = track.segments[segment_index].material_id
+        location = self.material_index.locate_material(material_id)
         # 尝试在文本素材中替换
-        for mat in self.imported_materials["texts"]:
-            if mat["id"] != material_id:
-                continue
+        if location is not None and location[0] == "texts":
+            mat = self._writable_material("texts", location[1])
 
             if isinstance(text, list):
                 if len(text) != 1:
@@ -714,46 +785,105 @@ class ScriptFile:
                 content["styles"] = __recalc_style_range(len(content["text"]), len(text), content["styles"])
             content["text"] = text
             mat["content"] = json.dumps(content, ensure_ascii=False)
-            replaced = True
-            break
-        if replaced:
             return self
 
         # 尝试在文本模板中替换
-        for template in self.imported_materials["text_templates"]:
-            if template["id"] != material_id:
+        assert location is not None and location[0] == "text_templates", f"未找到指定片段的素材 {material_id}"
+        template = self.imported_materials["text_templates"][location[1]]
+
+        resources = template["text_info_resources"]
+        if isinstance(text, str):
+            text = [text]
+        if len(text) > len(resources):
+            raise ValueError(f"文字模板'{template['name']}'只有{len(resources)}段文本, 但提供了{len(text)}段替换内容")
+
+        for sub_material_id, new_text in zip(map(lambda x: x["text_material_id"], resources), text):
+            sub_location = self.material_index.locate_material(sub_material_id)
+            if sub_location is None or sub_location[0] != "texts":
                 continue
+            mat = self._writable_material("texts", sub_location[1])
+
+            try:
+                content = json.loads(mat["content"])
+                if recalc_style:
+                    content["styles"] = __recalc_style_range(len(content["text"]), len(new_text), content["styles"])
+                content["text"] = new_text
+                mat["content"] = json.dumps(content, ensure_ascii=False)
+            except json.JSONDecodeError:
+                mat["content"] = new_text
+            except TypeError:
+                mat["content"] = new_text
+
+        return self
+
+    def set_segment_speed(self, track: EditableTrack, segment_index: int, speed: float) -> "ScriptFile":
+        """修改指定音视频轨道上指定片段的播放速度
+
+        片段在轨道上的时长保持不变, 取用的素材时长(`source_timerange`)随速度相应伸缩
+
+        Args:
+            track (`EditableTrack`): 要修改的轨道, 由`get_imported_track`获取
+            segment_index (`int`): 片段下标, 从0开始
+            speed (`float`): 新的播放速度, 取值范围为0.1~42.0
+
+        Raises:
+            `IndexError`: `segment_index`越界
+            `TypeError`: 轨道类型不正确
+        """
+        if not isinstance(track, ImportedMediaTrack):
+            raise TypeError("指定的轨道(类型为 %s)不支持变速" % track.track_type)
+        if not 0 <= segment_index < len(track):
+            raise IndexError("片段下标 %d 超出 [0, %d) 的范围" % (segment_index, len(track)))
+        seg = track.segments[segment_index]
+
+        # 片段的原始数据可能与草稿内容或编译模板共享, 修改前先取得私有副本
+        raw_data = seg.writable_raw_data()
+        raw_data["speed"] = speed
+        extra_refs: List[str] = list(raw_data.get("extra_material_refs", []))
 
-            resources = template["text_info_resources"]
-            if isinstance(text, str):
-                text = [text]
-            if len(text) > len(resources):
-                raise ValueError(f"文字模板'{template['name']}'只有{len(resources)}段文本, 但提供了{len(text)}段替换内容")
-
-            for sub_material_id, new_text in zip(map(lambda x: x["text_material_id"], resources), text):
-                for mat in self.imported_materials["texts"]:
-                    if mat["id"] != sub_material_id:
-                        continue
-
-                    try:
-                        content = json.loads(mat["content"])
-                        if recalc_style:
-                            content["styles"] = __recalc_style_range(len(content["text"]), len(new_text), content["styles"])
-                        content["text"] = new_text
-                        mat["content"] = json.dumps(content, ensure_ascii=False)
-                    except json.JSONDecodeError:
-                        mat["content"] = new_text
-                    except TypeError:
-                        mat["content"] = new_text
-
-                    break
-            replaced = True
-            break
-
-        assert replaced, f"未找到指定片段的素材 {material_id}"
+        for ref in extra_refs:
+            location = self.material_index.locate_material(ref)
+            if location is not None and location[0] == "speeds":
+                self._writable_material("speeds", location[1])["speed"] = speed
+                break
+        else:
+            speed_obj = Speed(speed)
+            self.material_index.add_material("speeds", speed_obj.export_json())
+            extra_refs.append(speed_obj.global_id)
+            raw_data["extra_material_refs"] = extra_refs
 
+        seg.source_timerange = Timerange(seg.source_timerange.start, round(seg.duration * speed))
         return self
 
+    @property
+    def material_index(self) -> DraftIndex:
+        """导入素材的id及名称索引, 首次访问时建立"""
+        if self._material_index is None or self._material_index.materials is not self.imported_materials:
+            self._material_index = DraftIndex(self.imported_materials)
+        return self._material_index
+
+    def get_imported_material(self, material_id: str) -> Optional[Dict[str, Any]]:
+        """根据id查找导入的素材, 不存在时返回None"""
+        return self.material_index.get_material(material_id)
+
+    def get_segments_by_material(self, material_id: str) -> List[Tuple[EditableTrack, ImportedSegment]]:
+        """返回导入的轨道中引用指定素材的所有片段及其所在轨道"""
+        if self._segment_index is None:
+            self._segment_index = {}
+            for track in self.imported_tracks:
+                if isinstance(track, EditableTrack):
+                    for seg in track.segments:
+                        self._segment_index.setdefault(seg.material_id, []).append((track, seg))
+        return [(track, seg) for track, seg in self._segment_index.get(material_id, []) if seg.material_id == material_id]
+
+    def _writable_material(self, material_type: str, index: int) -> Dict[str, Any]:
+        """获取可修改的导入素材, 若该素材与编译模板共享则先替换为副本(写时复制)"""
+        mat = self.imported_materials[material_type][index]
+        if id(mat) in self._shared_materials:
+            mat = dict(mat)
+            self.imported_materials[material_type][index] = mat
+        return mat
+
     def inspect_material(self) -> None:
         """输出草稿中导入的贴纸、文本气泡以及花字素材的元数据"""
         print("贴纸素材:")
@@ -771,38 +901,150 @@ class ScriptFile:
             if effect["type"] == "text_effect":
                 print("\tResource id: %s '%s'" % (effect["resource_id"], effect.get("name", "")))
 
-    def dumps(self) -> str:
-        """将草稿文件内容导出为JSON字符串"""
+    def _prepare_export(self) -> Tuple[Dict[str, List[Any]], List[BaseTrack]]:
+        """更新草稿的基本信息, 返回待导出的素材字典及按渲染层级排序的轨道列表"""
         self.content["fps"] = self.fps
         self.content["duration"] = self.duration
         self.content["canvas_config"] = {"width": self.width, "height": self.height, "ratio": "original"}
-        self.content["materials"] = self.materials.export_json()
+        materials = self.materials.export_json()
 
         # 合并导入的素材
         for material_type, material_list in self.imported_materials.items():
-            if material_type not in self.content["materials"]:
-                self.content["materials"][material_type] = material_list
+            if material_type not in materials:
+                materials[material_type] = material_list
             else:
-                self.content["materials"][material_type].extend(material_list)
+                # 部分列表(如masks)直接引用了`self.materials`中的列表, 不能原地扩展
+                materials[material_type] = materials[material_type] + material_list
 
-        # 对轨道排序并导出
+        # 对轨道排序
         track_list: List[BaseTrack] = list(self.imported_tracks + list(self.tracks.values()))  # 新加入的轨道在列表末尾（上层）
         track_list.sort(key=lambda track: track.render_index)
+        return materials, track_list
+
+    def dumps(self, *, compact: bool = False) -> str:
+        """将草稿文件内容导出为JSON字符串
+
+        Args:
+            compact (`bool`, optional): 是否使用无缩进的紧凑格式, 剪映可正常读取且体积更小、序列化更快. 默认为否.
+        """
+        return json_util.dumps(self.export_content(), indent=4, compact=compact)
+
+    def export_content(self) -> Dict[str, Any]:
+        """将素材与轨道导出到`content`中, 返回完整的草稿内容"""
+        materials, track_list = self._prepare_export()
+        self.content["materials"] = materials
         self.content["tracks"] = [track.export_json() for track in track_list]
+        return self.content
+
+    def dump(self, file_path: str, *, indent: int = 4, compact: bool = False) -> None:
+        """将草稿文件内容写入文件
+
+        素材和轨道被逐个导出并直接写入文件, 不在内存中构造完整的JSON字符串;
+        内容先写入临时文件再替换目标文件, 写入中途出错不会破坏原有草稿
+
+        Args:
+            file_path (`str`): 写入的文件路径
+            indent (`int`, optional): 缩进空格数, 默认为4.
+            compact (`bool`, optional): 是否使用无缩进的紧凑格式, 默认为否.
+        """
+        materials, track_list = self._prepare_export()
+        streamed_parts = {
+            "materials": json_util.StreamedDict((material_type, json_util.StreamedList(material_list))
+                                                for material_type, material_list in materials.items()),
+            "tracks": json_util.StreamedList(track.export_json() for track in track_list),
+        }
 
-        return json.dumps(self.content, ensure_ascii=False, indent=4)
+        def content_items():
+            for key, value in self.content.items():
+                yield key, streamed_parts.pop(key, value)
+            yield from streamed_parts.items()
 
-    def dump(self, file_path: str) -> None:
-        """将草稿文件内容写入文件"""
-        with open(file_path, "w", encoding="utf-8") as f:
-            f.write(self.dumps())
+        json_util.atomic_write(file_path, lambda f: json_util.dump_stream(json_util.StreamedDict(content_items()), f,
+                                                                          indent=indent, compact=compact))
 
-    def save(self) -> None:
+    def save(self, *, compact: bool = False) -> None:
         """保存草稿文件至打开时的路径
 
+        Args:
+            compact (`bool`, optional): 是否使用无缩进的紧凑格式, 默认为否.
+
         Raises:
             `ValueError`: 没有设置保存路径
         """
         if self.save_path is None:
             raise ValueError("没有设置保存路径, 可能不在模板模式下")
-        self.dump(self.save_path)
+        self.dump(self.save_path, compact=compact)
+
+class CompiledTemplate:
+    """只解析一次、可反复实例化的草稿模板
+
+    模板内容在编译后视为只读, 每个实例仅复制轨道与片段的可修改部分以及各素材列表本身,
+    素材字典在被修改时才复制(写时复制), 因此实例化开销与改动量而非模板大小相关
+    """
+
+    content: Dict[str, Any]
+    """模板的草稿内容, 只读"""
+    width: int
+    height: int
+    fps: int
+    duration: int
+
+    imported_materials: Dict[str, List[Dict[str, Any]]]
+    """模板的素材信息, 只读"""
+    imported_tracks: List[ImportedTrack]
+    """模板的轨道信息, 实例化时复制"""
+
+    def __init__(self, content: Dict[str, Any]):
+        """从已解析的草稿内容编译模板, 编译后不应再修改`content`
+
+        Args:
+            content (`Dict[str, Any]`): 草稿文件内容
+        """
+        self.content = content
+        util.assign_attr_with_json(self, ["fps", "duration"], content)
+        util.assign_attr_with_json(self, ["width", "height"], content["canvas_config"])
+
+        self.imported_materials = content["materials"]
+        self.imported_tracks = [import_track(track_data) for track_data in content["tracks"]]
+        self._material_ids = frozenset(id(mat) for mat_list in self.imported_materials.values()
+                                       if isinstance(mat_list, list) for mat in mat_list)
+        self._index = DraftIndex(self.imported_materials)
+
+    @staticmethod
+    def load(json_path: str) -> "CompiledTemplate":
+        """从JSON文件编译草稿模板
+
+        Args:
+            json_path (`str`): JSON文件路径
+
+        Raises:
+            `FileNotFoundError`: JSON文件不存在
+        """
+        if not os.path.exists(json_path):
+            raise FileNotFoundError("JSON文件 '%s' 不存在" % json_path)
+        return CompiledTemplate(json_util.load_file(json_path))
+
+    def instantiate(self, save_path: Optional[str] = None) -> ScriptFile:
+        """以此模板为基础创建一个新的草稿文件对象, 不读取磁盘
+
+        Args:
+            save_path (`str`, optional): 新草稿的保存路径, 供`ScriptFile.save`使用
+        """
+        script = ScriptFile.__new__(ScriptFile)
+        script.save_path = save_path
+        script.content = dict(self.content)  # 导出时只替换顶层字段, 浅复制即可
+
+        script.width, script.height = self.width, self.height
+        script.fps, script.duration = self.fps, self.duration
+
+        script.materials = ScriptMaterial()
+        script.tracks = {}
+
+        script.imported_materials = {material_type: list(mat_list) if isinstance(mat_list, list) else mat_list
+                                     for material_type, mat_list in self.imported_materials.items()}
+        script.imported_tracks = [track.fork() for track in self.imported_tracks]
+        script._shared_materials = self._material_ids
+        script._material_index = self._index.copy_for(script.imported_materials)
+        script._segment_index = None
+
+        return script
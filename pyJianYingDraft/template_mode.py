@@ -1,7 +1,7 @@
 """与模板模式相关的类及函数等"""
 
 from enum import Enum
-from copy import deepcopy
+from copy import copy
 
 from . import util
 from . import exceptions
@@ -41,19 +41,39 @@ class ExtendMode(Enum):
     """延伸尾部, 若有必要则依次后移后续片段, 此方法总是成功"""
 
 class ImportedSegment(BaseSegment):
-    """导入的片段"""
+    """导入的片段
+
+    原始json数据以引用方式持有, 可能与草稿内容、编译模板或其它片段共享, 因而只读;
+    可修改的字段(素材id及时间范围)保存为属性, 导出时覆盖到原始数据的浅副本之上.
+    需要修改其它字段时应通过`writable_raw_data`获取私有副本.
+    """
 
     raw_data: Dict[str, Any]
-    """原始json数据"""
+    """原始json数据, 只读"""
 
     __DATA_ATTRS = ["material_id", "target_timerange"]
     def __init__(self, json_data: Dict[str, Any]):
-        self.raw_data = deepcopy(json_data)
+        self.raw_data = json_data
+        self._owns_raw_data = False
 
         util.assign_attr_with_json(self, self.__DATA_ATTRS, json_data)
 
+    def writable_raw_data(self) -> Dict[str, Any]:
+        """返回可修改的原始json数据, 首次调用时将其替换为本片段私有的浅副本(写时复制)"""
+        if not self._owns_raw_data:
+            self.raw_data = dict(self.raw_data)
+            self._owns_raw_data = True
+        return self.raw_data
+
+    def fork(self) -> "ImportedSegment":
+        """复制片段的可修改部分, 原始json数据与原片段共享"""
+        ret = copy(self)
+        ret.target_timerange = Timerange(self.target_timerange.start, self.target_timerange.duration)
+        ret._owns_raw_data = False
+        return ret
+
     def export_json(self) -> Dict[str, Any]:
-        json_data = deepcopy(self.raw_data)
+        json_data = dict(self.raw_data)
         json_data.update(util.export_attr_to_json(self, self.__DATA_ATTRS))
         return json_data
 
@@ -69,6 +89,11 @@ class ImportedMediaSegment(ImportedSegment):
 
         util.assign_attr_with_json(self, self.__DATA_ATTRS, json_data)
 
+    def fork(self) -> "ImportedMediaSegment":
+        ret = super().fork()
+        ret.source_timerange = Timerange(self.source_timerange.start, self.source_timerange.duration)
+        return ret
+
     def export_json(self) -> Dict[str, Any]:
         json_data = super().export_json()
         json_data.update(util.export_attr_to_json(self, self.__DATA_ATTRS))
@@ -79,7 +104,7 @@ class ImportedTrack(BaseTrack):
     """模板模式下导入的轨道"""
 
     raw_data: Dict[str, Any]
-    """原始轨道数据"""
+    """原始轨道数据, 以引用方式持有, 只读"""
 
     def __init__(self, json_data: Dict[str, Any]):
         self.track_type = TrackType.from_name(json_data["type"])
@@ -87,10 +112,14 @@ class ImportedTrack(BaseTrack):
         self.track_id = json_data["id"]
         self.render_index = max([int(seg["render_index"]) for seg in json_data["segments"]], default=0)
 
-        self.raw_data = deepcopy(json_data)
+        self.raw_data = json_data
+
+    def fork(self) -> "ImportedTrack":
+        """复制轨道的可修改部分, 原始轨道数据与原轨道共享"""
+        return copy(self)
 
     def export_json(self) -> Dict[str, Any]:
-        ret = deepcopy(self.raw_data)
+        ret = dict(self.raw_data)
         ret.update({
             "name": self.name,
             "id": self.track_id
@@ -120,6 +149,11 @@ class EditableTrack(ImportedTrack):
             return 0
         return self.segments[-1].target_timerange.end
 
+    def fork(self) -> "EditableTrack":
+        ret = super().fork()
+        ret.segments = [seg.fork() for seg in self.segments]
+        return ret
+
     def export_json(self) -> Dict[str, Any]:
         ret = super().export_json()
         # 为每个片段写入render_index
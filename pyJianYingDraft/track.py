@@ -1,10 +1,11 @@
 """轨道类及其元数据"""
 
 import uuid
+import bisect
 
 from enum import Enum
 from typing import TypeVar, Generic, Type
-from typing import Dict, List, Any, Union
+from typing import Dict, List, Iterable, Any, Union
 from dataclasses import dataclass
 from abc import ABC, abstractmethod
 
@@ -76,7 +77,10 @@ class Track(BaseTrack, Generic[Seg_type]):
     """是否静音"""
 
     segments: List[Seg_type]
-    """该轨道包含的片段列表"""
+    """该轨道包含的片段列表, 按起始时间排序; 直接修改片段的时间范围后须调用`reindex()`"""
+
+    _starts: List[int]
+    """与`segments`一一对应的片段起始时间, 用于二分查找插入位置"""
 
     def __init__(self, track_type: TrackType, name: str, render_index: int, mute: bool):
         self.track_type = track_type
@@ -86,6 +90,7 @@ class Track(BaseTrack, Generic[Seg_type]):
 
         self.mute = mute
         self.segments = []
+        self._starts = []
 
     @property
     def end_time(self) -> int:
@@ -111,16 +116,80 @@ class Track(BaseTrack, Generic[Seg_type]):
         """
         if not isinstance(segment, self.accept_segment_type):
             raise TypeError("New segment (%s) is not of the same type as the track (%s)" % (type(segment), self.accept_segment_type))
-
-        # 检查片段是否重叠
-        for seg in self.segments:
+        self._sync_starts()
+
+        # 片段按起始时间有序且互不重叠, 只需检查插入位置前后的片段
+        start = segment.target_timerange.start
+        pos = bisect.bisect_right(self._starts, start)
+        if pos > 0 and self.segments[pos - 1].overlaps(segment):
+            self._raise_overlap(segment)
+        for seg in self.segments[pos:]:
+            if seg.target_timerange.start >= segment.target_timerange.end:
+                break
             if seg.overlaps(segment):
-                raise SegmentOverlap("New segment overlaps with existing segment [start: {}, end: {}]"
-                                     .format(segment.target_timerange.start, segment.target_timerange.end))
+                self._raise_overlap(segment)
+
+        self.segments.insert(pos, segment)
+        self._starts.insert(pos, start)
+        return self
+
+    def add_segments(self, segments: Iterable[Seg_type]) -> "Track[Seg_type]":
+        """向轨道中批量添加片段, 一次性完成类型与重叠检查; 任一片段不合法时不添加任何片段
+
+        按起始时间排好序的批次(如字幕)只需线性时间即可完成检查与合并
+
+        Args:
+            segments (`Iterable[Seg_type]`): 要添加的片段
 
-        self.segments.append(segment)
+        Raises:
+            `TypeError`: 有片段类型与轨道类型不匹配
+            `SegmentOverlap`: 片段之间或与现有片段重叠
+        """
+        batch = list(segments)
+        for segment in batch:
+            if not isinstance(segment, self.accept_segment_type):
+                raise TypeError("New segment (%s) is not of the same type as the track (%s)" % (type(segment), self.accept_segment_type))
+        self._sync_starts()
+        batch.sort(key=lambda seg: seg.target_timerange.start)  # 对已排序的输入为线性时间
+
+        # 归并现有片段与新片段, 同时检查相邻片段是否重叠
+        merged: List[Seg_type] = []
+        i = j = 0
+        while i < len(self.segments) or j < len(batch):
+            from_batch = j < len(batch) and (i == len(self.segments) or batch[j].target_timerange.start < self._starts[i])
+            if from_batch:
+                seg = batch[j]
+                j += 1
+            else:
+                seg = self.segments[i]
+                i += 1
+            if merged and merged[-1].overlaps(seg):
+                self._raise_overlap(seg if from_batch else merged[-1])  # 现有片段之间不会重叠
+            merged.append(seg)
+
+        self.segments = merged
+        self._starts = [seg.target_timerange.start for seg in merged]
         return self
 
+    def reindex(self) -> None:
+        """按起始时间重新排序片段并重建起始时间索引
+
+        直接修改了片段的时间范围, 或替换了`segments`中的片段后, 须调用本方法再继续添加片段;
+        只是直接增删片段时无需调用, 下次添加片段时会自动重建
+        """
+        self.segments.sort(key=lambda seg: seg.target_timerange.start)
+        self._starts = [seg.target_timerange.start for seg in self.segments]
+
+    def _sync_starts(self) -> None:
+        """若片段列表在外部增删过片段(长度与索引不一致), 则重建起始时间索引"""
+        if len(self._starts) != len(self.segments):
+            self.reindex()
+
+    @staticmethod
+    def _raise_overlap(segment: BaseSegment) -> None:
+        raise SegmentOverlap("New segment overlaps with existing segment [start: {}, end: {}]"
+                             .format(segment.target_timerange.start, segment.target_timerange.end))
+
     def export_json(self) -> Dict[str, Any]:
         # 为每个片段写入render_index
         segment_exports = [seg.export_json() for seg in self.segments]
@@ -6,7 +6,7 @@
 import uuid
 from copy import deepcopy
 
-from typing import Optional, Literal, Union
+from typing import Optional, Literal, Union, TYPE_CHECKING
 from typing import Dict, List, Tuple, Any
 
 from .time_util import tim, Timerange
@@ -14,10 +14,14 @@ from .segment import VisualSegment, ClipSettings
 from .local_materials import VideoMaterial
 from .animation import SegmentAnimations, VideoAnimation
 
+from . import metadata
 from .metadata import EffectMeta, EffectParamInstance
-from .metadata import MaskMeta, MaskType, FilterType, TransitionType
-from .metadata import IntroType, OutroType, GroupAnimationType
-from .metadata import VideoSceneEffectType, VideoCharacterEffectType
+from .metadata import MaskMeta, MaskType
+
+if TYPE_CHECKING:
+    from .metadata import FilterType, TransitionType
+    from .metadata import IntroType, OutroType, GroupAnimationType
+    from .metadata import VideoSceneEffectType, VideoCharacterEffectType
 
 class Mask:
     """蒙版对象"""
@@ -98,7 +102,7 @@ class VideoEffect:
 
     adjust_params: List[EffectParamInstance]
 
-    def __init__(self, effect_meta: Union[VideoSceneEffectType, VideoCharacterEffectType],
+    def __init__(self, effect_meta: Union["VideoSceneEffectType", "VideoCharacterEffectType"],
                  params: Optional[List[Optional[float]]] = None, *,
                  apply_target_type: Literal[0, 2] = 0):
         """根据给定的特效元数据及参数列表构造一个视频特效对象, params的范围是0~100"""
@@ -109,9 +113,9 @@ class VideoEffect:
         self.resource_id = effect_meta.value.resource_id
         self.adjust_params = []
 
-        if isinstance(effect_meta, VideoSceneEffectType):
+        if isinstance(effect_meta, metadata.VideoSceneEffectType):
             self.effect_type = "video_effect"
-        elif isinstance(effect_meta, VideoCharacterEffectType):
+        elif isinstance(effect_meta, metadata.VideoCharacterEffectType):
             self.effect_type = "face_effect"
         else:
             raise TypeError("Invalid effect meta type %s" % type(effect_meta))
@@ -218,7 +222,7 @@ class Transition:
     is_overlap: bool
     """是否与上一个片段重叠(?)"""
 
-    def __init__(self, effect_meta: TransitionType, duration: Optional[int] = None):
+    def __init__(self, effect_meta: "TransitionType", duration: Optional[int] = None):
         """根据给定的转场元数据及持续时间构造一个转场对象"""
         self.name = effect_meta.value.name
         self.global_id = uuid.uuid4().hex
@@ -346,7 +350,7 @@ class VideoSegment(VisualSegment):
         self.mask = None
         self.background_filling = None
 
-    def add_animation(self, animation_type: Union[IntroType, OutroType, GroupAnimationType],
+    def add_animation(self, animation_type: Union["IntroType", "OutroType", "GroupAnimationType"],
                       duration: Optional[Union[int, str]] = None) -> "VideoSegment":
         """将给定的入场/出场/组合动画添加到此片段的动画列表中
 
@@ -357,13 +361,13 @@ class VideoSegment(VisualSegment):
         """
         if duration is not None:
             duration = tim(duration)
-        if isinstance(animation_type, IntroType):
+        if isinstance(animation_type, metadata.IntroType):
             start = 0
             duration = duration or animation_type.value.duration
-        elif isinstance(animation_type, OutroType):
+        elif isinstance(animation_type, metadata.OutroType):
             duration = duration or animation_type.value.duration
             start = self.target_timerange.duration - duration
-        elif isinstance(animation_type, GroupAnimationType):
+        elif isinstance(animation_type, metadata.GroupAnimationType):
             start = 0
             duration = duration or self.target_timerange.duration
         else:
@@ -377,7 +381,7 @@ class VideoSegment(VisualSegment):
 
         return self
 
-    def add_effect(self, effect_type: Union[VideoSceneEffectType, VideoCharacterEffectType],
+    def add_effect(self, effect_type: Union["VideoSceneEffectType", "VideoCharacterEffectType"],
                    params: Optional[List[Optional[float]]] = None) -> "VideoSegment":
         """为视频片段添加一个作用于整个片段的特效
 
@@ -398,7 +402,7 @@ class VideoSegment(VisualSegment):
 
         return self
 
-    def add_filter(self, filter_type: FilterType, intensity: float = 100.0) -> "VideoSegment":
+    def add_filter(self, filter_type: "FilterType", intensity: float = 100.0) -> "VideoSegment":
         """为视频片段添加一个滤镜
 
         Args:
@@ -447,7 +451,7 @@ class VideoSegment(VisualSegment):
         self.extra_material_refs.append(self.mask.global_id)
         return self
 
-    def add_transition(self, transition_type: TransitionType, *, duration: Optional[Union[int, str]] = None) -> "VideoSegment":
+    def add_transition(self, transition_type: "TransitionType", *, duration: Optional[Union[int, str]] = None) -> "VideoSegment":
         """为视频片段添加转场, 注意转场应当添加在**前面的**片段上
 
         Args:
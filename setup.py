@@ -10,7 +10,8 @@ setup(
     url="https://github.com/GuanYixuan/pyJianYingDraft",
     packages=["pyJianYingDraft"],
     package_data={
-        'pyJianYingDraft.assets': ['*.json']
+        'pyJianYingDraft.assets': ['*.json'],
+        'pyJianYingDraft.metadata': ['catalog.bin']
     },
     classifiers=[
         "Programming Language :: Python :: 3",
@@ -23,4 +24,8 @@ setup(
         "imageio",
         "uiautomation>=2; sys_platform == 'win32'"
     ],
+    extras_require={
+        "fast": ["orjson"],
+        "search": ["pypinyin"]
+    },
 )
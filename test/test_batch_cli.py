@@ -12,6 +12,7 @@ from pathlib import Path
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
+import pyJianYingDraft as draft
 from examples.interactive_cli import BatchDraftProcessor
 
 
@@ -91,6 +92,27 @@ def test_material_scanning():
         return False
 
 
+def test_update_root_meta_info(tmp_path):
+    """测试新草稿被加入剪映根索引, 已有的草稿条目被更新"""
+    other = {"draft_name": "其它草稿", "draft_fold_path": str(tmp_path / "其它草稿")}
+    draft.json_util.dump_file({"all_draft_store": [other], "root_path": str(tmp_path)},
+                              str(tmp_path / "root_meta_info.json"))
+    draft_path = tmp_path / "新草稿"
+    draft_path.mkdir()
+    draft.json_util.dump_file({"draft_id": "ABC", "tm_duration": 5000000}, str(draft_path / "draft_meta_info.json"))
+
+    processor = BatchDraftProcessor()
+    processor.draft_folder_path = str(tmp_path)
+    processor.update_root_meta_info("新草稿", str(draft_path))
+    processor.update_root_meta_info("新草稿", str(draft_path))
+
+    root_meta = draft.json_util.load_file(str(tmp_path / "root_meta_info.json"))
+    entries = root_meta["all_draft_store"]
+    assert [entry["draft_name"] for entry in entries] == ["其它草稿", "新草稿"]
+    assert entries[1]["draft_id"] == "ABC" and entries[1]["tm_duration"] == 5000000
+    assert entries[1]["draft_fold_path"] == str(draft_path)
+
+
 def test_draft_info_loading():
     """测试草稿信息加载功能"""
     print("\n=== 测试草稿信息加载功能 ===")
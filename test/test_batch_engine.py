@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试批量草稿并行生成引擎
+"""
+
+import random
+import sys
+import time
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from examples.batch_engine import ParallelBatchEngine, plan_batch_tasks
+
+
+class FakeDraftFolder:
+    def __init__(self):
+        self.drafts = set()
+
+    def has_draft(self, name):
+        return name in self.drafts
+
+    def remove(self, name):
+        self.drafts.discard(name)
+
+
+class FakeProcessor:
+    """模拟批量处理器, 随机延迟并让指定组合第一次替换失败"""
+
+    def __init__(self, flaky_names=()):
+        self.selected_draft = "模板"
+        self.draft_folder = FakeDraftFolder()
+        self.flaky_names = set(flaky_names)
+
+    def generate_chinese_combo_name(self, combination):
+        return "".join(combination["names"])
+
+    def copy_single_draft(self, target_name):
+        time.sleep(random.random() * 0.01)
+        self.draft_folder.drafts.add(target_name)
+        return True
+
+    def replace_materials_for_draft(self, draft_name, combination):
+        time.sleep(random.random() * 0.01)
+        if draft_name in self.flaky_names:
+            self.flaky_names.discard(draft_name)
+            return False
+        return True
+
+
+def make_combinations():
+    # 第2、3个组合名称相同, 需要追加序号
+    return [{"names": ["甲", "乙"]}, {"names": ["丙"]}, {"names": ["丙"]}, {"names": ["丁"]}] * 3
+
+
+def test_plan_is_deterministic():
+    """测试目标名称的预先分配与串行规则一致"""
+    tasks = plan_batch_tasks(FakeProcessor(), make_combinations())
+    names = [task.target_name for task in tasks]
+
+    assert names[:4] == ["模板_甲乙", "模板_丙", "模板_丙_1", "模板_丁"]
+    assert names[4:8] == ["模板_甲乙_1", "模板_丙_2", "模板_丙_3", "模板_丁_1"]
+    assert len(set(names)) == len(names)
+    assert [task.index for task in tasks] == list(range(1, len(tasks) + 1))
+
+
+def test_parallel_mapping_matches_serial():
+    """测试并行处理得到的组合映射与串行处理完全一致, 且失败会被重试"""
+    combinations = make_combinations()
+
+    serial_processor = FakeProcessor()
+    serial_tasks = plan_batch_tasks(serial_processor, combinations)
+    serial_results = ParallelBatchEngine(serial_processor, workers=1, retry_delay=0).run(serial_tasks)
+
+    parallel_processor = FakeProcessor(flaky_names=["模板_丙_1"])
+    parallel_tasks = plan_batch_tasks(parallel_processor, combinations)
+    completed = []
+    parallel_results = ParallelBatchEngine(parallel_processor, workers=4, retry_delay=0).run(
+        parallel_tasks, on_result=lambda task, result: completed.append(task.index))
+
+    assert sorted(completed) == [task.index for task in parallel_tasks]
+    assert [r.index for r in parallel_results] == [t.index for t in parallel_tasks]
+    assert all(r.success for r in parallel_results)
+    assert parallel_results[2].attempts == 2
+    assert set(parallel_results[0].timings) == {"copy", "replace"}
+
+    serial_mapping = ParallelBatchEngine.build_combination_mapping(serial_tasks, serial_results)
+    parallel_mapping = ParallelBatchEngine.build_combination_mapping(parallel_tasks, parallel_results)
+    assert serial_mapping == parallel_mapping
+    assert parallel_mapping[2]["actual_draft_name"] == "模板_丙_1"
+    assert parallel_mapping[2]["target_name"] == "模板_丙"
+
+
+if __name__ == "__main__":
+    test_plan_is_deterministic()
+    test_parallel_mapping_matches_serial()
+    print("✅ 并行批量引擎测试通过")
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试按任务配置无交互地批量生成草稿
+"""
+
+import io
+import os
+import sys
+import json
+import shutil
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import pyJianYingDraft as draft
+import video_duplicate_checker
+from pyJianYingDraft import trange
+from examples.batch_job import JobSpecError, HeadlessBatchProcessor, normalize_job_spec, run_job_file
+
+TEST_VIDEO = os.path.join(project_root, "examples", "tests", "test_videos", "test_video.mp4")
+
+
+def make_job(tmp_path, **overrides):
+    """创建含一个视频片段和一个文本片段的模板草稿, 以及两个替换视频和两条标题"""
+    drafts = tmp_path / "drafts"
+    (drafts / "模板").mkdir(parents=True)
+    script = draft.ScriptFile(1920, 1080)
+    script.add_track(draft.TrackType.video).add_track(draft.TrackType.text)
+    script.add_segment(draft.VideoSegment(draft.VideoMaterial(TEST_VIDEO, material_name="part1.mp4"), trange("0s", "2s")))
+    script.add_segment(draft.TextSegment("原标题", trange("0s", "2s")))
+    script.dump(str(drafts / "模板" / "draft_info.json"))
+    (drafts / "模板" / "draft_meta_info.json").write_text("{}", encoding="utf-8")
+
+    materials = tmp_path / "materials"
+    (materials / "part1").mkdir(parents=True)
+    for name in ("甲.mp4", "乙.mp4"):
+        shutil.copy(TEST_VIDEO, materials / "part1" / name)
+    (materials / "text").mkdir()
+    (materials / "text" / "content.txt").write_text("标题一#标题二", encoding="utf-8")
+
+    spec = {"draft_folder": str(drafts), "template": "模板", "materials_folder": str(materials),
+            "text": {"content_track": 1}, **overrides}
+    spec_path = tmp_path / "job.json"
+    spec_path.write_text(json.dumps(spec, ensure_ascii=False), encoding="utf-8")
+    return spec_path, drafts
+
+
+def run(spec_path):
+    events = io.StringIO()
+    code = run_job_file(str(spec_path), events, log=io.StringIO())
+    return code, [json.loads(line) for line in events.getvalue().splitlines()]
+
+
+def test_normalize_job_spec():
+    """测试任务配置的默认值与校验"""
+    job = normalize_job_spec({"template": "模板", "materials_folder": "m", "audio": True, "shard": "2/3"})
+    assert job["timeline_mode"] == "speed_adjust"
+    assert job["audio"]["volume"] == 100 and job["background_music"] is None
+    assert job["shard"] == (2, 3)
+
+    for bad in ({"materials_folder": "m"},
+                {"template": "模板", "materials_folder": "m", "timeline_mode": "slow"},
+                {"template": "模板", "materials_folder": "m", "worker": 2},
+                {"template": "模板", "materials_folder": "m", "audio": {"volume": 2000}},
+                {"template": "模板", "materials_folder": "m", "text": {"content_track": None}}):
+        with pytest.raises(JobSpecError):
+            normalize_job_spec(bad)
+
+
+def test_prompts_are_errors():
+    """测试无交互处理器不会等待输入"""
+    processor = HeadlessBatchProcessor(normalize_job_spec({"template": "模板", "materials_folder": "m"}))
+    with pytest.raises(JobSpecError):
+        processor.get_user_choice(["是", "否"], "是否继续")
+    assert processor.confirm("确认?")
+
+
+def test_run_job_end_to_end(tmp_path):
+    """测试完整流程的事件输出、生成结果及重新运行时的跳过"""
+    # 两个替换视频是同一文件的副本, 关闭重复素材预检以生成两个组合
+    spec_path, drafts = make_job(tmp_path, screen_duplicates=False)
+    code, events = run(spec_path)
+    assert code == 0, events
+    assert [event["event"] for event in events][0] == "start"
+    tasks = [event for event in events if event["event"] == "task"]
+    assert [task["success"] for task in tasks] == [True, True]
+    done = events[-1]
+    assert done["event"] == "done" and done["succeeded"] == 2
+
+    texts = []
+    for name in done["drafts"]:
+        content = draft.json_util.load_file(str(drafts / name / "draft_info.json"))
+        texts.append(json.loads(content["materials"]["texts"][0]["content"])["text"])
+    assert sorted(texts) == ["标题一", "标题二"]
+
+    code, events = run(spec_path)
+    assert code == 0
+    assert all(event["skipped"] for event in events if event["event"] == "task")
+
+
+def test_run_job_reports_spec_errors(tmp_path):
+    """测试配置错误以error事件和退出码2报告"""
+    spec_path, _ = make_job(tmp_path, template="不存在的模板")
+    code, events = run(spec_path)
+    assert code == 2
+    assert events[-1]["event"] == "error" and "不存在的模板" in events[-1]["message"]
+
+
+def test_settings_file_defaults(tmp_path):
+    """测试以ConfigManager的配置文件为默认值, 任务配置中的选项优先"""
+    settings = json.loads((project_root / "utils" / "config" / "settings.json").read_text(encoding="utf-8"))
+    settings["replacement_settings"]["length_handle"]["value"] = 2
+    settings_path = tmp_path / "settings.json"
+    settings_path.write_text(json.dumps(settings, ensure_ascii=False), encoding="utf-8")
+
+    job = normalize_job_spec({"settings_file": str(settings_path), "materials_folder": "m"})
+    assert job["template"] == settings["template"]["name"]
+    assert job["draft_folder"] == settings["paths"]["draft_folder"]
+    assert job["materials_folder"] == "m"
+    assert job["timeline_mode"] == "crop_end"
+    assert job["replacement_mode"] == "video"
+
+
+def test_duplicate_screening(tmp_path, monkeypatch):
+    """测试生成组合前合并同一part文件夹中的重复素材, 且再次运行时指纹取自探测缓存"""
+    spec_path, drafts = make_job(tmp_path)
+    cache = draft.ProbeCache(str(tmp_path / "cache.sqlite3"))
+    draft.set_probe_cache(cache)
+    try:
+        code, events = run(spec_path)
+        assert code == 0, events
+        duplicates = [event for event in events if event["event"] == "duplicates"]
+        assert [(event["folder"], event["groups"]) for event in duplicates] == [("part1", [["乙.mp4", "甲.mp4"]])]
+        assert [event["combinations"] for event in events if event["event"] == "plan"] == [1]
+
+        def fail(path):
+            raise AssertionError(f"{path} 的指纹应取自缓存")
+        monkeypatch.setattr(video_duplicate_checker, "full_file_hash", fail)
+        monkeypatch.setattr(video_duplicate_checker, "video_fingerprint", fail)
+        code, events = run(spec_path)
+        assert code == 0, events
+        assert any(event["event"] == "duplicates" for event in events)
+    finally:
+        draft.set_probe_cache(None)
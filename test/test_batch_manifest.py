@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试批量生成的运行清单: 断点续跑与分片
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from examples.batch_engine import ParallelBatchEngine, plan_batch_tasks
+from examples.batch_manifest import BatchManifest, parse_shard, shard_tasks
+
+
+class FakeDraftFolder:
+    def __init__(self):
+        self.drafts = set()
+
+    def has_draft(self, name):
+        return name in self.drafts
+
+    def remove(self, name):
+        self.drafts.discard(name)
+
+
+class FakeProcessor:
+    """模拟批量处理器, 记录调用并让指定草稿的替换失败"""
+
+    def __init__(self, draft_folder=None, failing_names=()):
+        self.selected_draft = "模板"
+        self.draft_folder = draft_folder or FakeDraftFolder()
+        self.failing_names = set(failing_names)
+        self.copied = []
+        self.replaced = []
+
+    def generate_chinese_combo_name(self, combination):
+        return combination["name"]
+
+    def copy_single_draft(self, target_name):
+        self.copied.append(target_name)
+        self.draft_folder.drafts.add(target_name)
+        return True
+
+    def replace_materials_for_draft(self, draft_name, combination):
+        self.replaced.append(draft_name)
+        return draft_name not in self.failing_names
+
+
+COMBINATIONS = [{"name": name} for name in "甲乙丙丁戊己"]
+
+
+def run(processor, manifest, tasks=None, stage_resume=True):
+    tasks = tasks or plan_batch_tasks(processor, COMBINATIONS)
+    engine = ParallelBatchEngine(processor, workers=1, max_retries=1, retry_delay=0,
+                                 manifest=manifest, stage_resume=stage_resume)
+    try:
+        return engine.run(tasks)
+    finally:
+        manifest.close()
+
+
+def test_resume_skips_completed(tmp_path):
+    """测试重新运行时跳过已完成的组合, 已复制的草稿只重做替换阶段"""
+    folder = FakeDraftFolder()
+    first = FakeProcessor(folder, failing_names=["模板_丙"])
+    results = run(first, BatchManifest(str(tmp_path), "模板"))
+    assert [result.success for result in results] == [True, True, False, True, True, True]
+
+    second = FakeProcessor(folder)
+    results = run(second, BatchManifest(str(tmp_path), "模板"))
+    assert all(result.success for result in results)
+    assert [result.skipped for result in results] == [True, True, False, True, True, True]
+    assert second.copied == []
+    assert second.replaced == ["模板_丙"]
+
+    third = FakeProcessor(folder)
+    results = run(third, BatchManifest(str(tmp_path), "模板"))
+    assert all(result.skipped for result in results)
+    assert third.copied == third.replaced == []
+
+
+def test_changed_inputs_are_regenerated(tmp_path):
+    """测试参数变化或草稿被删除后重新生成, 遗留的草稿先删除再复制"""
+    folder = FakeDraftFolder()
+    run(FakeProcessor(folder), BatchManifest(str(tmp_path), "模板", {"volume": 100}))
+
+    folder.remove("模板_乙")
+    processor = FakeProcessor(folder)
+    run(processor, BatchManifest(str(tmp_path), "模板", {"volume": 100}))
+    assert processor.copied == processor.replaced == ["模板_乙"]
+
+    processor = FakeProcessor(folder)
+    results = run(processor, BatchManifest(str(tmp_path), "模板", {"volume": 50}))
+    assert not any(result.skipped for result in results)
+    assert len(processor.copied) == len(COMBINATIONS)
+
+
+def test_changed_files_are_regenerated(tmp_path):
+    """测试素材以同名重新导出或模板草稿被修改后, 对应的组合被重新生成"""
+    materials = tmp_path / "materials"
+    materials.mkdir()
+    for combination in COMBINATIONS:
+        (materials / (combination["name"] + ".mp4")).write_bytes(b"clip")
+    template_path = tmp_path / "draft_info.json"
+    template_path.write_text("{}", encoding="utf-8")
+
+    def manifest():
+        return BatchManifest(str(tmp_path), "模板", template_path=str(template_path),
+                             material_path=lambda folder, name: str(materials / (name + ".mp4")))
+
+    def touch(path):
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    folder = FakeDraftFolder()
+    run(FakeProcessor(folder), manifest())
+    processor = FakeProcessor(folder)
+    assert all(result.skipped for result in run(processor, manifest()))
+
+    touch(materials / "乙.mp4")
+    processor = FakeProcessor(folder)
+    results = run(processor, manifest())
+    assert processor.copied == processor.replaced == ["模板_乙"]
+    assert [result.skipped for result in results] == [True, False, True, True, True, True]
+
+    touch(template_path)
+    processor = FakeProcessor(folder)
+    run(processor, manifest())
+    assert len(processor.copied) == len(COMBINATIONS)
+
+
+def test_shards_share_state(tmp_path):
+    """测试各分片处理互不重叠的组合, 并能读取其它分片的记录"""
+    tasks = plan_batch_tasks(FakeProcessor(), COMBINATIONS)
+    shards = [shard_tasks(tasks, shard, 3) for shard in (1, 2, 3)]
+    assert sorted(task.index for shard in shards for task in shard) == list(range(1, len(COMBINATIONS) + 1))
+
+    folder = FakeDraftFolder()
+    for shard, shard_task_list in enumerate(shards, 1):
+        run(FakeProcessor(folder), BatchManifest(str(tmp_path), "模板", shard=shard, shard_count=3), shard_task_list)
+
+    processor = FakeProcessor(folder)
+    results = run(processor, BatchManifest(str(tmp_path), "模板"))
+    assert all(result.skipped for result in results)
+    assert len(list((tmp_path / ".batch_runs" / "模板").glob("*.jsonl"))) == 3
+
+
+def test_plan_first_writer_wins(tmp_path):
+    """测试分片运行时以先写入的批次计划为准"""
+    first = BatchManifest(str(tmp_path), "模板", shard=1, shard_count=2)
+    second = BatchManifest(str(tmp_path), "模板", shard=2, shard_count=2)
+    assert first.save_plan(COMBINATIONS, replace=False) == COMBINATIONS
+    assert second.save_plan(COMBINATIONS[::-1], replace=False) == COMBINATIONS
+    assert second.save_plan(COMBINATIONS[:2]) == COMBINATIONS[:2]
+    assert first.load_plan()["combinations"] == COMBINATIONS[:2]
+
+
+def test_parse_shard():
+    """测试分片参数的解析"""
+    assert parse_shard("2/4") == (2, 4)
+    for spec in ("0/4", "5/4", "2", "a/b"):
+        with pytest.raises(ValueError):
+            parse_shard(spec)
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试编译模板(解析一次、多次实例化)
+"""
+
+import json
+import os
+import sys
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import pyJianYingDraft as draft
+from pyJianYingDraft import trange
+
+TEST_VIDEO = os.path.join(project_root, "examples", "tests", "test_videos", "test_video.mp4")
+
+
+def build_template(tmp_path) -> str:
+    """生成一个包含视频轨道与文本轨道的模板草稿, 返回草稿文件路径"""
+    script = draft.ScriptFile(1920, 1080)
+    script.add_track(draft.TrackType.video).add_track(draft.TrackType.text)
+    script.add_segment(draft.VideoSegment(draft.VideoMaterial(TEST_VIDEO), trange("0s", "5s")))
+    script.add_segment(draft.TextSegment("你好", trange("0s", "2s")))
+    script.add_segment(draft.TextSegment("世界", trange("2s", "2s")))
+
+    json_path = os.path.join(str(tmp_path), "draft_content.json")
+    script.dump(json_path)
+    return json_path
+
+
+def text_of(content, index):
+    return json.loads(content["materials"]["texts"][index]["content"])["text"]
+
+
+def test_instances_are_independent(tmp_path):
+    """测试各实例的修改互不影响, 且不影响编译模板本身"""
+    json_path = build_template(tmp_path)
+    template = draft.CompiledTemplate.load(json_path)
+    template_snapshot = json.dumps(template.content, sort_keys=True)
+
+    first = template.instantiate()
+    second = template.instantiate(os.path.join(str(tmp_path), "second.json"))
+
+    first.replace_text(first.get_imported_track(draft.TrackType.text), 0, "早上好")
+    first.replace_material_by_name("test_video.mp4", draft.VideoMaterial(TEST_VIDEO, material_name="新素材.mp4"))
+
+    first_content = json.loads(first.dumps())
+    second_content = json.loads(second.dumps())
+
+    assert text_of(first_content, 0) == "早上好"
+    assert text_of(second_content, 0) == "你好"
+    assert text_of(first_content, 1) == "世界"
+    assert first_content["materials"]["videos"][0]["material_name"] == "新素材.mp4"
+    assert second_content["materials"]["videos"][0]["material_name"] == "test_video.mp4"
+
+    # 未修改的素材仍与模板共享
+    assert first.imported_materials["texts"][1] is template.imported_materials["texts"][1]
+    assert first.imported_materials["texts"][0] is not template.imported_materials["texts"][0]
+
+    # 模板内容保持不变
+    assert json.dumps(template.content, sort_keys=True) == template_snapshot
+
+    second.save()
+    assert os.path.exists(os.path.join(str(tmp_path), "second.json"))
+
+
+def test_instance_matches_load_template(tmp_path):
+    """测试实例化得到的草稿与直接加载模板得到的草稿一致"""
+    json_path = build_template(tmp_path)
+    loaded = json.loads(draft.ScriptFile.load_template(json_path).dumps())
+    instantiated = json.loads(draft.CompiledTemplate.load(json_path).instantiate().dumps())
+
+    assert loaded == instantiated
+
+
+def test_set_segment_speed(tmp_path):
+    """测试修改片段速度时仅影响当前实例"""
+    json_path = build_template(tmp_path)
+    template = draft.CompiledTemplate.load(json_path)
+
+    variant = template.instantiate()
+    video_track = variant.get_imported_track(draft.TrackType.video)
+    variant.set_segment_speed(video_track, 0, 2.0)
+    variant_content = json.loads(variant.dumps())
+    other_content = json.loads(template.instantiate().dumps())
+
+    seg = variant_content["tracks"][0]["segments"][0]
+    assert seg["speed"] == 2.0
+    assert seg["target_timerange"]["duration"] == 5000000
+    assert seg["source_timerange"]["duration"] == 10000000
+    speed_ids = {spd["id"]: spd["speed"] for spd in variant_content["materials"]["speeds"]}
+    assert [speed_ids[ref] for ref in seg["extra_material_refs"] if ref in speed_ids] == [2.0]
+
+    other_seg = other_content["tracks"][0]["segments"][0]
+    assert other_seg["speed"] == 1.0
+    assert other_seg["source_timerange"]["duration"] == 5000000
+    assert all(spd["speed"] == 1.0 for spd in other_content["materials"]["speeds"])
+
+
+def test_load_template_round_trip_without_copies(tmp_path):
+    """测试直接加载的模板共享原始数据而不深复制, 且修改片段时不影响共享的数据"""
+    json_path = build_template(tmp_path)
+    with open(json_path, encoding="utf-8") as f:
+        original = json.load(f)
+
+    script = draft.ScriptFile.load_template(json_path)
+    video_track = script.get_imported_track(draft.TrackType.video)
+    raw_segment = video_track.segments[0].raw_data
+    assert raw_segment is script.content["tracks"][0]["segments"][0]
+
+    # 未修改的草稿导出后与原文件一致, 多次导出结果相同
+    assert json.loads(script.dumps()) == original
+    assert json.loads(script.dumps()) == original
+
+    script.set_segment_speed(video_track, 0, 2.0)
+    assert video_track.segments[0].raw_data is not raw_segment
+    assert raw_segment["speed"] == 1.0
+
+    # 导入到其它草稿的轨道与源轨道互不影响
+    target = draft.ScriptFile(1920, 1080)
+    target.import_track(script, video_track, offset="1s")
+    assert video_track.segments[0].start == 0
+    assert json.loads(target.dumps())["tracks"][0]["segments"][0]["target_timerange"]["start"] == 1000000
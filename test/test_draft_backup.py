@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试草稿编辑的备份方式与撤销
+"""
+
+import os
+import sys
+import copy
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import pyJianYingDraft as draft
+from pyJianYingDraft import json_util
+from pyJianYingDraft.draft_backup import make_patch, apply_patch
+
+DRAFT = {
+    "materials": {"videos": [{"id": "v%d" % i, "material_name": "video%d.mp4" % i} for i in range(5)],
+                  "texts": [{"id": "t1", "content": "旧文本"}]},
+    "tracks": [{"type": "video", "segments": [1, 2, 3]}],
+    "a/b~c": 1,
+}
+
+
+def _edit(data):
+    data["materials"]["videos"][2]["material_name"] = "新素材.mp4"
+    data["materials"]["videos"].insert(1, {"id": "new"})
+    del data["materials"]["videos"][-1]
+    data["materials"]["texts"][0]["content"] = "新文本"
+    data["tracks"][0]["segments"] = [1, 3]
+    data["a/b~c"] = 2
+    data["duration"] = 10
+    return data
+
+
+def test_patch_roundtrip():
+    """测试补丁可以在两个方向上还原文档, 且只包含改动的部分"""
+    edited = _edit(copy.deepcopy(DRAFT))
+    patch = make_patch(DRAFT, edited)
+    assert apply_patch(copy.deepcopy(DRAFT), patch) == edited
+    assert apply_patch(copy.deepcopy(edited), make_patch(edited, DRAFT)) == DRAFT
+    assert not any(op["path"] == "/materials/videos" for op in patch)
+    assert make_patch(DRAFT, copy.deepcopy(DRAFT)) == []
+
+
+def _write_draft(tmp_path):
+    path = str(tmp_path / "draft_content.json")
+    json_util.dump_file(DRAFT, path)
+    return path
+
+
+def test_journal_undo(tmp_path):
+    """测试日志方式只记录改动, 并可逐次撤销"""
+    path = _write_draft(tmp_path)
+    for text in ["第一次", "第二次"]:
+        backup = draft.DraftBackup(path, "journal")
+        data = backup.load()
+        data["materials"]["texts"][0]["content"] = text
+        backup.save(data)
+    assert not os.path.exists(path + ".backup")
+    assert len(Path(path + ".journal").read_bytes().splitlines()) == 2
+
+    backup = draft.DraftBackup(path, "journal")
+    assert backup.undo()
+    assert json_util.load_file(path)["materials"]["texts"][0]["content"] == "第一次"
+    assert backup.undo()
+    assert json_util.load_file(path) == DRAFT
+    assert not os.path.exists(path + ".journal")
+    assert not backup.undo()
+
+
+def test_journal_failed_write(tmp_path, monkeypatch):
+    """测试写入草稿失败时不记录编辑日志, 之后的撤销仍然作用于真实发生的编辑"""
+    path = _write_draft(tmp_path)
+    backup = draft.DraftBackup(path, "journal")
+    data = backup.load()
+    data["materials"]["texts"][0]["content"] = "第一次"
+    backup.save(data)
+
+    def failing_dump(*args, **kwargs):
+        raise OSError("磁盘已满")
+    backup = draft.DraftBackup(path, "journal")
+    data = backup.load()
+    data["materials"]["videos"].append({"id": "extra"})
+    with monkeypatch.context() as patch:
+        patch.setattr(json_util, "dump_file", failing_dump)
+        with pytest.raises(OSError):
+            backup.save(data)
+    assert len(Path(path + ".journal").read_bytes().splitlines()) == 1
+
+    assert draft.DraftBackup(path, "journal").undo()
+    assert json_util.load_file(path) == DRAFT
+
+
+def test_snapshot_and_off(tmp_path):
+    """测试快照方式只保留首次修改前的内容, 关闭备份时不写入任何备份"""
+    path = _write_draft(tmp_path)
+    original = Path(path).read_bytes()
+    for mode in ["snapshot", "snapshot", "off"]:
+        backup = draft.DraftBackup(path, mode)
+        backup.save(_edit(backup.load()))
+    assert Path(path + ".pristine").read_bytes() == original
+    assert sorted(os.listdir(tmp_path)) == ["draft_content.json", "draft_content.json.pristine"]
+
+    assert draft.DraftBackup(path).undo()
+    assert Path(path).read_bytes() == original
+
+
+def test_full_backup(tmp_path, monkeypatch):
+    """测试完整备份方式保存修改前的原始文件, 且默认方式可由环境变量指定"""
+    path = _write_draft(tmp_path)
+    original = Path(path).read_bytes()
+    backup = draft.DraftBackup(path, suffix=".text_backup")
+    assert backup.mode == "full"
+    backup.save(_edit(backup.load()))
+    assert Path(path + ".text_backup").read_bytes() == original
+
+    monkeypatch.setenv("PYJIANYINGDRAFT_BACKUP_MODE", "off")
+    assert draft.DraftBackup(path).mode == "off"
+    with pytest.raises(ValueError):
+        draft.DraftBackup(path, "diff")
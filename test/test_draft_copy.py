@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试草稿复制时素材文件的共享
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import pyJianYingDraft as draft
+from pyJianYingDraft import draft_copy
+
+MEDIA_SIZE = 256 * 1024
+
+
+def _make_draft(folder: Path) -> Path:
+    template = folder / "模板"
+    (template / "materials" / "video").mkdir(parents=True)
+    (template / "draft_content.json").write_text('{"tracks": []}', encoding="utf-8")
+    (template / "draft_meta_info.json").write_text("{}", encoding="utf-8")
+    (template / "draft_cover.jpg").write_bytes(b"\xff" * MEDIA_SIZE)
+    (template / "materials" / "video" / "video.mp4").write_bytes(os.urandom(MEDIA_SIZE))
+    (template / "materials" / "video" / "small.png").write_bytes(b"png")
+    (template / "materials" / "extra.json").write_bytes(b"{}" * MEDIA_SIZE)
+    return template
+
+
+def test_hardlink_strategy(tmp_path):
+    """测试硬链接策略只共享子文件夹中的大型素材, JSON及根目录下的文件实际复制"""
+    template = _make_draft(tmp_path)
+    report = draft.copy_draft_tree(str(template), str(tmp_path / "副本"), "hardlink")
+
+    copied = tmp_path / "副本"
+    assert os.path.samefile(template / "materials" / "video" / "video.mp4", copied / "materials" / "video" / "video.mp4")
+    for rel_path in ["draft_content.json", "draft_cover.jpg", "materials/video/small.png", "materials/extra.json"]:
+        assert not os.path.samefile(template / rel_path, copied / rel_path)
+        assert (template / rel_path).read_bytes() == (copied / rel_path).read_bytes()
+
+    assert report.files_linked == 1
+    assert report.bytes_saved == MEDIA_SIZE
+    assert report.files_copied == 5
+    assert report.fallbacks == 0
+
+
+def test_auto_strategy_falls_back(tmp_path, monkeypatch):
+    """测试reflink不受支持时自动改用硬链接, 都不受支持时复制"""
+    template = _make_draft(tmp_path)
+    calls = []
+
+    def unsupported_reflink(src, dst):
+        calls.append(src)
+        raise OSError(draft_copy.errno.EOPNOTSUPP, "not supported")
+
+    monkeypatch.setattr(draft_copy, "reflink", unsupported_reflink)
+    (template / "materials" / "video" / "other.mp4").write_bytes(os.urandom(MEDIA_SIZE))
+    report = draft.copy_draft_tree(str(template), str(tmp_path / "auto"), "auto")
+    assert report.files_linked == 2
+    assert len(calls) == 1  # 不支持的方式只尝试一次
+
+    def unsupported_link(src, dst):
+        raise OSError(draft_copy.errno.EXDEV, "cross-device link")
+
+    monkeypatch.setattr(draft_copy.os, "link", unsupported_link)
+    report = draft.copy_draft_tree(str(template), str(tmp_path / "copy"), "auto")
+    assert report.bytes_saved == 0
+    assert report.fallbacks == 2
+    assert (tmp_path / "copy" / "materials" / "video" / "other.mp4").read_bytes() == \
+           (template / "materials" / "video" / "other.mp4").read_bytes()
+
+
+def test_replace_file_does_not_touch_template(tmp_path):
+    """测试替换共享的素材文件时不修改模板中的文件"""
+    template = _make_draft(tmp_path)
+    folder = draft.DraftFolder(str(tmp_path))
+    report = folder.duplicate_draft("模板", "副本", copy_strategy="hardlink")
+    assert folder.last_copy_report is report
+
+    original = (template / "materials" / "video" / "video.mp4").read_bytes()
+    new_file = tmp_path / "new.mp4"
+    new_file.write_bytes(b"new video")
+    draft.replace_file(str(new_file), str(tmp_path / "副本" / "materials" / "video" / "video.mp4"))
+
+    assert (tmp_path / "副本" / "materials" / "video" / "video.mp4").read_bytes() == b"new video"
+    assert (template / "materials" / "video" / "video.mp4").read_bytes() == original
+
+
+def test_duplicate_options(tmp_path):
+    """测试复制策略参数及重名处理"""
+    _make_draft(tmp_path)
+    folder = draft.DraftFolder(str(tmp_path))
+
+    report = folder.duplicate_draft("模板", "完整复制", copy_strategy="copy")
+    assert report.bytes_saved == 0 and report.files_copied == 6
+
+    with pytest.raises(FileExistsError):
+        folder.duplicate_draft("模板", "完整复制")
+    report = folder.duplicate_draft("模板", "完整复制", allow_replace=True, copy_strategy="hardlink")
+    assert report.files_linked == 1
+    with pytest.raises(ValueError):
+        folder.duplicate_draft("模板", "无效策略", copy_strategy="symlink")
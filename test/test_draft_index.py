@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试草稿素材与片段索引
+"""
+
+import json
+import os
+import sys
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import pyJianYingDraft as draft
+from pyJianYingDraft import trange
+
+TEST_VIDEO = os.path.join(project_root, "examples", "tests", "test_videos", "test_video.mp4")
+
+
+def sample_content():
+    return {
+        "materials": {
+            "videos": [{"id": "v1", "material_name": "a.mp4"}, {"id": "v2", "material_name": "b.mp4"}],
+            "audios": [{"id": "a1", "name": "bgm.mp3"}],
+            "speeds": [],
+        },
+        "tracks": [
+            {"type": "video", "segments": [{"material_id": "v1"}, {"material_id": "v2"}, {"material_id": "v1"}]},
+            {"type": "audio", "segments": [{"material_id": "a1"}]},
+        ],
+    }
+
+
+def test_lookup_and_update():
+    """测试按id、名称查找素材, 以及查找引用素材的片段"""
+    content = sample_content()
+    index = draft.DraftIndex.from_content(content)
+
+    assert index.get_material("v2")["material_name"] == "b.mp4"
+    assert index.get_material("missing") is None
+    assert index.find_materials("bgm.mp3") == [("audios", 0)]
+    assert index.find_materials("a.mp4", "audios") == []
+    assert len(index.segments_of("v1", "video")) == 2
+    assert index.segments_of("a1", "video") == []
+
+    index.rename_material(("videos", 0), "c.mp4")
+    assert index.find_materials("a.mp4") == []
+    assert index.find_materials("c.mp4") == [("videos", 0)]
+
+    assert index.add_material("speeds", {"id": "s1"}) == ("speeds", 0)
+    assert content["materials"]["speeds"] == [{"id": "s1"}]
+
+    # 素材列表在外部被修改后自动重建索引
+    content["materials"]["videos"].pop(0)
+    assert index.locate_material("v2") == ("videos", 0)
+    content["materials"]["audios"].append({"id": "a2", "name": "new.mp3"})
+    assert index.get_material("a2")["name"] == "new.mp3"
+
+
+def test_script_file_indexes(tmp_path):
+    """测试模板模式下的素材查找与替换"""
+    script = draft.ScriptFile(1920, 1080)
+    script.add_track(draft.TrackType.video)
+    material = draft.VideoMaterial(TEST_VIDEO)
+    script.add_segment(draft.VideoSegment(material, trange("0s", "2s")))
+    script.add_segment(draft.VideoSegment(material, trange("2s", "2s")))
+    assert material in script.materials
+    assert draft.VideoMaterial(TEST_VIDEO) not in script.materials
+
+    json_path = str(tmp_path / "draft_content.json")
+    script.dump(json_path)
+    template = draft.ScriptFile.load_template(json_path)
+
+    assert template.get_imported_material(material.material_id)["material_name"] == "test_video.mp4"
+    assert len(template.get_segments_by_material(material.material_id)) == 2
+
+    template.replace_material_by_name("test_video.mp4", draft.VideoMaterial(TEST_VIDEO, material_name="新素材.mp4"))
+    assert template.material_index.find_materials("test_video.mp4") == []
+    template.replace_material_by_name("新素材.mp4", draft.VideoMaterial(TEST_VIDEO, material_name="第三个.mp4"))
+    assert json.loads(template.dumps())["materials"]["videos"][0]["material_name"] == "第三个.mp4"
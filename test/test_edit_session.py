@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试草稿的一次性编辑会话
+"""
+
+import json
+import os
+import sys
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import pyJianYingDraft as draft
+from pyJianYingDraft import trange
+
+TEST_VIDEO = os.path.join(project_root, "examples", "tests", "test_videos", "test_video.mp4")
+
+
+def build_draft(tmp_path) -> str:
+    script = draft.ScriptFile(1920, 1080)
+    script.add_track(draft.TrackType.video).add_track(draft.TrackType.text)
+    script.add_segment(draft.VideoSegment(draft.VideoMaterial(TEST_VIDEO), trange("0s", "5s")))
+    script.add_segment(draft.TextSegment("你好", trange("0s", "2s")))
+
+    json_path = os.path.join(str(tmp_path), "draft_info.json")
+    script.dump(json_path)
+    return json_path
+
+
+def test_json_and_api_edits_saved_once(tmp_path, monkeypatch):
+    """测试直接修改JSON与经由库API的修改作用于同一份数据, 且只读写一次草稿文件"""
+    json_path = build_draft(tmp_path)
+    session = draft.DraftEditSession(json_path, backup_mode="journal")
+
+    # 直接修改JSON: 重命名视频素材
+    (_, position), = session.index.find_materials("test_video.mp4", "videos")
+    session.index.rename_material(("videos", position), "新素材.mp4")
+    session.mark_modified()
+
+    # 经由库API: 添加新的文本轨道, 并在创建ScriptFile之后继续修改文本素材
+    session.script.add_track(draft.TrackType.text, "字幕")
+    session.script.add_segment(draft.TextSegment("字幕", trange("0s", "1s")), "字幕")
+    text_material = session.content["materials"]["texts"][0]
+    text_material["content"] = json.dumps({"text": "早上好"}, ensure_ascii=False)
+
+    writes = []
+    original_atomic_write = draft.json_util.atomic_write
+    monkeypatch.setattr(draft.json_util, "atomic_write", lambda path, writer: (writes.append(path), original_atomic_write(path, writer)))
+    session.save()
+    assert writes == [json_path]
+    assert not session.modified
+
+    content = draft.json_util.load_file(json_path)
+    assert content["materials"]["videos"][0]["material_name"] == "新素材.mp4"
+    texts = [json.loads(text["content"])["text"] for text in content["materials"]["texts"]]
+    assert sorted(texts) == ["字幕", "早上好"]
+    assert len(content["tracks"]) == 3
+
+    # 整个会话的修改作为一次编辑记入日志, 可一次撤销
+    assert draft.DraftBackup(json_path).undo()
+    content = draft.json_util.load_file(json_path)
+    assert content["materials"]["videos"][0]["material_name"] == "test_video.mp4"
+    assert len(content["tracks"]) == 2
+
+
+def test_save_to_new_path(tmp_path):
+    """测试保存到新路径(如draft_content.json改名为draft_info.json)"""
+    json_path = build_draft(tmp_path)
+    session = draft.DraftEditSession(json_path, backup_mode="off")
+    session.script.duration = 1000000
+    new_path = os.path.join(str(tmp_path), "draft_content.json")
+    session.save(new_path)
+    assert session.script.save_path == new_path
+    assert draft.json_util.load_file(new_path)["duration"] == 1000000
+    assert sorted(os.listdir(tmp_path)) == ["draft_content.json", "draft_info.json"]
+
+
+def test_script_saved_by_streaming(tmp_path, monkeypatch):
+    """测试已创建`script`且不使用编辑日志时, 由`ScriptFile.dump`流式写入而不构造完整的JSON字符串"""
+    json_path = build_draft(tmp_path)
+    original = open(json_path, "rb").read()
+    session = draft.DraftEditSession(json_path, backup_mode="snapshot")
+    session.script.add_track(draft.TrackType.text, "字幕")
+    session.script.add_segment(draft.TextSegment("字幕", trange("0s", "1s")), "字幕")
+
+    def fail(*args, **kwargs):
+        raise AssertionError("不应在内存中序列化整个草稿")
+    monkeypatch.setattr(draft.json_util, "dump_file", fail)
+    session.save(compact=True)
+
+    assert open(json_path + ".pristine", "rb").read() == original
+    content = draft.json_util.load_file(json_path)
+    assert len(content["tracks"]) == 3
+    assert b"\n" not in open(json_path, "rb").read()
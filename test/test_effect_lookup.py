@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试特效枚举按名称、资源ID及效果ID查找
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import pyJianYingDraft as draft
+
+
+def _scan_by_name(enum_class, name):
+    """逐个比较的参考实现"""
+    name = name.lower().replace(" ", "").replace("_", "")
+    for effect in enum_class:
+        if effect.name.lower().replace(" ", "").replace("_", "") == name:
+            return effect
+    raise ValueError(name)
+
+
+def test_from_name_matches_scan():
+    """测试按名称查找的结果与逐个比较一致, 且忽略大小写、空格和下划线"""
+    for enum_class in [draft.FilterType, draft.TransitionType, draft.MaskType, draft.TextIntro]:
+        for effect in list(enum_class)[:50]:
+            assert enum_class.from_name(effect.name) is _scan_by_name(enum_class, effect.name)
+            assert enum_class.from_name(" " + effect.name.upper() + "_") is _scan_by_name(enum_class, effect.name)
+
+    with pytest.raises(ValueError):
+        draft.FilterType.from_name("不存在的滤镜")
+
+
+def test_from_ids():
+    """测试按资源ID及效果ID查找, 重复的ID取定义在前的成员"""
+    for enum_class in [draft.VideoSceneEffectType, draft.FontType, draft.IntroType]:
+        first_by_resource = {}
+        first_by_effect = {}
+        for effect in enum_class:
+            first_by_resource.setdefault(effect.value.resource_id, effect)
+            first_by_effect.setdefault(effect.value.effect_id, effect)
+        for effect in list(enum_class)[:50]:
+            assert enum_class.from_resource_id(effect.value.resource_id) is first_by_resource[effect.value.resource_id]
+            assert enum_class.from_effect_id(effect.value.effect_id) is first_by_effect[effect.value.effect_id]
+
+    with pytest.raises(ValueError):
+        draft.FontType.from_resource_id("0")
+    with pytest.raises(ValueError):
+        draft.FontType.from_effect_id("0")
+
+
+def test_index_per_enum():
+    """测试索引缓存在各枚举类自身上, 互不干扰"""
+    draft.FilterType.from_name(next(iter(draft.FilterType)).name)
+    draft.TransitionType.from_name(next(iter(draft.TransitionType)).name)
+    assert "_index_name" not in vars(draft.metadata.effect_meta.EffectEnum)
+    assert vars(draft.FilterType)["_index_name"] is not vars(draft.TransitionType)["_index_name"]
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试元数据枚举的模糊搜索
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import pyJianYingDraft as draft
+from pyJianYingDraft.metadata import search
+
+
+def test_search_ranking():
+    """测试完全匹配排在最前, 前缀匹配优先于包含匹配, 并可按枚举过滤"""
+    index = search.EffectSearchIndex.build(["VideoSceneEffectType", "FilterType", "FontType"])
+
+    results = index.search("全息扫描")
+    assert results[0].member is draft.VideoSceneEffectType.全息扫描
+    assert results[0].score == 1.0
+    assert [r.score for r in results] == sorted((r.score for r in results), reverse=True)
+
+    results = index.search("宋体", enum_types=[draft.FontType])
+    assert results[0].member is draft.FontType.宋体
+    assert all(r.enum_name == "FontType" for r in results)
+    assert all("宋体" in r.display_name for r in results)
+
+    assert index.search("复古", enum_types=["FilterType"], limit=3)
+    assert len(index.search("复古", limit=3)) == 3
+    assert index.search("") == []
+
+
+def test_index_disk_cache(tmp_path, monkeypatch):
+    """测试索引缓存到磁盘后可直接读取, 元数据源文件变化后缓存失效"""
+    cache_path = str(tmp_path / "index.json")
+    built = search.EffectSearchIndex.load_or_build(cache_path)
+    assert Path(cache_path).exists()
+
+    monkeypatch.setattr(search.EffectSearchIndex, "build", classmethod(lambda cls, enum_names=None: pytest.fail("不应重建索引")))
+    loaded = search.EffectSearchIndex.load_or_build(cache_path)
+    assert len(loaded.entries) == len(built.entries)
+    assert [(r.enum_name, r.member_name) for r in loaded.search("漫画")] == \
+           [(r.enum_name, r.member_name) for r in built.search("漫画")]
+
+    monkeypatch.setattr(search, "_INDEX_VERSION", search._INDEX_VERSION + 1)
+    assert search.EffectSearchIndex.load(cache_path) is None
+
+
+def test_pinyin_search():
+    """测试安装pypinyin时可按全拼及拼音首字母搜索"""
+    pytest.importorskip("pypinyin")
+    index = search.EffectSearchIndex.build(["VideoSceneEffectType"])
+    assert index.search("quanxisaomiao")[0].member is draft.VideoSceneEffectType.全息扫描
+    assert any(r.member is draft.VideoSceneEffectType.全息扫描 for r in index.search("qxsm"))
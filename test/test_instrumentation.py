@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试分阶段计时与计数, 以及批量生成引擎中的汇总和单个组合的剖析
+"""
+
+import sys
+import pickle
+import pstats
+import threading
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import pyJianYingDraft as draft
+from pyJianYingDraft import instrumentation
+from examples.batch_engine import ParallelBatchEngine, plan_batch_tasks
+
+
+def test_percentile():
+    """测试线性插值的百分位数"""
+    values = [4.0, 1.0, 3.0, 2.0, 5.0]
+    assert instrumentation.percentile(values, 50) == 3.0
+    assert instrumentation.percentile(values, 0) == 1.0 and instrumentation.percentile(values, 100) == 5.0
+    assert instrumentation.percentile(values, 95) == 4.8
+    assert instrumentation.percentile([], 50) == 0.0
+
+
+def test_recording_scope():
+    """测试只有在记录范围内埋点才生效, 且各线程互不干扰"""
+    with instrumentation.stage("ignored"):
+        instrumentation.count("ignored")
+    assert instrumentation.current_recorder() is None
+
+    with instrumentation.recording() as recorder:
+        with instrumentation.stage("work"):
+            instrumentation.count("items", 3)
+        with instrumentation.stage("work"):
+            pass
+
+        other = []
+        thread = threading.Thread(target=lambda: other.append(instrumentation.current_recorder()))
+        thread.start()
+        thread.join()
+    assert other == [None]
+    assert instrumentation.current_recorder() is None
+    assert len(recorder.stages["work"]) == 2 and recorder.counters == {"items": 3}
+    assert recorder.summary()["work"]["count"] == 2
+    assert "work" in recorder.report()
+
+
+def test_merge_and_pickle():
+    """测试记录器可以跨进程传递并合并"""
+    first, second = instrumentation.Recorder(), instrumentation.Recorder()
+    first.add_time("copy", 1.0)
+    first.add_count("bytes_read", 10)
+    second.add_time("copy", 3.0)
+    second.add_count("bytes_read", 5)
+
+    first.merge(pickle.loads(pickle.dumps(second)))
+    assert first.total("copy") == 4.0 and first.counters["bytes_read"] == 15
+    assert first.summary()["copy"]["p50"] == 2.0
+
+
+def test_library_hooks(tmp_path):
+    """测试JSON读写与草稿复制的埋点"""
+    src = tmp_path / "模板"
+    src.mkdir()
+    with instrumentation.recording() as recorder:
+        draft.json_util.dump_file({"a": [1, 2, 3]}, str(src / "draft_info.json"))
+        draft.json_util.load_file(str(src / "draft_info.json"))
+        draft.copy_draft_tree(str(src), str(tmp_path / "副本"), "copy")
+
+    size = (src / "draft_info.json").stat().st_size
+    assert {"json.write", "json.load", "draft.copy"} <= set(recorder.stages)
+    assert recorder.counters["bytes_written"] == recorder.counters["bytes_read"] == size
+    assert recorder.counters["bytes_copied"] == size
+
+
+class FakeDraftFolder:
+    def has_draft(self, name):
+        return False
+
+
+class FakeProcessor:
+    """模拟批量处理器, 替换时读写一个JSON文件"""
+
+    def __init__(self, json_path):
+        self.selected_draft = "模板"
+        self.draft_folder = FakeDraftFolder()
+        self.json_path = json_path
+
+    def generate_chinese_combo_name(self, combination):
+        return combination["name"]
+
+    def copy_single_draft(self, target_name):
+        return True
+
+    def replace_materials_for_draft(self, draft_name, combination):
+        content = draft.json_util.load_file(self.json_path)
+        draft.json_util.dump_file(content, self.json_path)
+        return True
+
+
+def test_engine_metrics_and_profile(tmp_path):
+    """测试引擎为每个组合记录分阶段统计, 并在剖析器下处理指定的组合"""
+    json_path = tmp_path / "draft_info.json"
+    draft.json_util.dump_file({"tracks": []}, str(json_path))
+    processor = FakeProcessor(str(json_path))
+    tasks = plan_batch_tasks(processor, [{"name": name} for name in "甲乙丙"])
+    profile_path = tmp_path / "variant.prof"
+
+    engine = ParallelBatchEngine(processor, workers=2, profile_index=2, profile_path=str(profile_path))
+    results = engine.run(tasks)
+    assert all(result.success for result in results)
+    for result in results:
+        assert {"variant.total", "variant.copy", "variant.replace", "json.load", "json.write"} <= set(result.metrics.stages)
+
+    metrics = ParallelBatchEngine.summarize_metrics(results)
+    assert metrics.summary()["variant.replace"]["count"] == 3
+    assert metrics.counters["bytes_read"] == 3 * json_path.stat().st_size
+
+    stats = pstats.Stats(str(profile_path))
+    assert any(func[2] == "replace_materials_for_draft" for func in stats.stats)
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试可插拔的JSON后端与紧凑输出模式
+"""
+
+import json
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import pyJianYingDraft as draft
+from pyJianYingDraft import json_util
+
+AVAILABLE_BACKENDS = [name for name, ok in json_util._AVAILABLE.items() if ok]
+
+SAMPLE = {
+    "text": "中文/路径 \"引号\"",
+    "path": "C:/Users/test/素材.mp4",
+    "float": 0.1,
+    "int": 10800000000,
+    "nested": [{"a": None, "b": True}, []],
+}
+
+
+@pytest.fixture(params=AVAILABLE_BACKENDS)
+def backend(request):
+    previous = json_util.get_backend()
+    json_util.set_backend(request.param)
+    yield request.param
+    json_util.set_backend(previous)
+
+
+def test_round_trip(backend, tmp_path):
+    """测试各后端的读写结果与标准库一致"""
+    for compact in (False, True):
+        text = json_util.dumps(SAMPLE, compact=compact)
+        assert json.loads(text) == SAMPLE
+        assert json_util.loads(text) == SAMPLE
+        assert json_util.loads(text.encode("utf-8")) == SAMPLE
+        assert "中文" in text and "素材" in text  # 不转义非ASCII字符
+        assert ("\n" in text) != compact
+
+    path = str(tmp_path / "draft.json")
+    json_util.dump_file(SAMPLE, path, indent=2)
+    assert json_util.load_file(path) == SAMPLE
+
+
+def test_fallback_to_stdlib(backend):
+    """测试第三方后端不支持的数据回退到标准库"""
+    huge = {"value": 2 ** 70}
+    assert json_util.loads(json_util.dumps(huge)) == huge
+
+
+def test_non_finite_floats(backend):
+    """测试NaN与无穷和标准库一样写为NaN/Infinity, 而不是被静默写为null"""
+    data = {"nan": float("nan"), "items": [1.0, float("inf"), None], "nested": {"x": -float("inf")}}
+    for compact in (False, True):
+        text = json_util.dumps(data, compact=compact)
+        assert "NaN" in text and "-Infinity" in text and "null" in text
+        loaded = json_util.loads(text)
+        assert loaded["nan"] != loaded["nan"] and loaded["items"][1] == float("inf")
+
+
+def test_set_unknown_backend():
+    with pytest.raises(ValueError):
+        json_util.set_backend("no_such_backend")
+
+
+def test_script_file_compact(backend, tmp_path):
+    """测试草稿文件的紧凑导出与常规导出内容一致"""
+    script = draft.ScriptFile(1920, 1080)
+    script.add_track(draft.TrackType.text)
+    script.add_segment(draft.TextSegment("你好", draft.trange("0s", "1s")))
+
+    pretty = script.dumps()
+    compact = script.dumps(compact=True)
+    assert json.loads(pretty) == json.loads(compact)
+    assert len(compact) < len(pretty)
+
+    path = str(tmp_path / "draft_content.json")
+    script.dump(path, compact=True)
+    loaded = draft.ScriptFile.load_template(path)
+    assert json.loads(loaded.dumps()) == json.loads(pretty)
+
+
+def test_streaming_dump_matches_dumps(backend, tmp_path):
+    """测试流式写入的草稿与一次性导出的内容一致, 且写入失败时不破坏原文件"""
+    script = draft.ScriptFile(1920, 1080)
+    script.add_track(draft.TrackType.text)
+    for i in range(3):
+        script.add_segment(draft.TextSegment(f"第{i}行\n换行", draft.trange(f"{i}s", "1s")))
+
+    path = str(tmp_path / "draft_content.json")
+    for compact in (False, True):
+        script.dump(path, compact=compact)
+        with open(path, encoding="utf-8") as f:
+            assert json.load(f) == json.loads(script.dumps(compact=compact))
+
+    original = open(path, "rb").read()
+    with pytest.raises(RuntimeError):
+        json_util.atomic_write(path, lambda f: (f.write(b"{"), (_ for _ in ()).throw(RuntimeError("中断"))))
+    assert open(path, "rb").read() == original
+    assert os.listdir(str(tmp_path)) == ["draft_content.json"]
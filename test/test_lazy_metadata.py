@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试元数据枚举的延迟加载
+"""
+
+import subprocess
+import sys
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import pyJianYingDraft as draft
+from pyJianYingDraft import metadata
+
+CHECK_LAZY = """
+import sys
+sys.path.insert(0, {root!r})
+import pyJianYingDraft
+loaded = [name for name in sys.modules if name.startswith("pyJianYingDraft.metadata.")]
+assert "pyJianYingDraft.metadata.video_scene_effect" not in loaded, loaded
+assert "pyJianYingDraft.metadata.filter_meta" not in loaded, loaded
+pyJianYingDraft.FilterType
+assert "pyJianYingDraft.metadata.filter_meta" in sys.modules
+assert "pyJianYingDraft.metadata.video_scene_effect" not in sys.modules
+"""
+
+
+def test_import_does_not_load_catalogs():
+    """测试导入本库时不加载大型元数据模块, 访问时才加载"""
+    subprocess.run([sys.executable, "-c", CHECK_LAZY.format(root=str(project_root))], check=True)
+
+
+def test_public_names_unchanged():
+    """测试延迟加载的名称与直接导入模块得到的对象一致"""
+    from pyJianYingDraft.metadata.filter_meta import FilterType
+    from pyJianYingDraft.metadata.text_intro import TextIntro
+
+    assert draft.FilterType is FilterType
+    assert metadata.TextIntro is TextIntro
+    for name in metadata.__all__:
+        assert getattr(metadata, name) is not None
+        assert name in dir(metadata)
+    assert draft.Intro_type.斜切 is draft.IntroType.斜切
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试草稿之间共享的素材池
+"""
+
+import os
+import sys
+import multiprocessing
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import pyJianYingDraft as draft
+from pyJianYingDraft.material_pool import hash_file
+from examples import batch_engine
+from examples.batch_job import HeadlessBatchProcessor, normalize_job_spec
+from examples.interactive_cli import BatchDraftProcessor
+
+
+def _make_drafts(folder: Path, names):
+    for name in names:
+        (folder / name / "materials" / "video").mkdir(parents=True)
+        (folder / name / "draft_content.json").write_text("{}", encoding="utf-8")
+
+
+def test_shared_material_refcount(tmp_path):
+    """测试同一素材只保存一份, 且最后一个引用它的草稿被删除后才释放"""
+    _make_drafts(tmp_path, ["草稿1", "草稿2"])
+    clip = tmp_path / "clip.mp4"
+    clip.write_bytes(os.urandom(4096))
+    folder = draft.DraftFolder(str(tmp_path))
+    pool = folder.material_pool
+
+    paths = []
+    for name in ["草稿1", "草稿2"]:
+        dst = str(tmp_path / name / "materials" / "video" / "clip.mp4")
+        assert pool.link_material(str(clip), dst, name) == dst
+        paths.append(dst)
+    assert os.path.samefile(paths[0], paths[1])
+    assert set(folder.list_drafts()) == {"草稿1", "草稿2"}
+
+    digest = hash_file(str(clip))
+    object_path = pool.object_path(digest)
+    assert pool.references(digest) == ["草稿1", "草稿2"]
+    assert pool.total_size() == 4096
+
+    folder.remove("草稿1")
+    assert pool.references(digest) == ["草稿2"]
+    assert os.path.exists(object_path)
+
+    folder.remove("草稿2")
+    assert pool.references(digest) == []
+    assert not os.path.exists(object_path)
+    assert pool.total_size() == 0
+
+
+def test_duplicate_keeps_references(tmp_path):
+    """测试复制草稿后新草稿同样持有素材引用"""
+    _make_drafts(tmp_path, ["模板"])
+    clip = tmp_path / "clip.mp4"
+    clip.write_bytes(b"clip" * 1024)
+    folder = draft.DraftFolder(str(tmp_path))
+    folder.material_pool.add(str(clip), "模板")
+    folder.duplicate_draft("模板", "副本", copy_strategy="copy")
+
+    digest = hash_file(str(clip))
+    assert folder.material_pool.references(digest) == ["副本", "模板"]
+    folder.remove("模板")
+    assert os.path.exists(folder.material_pool.object_path(digest))
+
+
+def test_link_unsupported_falls_back_to_pool_path(tmp_path, monkeypatch):
+    """测试不支持硬链接时返回素材池中的绝对路径"""
+    _make_drafts(tmp_path, ["草稿"])
+    clip = tmp_path / "clip.mp4"
+    clip.write_bytes(b"data")
+    pool = draft.DraftFolder(str(tmp_path)).material_pool
+
+    def unsupported_link(src, dst):
+        raise OSError("not supported")
+
+    monkeypatch.setattr(os, "link", unsupported_link)
+    dst = tmp_path / "草稿" / "materials" / "video" / "clip.mp4"
+    placed = pool.link_material(str(clip), str(dst), "草稿")
+    assert placed == pool.object_path(hash_file(str(clip)))
+    assert Path(placed).read_bytes() == b"data"
+    assert not dst.exists()
+
+
+def _add_in_worker(clip: str, draft_name: str) -> str:
+    """在工作进程中经由反序列化得到的处理器把素材加入素材池"""
+    return batch_engine._worker_processor.draft_folder.material_pool.add(clip, draft_name)
+
+
+def test_processors_pickle_under_spawn(tmp_path):
+    """测试带素材池的处理器能以spawn方式传给进程池(Windows与macOS的默认方式), 且工作进程中的素材池可用"""
+    _make_drafts(tmp_path, ["模板"])
+    clip = tmp_path / "clip.mp4"
+    clip.write_bytes(b"clip" * 1024)
+    folder = draft.DraftFolder(str(tmp_path))
+    folder.material_pool.add(str(clip), "模板")  # 主进程中已建立数据库连接
+
+    headless = HeadlessBatchProcessor(normalize_job_spec({"template": "模板", "materials_folder": str(tmp_path)}))
+    for processor in (BatchDraftProcessor(), headless):
+        processor.draft_folder = folder
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=batch_engine._init_process_worker, initargs=(processor,)) as pool:
+            path = pool.submit(_add_in_worker, str(clip), type(processor).__name__).result()
+        assert path == folder.material_pool.object_path(hash_file(str(clip)))
+        assert type(processor).__name__ in folder.material_pool.references(hash_file(str(clip)))
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试元数据枚举的二进制目录
+"""
+
+import sys
+import pickle
+import importlib.util
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from pyJianYingDraft.metadata import catalog
+from pyJianYingDraft.metadata.effect_meta import EffectMeta, TransitionMeta
+
+
+def _load_from_catalog(finder, module_name):
+    spec = finder.find_spec("pyJianYingDraft.metadata." + module_name)
+    if spec is None:
+        return None
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _meta_fields(meta):
+    meta.md5  # 触发解码
+    fields = {key: value for key, value in meta.__dict__.items() if not key.startswith("_")}
+    if "params" in fields:
+        fields["params"] = [param.__dict__ for param in fields["params"]]
+    return fields
+
+
+def test_catalog_matches_source(tmp_path):
+    """测试由目录构造的枚举与源文件定义的枚举一致, 且成员与元数据按需创建"""
+    path = str(tmp_path / "catalog.bin")
+    catalog.build_catalog(path, ["filter_meta", "transition_meta", "text_intro"])
+    finder = catalog.CatalogFinder(path)
+
+    for module_name in ["filter_meta", "transition_meta", "text_intro"]:
+        enum_name = catalog.CATALOG_MODULES[module_name]
+        source_enum = getattr(catalog._load_source_module(module_name), enum_name)
+        catalog_enum = getattr(_load_from_catalog(finder, module_name), enum_name)
+
+        assert catalog_enum.__doc__ == source_enum.__doc__
+        assert len(catalog_enum) == len(source_enum)
+        first = next(iter(source_enum)).name
+        assert catalog_enum._member_map_ == {}
+        member = catalog_enum[first]
+        assert list(catalog_enum._member_map_) == [first]
+        assert "_catalog_source" in member.value.__dict__  # 元数据尚未解码
+
+        assert [m.name for m in catalog_enum] == [m.name for m in source_enum]
+        for source_member, catalog_member in zip(source_enum, catalog_enum):
+            assert _meta_fields(catalog_member.value) == _meta_fields(source_member.value)
+            assert getattr(catalog_enum, source_member.name) is catalog_member
+            assert catalog_enum(catalog_member.value) is catalog_member
+        assert list(catalog_enum.__members__) == list(source_enum.__members__)
+
+    transitions = getattr(_load_from_catalog(finder, "transition_meta"), "TransitionType")
+    assert isinstance(transitions.上移.value, TransitionMeta)
+    assert transitions.from_name("上移") is transitions.上移
+
+
+def test_catalog_meta_pickle(tmp_path):
+    """测试延迟解码的元数据序列化为普通的元数据对象"""
+    path = str(tmp_path / "catalog.bin")
+    catalog.build_catalog(path, ["filter_meta"])
+    filters = _load_from_catalog(catalog.CatalogFinder(path), "filter_meta").FilterType
+    member = next(iter(filters))
+
+    meta = pickle.loads(pickle.dumps(member.value))
+    assert type(meta) is EffectMeta
+    assert _meta_fields(meta) == _meta_fields(member.value)
+
+
+def test_stale_or_invalid_catalog(tmp_path, monkeypatch):
+    """测试目录过期或损坏时回退为导入源文件"""
+    path = str(tmp_path / "catalog.bin")
+    catalog.build_catalog(path, ["speech_to_song"])
+    assert _load_from_catalog(catalog.CatalogFinder(path), "speech_to_song") is not None
+    assert catalog.CatalogFinder(path).find_spec("pyJianYingDraft.metadata.filter_meta") is None
+
+    monkeypatch.setattr(catalog, "_source_digest", lambda module_name: b"\0" * 20)
+    assert catalog.CatalogFinder(path).find_spec("pyJianYingDraft.metadata.speech_to_song") is None
+    monkeypatch.undo()
+
+    broken = tmp_path / "broken.bin"
+    broken.write_bytes(b"not a catalog")
+    assert catalog.CatalogFinder(str(broken)).find_spec("pyJianYingDraft.metadata.speech_to_song") is None
+    assert catalog.CatalogFinder(str(tmp_path / "missing.bin")).find_spec("pyJianYingDraft.metadata.speech_to_song") is None
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试媒体探测缓存
+"""
+
+import os
+import shutil
+import sys
+from pathlib import Path
+from concurrent.futures.process import BrokenProcessPool
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import pyJianYingDraft as draft
+from pyJianYingDraft import local_materials
+from pyJianYingDraft.probe_cache import MEDIAINFO_KIND, ProbeCache
+
+TEST_VIDEO = os.path.join(project_root, "examples", "tests", "test_videos", "test_video.mp4")
+
+
+class CountingProber:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, path):
+        self.calls += 1
+        return {"size": os.path.getsize(path)}
+
+
+def test_cache_hit_and_invalidation(tmp_path):
+    """测试缓存命中, 以及文件变化后缓存失效"""
+    media = tmp_path / "clip.mp4"
+    media.write_bytes(b"0" * 16)
+    cache = ProbeCache(str(tmp_path / "cache.sqlite3"))
+    prober = CountingProber()
+
+    assert cache.get_or_probe(str(media), prober) == {"size": 16}
+    assert cache.get_or_probe(str(media), prober) == {"size": 16}
+    assert prober.calls == 1
+
+    # 不同探测方式的结果互不干扰
+    cache.get_or_probe(str(media), prober, kind="ffprobe")
+    assert prober.calls == 2
+
+    media.write_bytes(b"0" * 32)
+    assert cache.get(str(media)) is None
+    assert cache.get_or_probe(str(media), prober) == {"size": 32}
+    assert prober.calls == 3
+
+
+def test_eviction(tmp_path):
+    """测试超出上限时淘汰最久未使用的记录"""
+    cache = ProbeCache(str(tmp_path / "cache.sqlite3"), max_entries=3)
+    for i in range(5):
+        media = tmp_path / f"{i}.mp4"
+        media.write_bytes(b"x")
+        cache.put(str(media), {"index": i})
+
+    assert cache.evict() == 2
+    assert len(cache) == 3
+    assert cache.get(str(tmp_path / "0.mp4")) is None
+    assert cache.get(str(tmp_path / "4.mp4")) == {"index": 4}
+
+
+def test_materials_use_cache_and_warm(tmp_path):
+    """测试素材类经由缓存探测, 以及预热整个文件夹"""
+    folder = tmp_path / "materials"
+    folder.mkdir()
+    video_path = str(folder / "video.mp4")
+    shutil.copy(TEST_VIDEO, video_path)
+
+    cache = ProbeCache(str(tmp_path / "cache.sqlite3"))
+    draft.set_probe_cache(cache)
+    try:
+        stats = cache.warm(str(folder))
+        assert stats == {"cached": 0, "probed": 1, "failed": 0}
+        assert cache.warm(str(folder))["cached"] == 1
+
+        material = draft.VideoMaterial(video_path)
+        assert (material.duration, material.width, material.height) == (10000000, 1280, 720)
+        assert material.material_type == "video"
+        assert len(cache) == 1
+    finally:
+        draft.set_probe_cache(None)
+
+
+def test_probe_many(tmp_path):
+    """测试批量探测整个文件夹, 并报告无法解析的文件"""
+    folder = tmp_path / "materials"
+    (folder / "sub").mkdir(parents=True)
+    for i in range(4):
+        shutil.copy(TEST_VIDEO, str(folder / "sub" / f"video{i}.mp4"))
+    (folder / "broken.mp4").write_bytes(b"not a video")
+
+    cache = ProbeCache(str(tmp_path / "cache.sqlite3"))
+    results = draft.probe_many([str(folder)], cache=cache, max_workers=2, ffprobe_fallback=False)
+
+    assert len(results) == 5
+    broken = results[str(folder / "broken.mp4")]
+    assert broken["error"] is not None and broken["size"] == 11
+    video = results[str(folder / "sub" / "video0.mp4")]
+    assert video["error"] is None and not video["cached"]
+    assert (video["media_type"], video["duration"], video["width"], video["height"]) == ("video", 10000000, 1280, 720)
+    assert video["video_codec"] == "AVC"
+
+    again = draft.probe_many([str(folder / "sub" / "video0.mp4")], cache=cache)
+    assert again[str(folder / "sub" / "video0.mp4")]["cached"]
+
+
+class BrokenPool:
+    """模拟探测到第二个文件时工作进程崩溃的进程池"""
+
+    def __init__(self, max_workers=None):
+        self.shutdown_called = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown_called = True
+        BrokenPool.instances.append(self)
+
+    def map(self, func, items, chunksize=1):
+        items = list(items)
+        yield func(items[0])
+        raise BrokenProcessPool("A process in the process pool was terminated abruptly")
+
+BrokenPool.instances = []
+
+
+def test_probe_many_recovers_from_broken_pool(tmp_path, monkeypatch):
+    """测试工作进程崩溃时关闭进程池, 其余文件改为在本进程中探测"""
+    for i in range(4):
+        shutil.copy(TEST_VIDEO, str(tmp_path / f"video{i}.mp4"))
+    monkeypatch.setattr(local_materials, "ProcessPoolExecutor", BrokenPool)
+
+    results = draft.probe_many([str(tmp_path)], use_cache=False, max_workers=2, ffprobe_fallback=False)
+    assert [result["error"] for result in results.values()] == [None] * 4
+    assert all(result["duration"] == 10000000 for result in results.values())
+    assert len(BrokenPool.instances) == 1 and BrokenPool.instances[0].shutdown_called
+
+
+def test_probe_many_reports_cache_write_errors(tmp_path):
+    """测试写入缓存时文件已被删除的情况作为该文件的错误报告, 不影响其它文件"""
+    for name in ("kept.mp4", "deleted.mp4"):
+        shutil.copy(TEST_VIDEO, str(tmp_path / name))
+
+    class DeletingCache(ProbeCache):
+        def put(self, path, record, kind=MEDIAINFO_KIND):
+            if path.endswith("deleted.mp4") and os.path.exists(path):
+                os.remove(path)
+            super().put(path, record, kind)
+
+    cache = DeletingCache(str(tmp_path / "cache.sqlite3"))
+    results = draft.probe_many([str(tmp_path / "kept.mp4"), str(tmp_path / "deleted.mp4")],
+                               cache=cache, ffprobe_fallback=False)
+    assert results[str(tmp_path / "kept.mp4")]["error"] is None
+    assert results[str(tmp_path / "deleted.mp4")]["error"] is not None
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试轨道的片段插入与重叠检查
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import pyJianYingDraft as draft
+from pyJianYingDraft import trange
+from pyJianYingDraft.exceptions import SegmentOverlap
+from pyJianYingDraft.segment import BaseSegment
+
+
+def text_track():
+    script = draft.ScriptFile(1920, 1080)
+    script.add_track(draft.TrackType.text)
+    return script, script.tracks["text"]
+
+
+def starts(track):
+    return [seg.start for seg in track.segments]
+
+
+def test_add_segment_keeps_time_order():
+    """测试乱序添加的片段按时间排序, 且能检出与前后片段的重叠"""
+    script, track = text_track()
+    for start in ("4s", "0s", "2s"):
+        script.add_segment(draft.TextSegment(start, trange(start, "1s")))
+    assert starts(track) == [0, 2000000, 4000000]
+    assert track.end_time == 5000000
+
+    with pytest.raises(SegmentOverlap):
+        track.add_segment(draft.TextSegment("x", trange("1.5s", "1s")))
+    with pytest.raises(SegmentOverlap):
+        track.add_segment(draft.TextSegment("x", trange("0.5s", "5s")))
+    track.add_segment(draft.TextSegment("x", trange("1s", "1s")))  # 首尾相接不算重叠
+    assert starts(track) == [0, 1000000, 2000000, 4000000]
+
+
+def test_add_segments_batch():
+    """测试批量添加片段, 重叠时不添加任何片段"""
+    script, track = text_track()
+    script.add_segment(draft.TextSegment("a", trange("3s", "1s")))
+
+    script.add_segments([draft.TextSegment(str(i), trange(i * 1000000, 1000000)) for i in (0, 1, 2, 5)])
+    assert starts(track) == [0, 1000000, 2000000, 3000000, 5000000]
+    assert script.duration == 6000000
+
+    with pytest.raises(SegmentOverlap):
+        track.add_segments([draft.TextSegment("b", trange("7s", "1s")), draft.TextSegment("c", trange("3.5s", "1s"))])
+    assert len(track.segments) == 5
+
+    # 片段列表在外部被修改后仍能正确检查
+    track.segments.pop(0)
+    track.add_segment(draft.TextSegment("d", trange("0s", "1s")))
+    assert starts(track) == [0, 1000000, 2000000, 3000000, 5000000]
+
+
+def test_reindex_after_editing_time_ranges():
+    """测试直接修改片段的时间范围并调用`reindex()`后, 仍能保持排序并检出重叠"""
+    script, track = text_track()
+    for start in ("0s", "2s", "4s"):
+        script.add_segment(draft.TextSegment(start, trange(start, "1s")))
+
+    track.segments[1].start = 6000000
+    track.reindex()
+    assert starts(track) == [0, 4000000, 6000000]
+    with pytest.raises(SegmentOverlap):
+        track.add_segment(draft.TextSegment("x", trange("6.2s", "0.5s")))
+    track.add_segment(draft.TextSegment("x", trange("2s", "1s")))
+    assert starts(track) == [0, 2000000, 4000000, 6000000]
+
+
+def test_many_segments_are_not_quadratic(monkeypatch):
+    """测试按序添加大量片段时, 每个片段只与常数个现有片段比较"""
+    calls = []
+    original = BaseSegment.overlaps
+    monkeypatch.setattr(BaseSegment, "overlaps", lambda self, other: calls.append(1) or original(self, other))
+
+    _, track = text_track()
+    for i in range(2000):
+        track.add_segment(draft.TextSegment("x", trange(i * 1000, 1000)))
+    assert len(calls) <= 2 * 2000
+
+    calls.clear()
+    track.add_segments([draft.TextSegment("y", trange(2000 * 1000 + i * 1000, 1000)) for i in range(2000)])
+    assert len(calls) <= 4000
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试视频重复检测脚本的分阶段内容比较、并行计算与持久化的哈希缓存、文件名相似度的候选索引, 以及画面指纹
+"""
+
+import os
+import sys
+import random
+import difflib
+import hashlib
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import pytest
+
+import video_duplicate_checker
+from video_duplicate_checker import PARTIAL_CHUNK_SIZE, BKTree, HashCache, NameSimilarityIndex, VideoDuplicateChecker, VideoFile
+
+
+def make_videos(folder):
+    """创建两个完全相同的文件、一个只有中间不同的同样大小的文件, 以及一个大小唯一的文件"""
+    size = PARTIAL_CHUNK_SIZE * 4
+    content = os.urandom(size)
+    middle_changed = bytearray(content)
+    middle_changed[size // 2] ^= 0xFF
+    files = {"原片.mp4": content, "原片_副本.mp4": content, "中间不同.mp4": bytes(middle_changed),
+             "大小唯一.mp4": content[:-1]}
+    for name, data in files.items():
+        (folder / name).write_bytes(data)
+    return content
+
+
+def test_staged_content_duplicates(tmp_path):
+    """测试大小唯一的文件不被读取, 首尾相同而中间不同的文件由完整哈希区分"""
+    content = make_videos(tmp_path)
+    checker = VideoDuplicateChecker(use_cache=False)
+    checker.scan_directory(str(tmp_path))
+    checker.find_content_duplicates()
+
+    by_name = {f.file_name: f for f in checker.video_files}
+    assert by_name["大小唯一.mp4"].partial_hash is None and by_name["大小唯一.mp4"].content_hash is None
+    assert by_name["中间不同.mp4"].partial_hash == by_name["原片.mp4"].partial_hash
+    assert by_name["中间不同.mp4"].content_hash != by_name["原片.mp4"].content_hash
+
+    groups = list(checker.md5_duplicates.values())
+    assert len(groups) == 1
+    assert sorted(f.file_name for f in groups[0]) == ["原片.mp4", "原片_副本.mp4"]
+
+    report = checker.generate_report()
+    assert report["md5_duplicate_groups"] == 1
+    assert report["statistics"]["total_waste_size"] == len(content)
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_parallel_and_cached_rescan(tmp_path, executor):
+    """测试并行计算的结果与串行一致, 再次扫描时只计算新增或变化的文件"""
+    videos = tmp_path / "videos"
+    videos.mkdir()
+    content = make_videos(videos)
+    cache = HashCache(str(tmp_path / "hashes.sqlite3"))
+
+    def scan(workers):
+        checker = VideoDuplicateChecker(workers=workers, executor=executor, cache=cache)
+        checker.scan_directory(str(videos))
+        checker.find_content_duplicates()
+        return checker
+
+    first = scan(4)
+    assert first.hash_stats == {"cached": 0, "hashed": 6, "failed": 0}
+    assert [sorted(f.file_name for f in group) for group in first.md5_duplicates.values()] == [["原片.mp4", "原片_副本.mp4"]]
+
+    second = scan(1)
+    assert second.hash_stats == {"cached": 6, "hashed": 0, "failed": 0}
+    assert list(second.md5_duplicates) == list(first.md5_duplicates)
+
+    # 修改文件内容(大小不变)后, 该文件的缓存失效
+    changed = videos / "中间不同.mp4"
+    changed.write_bytes(content)
+    os.utime(changed, ns=(changed.stat().st_atime_ns, changed.stat().st_mtime_ns + 10**9))
+    third = scan(4)
+    assert third.hash_stats == {"cached": 4, "hashed": 2, "failed": 0}
+    assert len(next(iter(third.md5_duplicates.values()))) == 3
+    cache.close()
+
+
+def test_calculate_md5(tmp_path):
+    """测试仍可计算真正的MD5值"""
+    path = tmp_path / "视频1.mp4"
+    path.write_bytes(b"abc" * 1000)
+    assert VideoFile(str(path)).calculate_md5() == hashlib.md5(b"abc" * 1000).hexdigest()
+
+
+def random_names(count, seed=0):
+    """生成带有插入、删除、替换等小改动的相似文件名"""
+    rng = random.Random(seed)
+    alphabet = "毛笔字楷书写法红石书院视频教程第集abc0123456789_ "
+    names = []
+    while len(names) < count:
+        base = [rng.choice(alphabet) for _ in range(rng.randint(0, 16))]
+        for _ in range(rng.randint(1, 3)):
+            name = list(base)
+            for _ in range(rng.randint(0, 3)):
+                pos = rng.randint(0, len(name))
+                if rng.random() < 0.5:
+                    name.insert(pos, rng.choice(alphabet))
+                elif name:
+                    del name[min(pos, len(name) - 1)]
+            names.append("".join(name))
+    return names[:count]
+
+
+@pytest.mark.parametrize("threshold", [0.1, 0.6, 0.85, 1.0])
+def test_name_index_has_no_false_negatives(threshold):
+    """测试候选索引不会漏掉任何相似度达到阈值的名称对"""
+    names = random_names(200)
+    index = NameSimilarityIndex(names, threshold)
+    for i, name in enumerate(names):
+        candidates = set(index.candidates(i))
+        assert all(j > i for j in candidates)
+        for j in range(i + 1, len(names)):
+            if difflib.SequenceMatcher(None, name, names[j]).ratio() >= threshold:
+                assert j in candidates, (name, names[j])
+
+
+class NamedFile:
+    def __init__(self, file_name, file_size):
+        self.file_name = file_name
+        self.file_size = file_size
+
+
+def pairwise_name_groups(files, threshold):
+    """原有的两两比较分组, 作为索引分组的对照"""
+    groups, processed = [], set()
+    for i, file1 in enumerate(files):
+        if file1.file_name in processed:
+            continue
+        group = [file1]
+        processed.add(file1.file_name)
+        for file2 in files[i + 1:]:
+            if file2.file_name in processed:
+                continue
+            similarity = difflib.SequenceMatcher(None, os.path.splitext(file1.file_name)[0],
+                                                 os.path.splitext(file2.file_name)[0]).ratio()
+            if similarity >= threshold and min(file1.file_size, file2.file_size) / max(file1.file_size, file2.file_size) >= 0.8:
+                group.append(file2)
+                processed.add(file2.file_name)
+        if len(group) > 1:
+            groups.append(group)
+    return groups
+
+
+def test_name_groups_match_pairwise_comparison():
+    """测试基于索引的分组与两两比较的结果完全相同"""
+    rng = random.Random(1)
+    files = [NamedFile(name + ".mp4", rng.choice([100, 90, 50])) for name in dict.fromkeys(random_names(300, seed=1))]
+
+    checker = VideoDuplicateChecker(use_cache=False)
+    for threshold in (0.5, 0.85):
+        assert checker._similar_name_groups(files, threshold) == pairwise_name_groups(files, threshold)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_name_groups_keep_comparison_order(seed):
+    """测试相似度按原有的参数顺序计算: `SequenceMatcher.ratio()`不对称, 交换两个名称可能改变分组"""
+    rng = random.Random(seed)
+    alphabet = "ab院石楷书"
+    names = []
+    for _ in range(60):
+        base = [rng.choice(alphabet) for _ in range(rng.randint(6, 14))]
+        for _ in range(rng.randint(1, 3)):
+            name = list(base)
+            for _ in range(rng.randint(0, 4)):
+                name.insert(rng.randint(0, len(name)), rng.choice(alphabet))
+            names.append("".join(name))
+    files = [NamedFile(name + ".mp4", 100) for name in dict.fromkeys(names)]
+    rng.shuffle(files)
+
+    checker = VideoDuplicateChecker(use_cache=False)
+    for threshold in (0.75, 0.8, 0.85):
+        assert checker._similar_name_groups(files, threshold) == pairwise_name_groups(files, threshold)
+
+
+def test_name_groups_asymmetric_ratio():
+    """测试`ratio(a, b)`达到阈值而`ratio(b, a)`未达到的名称对仍被归为一组"""
+    files = [NamedFile("acb院院石院b院b.mp4", 100), NamedFile("acb楷院院石院bb院书b.mp4", 100)]
+    checker = VideoDuplicateChecker(use_cache=False)
+    assert checker._similar_name_groups(files, 0.85) == [files]
+
+
+def test_bk_tree_search():
+    """测试BK树返回的结果与逐一比较相同"""
+    rng = random.Random(2)
+    keys = [rng.getrandbits(64) for _ in range(500)]
+    tree = BKTree()
+    for i, key in enumerate(keys):
+        tree.add(key, i)
+    for query in keys[:20] + [rng.getrandbits(64) for _ in range(20)]:
+        expected = {i for i, key in enumerate(keys) if bin(key ^ query).count("1") <= 20}
+        assert {i for i, _ in tree.search(query, 20)} == expected
+
+
+def write_clip(path, seed, size=(96, 64), noise=0.0, trim=0):
+    """用imageio写出由几个镜头组成的GIF短片, 可以加噪、缩放(模拟重新编码)或剪掉首尾的帧"""
+    np = pytest.importorskip("numpy")
+    imageio = pytest.importorskip("imageio")
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    noise_rng = np.random.default_rng(seed + 100)
+    frames = []
+    yy, xx = np.mgrid[0:64, 0:96]
+    for _ in range(6):
+        image = np.zeros((64, 96, 3)) + (xx / 96 * 60)[..., None]
+        for _ in range(5):
+            cx, cy, radius = rng.integers(0, 96), rng.integers(0, 64), rng.integers(8, 30)
+            image[(xx - cx) ** 2 + (yy - cy) ** 2 < radius ** 2] = rng.integers(0, 255, 3)
+        for _ in range(3):
+            frame = np.clip(image + noise_rng.normal(0, noise, image.shape), 0, 255).astype(np.uint8)
+            frames.append(np.asarray(Image.fromarray(frame).resize(size)))
+    imageio.mimsave(str(path), frames[trim:len(frames) - trim])
+
+
+def test_perceptual_duplicates(tmp_path, monkeypatch):
+    """测试重新编码、缩放及剪掉首尾的副本被识别为画面相似, 不同的短片不会"""
+    clips = tmp_path / "clips"
+    clips.mkdir()
+    write_clip(clips / "原片.gif", 1)
+    write_clip(clips / "重新编码.gif", 1, size=(144, 96), noise=8)
+    write_clip(clips / "剪辑版.gif", 1, trim=2)
+    write_clip(clips / "其它短片.gif", 2)
+
+    # 用imageio自带的GIF解码代替ffmpeg
+    monkeypatch.setattr(video_duplicate_checker, "perceptual_available", lambda: True)
+    cache = HashCache(str(tmp_path / "hashes.sqlite3"))
+    checker = VideoDuplicateChecker(workers=1, cache=cache)
+    checker.VIDEO_EXTENSIONS = {".gif"}
+    checker.scan_directory(str(clips))
+    checker.find_perceptual_duplicates()
+
+    assert [sorted(f.file_name for f in group) for group in checker.perceptual_groups] == [["剪辑版.gif", "原片.gif", "重新编码.gif"]]
+    assert checker.generate_report()["perceptual_similar_groups"] == 1
+
+    rescan = VideoDuplicateChecker(workers=1, cache=cache)
+    rescan.VIDEO_EXTENSIONS = {".gif"}
+    rescan.scan_directory(str(clips))
+    rescan.find_perceptual_duplicates()
+    assert rescan.hash_stats["cached"] == 4 and rescan.hash_stats["hashed"] == 0
+    cache.close()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测量导入pyJianYingDraft的启动耗时
+
+分别在新的解释器进程中测量:
+1. 仅导入库(元数据枚举延迟加载)
+2. 导入库并加载全部元数据枚举(相当于延迟加载之前的行为)
+"""
+
+import os
+import sys
+import statistics
+import subprocess
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CASES = {
+    "import pyJianYingDraft": "import pyJianYingDraft",
+    "import + 加载全部元数据": "import pyJianYingDraft, pyJianYingDraft.metadata as m; [getattr(m, n) for n in m.__all__]",
+}
+
+TIMER = """
+import sys, time
+sys.path.insert(0, {root!r})
+_start = time.perf_counter()
+{stmt}
+print(time.perf_counter() - _start)
+"""
+
+def measure(stmt: str, repeat: int) -> list:
+    """在独立进程中重复执行导入语句, 返回每次的耗时(秒)"""
+    code = TIMER.format(root=PROJECT_ROOT, stmt=stmt)
+    timings = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+        timings.append(float(output.strip().splitlines()[-1]))
+    return timings
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    print(f"Python {sys.version.split()[0]}, 每项重复 {repeat} 次")
+    results = {}
+    for name, stmt in CASES.items():
+        timings = measure(stmt, repeat)
+        results[name] = statistics.median(timings)
+        print(f"{name}: 中位数 {results[name] * 1000:.1f} ms, 最小 {min(timings) * 1000:.1f} ms")
+
+    lazy, eager = results.values()
+    print(f"延迟加载节省 {(eager - lazy) * 1000:.1f} ms ({(1 - lazy / eager) * 100:.0f}%)")
+
+if __name__ == "__main__":
+    main()
@@ -6,8 +6,13 @@
 """
 
 import os
+import sys
+from pathlib import Path
 from config_manager import ConfigManager
 
+# 添加项目根目录到Python路径, 以便搜索pyJianYingDraft的元数据
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
 class ConfigEditor:
     """配置编辑器类"""
     
@@ -26,6 +31,7 @@ class ConfigEditor:
         print("6. 验证配置")
         print("7. 保存配置")
         print("8. 重置为默认配置")
+        print("9. 搜索特效/滤镜/字体名称")
         print("0. 退出")
         print("-" * 40)
     
@@ -261,6 +267,23 @@ class ConfigEditor:
         else:
             print("❌ 取消重置")
     
+    def search_effect_names(self):
+        """按名称、拼音模糊搜索特效/滤镜/字体等, 查看其准确名称"""
+        print("\n🔎 搜索特效/滤镜/字体名称:")
+        print("-" * 30)
+        from pyJianYingDraft.metadata.search import search_effects
+
+        while True:
+            query = input("输入关键词 (回车返回主菜单): ").strip()
+            if not query:
+                return
+            results = search_effects(query, limit=15)
+            if not results:
+                print("❌ 没有找到匹配的项")
+                continue
+            for i, result in enumerate(results, 1):
+                print(f"{i:2d}. {result.display_name}  [{result.enum_name}.{result.member_name}]  匹配度 {result.score:.2f}")
+
     def run(self):
         """运行配置编辑器"""
         print("🔧 配置编辑器")
@@ -270,7 +293,7 @@ class ConfigEditor:
             self.show_main_menu()
             
             try:
-                choice = int(input("请选择操作 (0-8): "))
+                choice = int(input("请选择操作 (0-9): "))
                 
                 if choice == 0:
                     print("👋 退出配置编辑器")
@@ -291,6 +314,8 @@ class ConfigEditor:
                     self.save_config()
                 elif choice == 8:
                     self.reset_config()
+                elif choice == 9:
+                    self.search_effect_names()
                 else:
                     print("❌ 无效选择，请重试")
                     
@@ -4,32 +4,475 @@
 视频文件重复检测脚本
 功能：
 1. 遍历目录下所有视频文件
-2. 计算MD5值检测完全重复
+2. 按文件大小、首尾块哈希、完整哈希分阶段检测完全重复, 哈希并行计算并持久化缓存, 再次扫描时只计算新增或变化的文件
 3. 解析中文+数字文件名结构，检测相似重复
-4. 生成对比报告
-5. 提供交互式删除功能
+4. 对视频均匀抽帧计算感知哈希, 检测重新编码或剪辑过的画面相似副本(需要ffmpeg)
+5. 生成对比报告
+6. 提供交互式删除功能
 """
 
 import os
+import sys
+import math
+import bisect
+import time
 import hashlib
 import re
 import datetime
 import json
+import shutil
+import sqlite3
+import functools
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Tuple, Optional, Set
-from collections import defaultdict
+from typing import Callable, Dict, List, Tuple, Optional, Set
+from collections import Counter, defaultdict
 import difflib
 
+try:
+    import blake3
+except ImportError:
+    blake3 = None
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+try:
+    import numpy as np
+    import imageio
+    from PIL import Image
+except ImportError:
+    np = imageio = Image = None
+
+PARTIAL_CHUNK_SIZE = 64 * 1024
+"""部分哈希读取的文件首、尾块大小"""
+READ_BUFFER_SIZE = 4 * 1024 * 1024
+"""完整哈希时每次读取的字节数"""
+
+def _default_hash_algorithm() -> str:
+    """可用的最快的完整哈希算法: 安装了blake3或xxhash时使用它们, 否则使用标准库的blake2b"""
+    if blake3 is not None:
+        return "blake3"
+    if xxhash is not None:
+        return "xxh3_128"
+    return "blake2b"
+
+HASH_ALGORITHM = _default_hash_algorithm()
+"""完整哈希使用的算法"""
+
+FINGERPRINT_FRAMES = 8
+"""计算画面指纹时每个视频均匀抽取的帧数"""
+FINGERPRINT_KIND = f"perceptual-v1:{FINGERPRINT_FRAMES}"
+"""画面指纹在哈希缓存中的记录类型, 算法变化时更新版本号以使旧记录失效"""
+_HASH_SIZE = 32
+"""感知哈希计算前将画面缩放到的边长"""
+_MIN_FRAME_STD = 4.0
+"""灰度标准差低于此值的画面(黑屏、纯色转场)不参与比较, 避免不同视频因黑屏而误判为相似"""
+
+HASH_CACHE_ENV = "VIDEO_DUPLICATE_HASH_CACHE"
+"""指定哈希缓存数据库路径的环境变量, 取值为`off`时禁用缓存"""
+
+def new_hasher(algorithm: Optional[str] = None):
+    """创建指定算法(默认为`HASH_ALGORITHM`)的哈希对象, 其余算法名称交给`hashlib.new`"""
+    algorithm = algorithm or HASH_ALGORITHM
+    if algorithm == "blake3":
+        return blake3.blake3()
+    if algorithm == "xxh3_128":
+        return xxhash.xxh3_128()
+    return hashlib.new(algorithm)
+
+def partial_file_hash(path: str, size: int, chunk_size: int = PARTIAL_CHUNK_SIZE) -> str:
+    """计算文件大小及首、尾各`chunk_size`字节的哈希"""
+    hasher = hashlib.blake2b(str(size).encode(), digest_size=16)
+    with open(path, "rb") as f:
+        hasher.update(f.read(chunk_size))
+        if size > chunk_size:
+            f.seek(max(chunk_size, size - chunk_size))
+            hasher.update(f.read(chunk_size))
+    return hasher.hexdigest()
+
+def full_file_hash(path: str, algorithm: Optional[str] = None, buffer_size: int = READ_BUFFER_SIZE) -> str:
+    """以大块缓冲读取计算完整内容的哈希, 默认使用HASH_ALGORITHM"""
+    hasher = new_hasher(algorithm)
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                break
+            hasher.update(view[:n])
+    return hasher.hexdigest()
+
+def perceptual_available() -> bool:
+    """是否可以计算画面指纹: 需要numpy与Pillow, 以及imageio的ffmpeg插件或系统中的ffmpeg"""
+    if np is None:
+        return False
+    if shutil.which("ffmpeg") is not None and shutil.which("ffprobe") is not None:
+        return True
+    try:
+        import imageio_ffmpeg  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def _read_frames_with_imageio(path: str, count: int) -> List["np.ndarray"]:
+    """用imageio均匀读取`count`帧, 缩放为`_HASH_SIZE`见方的灰度图"""
+    frames = []
+    reader = imageio.get_reader(path)
+    try:
+        length = reader.get_length()
+        if not math.isfinite(length) or length <= 0:
+            # ffmpeg插件不预先统计帧数, 由时长与帧率估算
+            meta = reader.get_meta_data()
+            length = int((meta.get("duration") or 0) * (meta.get("fps") or 0))
+        if length <= 0:
+            return frames
+        for index in sorted({min(length - 1, int((k + 0.5) * length / count)) for k in range(count)}):
+            try:
+                frame = reader.get_data(index)
+            except (IndexError, RuntimeError):
+                break  # 估算的帧数多于实际帧数
+            image = Image.fromarray(np.asarray(frame)).convert("L").resize((_HASH_SIZE, _HASH_SIZE), Image.BILINEAR)
+            frames.append(np.asarray(image, dtype=np.float64))
+    finally:
+        reader.close()
+    return frames
+
+def _read_frames_with_ffmpeg(path: str, count: int) -> List["np.ndarray"]:
+    """用ffprobe获取时长, 再调用ffmpeg在均匀分布的时间点各取一帧, 缩放为`_HASH_SIZE`见方的灰度图"""
+    probe = subprocess.run(["ffprobe", "-v", "quiet", "-show_entries", "format=duration", "-of", "csv=p=0", path],
+                           capture_output=True, text=True, timeout=60)
+    duration = float(probe.stdout.strip() or 0)
+    if probe.returncode != 0 or duration <= 0:
+        raise RuntimeError("ffprobe 无法获取视频时长")
+    frames = []
+    for k in range(count):
+        result = subprocess.run(["ffmpeg", "-v", "quiet", "-ss", "%.3f" % ((k + 0.5) * duration / count), "-i", path,
+                                 "-frames:v", "1", "-vf", f"scale={_HASH_SIZE}:{_HASH_SIZE},format=gray",
+                                 "-f", "rawvideo", "-"], capture_output=True, timeout=120)
+        if result.returncode == 0 and len(result.stdout) == _HASH_SIZE * _HASH_SIZE:
+            frames.append(np.frombuffer(result.stdout, dtype=np.uint8).reshape(_HASH_SIZE, _HASH_SIZE).astype(np.float64))
+    return frames
+
+def sample_video_frames(path: str, count: int = FINGERPRINT_FRAMES) -> List["np.ndarray"]:
+    """在视频中均匀抽取`count`帧, 返回缩放后的灰度图, 优先使用imageio, 不可用时调用ffmpeg
+    
+    Raises:
+        `RuntimeError`: 没有可用的解码方式
+    """
+    if np is None:
+        raise RuntimeError("计算画面指纹需要安装numpy与Pillow")
+    try:
+        return _read_frames_with_imageio(path, count)
+    except Exception:
+        if shutil.which("ffmpeg") is None or shutil.which("ffprobe") is None:
+            raise
+    return _read_frames_with_ffmpeg(path, count)
+
+@functools.lru_cache(maxsize=None)
+def _dct_matrix(n: int) -> "np.ndarray":
+    """n阶正交DCT-II矩阵"""
+    k = np.arange(n)[:, None]
+    matrix = np.cos(np.pi * (2 * np.arange(n)[None, :] + 1) * k / (2 * n)) * math.sqrt(2 / n)
+    matrix[0] /= math.sqrt(2)
+    return matrix
+
+def perceptual_hash(gray: "np.ndarray") -> Optional[int]:
+    """计算`_HASH_SIZE`见方灰度图的64位感知哈希(pHash): 取二维DCT左上角8x8的低频系数, 与其中位数比较
+    
+    画面接近纯色时返回None
+    """
+    if float(gray.std()) < _MIN_FRAME_STD:
+        return None
+    dct = _dct_matrix(gray.shape[0])
+    low = (dct @ gray @ dct.T)[:8, :8].flatten()
+    bits = low > np.median(low[1:])  # 直流分量只反映整体亮度, 不参与中位数
+    return int("".join("1" if bit else "0" for bit in bits), 2)
+
+def video_fingerprint(path: str, frames: int = FINGERPRINT_FRAMES) -> str:
+    """视频的画面指纹: 均匀抽取的各帧感知哈希(十六进制, 以逗号分隔), 纯色画面被略去"""
+    hashes = (perceptual_hash(frame) for frame in sample_video_frames(path, frames))
+    return ",".join("%016x" % h for h in hashes if h is not None)
+
+def hamming_distance(a: int, b: int) -> int:
+    """两个整数二进制表示的汉明距离"""
+    return bin(a ^ b).count("1")
+
+class BKTree:
+    """以汉明距离为度量的BK树, 用于查找与给定哈希距离不超过阈值的所有哈希, 不必逐一比较"""
+    
+    def __init__(self):
+        self._root = None  # [哈希, 值列表, {距离: 子节点}]
+        self.size = 0
+    
+    def add(self, key: int, value) -> None:
+        """加入一个哈希及其关联的值, 相同的哈希共用一个节点"""
+        self.size += 1
+        if self._root is None:
+            self._root = [key, [value], {}]
+            return
+        node = self._root
+        while True:
+            distance = hamming_distance(key, node[0])
+            if distance == 0:
+                node[1].append(value)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [key, [value], {}]
+                return
+            node = child
+    
+    def search(self, key: int, radius: int) -> List[Tuple[object, int]]:
+        """查找与`key`的汉明距离不超过`radius`的所有哈希, 返回 [(值, 距离)]"""
+        found = []
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node = stack.pop()
+            distance = hamming_distance(key, node[0])
+            if distance <= radius:
+                found.extend((value, distance) for value in node[1])
+            # 三角不等式: 只有与当前节点距离在[distance-radius, distance+radius]内的子树可能包含结果
+            for child_distance, child in node[2].items():
+                if distance - radius <= child_distance <= distance + radius:
+                    stack.append(child)
+        return found
+
+def group_similar_fingerprints(fingerprints: List[str], max_distance: int = 10, min_match_ratio: float = 0.5,
+                               skip_pair: Optional[Callable[[int, int], bool]] = None) -> List[List[int]]:
+    """按顺序贪心地将画面指纹相似的视频归为一组, 返回各组(只含多个视频的组)中视频的序号
+    
+    所有帧的哈希放入BK树, 查询与每一帧汉明距离不超过`max_distance`的帧;
+    两个视频中相似的帧数达到较少一方帧数的`min_match_ratio`时视为画面相似. 空指纹(全部为纯色画面)不参与比较
+    
+    Args:
+        fingerprints (`List[str]`): `video_fingerprint`返回的画面指纹
+        max_distance (`int`, optional): 两帧视为相似的最大汉明距离(64位中), 默认为10
+        min_match_ratio (`float`, optional): 视为画面相似所需的相似帧比例, 默认为0.5
+        skip_pair (`Callable[[int, int], bool]`, optional): 返回True的视频对不归为一组
+    """
+    frame_hashes = [[int(h, 16) for h in fingerprint.split(",")] if fingerprint else [] for fingerprint in fingerprints]
+    tree = BKTree()
+    for i, hashes in enumerate(frame_hashes):
+        for h in hashes:
+            tree.add(h, i)
+    
+    groups = []
+    processed = set()
+    for i, hashes in enumerate(frame_hashes):
+        if i in processed or not hashes:
+            continue
+        matched_frames = defaultdict(set)  # 另一个视频 → 本视频中与它相似的帧
+        for frame_index, h in enumerate(hashes):
+            for j, _ in tree.search(h, max_distance):
+                if j != i:
+                    matched_frames[j].add(frame_index)
+        
+        group = [i]
+        processed.add(i)
+        for j in sorted(matched_frames):
+            if j in processed or (skip_pair is not None and skip_pair(i, j)):
+                continue
+            required = min_match_ratio * min(len(hashes), len(frame_hashes[j]))
+            if len(matched_frames[j]) >= max(1, required):
+                group.append(j)
+                processed.add(j)
+        if len(group) > 1:
+            groups.append(group)
+    return groups
+
+def _hash_in_worker(path: str, size: int, kind: str) -> Tuple[Optional[str], Optional[str]]:
+    """在工作线程/进程中计算单个文件的哈希, 异常转为错误信息以便跨进程返回"""
+    try:
+        if kind == "partial":
+            return partial_file_hash(path, size), None
+        if kind == "perceptual":
+            return video_fingerprint(path), None
+        return full_file_hash(path), None
+    except Exception as e:
+        return None, str(e) or type(e).__name__
+
+class NameSimilarityIndex:
+    """文件名相似度的候选索引: 找出`difflib.SequenceMatcher`相似度可能不低于阈值的名称对
+    
+    相似度`2M/(|a|+|b|)`中的匹配字符数M不超过两个名称字符多重集的交集大小, 因此相似度达到阈值t的名称对,
+    交集至少为`t*(|a|+|b|)/2`, 也至少为`|a|*t/(2-t)`. 将每个名称的字符(重复出现的字符按出现次序区分)
+    按全局频率由低到高排序后, 这样的名称对的前`|a| - ceil(|a|*t/(2-t)) + 1`个字符必有交集(前缀过滤);
+    再由第一个共同字符在两个名称中的位置估计交集的上限(位置过滤). 索引只记录前缀字符,
+    查询得到的候选包含全部满足阈值的名称, 且通常只由少见的字符产生, 不必两两比较
+    """
+    
+    def __init__(self, names: List[str], threshold: float):
+        """
+        Args:
+            names (`List[str]`): 名称列表
+            threshold (`float`): 相似度阈值, 在0-1之间
+        """
+        token_lists = []
+        for name in names:
+            seen = Counter()
+            tokens = []
+            for ch in name:
+                tokens.append((ch, seen[ch]))
+                seen[ch] += 1
+            token_lists.append(tokens or [("", 0)])  # 空名称之间互为候选
+        frequency = Counter(token for tokens in token_lists for token in tokens)
+        
+        self.threshold = threshold
+        self._lengths = [len(tokens) for tokens in token_lists]
+        self._prefixes: List[List[Tuple[str, int]]] = []
+        self._postings: Dict[Tuple[str, int], List[Tuple[int, int]]] = defaultdict(list)
+        for i, tokens in enumerate(token_lists):
+            tokens.sort(key=lambda token: (frequency[token], token))
+            required = math.ceil(len(tokens) * threshold / (2 - threshold) - 1e-9)
+            prefix = tokens[:max(1, len(tokens) - required + 1)]
+            self._prefixes.append(prefix)
+            for position, token in enumerate(prefix):
+                self._postings[token].append((i, position))
+    
+    def candidates(self, i: int) -> List[int]:
+        """序号在`i`之后、与第`i`个名称的相似度可能达到阈值的名称序号(升序)"""
+        lengths = self._lengths
+        length = lengths[i]
+        # 长度过滤: 2*min(|a|, |b|) >= t*(|a|+|b|)
+        min_length = length * self.threshold / (2 - self.threshold) - 1e-9
+        max_length = length * (2 - self.threshold) / self.threshold + 1e-9 if self.threshold > 0 else math.inf
+        half_threshold = self.threshold / 2
+        visited = set()
+        found = []
+        for position, token in enumerate(self._prefixes[i]):
+            postings = self._postings[token]
+            for k in range(bisect.bisect_right(postings, (i, math.inf)), len(postings)):
+                j, other_position = postings[k]
+                if j in visited:
+                    continue
+                visited.add(j)  # 按全局顺序第一次遇到的共同字符即为两者的第一个共同字符
+                other_length = lengths[j]
+                if other_length < min_length or other_length > max_length:
+                    continue
+                # 位置过滤: 第一个共同字符之后, 交集最多还能包含两者剩余字符数中较少的那些
+                remaining = length - position
+                if other_length - other_position < remaining:
+                    remaining = other_length - other_position
+                if remaining < half_threshold * (length + other_length) - 1e-9:
+                    continue
+                found.append(j)
+        found.sort()
+        return found
+
+def default_hash_cache_path() -> str:
+    """返回默认的哈希缓存数据库路径"""
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA", os.path.expanduser("~"))
+    else:
+        base = os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache"))
+    return os.path.join(base, "video_duplicate_checker", "hashes.sqlite3")
+
+class HashCache:
+    """文件哈希的持久化缓存
+    
+    以(绝对路径, 文件大小, 修改时间)为键保存在SQLite数据库中, 文件变化后对应记录自动失效.
+    只在主线程中读写, 工作线程/进程只负责计算哈希
+    """
+    
+    def __init__(self, db_path: Optional[str] = None):
+        """
+        Args:
+            db_path (`str`, optional): 数据库路径, 默认为用户缓存目录下的`video_duplicate_checker/hashes.sqlite3`
+        """
+        self.db_path = db_path or default_hash_cache_path()
+        self._conn = None
+        self._disabled = False
+    
+    @classmethod
+    def from_env(cls) -> Optional["HashCache"]:
+        """按环境变量`VIDEO_DUPLICATE_HASH_CACHE`创建缓存, 取值为`off`时返回None"""
+        location = os.environ.get(HASH_CACHE_ENV, "")
+        if location.lower() == "off":
+            return None
+        return cls(location or None)
+    
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        """获取数据库连接, 数据库不可用时返回None"""
+        if self._disabled:
+            return None
+        if self._conn is not None:
+            return self._conn
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS hashes ("
+                         "path TEXT NOT NULL, kind TEXT NOT NULL, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL,"
+                         "digest TEXT NOT NULL, updated REAL NOT NULL, PRIMARY KEY (path, kind))")
+        except (sqlite3.Error, OSError) as e:
+            # 缓存只是加速手段, 数据库不可用(如只读目录)时退化为不缓存
+            print(f"哈希缓存不可用, 将不使用缓存: {e}")
+            self._disabled = True
+            return None
+        self._conn = conn
+        return conn
+    
+    def get(self, video_file: "VideoFile", kind: str) -> Optional[str]:
+        """查询文件的哈希, 文件已变化或无记录时返回None"""
+        conn = self._connect()
+        if conn is None:
+            return None
+        try:
+            row = conn.execute("SELECT size, mtime_ns, digest FROM hashes WHERE path=? AND kind=?",
+                               (os.path.abspath(video_file.file_path), kind)).fetchone()
+        except sqlite3.Error:
+            return None
+        if row is None or row[0] != video_file.file_size or row[1] != video_file.mtime_ns:
+            return None
+        return row[2]
+    
+    def put(self, video_file: "VideoFile", kind: str, digest: str) -> None:
+        """写入文件的哈希"""
+        conn = self._connect()
+        if conn is None:
+            return
+        try:
+            conn.execute("INSERT OR REPLACE INTO hashes (path, kind, size, mtime_ns, digest, updated) VALUES (?, ?, ?, ?, ?, ?)",
+                         (os.path.abspath(video_file.file_path), kind, video_file.file_size, video_file.mtime_ns,
+                          digest, time.time()))
+        except sqlite3.Error:
+            pass
+    
+    def forget(self, path: str) -> None:
+        """删除文件的所有记录, 在删除文件后调用"""
+        conn = self._connect()
+        if conn is None:
+            return
+        try:
+            conn.execute("DELETE FROM hashes WHERE path=?", (os.path.abspath(path),))
+        except sqlite3.Error:
+            pass
+    
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
 class VideoFile:
     """视频文件信息类"""
     
     def __init__(self, file_path: str):
         self.file_path = file_path
         self.file_name = os.path.basename(file_path)
-        self.file_size = os.path.getsize(file_path)
-        self.create_time = os.path.getctime(file_path)
-        self.modify_time = os.path.getmtime(file_path)
-        self.md5_hash = None
+        stat = os.stat(file_path)
+        self.file_size = stat.st_size
+        self.create_time = stat.st_ctime
+        self.modify_time = stat.st_mtime
+        self.mtime_ns = stat.st_mtime_ns
+        self.partial_hash = None  # 文件大小与首尾块的哈希
+        self.content_hash = None  # 完整内容的哈希, 算法见HASH_ALGORITHM
+        self.fingerprint = None  # 画面指纹, 见video_fingerprint
         self.chinese_prefix = None
         self.number_suffix = None
         self._parse_filename()
@@ -63,18 +506,30 @@ class VideoFile:
                         self.number_suffix = int(number_part)
                         break
     
+    @property
+    def md5_hash(self) -> Optional[str]:
+        """完整内容的哈希(兼容旧名称, 算法见HASH_ALGORITHM)"""
+        return self.content_hash
+    
+    def calculate_partial_hash(self, chunk_size: int = PARTIAL_CHUNK_SIZE) -> str:
+        """计算文件大小及首、尾各`chunk_size`字节的哈希, 用于在完整哈希之前快速排除内容不同的文件"""
+        if self.partial_hash is None:
+            self.partial_hash = partial_file_hash(self.file_path, self.file_size, chunk_size)
+        return self.partial_hash
+    
+    def calculate_hash(self, algorithm: Optional[str] = None, buffer_size: int = READ_BUFFER_SIZE) -> str:
+        """以大块缓冲读取计算完整内容的哈希, 默认使用HASH_ALGORITHM"""
+        if self.content_hash is not None and algorithm in (None, HASH_ALGORITHM):
+            return self.content_hash
+        
+        digest = full_file_hash(self.file_path, algorithm, buffer_size)
+        if algorithm in (None, HASH_ALGORITHM):
+            self.content_hash = digest
+        return digest
+    
     def calculate_md5(self) -> str:
         """计算文件MD5值"""
-        if self.md5_hash is not None:
-            return self.md5_hash
-        
-        hash_md5 = hashlib.md5()
-        with open(self.file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_md5.update(chunk)
-        
-        self.md5_hash = hash_md5.hexdigest()
-        return self.md5_hash
+        return self.calculate_hash("md5")
     
     def get_create_time_str(self) -> str:
         """获取创建时间字符串"""
@@ -89,10 +544,26 @@ class VideoDuplicateChecker:
     # 支持的视频格式
     VIDEO_EXTENSIONS = {'.mp4', '.avi', '.mkv', '.mov', '.wmv', '.flv', '.webm', '.m4v', '.mpg', '.mpeg'}
     
-    def __init__(self, debug_mode: bool = False):
+    def __init__(self, debug_mode: bool = False, workers: Optional[int] = None, executor: str = "thread",
+                 use_cache: bool = True, cache: Optional[HashCache] = None):
+        """
+        Args:
+            debug_mode (`bool`, optional): 是否显示文件名解析等调试信息
+            workers (`int`, optional): 并行计算哈希的线程/进程数, 默认为`min(8, CPU核数)`
+            executor (`str`, optional): "thread"(适合NAS等I/O受限的存储)或"process"(适合读取很快、哈希受限于CPU的SSD), 默认为"thread"
+            use_cache (`bool`, optional): 是否使用持久化的哈希缓存, 默认为是
+            cache (`HashCache`, optional): 使用的缓存, 默认按环境变量`VIDEO_DUPLICATE_HASH_CACHE`创建
+        """
+        if executor not in ("thread", "process"):
+            raise ValueError(f"未知的执行器类型: {executor}")
+        self.workers = max(1, workers or min(8, os.cpu_count() or 1))
+        self.executor = executor
+        self.hash_cache = (cache or HashCache.from_env()) if use_cache else None
+        self.hash_stats = {"cached": 0, "hashed": 0, "failed": 0}  # 各阶段命中缓存、实际计算及失败的文件数
         self.video_files: List[VideoFile] = []
-        self.md5_duplicates: Dict[str, List[VideoFile]] = defaultdict(list)
+        self.md5_duplicates: Dict[str, List[VideoFile]] = defaultdict(list)  # 完整哈希 → 内容相同的文件
         self.name_similar_groups: List[List[VideoFile]] = []
+        self.perceptual_groups: List[List[VideoFile]] = []  # 画面相似(可能经过重新编码或剪辑)的文件组
         self.debug_mode = debug_mode
     
     def scan_directory(self, directory: str) -> None:
@@ -152,119 +623,222 @@ class VideoDuplicateChecker:
         if len(no_prefix_files) > 10:
             print(f"  ... 还有 {len(no_prefix_files) - 10} 个文件")
     
-    def calculate_all_md5(self) -> None:
-        """计算所有视频文件的MD5值"""
-        print("正在计算MD5值...")
+    @staticmethod
+    def _duplicate_groups(files: List[VideoFile], key) -> List[List[VideoFile]]:
+        """按`key`将文件分组, 只返回含多个文件的组, `key`为None的文件不参与分组"""
+        groups = defaultdict(list)
+        for video_file in files:
+            value = key(video_file)
+            if value is not None:
+                groups[value].append(video_file)
+        return [group for group in groups.values() if len(group) > 1]
+    
+    def _open_pool(self, task_count: int):
+        """按并行配置创建线程池/进程池, 只有一个任务或只使用一个线程时返回None"""
+        if self.workers > 1 and task_count > 1:
+            pool_class = ProcessPoolExecutor if self.executor == "process" else ThreadPoolExecutor
+            return pool_class(max_workers=self.workers)
+        return None
+    
+    def _compute_hashes(self, files: List[VideoFile], kind: str, pool, label: str, on_done=None) -> None:
+        """计算文件的部分哈希(`kind`为"partial")、完整哈希("content")或画面指纹("perceptual"), 结果写入文件对象
         
-        for i, video_file in enumerate(self.video_files):
-            print(f"计算进度: {i+1}/{len(self.video_files)} - {video_file.file_name}")
-            try:
-                md5_hash = video_file.calculate_md5()
-                self.md5_duplicates[md5_hash].append(video_file)
-            except Exception as e:
-                print(f"计算 {video_file.file_name} MD5时出错: {e}")
+        优先使用缓存, 未命中的文件在`pool`中并行计算; 计算失败的文件对应的哈希保持为None
+        """
+        attr, cache_kind = {"partial": ("partial_hash", "partial"),
+                            "content": ("content_hash", f"content:{HASH_ALGORITHM}"),
+                            "perceptual": ("fingerprint", FINGERPRINT_KIND)}[kind]
+        misses = []
+        for video_file in files:
+            if getattr(video_file, attr) is None and self.hash_cache is not None:
+                setattr(video_file, attr, self.hash_cache.get(video_file, cache_kind))
+                if getattr(video_file, attr) is not None:
+                    self.hash_stats["cached"] += 1
+            if getattr(video_file, attr) is None:
+                misses.append(video_file)
+            elif on_done:
+                on_done(video_file)
         
-        # 保留只有重复文件的组
-        self.md5_duplicates = {k: v for k, v in self.md5_duplicates.items() if len(v) > 1}
-        print(f"发现 {len(self.md5_duplicates)} 个MD5重复组")
+        if pool is None or len(misses) < 2:
+            outcomes = map(_hash_in_worker, [f.file_path for f in misses], [f.file_size for f in misses],
+                           [kind] * len(misses))
+        else:
+            outcomes = pool.map(_hash_in_worker, [f.file_path for f in misses], [f.file_size for f in misses],
+                                [kind] * len(misses))
+        for i, (video_file, (digest, error)) in enumerate(zip(misses, outcomes)):
+            if self.debug_mode:
+                print(f"{label}进度: {i+1}/{len(misses)} - {video_file.file_name}")
+            if digest is None:
+                self.hash_stats["failed"] += 1
+                print(f"计算 {video_file.file_name} 的{label}时出错: {error}")
+                continue
+            setattr(video_file, attr, digest)
+            self.hash_stats["hashed"] += 1
+            if self.hash_cache is not None:
+                self.hash_cache.put(video_file, cache_kind, digest)
+            if on_done:
+                on_done(video_file)
     
-    def find_name_similar_groups(self, similarity_threshold: float = 0.85) -> None:
-        """查找文件名相似的组"""
-        print("正在检测文件名相似的重复文件...")
+    def find_content_duplicates(self) -> None:
+        """分三个阶段查找内容完全相同的文件:
+        按文件大小分组 → 同样大小的文件比较首尾块的部分哈希 → 只对部分哈希仍然相同的文件计算完整哈希
         
-        # 按中文前缀分组，但需要更严格的判断
-        prefix_groups = defaultdict(list)
+        大小唯一的文件不可能有完全相同的副本, 因此不会被读取
+        """
+        print("正在检测内容完全相同的文件...")
+        
+        size_groups = defaultdict(list)
         for video_file in self.video_files:
-            if video_file.chinese_prefix:
-                prefix_groups[video_file.chinese_prefix].append(video_file)
+            size_groups[video_file.file_size].append(video_file)
+        candidates = [f for group in size_groups.values() if len(group) > 1 for f in group]
+        print(f"阶段 1/3 按大小分组: {len(self.video_files)} 个文件中有 {len(candidates)} 个存在同样大小的文件")
         
-        # 找出有多个文件的组，但要检查是否真的相似
-        for prefix, files in prefix_groups.items():
-            if len(files) > 1:
-                # 进一步检查：如果前缀完全相同，还要检查完整文件名的相似度
-                valid_groups = []
-                processed = set()
-                
-                for i, file1 in enumerate(files):
-                    if file1.file_name in processed:
-                        continue
-                    
-                    similar_group = [file1]
-                    processed.add(file1.file_name)
-                    
-                    for j, file2 in enumerate(files[i+1:], i+1):
-                        if file2.file_name in processed:
-                            continue
-                        
-                        # 计算完整文件名的相似度
-                        name1 = os.path.splitext(file1.file_name)[0]
-                        name2 = os.path.splitext(file2.file_name)[0]
-                        similarity = difflib.SequenceMatcher(None, name1, name2).ratio()
-                        
-                        # 更严格的判断：相似度要高，且文件大小差异不能太大
-                        size_ratio = min(file1.file_size, file2.file_size) / max(file1.file_size, file2.file_size)
-                        
-                        if similarity >= similarity_threshold and size_ratio >= 0.8:
-                            similar_group.append(file2)
-                            processed.add(file2.file_name)
-                    
-                    if len(similar_group) > 1:
-                        # 按数字后缀排序
-                        similar_group.sort(key=lambda x: x.number_suffix if x.number_suffix else 0)
-                        valid_groups.append(similar_group)
-                
-                self.name_similar_groups.extend(valid_groups)
+        self.hash_stats = {"cached": 0, "hashed": 0, "failed": 0}
+        pool = self._open_pool(len(candidates))
+        try:
+            self._compute_hashes(candidates, "partial", pool, "部分哈希")
+            partial_groups = self._duplicate_groups(candidates, lambda f: f.partial_hash)
+            candidates = [f for group in partial_groups for f in group]
+            print(f"阶段 2/3 首尾块哈希: {len(candidates)} 个文件仍需比较完整内容")
+            
+            total_bytes = sum(f.file_size for f in candidates)
+            progress = {"bytes": 0, "printed": 0.0}
+            
+            def report_progress(video_file: VideoFile) -> None:
+                progress["bytes"] += video_file.file_size
+                now = time.monotonic()
+                if now - progress["printed"] >= 1 or progress["bytes"] == total_bytes:
+                    progress["printed"] = now
+                    print(f"阶段 3/3 完整哈希({HASH_ALGORITHM}): "
+                          f"{progress['bytes'] / 1024 / 1024:.1f}/{total_bytes / 1024 / 1024:.1f} MB")
+            
+            self._compute_hashes(candidates, "content", pool, "完整哈希", report_progress)
+        finally:
+            if pool is not None:
+                pool.shutdown()
         
-        # 对于没有中文前缀的文件，使用更严格的字符串相似度检测
-        no_prefix_files = [f for f in self.video_files if not f.chinese_prefix]
-        similar_groups = []
+        self.md5_duplicates = {group[0].content_hash: group
+                               for group in self._duplicate_groups(candidates, lambda f: f.content_hash)}
+        print(f"哈希统计: 新计算 {self.hash_stats['hashed']} 次, 命中缓存 {self.hash_stats['cached']} 次, "
+              f"失败 {self.hash_stats['failed']} 次")
+        print(f"发现 {len(self.md5_duplicates)} 个内容重复组")
+    
+    def find_perceptual_duplicates(self, max_distance: int = 10, min_match_ratio: float = 0.5) -> None:
+        """查找画面相似的文件: 重新编码、改变分辨率或剪掉片头片尾的副本内容哈希不同, 但抽取的画面仍然相似
+        
+        每个视频均匀抽取`FINGERPRINT_FRAMES`帧计算感知哈希(结果保存在哈希缓存中), 所有帧的哈希放入BK树,
+        查询与每一帧汉明距离不超过`max_distance`的帧; 两个视频中相似的帧数达到较少一方帧数的`min_match_ratio`时视为画面相似.
+        内容完全相同的文件已由`find_content_duplicates`报告, 不再重复列出
+        
+        Args:
+            max_distance (`int`, optional): 两帧视为相似的最大汉明距离(64位中), 默认为10
+            min_match_ratio (`float`, optional): 视为画面相似所需的相似帧比例, 默认为0.5
+        """
+        print("正在检测画面相似的文件...")
+        if not perceptual_available():
+            print("未找到ffmpeg(或imageio-ffmpeg)及numpy、Pillow, 跳过画面相似检测")
+            return
+        
+        pool = self._open_pool(len(self.video_files))
+        try:
+            self._compute_hashes(self.video_files, "perceptual", pool, "画面指纹")
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        
+        files = [f for f in self.video_files if f.fingerprint]
+        groups = group_similar_fingerprints(
+            [f.fingerprint for f in files], max_distance, min_match_ratio,
+            skip_pair=lambda i, j: files[i].content_hash is not None and files[i].content_hash == files[j].content_hash)
+        self.perceptual_groups = [[files[i] for i in group] for group in groups]
+        frame_count = sum(len(f.fingerprint.split(",")) for f in files)
+        
+        print(f"已比较 {len(files)} 个视频的 {frame_count} 帧画面, 发现 {len(self.perceptual_groups)} 个画面相似组")
+    
+    def calculate_all_md5(self) -> None:
+        """查找内容完全相同的文件(兼容旧名称), 见`find_content_duplicates`"""
+        self.find_content_duplicates()
+    
+    def _similar_name_groups(self, files: List[VideoFile], similarity_threshold: float) -> List[List[VideoFile]]:
+        """按文件顺序贪心地将文件名(不含扩展名)相似、大小相近的文件归为一组, 只返回含多个文件的组
+        
+        候选文件对由`NameSimilarityIndex`给出, 只对候选对计算`difflib`相似度, 结果与两两比较相同
+        """
+        names = [os.path.splitext(f.file_name)[0] for f in files]
+        index = NameSimilarityIndex(names, similarity_threshold)
+        groups = []
         processed = set()
         
-        for i, file1 in enumerate(no_prefix_files):
+        for i, file1 in enumerate(files):
             if file1.file_name in processed:
                 continue
             
             similar_group = [file1]
             processed.add(file1.file_name)
+            matcher = difflib.SequenceMatcher(None, names[i])
             
-            for j, file2 in enumerate(no_prefix_files[i+1:], i+1):
+            for j in index.candidates(i):
+                file2 = files[j]
                 if file2.file_name in processed:
                     continue
                 
-                # 计算文件名相似度（去除扩展名）
-                name1 = os.path.splitext(file1.file_name)[0]
-                name2 = os.path.splitext(file2.file_name)[0]
-                similarity = difflib.SequenceMatcher(None, name1, name2).ratio()
-                
-                # 更严格的判断：高相似度 + 文件大小相近
-                size_ratio = min(file1.file_size, file2.file_size) / max(file1.file_size, file2.file_size)
-                
-                if similarity >= similarity_threshold and size_ratio >= 0.8:
+                # 更严格的判断：相似度要高，且文件大小差异不能太大
+                small, large = sorted((file1.file_size, file2.file_size))
+                if small < 0.8 * large:
+                    continue
+                # ratio()不对称, 与两两比较时一样以names[i]为第一个序列
+                matcher.set_seq2(names[j])
+                if (matcher.real_quick_ratio() >= similarity_threshold and matcher.quick_ratio() >= similarity_threshold
+                        and matcher.ratio() >= similarity_threshold):
                     similar_group.append(file2)
                     processed.add(file2.file_name)
             
             if len(similar_group) > 1:
-                similar_groups.append(similar_group)
+                groups.append(similar_group)
+        return groups
+    
+    def find_name_similar_groups(self, similarity_threshold: float = 0.85) -> None:
+        """查找文件名相似的组"""
+        print("正在检测文件名相似的重复文件...")
         
-        self.name_similar_groups.extend(similar_groups)
+        # 按中文前缀分组，前缀相同的文件还要检查完整文件名的相似度
+        prefix_groups = defaultdict(list)
+        for video_file in self.video_files:
+            if video_file.chinese_prefix:
+                prefix_groups[video_file.chinese_prefix].append(video_file)
+        
+        for prefix, files in prefix_groups.items():
+            if len(files) > 1:
+                valid_groups = self._similar_name_groups(files, similarity_threshold)
+                for similar_group in valid_groups:
+                    # 按数字后缀排序
+                    similar_group.sort(key=lambda x: x.number_suffix if x.number_suffix else 0)
+                self.name_similar_groups.extend(valid_groups)
+        
+        # 对于没有中文前缀的文件，直接比较文件名相似度
+        no_prefix_files = [f for f in self.video_files if not f.chinese_prefix]
+        self.name_similar_groups.extend(self._similar_name_groups(no_prefix_files, similarity_threshold))
         print(f"发现 {len(self.name_similar_groups)} 个文件名相似组")
     
     def generate_report(self) -> Dict:
         """生成检测报告"""
         report = {
             'scan_time': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'hash_algorithm': HASH_ALGORITHM,
             'total_files': len(self.video_files),
             'md5_duplicate_groups': len(self.md5_duplicates),
             'name_similar_groups': len(self.name_similar_groups),
+            'perceptual_similar_groups': len(self.perceptual_groups),
             'md5_duplicates': [],
             'name_similar': [],
+            'perceptual_similar': [],
             'statistics': {
                 'total_duplicate_files': 0,
                 'total_waste_size': 0
             }
         }
         
-        # MD5重复文件信息
+        # 内容重复文件信息（字段名沿用md5，与旧报告兼容，算法见hash_algorithm）
         for md5_hash, files in self.md5_duplicates.items():
             group_info = {
                 'md5': md5_hash,
@@ -306,13 +880,28 @@ class VideoDuplicateChecker:
                     'name': file.file_name,
                     'size': file.file_size,
                     'create_time': file.get_create_time_str(),
-                    'md5': file.md5_hash,
+                    'md5': file.content_hash,
                     'is_oldest': file == group[0]
                 }
                 group_info['files'].append(file_info)
             
             report['name_similar'].append(group_info)
         
+        # 画面相似文件信息
+        for group in self.perceptual_groups:
+            group.sort(key=lambda x: x.create_time)
+            report['perceptual_similar'].append({
+                'count': len(group),
+                'files': [{
+                    'path': file.file_path,
+                    'name': file.file_name,
+                    'size': file.file_size,
+                    'create_time': file.get_create_time_str(),
+                    'md5': file.content_hash,
+                    'is_oldest': file == group[0]
+                } for file in group]
+            })
+        
         return report
     
     def print_report(self, report: Dict) -> None:
@@ -322,16 +911,17 @@ class VideoDuplicateChecker:
         print("="*80)
         print(f"扫描时间: {report['scan_time']}")
         print(f"总文件数: {report['total_files']}")
-        print(f"MD5重复组数: {report['md5_duplicate_groups']}")
+        print(f"内容重复组数: {report['md5_duplicate_groups']} (哈希算法: {report['hash_algorithm']})")
         print(f"文件名相似组数: {report['name_similar_groups']}")
+        print(f"画面相似组数: {report['perceptual_similar_groups']}")
         print(f"重复文件数: {report['statistics']['total_duplicate_files']}")
         print(f"浪费空间: {report['statistics']['total_waste_size'] / 1024 / 1024:.2f} MB")
         
         if report['md5_duplicates']:
             print("\n" + "-"*50)
-            print("MD5完全重复文件:")
+            print("内容完全重复文件:")
             for i, group in enumerate(report['md5_duplicates'], 1):
-                print(f"\n组 {i}: {group['count']} 个文件 (MD5: {group['md5'][:8]}...)")
+                print(f"\n组 {i}: {group['count']} 个文件 (哈希: {group['md5'][:8]}...)")
                 for file in group['files']:
                     oldest_mark = " [最早]" if file['is_oldest'] else ""
                     print(f"  - {file['name']} ({file['size']} bytes, {file['create_time']}){oldest_mark}")
@@ -343,8 +933,17 @@ class VideoDuplicateChecker:
                 print(f"\n组 {i}: {group['count']} 个文件 (前缀: {group['chinese_prefix']})")
                 for file in group['files']:
                     oldest_mark = " [最早]" if file['is_oldest'] else ""
-                    md5_info = f" MD5: {file['md5'][:8]}..." if file['md5'] else ""
+                    md5_info = f" 哈希: {file['md5'][:8]}..." if file['md5'] else ""
                     print(f"  - {file['name']} ({file['size']} bytes, {file['create_time']}){oldest_mark}{md5_info}")
+        
+        if report['perceptual_similar']:
+            print("\n" + "-"*50)
+            print("画面相似文件(可能是重新编码或剪辑过的副本):")
+            for i, group in enumerate(report['perceptual_similar'], 1):
+                print(f"\n组 {i}: {group['count']} 个文件")
+                for file in group['files']:
+                    oldest_mark = " [最早]" if file['is_oldest'] else ""
+                    print(f"  - {file['name']} ({file['size']} bytes, {file['create_time']}){oldest_mark}")
     
     def save_report(self, report: Dict, output_file: str) -> None:
         """保存报告到JSON文件"""
@@ -361,11 +960,11 @@ class VideoDuplicateChecker:
         deleted_files = []
         deleted_size = 0
         
-        # 处理MD5完全重复的文件
+        # 处理内容完全重复的文件
         if self.md5_duplicates:
-            print("\n处理MD5完全重复的文件:")
+            print("\n处理内容完全重复的文件:")
             for i, (md5_hash, files) in enumerate(self.md5_duplicates.items(), 1):
-                print(f"\n组 {i}: {len(files)} 个文件 (MD5: {md5_hash[:8]}...)")
+                print(f"\n组 {i}: {len(files)} 个文件 (哈希: {md5_hash[:8]}...)")
                 
                 # 按创建时间排序，最早的在前面
                 files.sort(key=lambda x: x.create_time)
@@ -385,6 +984,8 @@ class VideoDuplicateChecker:
                         for file in duplicate_files:
                             try:
                                 os.remove(file.file_path)
+                                if self.hash_cache is not None:
+                                    self.hash_cache.forget(file.file_path)
                                 deleted_files.append(file.file_path)
                                 deleted_size += file.file_size
                                 print(f"已删除: {file.file_name}")
@@ -400,14 +1001,25 @@ class VideoDuplicateChecker:
                     else:
                         print("请输入 y(是)/n(否)/s(跳过)")
         
-        # 处理文件名相似的文件（需要用户判断）
-        if self.name_similar_groups:
-            print(f"\n处理文件名相似的文件 ({len(self.name_similar_groups)} 组):")
-            print("注意: 这些文件只是名称相似，请仔细确认是否为重复文件!")
+        # 处理文件名相似与画面相似的文件（需要用户判断）
+        similar_sections = [
+            ("文件名相似", "这些文件只是名称相似", self.name_similar_groups),
+            ("画面相似", "这些文件只是画面相似，可能是重新编码或剪辑过的副本，也可能只是素材相同", self.perceptual_groups),
+        ]
+        for title, warning, groups in similar_sections:
+            if not groups:
+                continue
+            print(f"\n处理{title}的文件 ({len(groups)} 组):")
+            print(f"注意: {warning}，请仔细确认是否为重复文件!")
             
-            for i, group in enumerate(self.name_similar_groups, 1):
+            for i, group in enumerate(groups, 1):
+                # 已在前面的组中删除的文件不再列出
+                group = [file for file in group if file.file_path not in deleted_files]
+                if len(group) < 2:
+                    continue
                 print(f"\n组 {i}: {len(group)} 个文件")
-                print(f"中文前缀: {group[0].chinese_prefix if group[0].chinese_prefix else '无'}")
+                if groups is self.name_similar_groups:
+                    print(f"中文前缀: {group[0].chinese_prefix if group[0].chinese_prefix else '无'}")
                 
                 # 按创建时间排序
                 group.sort(key=lambda x: x.create_time)
@@ -417,7 +1029,7 @@ class VideoDuplicateChecker:
                 # 显示所有文件的详细信息
                 for j, file in enumerate(group):
                     oldest_mark = " [最早]" if file == oldest_file else ""
-                    md5_info = f" MD5: {file.md5_hash[:8]}..." if file.md5_hash else ""
+                    md5_info = f" 哈希: {file.content_hash[:8]}..." if file.content_hash else ""
                     print(f"  {j+1}. {file.file_name} ({file.get_create_time_str()}) - {file.file_size} bytes{oldest_mark}{md5_info}")
                 
                 while True:
@@ -427,6 +1039,8 @@ class VideoDuplicateChecker:
                         for file in similar_files:
                             try:
                                 os.remove(file.file_path)
+                                if self.hash_cache is not None:
+                                    self.hash_cache.forget(file.file_path)
                                 deleted_files.append(file.file_path)
                                 deleted_size += file.file_size
                                 print(f"已删除: {file.file_name}")
@@ -448,7 +1062,7 @@ class VideoDuplicateChecker:
                     else:
                         print("请输入 y(是)/n(否)/s(跳过)/v(查看详情)")
         
-        # 显示删除统计
+                # 显示删除统计
         print(f"\n删除统计:")
         print(f"删除文件数: {len(deleted_files)}")
         print(f"释放空间: {deleted_size / 1024 / 1024:.2f} MB")
@@ -489,6 +1103,10 @@ def main():
         similarity_threshold = 0.85
         print("输入无效，使用默认阈值0.85")
     
+    # 询问是否检测画面相似
+    perceptual_choice = input("是否检测画面相似(重新编码或剪辑过)的视频? 需要ffmpeg, 首次扫描较慢 (y/n): ").lower().strip()
+    perceptual_mode = perceptual_choice in ['y', 'yes', '是']
+    
     # 创建检测器实例
     checker = VideoDuplicateChecker(debug_mode)
     
@@ -500,12 +1118,16 @@ def main():
             print("未发现任何视频文件!")
             return
         
-        # 计算MD5
-        checker.calculate_all_md5()
+        # 分阶段查找内容完全相同的文件
+        checker.find_content_duplicates()
         
         # 查找相似文件名
         checker.find_name_similar_groups(similarity_threshold)
         
+        # 查找画面相似的文件
+        if perceptual_mode:
+            checker.find_perceptual_duplicates()
+        
         # 生成报告
         report = checker.generate_report()
         
@@ -517,7 +1139,8 @@ def main():
         checker.save_report(report, output_file)
         
         # 询问是否进行交互式删除
-        if (report['md5_duplicate_groups'] > 0 or report['name_similar_groups'] > 0):
+        if (report['md5_duplicate_groups'] > 0 or report['name_similar_groups'] > 0
+                or report['perceptual_similar_groups'] > 0):
             print("\n" + "="*80)
             while True:
                 choice = input("是否进行交互式删除重复文件? (y/n): ").lower().strip()
@@ -8,8 +8,6 @@
 import os
 import sys
 import glob
-import json
-import shutil
 from pathlib import Path
 
 # 添加项目根目录到Python路径
@@ -42,6 +40,16 @@ class VideoPreprocessCli:
         
         # 时间线处理模式配置
         self.timeline_mode = None  # "speed_adjust", "crop_end", "crop_start", "crop_random", "keep_original"
+        
+        # 以紧凑格式（无缩进）写入草稿JSON，剪映可正常读取且写入更快
+        self.json_compact = False
+        
+        # 复制草稿时素材文件的共享方式: "auto"(reflink或硬链接，不支持时复制) 或 "copy"(完整复制)
+        self.copy_strategy = "auto"
+        # 替换的新素材经由草稿根目录下的素材池共享，同一素材用于多个草稿时只保存一份
+        self.use_material_pool = True
+        # 修改草稿JSON前的备份方式: "full"(完整备份)、"snapshot"(只保留原始快照)、"journal"(只记录改动)或 "off"(不备份，模板即是备份)
+        self.backup_mode = draft.draft_backup.default_backup_mode()
     
     def print_header(self, title):
         """打印标题"""
@@ -210,8 +218,7 @@ class VideoPreprocessCli:
             return None
         
         try:
-            with open(draft_info_path, 'r', encoding='utf-8') as f:
-                draft_info = json.load(f)
+            draft_info = draft.json_util.load_file(draft_info_path)
             
             # 提取基本信息
             canvas = draft_info.get('canvas_config', {})
@@ -388,6 +395,18 @@ class VideoPreprocessCli:
                     elif file_ext in self.supported_audio_extensions:
                         audio_files.append(file_path)
             
+            # 并发探测全部素材（结果经由探测缓存），在创建草稿之前剔除无法解析的文件
+            probes = draft.probe_many(video_files + image_files + audio_files)
+            broken = {path: probe['error'] for path, probe in probes.items() if probe['error'] is not None}
+            if broken and len(broken) == len(probes):
+                self.print_warning(f"无法探测素材文件，跳过素材预检: {next(iter(broken.values()))}")
+            elif broken:
+                for path, error in broken.items():
+                    self.print_warning(f"跳过无法解析的素材 {os.path.basename(path)}: {error}")
+                video_files = [f for f in video_files if os.path.abspath(f) not in broken]
+                image_files = [f for f in image_files if os.path.abspath(f) not in broken]
+                audio_files = [f for f in audio_files if os.path.abspath(f) not in broken]
+            
             # 显示扫描结果
             print(f"🎬 视频文件: {len(video_files)} 个")
             for video in video_files[:5]:  # 只显示前5个
@@ -474,13 +493,14 @@ class VideoPreprocessCli:
             source_path = os.path.join(self.draft_folder_path, self.template_draft)
             target_path = os.path.join(self.draft_folder_path, target_name)
             
-            # 如果目标已存在，先删除
+            # 如果目标已存在，先删除（同时释放它对素材池的引用）
             if os.path.exists(target_path):
-                shutil.rmtree(target_path)
+                self.draft_folder.remove(target_name)
             
-            # 复制整个草稿文件夹
-            shutil.copytree(source_path, target_path)
+            # 复制整个草稿文件夹，素材文件与模板共享，只实际复制JSON等会被编辑的文件
+            report = draft.copy_draft_tree(source_path, target_path, self.copy_strategy)
             print(f"    📁 成功复制文件夹: {source_path} -> {target_path}")
+            print(f"    💾 {report}")
             return True
         except Exception as e:
             print(f"    ❌ 复制草稿失败: {e}")
@@ -495,7 +515,7 @@ class VideoPreprocessCli:
             new_draft_path = os.path.join(self.draft_folder_path, new_draft_name)
             if os.path.exists(new_draft_path):
                 print(f"    🗑️ 删除已存在的草稿: {new_draft_name}")
-                shutil.rmtree(new_draft_path)
+                self.draft_folder.remove(new_draft_name)
             
             # 复制草稿
             success = self.copy_single_draft(new_draft_name)
@@ -567,27 +587,23 @@ class VideoPreprocessCli:
                 print(f"    ❌ 草稿文件不存在，已检查 draft_info.json 和 draft_content.json")
                 return False
             
-            # 读取当前的草稿文件
-            with open(draft_file_path, 'r', encoding='utf-8') as f:
-                draft_info = json.load(f)
-            
-            # 备份原文件
-            backup_path = draft_file_path + ".backup"
-            with open(backup_path, 'w', encoding='utf-8') as f:
-                json.dump(draft_info, f, ensure_ascii=False, indent=2)
+            # 读取当前的草稿文件，备份在保存时按备份方式写入
+            draft_backup = draft.DraftBackup(draft_file_path, self.backup_mode, ".backup")
+            draft_info = draft_backup.load()
             
             success_count = 0
+            # 素材与片段索引只建立一次, 供所有替换项共用
+            index = draft.DraftIndex.from_content(draft_info)
             
             # 处理视频素材替换
             for replacement in replacements:
                 if replacement['type'] == 'video':
-                    if self.replace_video_material(draft_info, replacement, draft_name):
+                    if self.replace_video_material(draft_info, replacement, draft_name, index=index):
                         success_count += 1
             
             if success_count > 0:
                 # 保存更新后的草稿文件
-                with open(draft_file_path, 'w', encoding='utf-8') as f:
-                    json.dump(draft_info, f, ensure_ascii=False, indent=2)
+                draft_backup.save(draft_info, indent=2, compact=self.json_compact)
                 
                 print(f"    ✅ 素材替换完成! 成功替换 {success_count}/{len(replacements)} 个素材")
                 return True
@@ -599,9 +615,11 @@ class VideoPreprocessCli:
             print(f"    ❌ 直接JSON替换失败: {e}")
             return False
     
-    def replace_video_material(self, draft_info, replacement, draft_name):
-        """替换视频素材"""
+    def replace_video_material(self, draft_info, replacement, draft_name, index=None):
+        """替换视频素材, `index`为草稿的`DraftIndex`, 未提供时临时建立"""
         try:
+            if index is None:
+                index = draft.DraftIndex.from_content(draft_info)
             # 创建video materials目录
             materials_dir = os.path.join(self.draft_folder_path, draft_name, "materials", "video")
             if not os.path.exists(materials_dir):
@@ -614,7 +632,8 @@ class VideoPreprocessCli:
                 # 使用更精确的匹配逻辑：只替换名为 "video.mp4" 的视频素材
                 target_name = replacement.get('target_name', replacement['original_name'])
                 
-                for video in videos:
+                for _, position in index.find_materials(target_name, 'videos'):
+                    video = videos[position]
                     # 精确匹配：只替换指定名称的视频素材
                     video_name = video.get('material_name', '')
                     video_id = video.get('id', '')
@@ -627,31 +646,29 @@ class VideoPreprocessCli:
                         original_filename = video_name  # 保持原始文件名
                         target_path = os.path.join(materials_dir, original_filename)
                         
-                        # 备份原文件
-                        if os.path.exists(target_path):
+                        # 备份原文件：原文件随后即被替换，直接重命名为备份而不必再复制一份
+                        if os.path.exists(target_path) and self.backup_mode != "off":
                             backup_path = target_path + ".backup"
-                            shutil.copy2(target_path, backup_path)
+                            os.replace(target_path, backup_path)
                             print(f"    💾 备份原文件: {target_path} -> {backup_path}")
                         
-                        # 复制新文件，但使用原文件名
-                        shutil.copy2(replacement['new_file'], target_path)
+                        # 放入新文件，但使用原文件名；经由素材池链接或先删除再复制，不写穿与模板共享的素材文件
+                        if self.use_material_pool:
+                            target_path = self.draft_folder.material_pool.link_material(replacement['new_file'], target_path, draft_name)
+                        else:
+                            draft.replace_file(replacement['new_file'], target_path)
                         print(f"    📁 复制文件: {replacement['new_file']} -> {target_path}")
                         
                         # 获取新视频文件的信息
                         try:
-                            import pymediainfo
-                            media_info = pymediainfo.MediaInfo.parse(replacement['new_file'])
-                            video_track = None
-                            for track in media_info.tracks:
-                                if track.track_type == 'Video':
-                                    video_track = track
-                                    break
+                            # 经由探测缓存获取，同一素材不会重复探测
+                            video_track = draft.probe_media(replacement['new_file'])["video"]
                             
                             if video_track:
-                                new_duration = int(video_track.duration * 1000) if video_track.duration else video.get('duration', 0)
-                                new_width = video_track.width or video.get('width', 1920)
-                                new_height = video_track.height or video.get('height', 1080)
-                                fps = video_track.frame_rate or 30.0
+                                new_duration = int(video_track["duration"] * 1000) if video_track["duration"] else video.get('duration', 0)
+                                new_width = video_track["width"] or video.get('width', 1920)
+                                new_height = video_track["height"] or video.get('height', 1080)
+                                fps = float(video_track["frame_rate"] or 30.0)
                             else:
                                 new_duration = video.get('duration', 0)
                                 new_width = video.get('width', 1920)
@@ -672,7 +689,7 @@ class VideoPreprocessCli:
                             fps = 30.0
                         
                         # 获取原素材的时间线使用时长
-                        original_timeline_duration = self.get_actual_segment_duration(draft_info, video_id)
+                        original_timeline_duration = self.get_actual_segment_duration(draft_info, video_id, index=index)
                         if original_timeline_duration is None:
                             original_timeline_duration = video.get('duration', 0)
                             print(f"    ⚠️ 无法获取时间线时长，使用素材时长: {original_timeline_duration/1000000:.1f}s")
@@ -692,7 +709,7 @@ class VideoPreprocessCli:
                         
                         # 应用时间线处理
                         if self.timeline_mode and original_timeline_duration > 0:
-                            self.apply_timeline_processing(draft_info, video_id, original_timeline_duration, new_duration)
+                            self.apply_timeline_processing(draft_info, video_id, original_timeline_duration, new_duration, index=index)
                         
                         return True
             
@@ -706,25 +723,21 @@ class VideoPreprocessCli:
             print(f"    ❌ 替换视频素材失败: {e}")
             return False
     
-    def get_actual_segment_duration(self, draft_info, material_id):
-        """获取素材在时间线上的实际使用时长"""
+    def get_actual_segment_duration(self, draft_info, material_id, index=None):
+        """获取素材在时间线上的实际使用时长, `index`为草稿的`DraftIndex`, 未提供时临时建立"""
         total_duration = 0
         
         try:
-            if 'tracks' in draft_info:
-                for track in draft_info['tracks']:
-                    if track.get('type') == 'video' and 'segments' in track:
-                        segments = track['segments']
-                        
-                        for segment in segments:
-                            if segment.get('material_id') == material_id:
-                                # 计算片段实际时长：target_timerange.duration
-                                target_timerange = segment.get('target_timerange', {})
-                                if 'duration' in target_timerange:
-                                    total_duration += target_timerange['duration']
-                                elif 'start' in target_timerange and 'end' in target_timerange:
-                                    # 如果没有duration，用end-start计算
-                                    total_duration += target_timerange['end'] - target_timerange['start']
+            if index is None:
+                index = draft.DraftIndex.from_content(draft_info)
+            for segment in index.segments_of(material_id, 'video'):
+                # 计算片段实际时长：target_timerange.duration
+                target_timerange = segment.get('target_timerange', {})
+                if 'duration' in target_timerange:
+                    total_duration += target_timerange['duration']
+                elif 'start' in target_timerange and 'end' in target_timerange:
+                    # 如果没有duration，用end-start计算
+                    total_duration += target_timerange['end'] - target_timerange['start']
             
             return total_duration if total_duration > 0 else None
             
@@ -732,8 +745,8 @@ class VideoPreprocessCli:
             print(f"    ⚠️ 获取片段实际时长失败: {e}")
             return None
     
-    def update_segments_speed(self, draft_info, material_id, speed_ratio, new_material_duration=None):
-        """更新使用指定素材的片段速度"""
+    def update_segments_speed(self, draft_info, material_id, speed_ratio, new_material_duration=None, index=None):
+        """更新使用指定素材的片段速度, `index`为草稿的`DraftIndex`, 未提供时临时建立"""
         try:
             if 'tracks' not in draft_info:
                 return
@@ -760,32 +773,29 @@ class VideoPreprocessCli:
             # 添加speed对象到speeds数组
             draft_info['materials']['speeds'].append(speed_obj)
             
-            for track in draft_info['tracks']:
-                if track.get('type') == 'video' and 'segments' in track:
-                    segments = track['segments']
-                    
-                    for segment in segments:
-                        # 检查片段是否使用了指定的素材
-                        if segment.get('material_id') == material_id:
-                            # 更新source_timerange以适应新素材时长
-                            if new_material_duration and 'source_timerange' in segment:
-                                # 保持source_timerange的start不变，只更新duration
-                                source_start = segment['source_timerange'].get('start', 0)
-                                segment['source_timerange']['duration'] = new_material_duration
-                            
-                            # 更新片段速度引用
-                            segment['speed'] = speed_ratio
-                            
-                            # 更新extra_material_refs，添加speed_id引用
-                            if 'extra_material_refs' not in segment:
-                                segment['extra_material_refs'] = []
-                            
-                            # 添加新的speed引用
-                            segment['extra_material_refs'].append(speed_id)
-                            
-                            updated_segments += 1
-                            print(f"    🎬 更新片段速度: {speed_ratio:.2f}x (ID: {speed_id})")
-            
+            # 经由反向索引查找使用此素材的片段
+            if index is None:
+                index = draft.DraftIndex.from_content(draft_info)
+            for segment in index.segments_of(material_id, 'video'):
+                # 更新source_timerange以适应新素材时长
+                if new_material_duration and 'source_timerange' in segment:
+                    # 保持source_timerange的start不变，只更新duration
+                    source_start = segment['source_timerange'].get('start', 0)
+                    segment['source_timerange']['duration'] = new_material_duration
+                
+                # 更新片段速度引用
+                segment['speed'] = speed_ratio
+                
+                # 更新extra_material_refs，添加speed_id引用
+                if 'extra_material_refs' not in segment:
+                    segment['extra_material_refs'] = []
+                
+                # 添加新的speed引用
+                segment['extra_material_refs'].append(speed_id)
+                
+                updated_segments += 1
+                print(f"    🎬 更新片段速度: {speed_ratio:.2f}x (ID: {speed_id})")
+
             if updated_segments == 0:
                 print(f"    ⚠️ 未找到使用素材 {material_id} 的片段")
                 # 如果没有使用到，移除刚创建的speed对象
@@ -794,7 +804,7 @@ class VideoPreprocessCli:
         except Exception as e:
             print(f"    ❌ 更新片段速度失败: {e}")
     
-    def apply_timeline_processing(self, draft_info, material_id, original_duration, new_duration):
+    def apply_timeline_processing(self, draft_info, material_id, original_duration, new_duration, index=None):
         """应用时间线处理逻辑"""
         try:
             print(f"    ⏱️ 时间线处理: 原时长 {original_duration/1000000:.1f}s, 新时长 {new_duration/1000000:.1f}s")
@@ -814,17 +824,18 @@ class VideoPreprocessCli:
                 # 变速调整：调整播放速度以匹配原时长
                 speed_ratio = duration_ratio  # 新素材长就加速，短就减速
                 print(f"    🎛️ 应用变速调整: {speed_ratio:.2f}x")
-                self.update_segments_speed(draft_info, material_id, speed_ratio, new_duration)
+                self.update_segments_speed(draft_info, material_id, speed_ratio, new_duration, index=index)
                 
             elif self.timeline_mode in ["crop_end", "crop_start", "crop_random"]:
                 if new_duration > original_duration:
                     # 新素材太长，需要裁剪
-                    self.apply_crop_processing(draft_info, material_id, original_duration, new_duration, self.timeline_mode)
+                    self.apply_crop_processing(draft_info, material_id, original_duration, new_duration, self.timeline_mode,
+                                               index=index)
                 else:
                     # 新素材太短，减速播放
                     speed_ratio = duration_ratio
                     print(f"    🐌 新素材较短，减速播放: {speed_ratio:.2f}x")
-                    self.update_segments_speed(draft_info, material_id, speed_ratio, new_duration)
+                    self.update_segments_speed(draft_info, material_id, speed_ratio, new_duration, index=index)
             
             return True
             
@@ -832,45 +843,42 @@ class VideoPreprocessCli:
             print(f"    ❌ 时间线处理失败: {e}")
             return False
     
-    def apply_crop_processing(self, draft_info, material_id, target_duration, source_duration, crop_mode):
-        """应用裁剪处理"""
+    def apply_crop_processing(self, draft_info, material_id, target_duration, source_duration, crop_mode, index=None):
+        """应用裁剪处理, `index`为草稿的`DraftIndex`, 未提供时临时建立"""
         try:
             if 'tracks' not in draft_info:
                 return
             
             import random
             
-            for track in draft_info['tracks']:
-                if track.get('type') == 'video' and 'segments' in track:
-                    segments = track['segments']
+            if index is None:
+                index = draft.DraftIndex.from_content(draft_info)
+            for segment in index.segments_of(material_id, 'video'):
+                if 'source_timerange' not in segment:
+                    segment['source_timerange'] = {'start': 0, 'duration': source_duration}
+                
+                source_range = segment['source_timerange']
+                
+                if crop_mode == "crop_end":
+                    # 裁剪尾部：保持开始时间，缩短duration
+                    source_range['duration'] = target_duration
+                    print(f"    ✂️ 裁剪尾部: 保留前 {target_duration/1000000:.1f}s")
                     
-                    for segment in segments:
-                        if segment.get('material_id') == material_id:
-                            if 'source_timerange' not in segment:
-                                segment['source_timerange'] = {'start': 0, 'duration': source_duration}
-                            
-                            source_range = segment['source_timerange']
-                            
-                            if crop_mode == "crop_end":
-                                # 裁剪尾部：保持开始时间，缩短duration
-                                source_range['duration'] = target_duration
-                                print(f"    ✂️ 裁剪尾部: 保留前 {target_duration/1000000:.1f}s")
-                                
-                            elif crop_mode == "crop_start":
-                                # 裁剪头部：调整开始时间
-                                crop_amount = source_duration - target_duration
-                                source_range['start'] = crop_amount
-                                source_range['duration'] = target_duration
-                                print(f"    ✂️ 裁剪头部: 跳过前 {crop_amount/1000000:.1f}s")
-                                
-                            elif crop_mode == "crop_random":
-                                # 随机裁剪：随机选择开始位置
-                                max_start = source_duration - target_duration
-                                random_start = random.randint(0, int(max_start))
-                                source_range['start'] = random_start
-                                source_range['duration'] = target_duration
-                                print(f"    ✂️ 随机裁剪: 从 {random_start/1000000:.1f}s 开始")
-                            
+                elif crop_mode == "crop_start":
+                    # 裁剪头部：调整开始时间
+                    crop_amount = source_duration - target_duration
+                    source_range['start'] = crop_amount
+                    source_range['duration'] = target_duration
+                    print(f"    ✂️ 裁剪头部: 跳过前 {crop_amount/1000000:.1f}s")
+                    
+                elif crop_mode == "crop_random":
+                    # 随机裁剪：随机选择开始位置
+                    max_start = source_duration - target_duration
+                    random_start = random.randint(0, int(max_start))
+                    source_range['start'] = random_start
+                    source_range['duration'] = target_duration
+                    print(f"    ✂️ 随机裁剪: 从 {random_start/1000000:.1f}s 开始")
+                
         except Exception as e:
             print(f"    ❌ 裁剪处理失败: {e}")
     